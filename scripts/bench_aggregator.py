@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark and cross-check the window metric implementations.
+
+For each window spec, checks that the vectorized batch path, the
+incremental MetricsEngine and the pure-Python reference agree on a small
+sample, then times them on synthetic trades (the reference only up to
+--reference-max rows). No database needed.
+
+    python scripts/bench_aggregator.py [--sizes 100000,1000000,5000000] [--symbols 500] [--processes 4]
+"""
+
+import argparse
+import asyncio
+import math
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from analytics.aggregator import compute_sharded, compute_window_metrics, parse_windows, reference_window_metrics
+from analytics.metrics import NS_PER_SEC, MetricsEngine
+from ingest.batch import TradeBatch
+
+DAY_START_NS = 1_735_810_200 * NS_PER_SEC  # 2025-01-02 09:30 UTC
+
+
+def make_batch(n, symbols, seconds=6.5 * 3600, seed=0):
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(0, symbols, n).astype(np.int32)
+    ts = DAY_START_NS + np.sort(rng.integers(0, int(seconds * NS_PER_SEC), n))
+    walk = np.exp(np.cumsum(rng.normal(0, 0.0005, n)))
+    price = (50 + codes) * walk
+    size = rng.integers(1, 500, n).astype(np.float64)
+    return TradeBatch.from_columns(
+        codes, ["SYM{}".format(i) for i in range(symbols)], ts, price, size,
+        np.zeros(n, dtype=np.int32), ["bench"],
+    )
+
+
+def key(m):
+    return m.symbol, m.window_end
+
+
+def assert_same(expected, actual, label):
+    expected, actual = sorted(expected, key=key), sorted(actual, key=key)
+    assert len(expected) == len(actual), "{}: {} windows vs {}".format(label, len(expected), len(actual))
+    for e, a in zip(expected, actual):
+        for x, y in zip(e, a):
+            if isinstance(x, float) and isinstance(y, float):
+                assert math.isclose(x, y, rel_tol=1e-7, abs_tol=1e-12), "{}: {} != {}".format(label, e, a)
+            else:
+                assert x == y, "{}: {} != {}".format(label, e, a)
+
+
+def run_engine(batch, window, step):
+    engine = MetricsEngine(window, step, allowed_lateness_sec=0)
+    engine.add_batch(batch)
+    return engine.close_all()
+
+
+def timed(label, n, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print("{:>14} | {:>9} rows | {:>8.3f} s | {:>11.0f} rows/s | {:>7} windows".format(
+        label, n, elapsed, n / elapsed, len(result)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="100000,1000000,5000000")
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--windows", default="60,300:60")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--reference-max", type=int, default=100000)
+    args = parser.parse_args()
+
+    windows = parse_windows(args.windows)
+    executor = ProcessPoolExecutor(max_workers=args.processes) if args.processes > 1 else None
+    try:
+        sample = make_batch(20000, 20, seconds=3600, seed=1)
+        for window, step in windows:
+            label = "{}:{}".format(window, step)
+            expected = reference_window_metrics(sample.to_records(), window, step)
+            assert_same(expected, compute_window_metrics(sample, window, step), "vectorized " + label)
+            assert_same(expected, run_engine(sample, window, step), "engine " + label)
+            if executor is not None:
+                assert_same(expected, asyncio.run(
+                    compute_sharded(sample, window, step, executor=executor, shards=args.processes)
+                ), "sharded " + label)
+        print("correctness: all paths match the reference for {}".format(args.windows))
+
+        for n in [int(s) for s in args.sizes.split(",")]:
+            batch = make_batch(n, args.symbols)
+            for window, step in windows:
+                print("-- window {}s step {}s".format(window, step))
+                if n <= args.reference_max:
+                    records = batch.to_records()
+                    timed("reference", n, lambda: reference_window_metrics(records, window, step))
+                timed("engine", n, lambda: run_engine(batch, window, step))
+                timed("vectorized", n, lambda: compute_window_metrics(batch, window, step))
+                if executor is not None:
+                    timed("vectorized x{}".format(args.processes), n, lambda: asyncio.run(
+                        compute_sharded(batch, window, step, executor=executor, shards=args.processes)
+                    ))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
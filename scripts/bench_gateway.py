@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark the LLM gateway against the local fake model server.
+
+Starts scripts/fake_model_server.py in-process on a free port and pushes
+--requests summary requests through LLMGateway for each worker count,
+reporting throughput, latency and retries. Rows are counted, not written;
+no database or network needed.
+
+    python scripts/bench_gateway.py [--requests 500] [--workers 1,8,32] [--latency 0.2] [--error-rate 0.05]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from aiohttp.test_utils import TestServer
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from fake_model_server import make_app
+from reasoning.gateway import LLMGateway, SummaryRequest
+
+
+def make_requests(n, duplicate_share):
+    end = datetime(2025, 1, 2, 15, 0, tzinfo=timezone.utc)
+    unique = max(1, int(n * (1 - duplicate_share)))
+    return [
+        SummaryRequest(
+            symbol="S{}".format(i % unique), window_start=end - timedelta(minutes=5), window_end=end,
+            prompt="Summarize the last 5 minutes of S{}: vwap 101.2, volatility 0.0012, momentum 0.004.".format(i % unique),
+            prompt_version="bench",
+        )
+        for i in range(n)
+    ]
+
+
+async def run(args, workers):
+    server = TestServer(make_app(args.latency, args.jitter, args.error_rate, args.rate_limit_rate, seed=1))
+    await server.start_server()
+    written = []
+
+    async def writer(rows):
+        written.extend(rows)
+        return len(rows)
+
+    try:
+        gateway = LLMGateway(
+            base_url=str(server.make_url("/v1")), api_key="", model="fake-model",
+            workers=workers, rpm=args.rpm, tpm=args.tpm, writer=writer,
+        )
+        gateway.backoff_base, gateway.backoff_max = 0.01, 0.1
+        started = time.perf_counter()
+        async with gateway:
+            results = await gateway.summarize_many(make_requests(args.requests, args.duplicates))
+        elapsed = time.perf_counter() - started
+    finally:
+        await server.close()
+
+    stats = gateway.stats.as_dict()
+    ok = sum(r.ok for r in results)
+    print("workers={:<4} {:7.1f} req/s  ok={}/{}  calls={} coalesced={} retries={} failures={} "
+          "avg={:.0f}ms p95={}ms rows={} server_max_concurrent={}".format(
+              workers, len(results) / elapsed, ok, len(results), stats["calls"], stats["coalesced"],
+              stats["retries"], stats["failures"], stats["avg_latency_ms"], stats["p95_latency_ms"],
+              len(written), server.app["stats"]["max_concurrent"],
+          ))
+
+
+async def main(args):
+    for workers in [int(w) for w in args.workers.split(",")]:
+        await run(args, workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--workers", default="1,8,32")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.02)
+    parser.add_argument("--duplicates", type=float, default=0.1, help="share of requests repeating another")
+    parser.add_argument("--rpm", type=float, default=0, help="0 disables the limit")
+    parser.add_argument("--tpm", type=float, default=0, help="0 disables the limit")
+    asyncio.run(main(parser.parse_args()))
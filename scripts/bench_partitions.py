@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark the daily-partitioned raw_trades layout against the old heap layout.
+
+Builds both layouts side by side in a scratch schema, loads the same
+synthetic trades into each (server-side, one day at a time), then times:
+- steady-state inserts: COPY batches into the newest day
+- window queries: one symbol over 1h, and all symbols over 5 minutes
+
+Uses TEST_DATABASE_URL (falling back to DATABASE_URL) and drops the
+scratch schema afterwards unless --keep is given. The 100M-row comparison
+is --rows 100000000 --days 30 (needs ~40GB of disk and a while to load).
+
+    python scripts/bench_partitions.py [--rows 10000000] [--days 10] [--symbols 500] [--keep]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import os
+from core.config import Config
+import core.db as db
+
+SCHEMA = "bench_partitions"
+COLUMNS = ("symbol", "ts", "price", "size", "source")
+
+LAYOUTS = {
+    "heap": """
+        CREATE TABLE {schema}.heap (
+            id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+            symbol TEXT NOT NULL, ts TIMESTAMPTZ NOT NULL,
+            price NUMERIC(18,6) NOT NULL, size NUMERIC(18,6), source TEXT,
+            inserted_at TIMESTAMPTZ DEFAULT NOW()
+        );
+        CREATE INDEX ON {schema}.heap(symbol, ts);
+    """,
+    "partitioned": """
+        CREATE TABLE {schema}.partitioned (
+            id UUID NOT NULL DEFAULT uuid_generate_v4(),
+            symbol TEXT NOT NULL, ts TIMESTAMPTZ NOT NULL,
+            price NUMERIC(18,6) NOT NULL, size NUMERIC(18,6), source TEXT,
+            inserted_at TIMESTAMPTZ DEFAULT NOW(),
+            PRIMARY KEY (id, ts)
+        ) PARTITION BY RANGE (ts);
+        CREATE INDEX ON {schema}.partitioned(symbol, ts);
+        CREATE INDEX ON {schema}.partitioned USING brin (ts) WITH (pages_per_range = 32);
+    """,
+}
+
+LOAD_DAY_SQL = """
+    INSERT INTO {table} (symbol, ts, price, size, source)
+    SELECT 'SYM' || (g % $3), $1::timestamptz + (g * $4::float8) * INTERVAL '1 second',
+           100 + (g % 1000) * 0.01, (g % 500) + 1, 'bench'
+    FROM generate_series(0, $2 - 1) AS g
+"""
+
+
+def day_start(days_ago):
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=days_ago)
+
+
+async def setup(conn, days):
+    await conn.execute("DROP SCHEMA IF EXISTS {} CASCADE".format(SCHEMA))
+    await conn.execute("CREATE SCHEMA {}".format(SCHEMA))
+    for ddl in LAYOUTS.values():
+        await conn.execute(ddl.format(schema=SCHEMA))
+    for d in range(days, -1, -1):
+        lo = day_start(d)
+        await conn.execute(
+            "CREATE TABLE {s}.partitioned_{n} PARTITION OF {s}.partitioned FOR VALUES FROM ('{lo}') TO ('{hi}')".format(
+                s=SCHEMA, n=lo.strftime("%Y%m%d"), lo=lo.isoformat(), hi=(lo + timedelta(days=1)).isoformat()
+            )
+        )
+
+
+async def load(conn, table, rows, days, symbols):
+    per_day = rows // days
+    step = 86400.0 / per_day
+    start = time.perf_counter()
+    for d in range(days, 0, -1):
+        await conn.execute(LOAD_DAY_SQL.format(table="{}.{}".format(SCHEMA, table)),
+                           day_start(d), per_day, symbols, step)
+    await conn.execute("ANALYZE {}.{}".format(SCHEMA, table))
+    elapsed = time.perf_counter() - start
+    print("{:>12} | load        | {:>11} rows | {:>8.1f} s | {:>10.0f} rows/s".format(
+        table, per_day * days, elapsed, per_day * days / elapsed))
+
+
+async def bench_inserts(conn, table, batches, batch_size, symbols):
+    base = day_start(0)
+    latencies = []
+    for b in range(batches):
+        rows = [
+            ("SYM{}".format(i % symbols), base + timedelta(seconds=b, microseconds=i), 100.0, 1.0, "bench")
+            for i in range(batch_size)
+        ]
+        start = time.perf_counter()
+        await conn.copy_records_to_table(table, records=rows, columns=list(COLUMNS), schema_name=SCHEMA)
+        latencies.append(time.perf_counter() - start)
+    print("{:>12} | insert      | {:>6} x {:>5} rows | median {:>7.1f} ms | p95 {:>7.1f} ms".format(
+        table, batches, batch_size, statistics.median(latencies) * 1000,
+        sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000))
+
+
+async def bench_query(conn, table, label, sql, params, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await conn.fetch(sql.format(table="{}.{}".format(SCHEMA, table)), *params)
+        latencies.append(time.perf_counter() - start)
+    print("{:>12} | {:<11} | median {:>7.1f} ms | max {:>7.1f} ms".format(
+        table, label, statistics.median(latencies) * 1000, max(latencies) * 1000))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=10)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--insert-batches", type=int, default=50)
+    parser.add_argument("--insert-batch-size", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema afterwards")
+    args = parser.parse_args()
+
+    Config.DB_URL = os.getenv("TEST_DATABASE_URL") or Config.DB_URL
+    Config.DB_COMMAND_TIMEOUT_SEC = None
+    await db.init_pool()
+    try:
+        async with db.pool.acquire() as conn:
+            await setup(conn, args.days)
+            for table in LAYOUTS:
+                await load(conn, table, args.rows, args.days, args.symbols)
+
+            mid = day_start(args.days // 2) + timedelta(hours=12)
+            queries = [
+                ("symbol 1h",
+                 "SELECT count(*), sum(price * size) / sum(size) FROM {table} "
+                 "WHERE symbol = $1 AND ts >= $2 AND ts < $3",
+                 ("SYM7", mid, mid + timedelta(hours=1))),
+                ("market 5m",
+                 "SELECT symbol, count(*), max(price) - min(price) FROM {table} "
+                 "WHERE ts >= $1 AND ts < $2 GROUP BY symbol",
+                 (mid, mid + timedelta(minutes=5))),
+            ]
+            for table in LAYOUTS:
+                await bench_inserts(conn, table, args.insert_batches, args.insert_batch_size, args.symbols)
+                for label, sql, params in queries:
+                    await bench_query(conn, table, label, sql, params, args.repeats)
+
+            if not args.keep:
+                await conn.execute("DROP SCHEMA {} CASCADE".format(SCHEMA))
+    finally:
+        await db.close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
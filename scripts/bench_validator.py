@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark the reference validator against the columnar batch validator.
+
+validate() raises on the first bad row, so the comparison uses clean
+batches; the batch validator is additionally timed on a batch with ~1%
+bad rows, which validate() cannot process at all, and on a TradeBatch
+(columns already built, as in the streaming path).
+
+    python scripts/bench_validator.py [--sizes 1000,10000,100000] [--repeat 5]
+"""
+
+import argparse
+import sys
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from ingest.batch import TradeBatch
+from ingest.providers.base import TradeRecord
+from ingest.validator import validate, validate_batch
+
+
+def make_records(n, bad_every=None):
+    base = datetime.now(timezone.utc) - timedelta(hours=1)
+    records = []
+    for i in range(n):
+        record = TradeRecord(
+            symbol="SYM{}".format(i % 500),
+            ts=base + timedelta(microseconds=i),
+            price=100.0 + (i % 100) * 0.01,
+            size=float(i % 1000),
+            source="Finnhub",
+        )
+        if bad_every and i % bad_every == 0:
+            record.price = -1.0
+        records.append(record)
+    return records
+
+
+def best_of(repeat, fn, make_input):
+    best = float("inf")
+    for _ in range(repeat):
+        data = make_input()
+        start = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("{:>8} | {:>12} | {:>12} | {:>7} | {:>16} | {:>12} | {:>7}".format(
+        "rows", "validate", "batch", "speedup", "batch (1% bad)", "TradeBatch", "speedup"
+    ))
+    for n in [int(s) for s in args.sizes.split(",")]:
+        clean = make_records(n)
+        dirty = make_records(n, bad_every=100)
+        # validate() mutates its input, so each run gets fresh copies
+        ref = best_of(args.repeat, validate, lambda: [replace(r) for r in clean])
+        batch = best_of(args.repeat, validate_batch, lambda: clean)
+        batch_dirty = best_of(args.repeat, validate_batch, lambda: dirty)
+        columnar = TradeBatch.from_records(clean)
+        batch_columns = best_of(args.repeat, validate_batch, lambda: columnar)
+        print("{:>8} | {:>10.2f}ms | {:>10.2f}ms | {:>6.1f}x | {:>14.2f}ms | {:>10.2f}ms | {:>6.1f}x".format(
+            n, ref * 1000, batch * 1000, ref / batch, batch_dirty * 1000,
+            batch_columns * 1000, ref / batch_columns,
+        ))
+
+
+if __name__ == "__main__":
+    main()
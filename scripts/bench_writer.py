@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark the raw_trades write paths against a real database.
+
+Compares the per-row writer with the bulk COPY and executemany paths at
+1k / 10k / 100k records. Uses TEST_DATABASE_URL (falling back to
+DATABASE_URL) and removes its own rows after each run.
+
+    python scripts/bench_writer.py [--sizes 1000,10000,100000] [--skip-per-row-above 10000]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import os
+from core.config import Config
+import core.db as db
+from ingest.providers.base import TradeRecord
+from ingest.writer import write, write_bulk
+
+BENCH_SOURCE = "bench_writer"
+
+
+def make_records(n):
+    base = datetime.now(timezone.utc) - timedelta(days=1)
+    return [
+        TradeRecord(
+            symbol="SYM{}".format(i % 500),
+            ts=base + timedelta(microseconds=i),
+            price=100.0 + (i % 100) * 0.01,
+            size=float(i % 1000),
+            source=BENCH_SOURCE,
+        )
+        for i in range(n)
+    ]
+
+
+async def timed(label, n, coro):
+    start = time.perf_counter()
+    written = await coro
+    elapsed = time.perf_counter() - start
+    assert written == n, "{} wrote {} of {} rows".format(label, written, n)
+    print("{:>12} | {:>8} rows | {:>8.3f} s | {:>10.0f} rows/s".format(
+        label, n, elapsed, n / elapsed
+    ))
+    await db.execute("DELETE FROM raw_trades WHERE source = $1", (BENCH_SOURCE,))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--skip-per-row-above", type=int, default=None,
+                        help="Skip the per-row writer for sizes above this value")
+    args = parser.parse_args()
+
+    Config.DB_URL = os.getenv("TEST_DATABASE_URL") or Config.DB_URL
+    await db.init_pool()
+    try:
+        for n in [int(s) for s in args.sizes.split(",")]:
+            records = make_records(n)
+            if args.skip_per_row_above is None or n <= args.skip_per_row_above:
+                await timed("per-row", n, write(records))
+            await timed("executemany", n, write_bulk(records, use_copy=False))
+            await timed("copy", n, write_bulk(records))
+    finally:
+        await db.close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Local fake of an OpenAI-compatible /v1/chat/completions endpoint.
+
+Answers after a configurable latency with a canned summary and token usage
+estimated from the prompt, and can inject 429 / 503 errors, so the LLM
+gateway can be tested and benchmarked without network or cost.
+
+    python scripts/fake_model_server.py [--port 8089] [--latency 0.2] [--error-rate 0.05]
+    LLM_BASE_URL=http://127.0.0.1:8089/v1 ...
+"""
+
+import argparse
+import asyncio
+import json
+import random
+
+from aiohttp import web
+
+
+def make_app(latency=0.2, jitter=0.05, error_rate=0.0, rate_limit_rate=0.0, seed=None):
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0, "max_concurrent": 0}
+    state = {"concurrent": 0}
+
+    async def completions(request):
+        stats["requests"] += 1
+        state["concurrent"] += 1
+        stats["max_concurrent"] = max(stats["max_concurrent"], state["concurrent"])
+        try:
+            body = await request.json()
+            await asyncio.sleep(max(0.0, rng.gauss(latency, jitter)))
+            roll = rng.random()
+            if roll < rate_limit_rate:
+                stats["errors"] += 1
+                return web.json_response({"error": "rate limited"}, status=429, headers={"Retry-After": "0"})
+            if roll < rate_limit_rate + error_rate:
+                stats["errors"] += 1
+                return web.json_response({"error": "overloaded"}, status=503)
+
+            prompt = " ".join(m.get("content", "") for m in body.get("messages", []))
+            prompt_tokens = (len(prompt) + 3) // 4
+            text = "Summary: {}".format(prompt[-120:].strip())
+            completion_tokens = min(body.get("max_tokens") or 300, (len(text) + 3) // 4)
+            return web.json_response({
+                "id": "fake-{}".format(stats["requests"]),
+                "object": "chat.completion",
+                "model": body.get("model", "fake-model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+        finally:
+            state["concurrent"] -= 1
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    app["stats"] = stats
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2, help="mean seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 503 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of 429 responses")
+    args = parser.parse_args()
+    web.run_app(
+        make_app(args.latency, args.jitter, args.error_rate, args.rate_limit_rate),
+        host=args.host, port=args.port, print=lambda *a: print(json.dumps({"listening": args.port})),
+    )
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Incremental analytics runner.
+
+Computes derived_metrics for raw_trades newer than each symbol's checkpoint
+(see src/analytics/runner.py), then sleeps ANALYTICS_INTERVAL_SEC and
+repeats. Safe to stop or kill at any point; the next start resumes from the
+last committed checkpoint.
+
+    python scripts/run_analytics.py [--once] [--symbols AAPL,MSFT] [--interval 60]
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from analytics.runner import run_once
+from core.config import Config
+from core.db import close_pool, init_pool
+from core.logging import error, info
+
+
+async def main(args):
+    symbols = [s.strip() for s in args.symbols.split(",")] if args.symbols else None
+    await init_pool()
+    try:
+        while True:
+            try:
+                await run_once(symbols)
+            except Exception as e:
+                if args.once:
+                    raise
+                error("Analytics run failed: {}".format(e))
+            if args.once:
+                break
+            await asyncio.sleep(args.interval)
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="run one pass and exit")
+    parser.add_argument("--symbols", default=None, help="comma separated (default: SYMBOLS)")
+    parser.add_argument("--interval", type=float, default=Config.ANALYTICS_INTERVAL_SEC)
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        info("Analytics runner stopped.")
@@ -0,0 +1,21 @@
+-- ==========================================================
+-- Quarantine for records rejected by ingest validation
+-- ==========================================================
+-- Typed columns are filled when the rejected value is usable; raw keeps
+-- the original field values so every row can be inspected and replayed.
+CREATE TABLE IF NOT EXISTS raw_trades_rejects (
+    id              UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    symbol          TEXT,
+    ts              TIMESTAMPTZ,
+    price           NUMERIC(18,6),
+    size            NUMERIC(18,6),
+    source          TEXT,
+    reason          TEXT NOT NULL,
+    raw             JSONB,
+    rejected_at     TIMESTAMPTZ DEFAULT NOW(),
+    replayed_at     TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_raw_trades_rejects_pending
+    ON raw_trades_rejects(reason, rejected_at)
+    WHERE replayed_at IS NULL;
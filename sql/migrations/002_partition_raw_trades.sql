@@ -0,0 +1,128 @@
+-- ==========================================================
+-- Daily range partitioning of raw_trades
+-- ==========================================================
+-- Databases created before partitioning have raw_trades as a plain heap
+-- table. It is converted in place: the old table is attached unchanged as
+-- a single partition covering its existing days (no data is rewritten),
+-- and new days get their own partitions. Safe to re-run.
+DO $$
+DECLARE
+    lo TIMESTAMPTZ;
+    hi TIMESTAMPTZ;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = 'raw_trades' AND n.nspname = current_schema() AND c.relkind = 'r'
+    ) THEN
+        ALTER TABLE raw_trades RENAME TO raw_trades_legacy;
+        -- The partitioned primary key must include the partition key
+        ALTER TABLE raw_trades_legacy DROP CONSTRAINT IF EXISTS raw_trades_pkey;
+        ALTER INDEX IF EXISTS idx_raw_trades_symbol_ts RENAME TO raw_trades_legacy_symbol_ts_idx;
+
+        CREATE TABLE raw_trades (
+            id              UUID NOT NULL DEFAULT uuid_generate_v4(),
+            symbol          TEXT NOT NULL,
+            ts              TIMESTAMPTZ NOT NULL,
+            price           NUMERIC(18,6) NOT NULL,
+            size            NUMERIC(18,6),
+            source          TEXT,
+            inserted_at     TIMESTAMPTZ DEFAULT NOW(),
+            PRIMARY KEY (id, ts)
+        ) PARTITION BY RANGE (ts);
+        CREATE INDEX idx_raw_trades_symbol_ts ON raw_trades(symbol, ts);
+
+        SELECT date_trunc('day', min(ts) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+               (date_trunc('day', max(ts) AT TIME ZONE 'UTC') + INTERVAL '1 day') AT TIME ZONE 'UTC'
+          INTO lo, hi
+          FROM raw_trades_legacy;
+
+        IF lo IS NULL THEN
+            DROP TABLE raw_trades_legacy;
+        ELSE
+            EXECUTE format(
+                'ALTER TABLE raw_trades ATTACH PARTITION raw_trades_legacy FOR VALUES FROM (%L) TO (%L)',
+                lo, hi
+            );
+        END IF;
+    END IF;
+END $$;
+
+-- Catches rows outside every daily partition (late or far-future data);
+-- raw_trades_create_partitions() moves them out as partitions appear.
+CREATE TABLE IF NOT EXISTS raw_trades_default PARTITION OF raw_trades DEFAULT;
+
+-- BRIN on ts: tiny, and trades arrive roughly in ts order, so time-range
+-- scans skip almost every block. Cascades to every partition.
+CREATE INDEX IF NOT EXISTS idx_raw_trades_ts_brin
+    ON raw_trades USING brin (ts) WITH (pages_per_range = 32, autosummarize = on);
+
+-- Create daily partitions raw_trades_YYYYMMDD for today .. today + days_ahead
+-- (UTC). Days already covered by another partition are skipped. Returns
+-- the number of partitions created.
+CREATE OR REPLACE FUNCTION raw_trades_create_partitions(days_ahead INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    day DATE;
+    part TEXT;
+    lo TIMESTAMPTZ;
+    hi TIMESTAMPTZ;
+    created INTEGER := 0;
+BEGIN
+    FOR i IN 0..days_ahead LOOP
+        day := (NOW() AT TIME ZONE 'UTC')::date + i;
+        part := 'raw_trades_' || to_char(day, 'YYYYMMDD');
+        CONTINUE WHEN to_regclass(part) IS NOT NULL;
+
+        lo := day::timestamp AT TIME ZONE 'UTC';
+        hi := (day + 1)::timestamp AT TIME ZONE 'UTC';
+        BEGIN
+            -- Build the partition standalone so rows for this day already
+            -- sitting in the default partition can be moved before ATTACH.
+            EXECUTE format('CREATE TABLE %I (LIKE raw_trades INCLUDING DEFAULTS)', part);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM raw_trades_default WHERE ts >= %L AND ts < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                lo, hi, part
+            );
+            EXECUTE format(
+                'ALTER TABLE raw_trades ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                part, lo, hi
+            );
+            created := created + 1;
+        EXCEPTION WHEN invalid_object_definition THEN
+            -- Overlaps an existing partition (e.g. raw_trades_legacy)
+            NULL;
+        END;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Drop partitions whose upper bound is more than retain_days days ago
+-- (UTC). The default partition is never dropped. Returns the number of
+-- partitions dropped.
+CREATE OR REPLACE FUNCTION raw_trades_drop_partitions(retain_days INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    part RECORD;
+    cutoff TIMESTAMPTZ := ((NOW() AT TIME ZONE 'UTC')::date - retain_days)::timestamp AT TIME ZONE 'UTC';
+    dropped INTEGER := 0;
+BEGIN
+    FOR part IN
+        SELECT c.oid::regclass AS name,
+               substring(pg_get_expr(c.relpartbound, c.oid) FROM 'TO \(''([^'']+)''\)')::timestamptz AS upper_bound
+          FROM pg_inherits i
+          JOIN pg_class c ON c.oid = i.inhrelid
+         WHERE i.inhparent = 'raw_trades'::regclass
+    LOOP
+        IF part.upper_bound IS NOT NULL AND part.upper_bound <= cutoff THEN
+            EXECUTE format('DROP TABLE %s', part.name);
+            dropped := dropped + 1;
+        END IF;
+    END LOOP;
+    RETURN dropped;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT raw_trades_create_partitions(3);
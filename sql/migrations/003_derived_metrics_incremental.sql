@@ -0,0 +1,12 @@
+-- ==========================================================
+-- Columns written by the incremental metrics engine
+-- ==========================================================
+-- See docs/metrics_reference.md. liquidity_ratio is notional per unit of
+-- relative range and can exceed NUMERIC(18,6), so it is left unbounded.
+ALTER TABLE derived_metrics
+    ADD COLUMN IF NOT EXISTS volume        NUMERIC(24,6),
+    ADD COLUMN IF NOT EXISTS trade_count   INTEGER,
+    ADD COLUMN IF NOT EXISTS first_price   NUMERIC(18,6),
+    ADD COLUMN IF NOT EXISTS last_price    NUMERIC(18,6);
+
+ALTER TABLE derived_metrics ALTER COLUMN liquidity_ratio TYPE NUMERIC;
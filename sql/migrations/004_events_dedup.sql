@@ -0,0 +1,14 @@
+-- ==========================================================
+-- At most one event per symbol, type and window
+-- ==========================================================
+-- The detector inserts with ON CONFLICT DO NOTHING against this index.
+DELETE FROM events e
+USING events d
+WHERE e.symbol = d.symbol
+  AND e.type = d.type
+  AND e.window_start = d.window_start
+  AND e.window_end = d.window_end
+  AND e.ctid > d.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_events_dedup
+    ON events(symbol, type, window_start, window_end);
@@ -0,0 +1,37 @@
+-- ==========================================================
+-- Multi-resolution OHLCV + VWAP bars (see analytics/rollups.py)
+-- ==========================================================
+-- 1m bars are folded from raw_trades, coarser bars from the next finer
+-- resolution. notional = sum(price * size), kept so VWAP rolls up exactly.
+CREATE TABLE IF NOT EXISTS bars (
+    resolution      TEXT NOT NULL,
+    symbol          TEXT NOT NULL,
+    bucket          TIMESTAMPTZ NOT NULL,
+    open            NUMERIC(18,6) NOT NULL,
+    high            NUMERIC(18,6) NOT NULL,
+    low             NUMERIC(18,6) NOT NULL,
+    close           NUMERIC(18,6) NOT NULL,
+    volume          NUMERIC(24,6) NOT NULL,
+    notional        NUMERIC NOT NULL,
+    trade_count     INTEGER NOT NULL,
+    vwap            NUMERIC(18,6),
+    updated_at      TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (resolution, symbol, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS idx_bars_resolution_bucket
+    ON bars(resolution, bucket);
+
+-- Every bucket of `resolution` before `watermark` has been folded in.
+-- scanned_until tracks raw_trades.inserted_at already checked for late
+-- trades (1m only).
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+    resolution      TEXT PRIMARY KEY,
+    watermark       TIMESTAMPTZ NOT NULL,
+    scanned_until   TIMESTAMPTZ,
+    updated_at      TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Late-trade scans filter on inserted_at, which only grows
+CREATE INDEX IF NOT EXISTS idx_raw_trades_inserted_brin
+    ON raw_trades USING brin (inserted_at);
@@ -0,0 +1,36 @@
+-- ==========================================================
+-- Checkpointed analytics runner (scripts/run_analytics.py)
+-- ==========================================================
+-- One row per job and symbol: every derived_metrics window of that symbol
+-- ending at or before processed_until has been written. The row is updated
+-- in the same transaction as the windows, so a crashed run resumes exactly.
+CREATE TABLE IF NOT EXISTS analytics_checkpoints (
+    job             TEXT NOT NULL,
+    symbol          TEXT NOT NULL,
+    processed_until TIMESTAMPTZ NOT NULL,
+    updated_at      TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (job, symbol)
+);
+
+-- derived_metrics is written with upserts keyed on (symbol, window), so a
+-- window recomputed by the runner, a backfill or the live aggregator
+-- replaces the earlier row instead of duplicating it. schema.sql creates the
+-- index as unique; older databases keep the newest duplicate and rebuild it.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = 'idx_metrics_symbol_window' AND NOT i.indisunique
+    ) THEN
+        DELETE FROM derived_metrics m
+        USING derived_metrics d
+        WHERE m.symbol = d.symbol
+          AND m.window_start = d.window_start
+          AND m.window_end = d.window_end
+          AND (COALESCE(m.computed_at, '-infinity'), m.ctid) < (COALESCE(d.computed_at, '-infinity'), d.ctid);
+
+        DROP INDEX idx_metrics_symbol_window;
+        CREATE UNIQUE INDEX idx_metrics_symbol_window
+            ON derived_metrics(symbol, window_start, window_end);
+    END IF;
+END $$;
@@ -0,0 +1,40 @@
+-- ==========================================================
+-- Cross-sectional sector and market context (context/market.py)
+-- ==========================================================
+CREATE TABLE IF NOT EXISTS symbol_sectors (
+    symbol          TEXT PRIMARY KEY,
+    sector_id       TEXT NOT NULL,
+    updated_at      TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE context_sector
+    ADD COLUMN IF NOT EXISTS weighted_return NUMERIC(18,6),
+    ADD COLUMN IF NOT EXISTS symbol_count    INTEGER;
+
+ALTER TABLE context_market
+    ADD COLUMN IF NOT EXISTS avg_return      NUMERIC(18,6),
+    ADD COLUMN IF NOT EXISTS weighted_return NUMERIC(18,6),
+    ADD COLUMN IF NOT EXISTS avg_volatility  NUMERIC(18,6),
+    ADD COLUMN IF NOT EXISTS advancers       INTEGER,
+    ADD COLUMN IF NOT EXISTS decliners       INTEGER,
+    ADD COLUMN IF NOT EXISTS symbol_count    INTEGER;
+
+-- Rows are upserted per window, so recomputing a window replaces it
+DELETE FROM context_sector c
+USING context_sector d
+WHERE c.sector_id = d.sector_id
+  AND c.window_start = d.window_start
+  AND c.window_end = d.window_end
+  AND c.ctid < d.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_context_sector_window
+    ON context_sector(sector_id, window_start, window_end);
+
+DELETE FROM context_market c
+USING context_market d
+WHERE c.window_start = d.window_start
+  AND c.window_end = d.window_end
+  AND c.ctid < d.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_context_market_window
+    ON context_market(window_start, window_end);
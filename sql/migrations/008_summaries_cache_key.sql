@@ -0,0 +1,12 @@
+-- ==========================================================
+-- Persistent tier of the prompt-response cache
+-- ==========================================================
+-- Summaries rows carry the fingerprint of their inputs (see
+-- reasoning/prompt_cache.py), so a later window with the same inputs can
+-- reuse the newest row's text instead of calling the model.
+ALTER TABLE summaries
+    ADD COLUMN IF NOT EXISTS cache_key TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_summaries_cache_key
+    ON summaries(cache_key, created_at DESC)
+    WHERE cache_key IS NOT NULL;
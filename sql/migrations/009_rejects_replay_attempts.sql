@@ -0,0 +1,13 @@
+-- ==========================================================
+-- Replay attempts on quarantined rows
+-- ==========================================================
+-- Rows that still fail validation on replay are marked, so they sort
+-- behind newer rejects and stop being re-selected after
+-- QUARANTINE_REPLAY_MAX_ATTEMPTS attempts.
+ALTER TABLE raw_trades_rejects
+    ADD COLUMN IF NOT EXISTS replay_attempts INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS last_replay_at TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS idx_raw_trades_rejects_replay
+    ON raw_trades_rejects(replay_attempts, rejected_at)
+    WHERE replayed_at IS NULL;
@@ -7,15 +7,19 @@ CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 -- ==========================================================
 -- Core data tables
 -- ==========================================================
+-- Range-partitioned by day on ts (UTC). Partitions, the default
+-- partition, BRIN indexes and retention are managed by
+-- migrations/002_partition_raw_trades.sql and ops/partitions.py.
 CREATE TABLE IF NOT EXISTS raw_trades (
-    id              UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id              UUID NOT NULL DEFAULT uuid_generate_v4(),
     symbol          TEXT NOT NULL,
     ts              TIMESTAMPTZ NOT NULL,
     price           NUMERIC(18,6) NOT NULL,
     size            NUMERIC(18,6),
     source          TEXT,
-    inserted_at     TIMESTAMPTZ DEFAULT NOW()
-);
+    inserted_at     TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
 
 CREATE INDEX IF NOT EXISTS idx_raw_trades_symbol_ts
     ON raw_trades(symbol, ts);
@@ -35,7 +39,7 @@ CREATE TABLE IF NOT EXISTS derived_metrics (
     computed_at     TIMESTAMPTZ DEFAULT NOW()
 );
 
-CREATE INDEX IF NOT EXISTS idx_metrics_symbol_window
+CREATE UNIQUE INDEX IF NOT EXISTS idx_metrics_symbol_window
     ON derived_metrics(symbol, window_start, window_end);
 
 CREATE TABLE IF NOT EXISTS events (
@@ -9,3 +9,9 @@ VALUES
 INSERT INTO context_market (window_start, window_end, spx_return, vix_level, risk_flag)
 VALUES
     (NOW() - INTERVAL '15 min', NOW(), 0.0012, 13.7, 'low');
+
+INSERT INTO symbol_sectors (symbol, sector_id)
+VALUES
+    ('AAPL', 'technology'),
+    ('MSFT', 'technology')
+ON CONFLICT (symbol) DO NOTHING;
@@ -0,0 +1,513 @@
+"""
+Window aggregation for derived_metrics
+
+Live: MetricsAggregator feeds committed trades into the incremental metrics
+engines and writes closed windows to derived_metrics in bulk. Windows whose
+write fails stay buffered and are retried with the next write or flush.
+
+    aggregator = MetricsAggregator()
+    add_listener(aggregator.on_trades)   # ingest.writer
+    ...
+    await aggregator.flush()             # at shutdown
+
+Backfill: compute_window_metrics() computes every window of a TradeBatch at
+once with sorted arrays, searchsorted and reduceat; backfill() streams
+raw_trades chunk by chunk through it, optionally sharding symbols across a
+process pool. reference_window_metrics() is the pure-Python definition the
+vectorized path is checked against (scripts/bench_aggregator.py).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import math
+import statistics
+
+import numpy as np
+
+from analytics.metrics import DERIVED_METRICS_COLUMNS, NS_PER_SEC, MetricsEngine, WindowMetrics
+from core.config import Config
+from core.db import execute, stream_columns, transaction, upsert_records
+from core.logging import debug, error, info
+from ingest.batch import TradeBatch, factorize, ns_to_datetimes, ts_column
+from ingest.providers.base import TradeRecord
+from ingest.writer_errors import WriterError
+
+MetricsWriter = Callable[[List[WindowMetrics]], Awaitable[int]]
+MetricsListener = Callable[[List[WindowMetrics]], Awaitable[Any]]
+
+# Unique key of derived_metrics rows
+DERIVED_METRICS_KEY = ("symbol", "window_start", "window_end")
+
+
+def parse_windows(spec: str) -> List[Tuple[int, int]]:
+    """
+    Parse "60,300:60" into [(60, 60), (300, 60)]: window_sec[:step_sec],
+    where a missing step means a tumbling window.
+    """
+    windows = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        window, _, step = part.partition(":")
+        windows.append((int(window), int(step) if step else int(window)))
+    return windows
+
+
+async def write_metrics(metrics: List[WindowMetrics], conn=None) -> int:
+    """
+    Upsert closed windows into derived_metrics (COPY + ON CONFLICT) in one
+    transaction, or in the caller's when conn is given. Rewriting a window
+    replaces its row, so recomputation is idempotent.
+    """
+    if not metrics:
+        return 0
+    try:
+        return await upsert_records(
+            "derived_metrics", DERIVED_METRICS_COLUMNS, metrics, DERIVED_METRICS_KEY, conn=conn
+        )
+    except Exception as e:
+        raise WriterError("Database error during metrics write: {}".format(e)) from e
+
+
+class MetricsAggregator:
+    """
+    One MetricsEngine per configured window, fed from committed batches.
+    """
+
+    def __init__(
+        self,
+        windows: Optional[Sequence[Tuple[int, int]]] = None,
+        writer: Optional[MetricsWriter] = None,
+        allowed_lateness_sec: Optional[float] = None,
+    ):
+        windows = windows if windows is not None else parse_windows(Config.METRICS_WINDOWS)
+        self.engines = [
+            MetricsEngine(window, step, allowed_lateness_sec)
+            for window, step in windows
+        ]
+        self._writer = writer or write_metrics
+        self._listeners: List[MetricsListener] = []
+        # Closed windows whose write failed; retried with the next write
+        self._pending: List[WindowMetrics] = []
+        self.windows_written = 0
+        self.windows_dropped = 0
+
+    def add_listener(self, listener: MetricsListener) -> None:
+        """
+        Call listener with every list of windows after it is written.
+        """
+        self._listeners.append(listener)
+
+    async def on_trades(self, batch: TradeBatch) -> int:
+        """
+        Writer listener: fold in a committed batch and write the windows it closed.
+        """
+        for engine in self.engines:
+            engine.add_batch(batch)
+        return await self._write([m for engine in self.engines for m in engine.close()])
+
+    async def flush(self) -> int:
+        """
+        Close and write every open window.
+        """
+        return await self._write([m for engine in self.engines for m in engine.close_all()])
+
+    async def _write(self, metrics: List[WindowMetrics]) -> int:
+        metrics = self._pending + metrics
+        if not metrics:
+            return 0
+        try:
+            written = await self._writer(metrics)
+        except WriterError:
+            # The engines have already forgotten these windows: keep them (newest
+            # METRICS_MAX_PENDING_WINDOWS) for the next call or flush
+            overflow = max(len(metrics) - Config.METRICS_MAX_PENDING_WINDOWS, 0)
+            if overflow:
+                self.windows_dropped += overflow
+                error("Dropping {} unwritten metric windows over the pending limit.".format(overflow))
+            self._pending = metrics[overflow:]
+            raise
+        self._pending = []
+        self.windows_written += written
+        debug("Wrote {} closed metric windows.".format(written))
+        for listener in self._listeners:
+            try:
+                await listener(metrics)
+            except Exception as e:
+                error("Metrics listener {} failed: {}".format(getattr(listener, "__qualname__", listener), e))
+        return written
+
+    def late_trades(self) -> int:
+        return sum(engine.late_trades for engine in self.engines)
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def log_summary(self) -> None:
+        info("Metrics aggregator: {} windows written, {} late trades dropped, {} windows unwritten.".format(
+            self.windows_written, self.late_trades(), len(self._pending) + self.windows_dropped
+        ))
+
+
+# ---- vectorized batch path ----------------------------------------------
+
+def _range_reduce(ufunc: np.ufunc, values: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """
+    ufunc over values[lo[i]:hi[i]] for every i in one reduceat call.
+    Ranges may overlap; empty ranges give garbage and must be masked.
+    """
+    padded = np.append(values, values[:1] if len(values) else 0)
+    idx = np.empty(2 * len(lo), dtype=np.intp)
+    idx[0::2] = lo
+    idx[1::2] = hi
+    return ufunc.reduceat(padded, idx)[0::2]
+
+
+# Array columns produced by window_columns(), besides the WindowMetrics values
+_WINDOW_ARRAYS = (
+    "symbol_code", "window_start", "window_end", "vwap", "volatility", "momentum",
+    "liquidity_ratio", "volume", "trade_count", "first_price", "last_price",
+)
+
+
+def _empty_columns() -> Dict[str, np.ndarray]:
+    return {name: np.empty(0) for name in _WINDOW_ARRAYS}
+
+
+def compute_window_metrics(
+    batch: TradeBatch,
+    window_sec: int,
+    step_sec: Optional[int] = None,
+    end_range: Optional[Tuple[int, int]] = None,
+) -> List[WindowMetrics]:
+    """
+    Every non-empty window of `batch` (validated trades, any order).
+    Same definitions as MetricsEngine. end_range=(lo_ns, hi_ns) keeps only
+    windows with lo < window_end <= hi.
+    """
+    return columns_to_metrics(window_columns(batch, window_sec, step_sec, end_range), batch.symbols)
+
+
+def window_columns(
+    batch: TradeBatch,
+    window_sec: int,
+    step_sec: Optional[int] = None,
+    end_range: Optional[Tuple[int, int]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    compute_window_metrics() as arrays (window bounds in epoch ns, symbols
+    as codes into batch.symbols, NaN for missing values).
+
+    Trades are sorted by (symbol, ts) so each window is a contiguous slice
+    [a, b) found with searchsorted; sums, extremes and return moments for
+    all windows come from reduceat over those slices.
+    """
+    step_sec = step_sec or window_sec
+    if window_sec <= 0 or step_sec <= 0 or window_sec % step_sec:
+        raise ValueError("Window ({}s) must be a positive multiple of step ({}s).".format(window_sec, step_sec))
+    if not len(batch):
+        return _empty_columns()
+
+    step = step_sec * NS_PER_SEC
+    per_window = window_sec // step_sec
+
+    order = np.lexsort((batch.ts, batch.symbol_codes))
+    ts = batch.ts[order]
+    price = batch.price[order]
+    size = np.nan_to_num(batch.size[order], nan=0.0)
+    codes = batch.symbol_codes[order].astype(np.int64)
+
+    # Sortable (symbol, pane) key: panes are numbered from the first one
+    pane0 = int(ts.min()) // step
+    pane = ts // step - pane0
+    span = int(pane.max()) + per_window + 1
+    key = codes * span + pane
+
+    # Windows are identified by (symbol, last pane); every pane with trades
+    # is the last pane of one window and inside per_window - 1 later ones.
+    last = np.unique((key[:, None] + np.arange(per_window)).ravel())
+    if end_range is not None:
+        end_ns = (last % span + pane0 + 1) * step
+        last = last[(end_ns > end_range[0]) & (end_ns <= end_range[1])]
+        if not len(last):
+            return _empty_columns()
+    a = np.searchsorted(key, last - per_window + 1, side="left")
+    b = np.searchsorted(key, last + 1, side="left")
+    nonempty = b > a
+    last, a, b = last[nonempty], a[nonempty], b[nonempty]
+
+    count = b - a
+    volume = _range_reduce(np.add, size, a, b)
+    notional = _range_reduce(np.add, price * size, a, b)
+    high = _range_reduce(np.maximum, price, a, b)
+    low = _range_reduce(np.minimum, price, a, b)
+    first_price = price[a]
+    last_price = price[b - 1]
+
+    # Log returns between consecutive trades; returns in [a, b - 1) stay
+    # within one symbol. Centering first keeps the one-pass variance stable.
+    returns = np.diff(np.log(price))
+    if len(returns):
+        returns = returns - returns.mean()
+    n_ret = count - 1
+    has_ret = n_ret > 0
+    s1 = np.zeros(len(a))
+    s2 = np.zeros(len(a))
+    if has_ret.any():
+        ra, rb = a[has_ret], b[has_ret] - 1
+        s1[has_ret] = _range_reduce(np.add, returns, ra, rb)
+        s2[has_ret] = _range_reduce(np.add, returns * returns, ra, rb)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vwap = np.where(volume > 0, notional / volume, np.nan)
+        variance = np.where(n_ret >= 2, (s2 - s1 * s1 / np.maximum(n_ret, 1)) / np.maximum(n_ret - 1, 1), np.nan)
+        volatility = np.sqrt(np.maximum(variance, 0.0))
+        momentum = last_price / first_price - 1.0
+        liquidity = np.where(high > low, notional / ((high - low) / vwap), np.nan)
+
+    end = (last % span + pane0 + 1) * step
+    return {
+        "symbol_code": last // span,
+        "window_start": end - per_window * step,
+        "window_end": end,
+        "vwap": vwap,
+        "volatility": volatility,
+        "momentum": momentum,
+        "liquidity_ratio": liquidity,
+        "volume": volume,
+        "trade_count": count,
+        "first_price": first_price,
+        "last_price": last_price,
+    }
+
+
+def columns_to_metrics(columns: Dict[str, np.ndarray], symbols: Sequence[str]) -> List[WindowMetrics]:
+    """
+    WindowMetrics rows from window_columns() output.
+    """
+    if not len(columns["window_end"]):
+        return []
+    # Many windows share bounds, so convert each distinct bound once
+    bounds, which = np.unique(
+        np.concatenate((columns["window_start"], columns["window_end"])).astype(np.int64),
+        return_inverse=True,
+    )
+    as_datetimes = np.array(ns_to_datetimes(bounds), dtype=object)[which]
+    n = len(columns["window_end"])
+    names = np.array(symbols, dtype=object)
+    return list(map(
+        WindowMetrics,
+        names[columns["symbol_code"].astype(np.int64)].tolist(),
+        as_datetimes[:n].tolist(),
+        as_datetimes[n:].tolist(),
+        _nullable(columns["vwap"]),
+        _nullable(columns["volatility"]),
+        _nullable(columns["momentum"]),
+        _nullable(columns["liquidity_ratio"]),
+        columns["volume"].tolist(),
+        columns["trade_count"].astype(np.int64).tolist(),
+        columns["first_price"].tolist(),
+        columns["last_price"].tolist(),
+    ))
+
+
+def _nullable(values: np.ndarray) -> List[Optional[float]]:
+    out = values.astype(object)
+    out[np.isnan(values)] = None
+    return out.tolist()
+
+
+def reference_window_metrics(
+    records: Sequence[TradeRecord],
+    window_sec: int,
+    step_sec: Optional[int] = None,
+) -> List[WindowMetrics]:
+    """
+    Pure-Python definition of the window metrics, one window at a time.
+    Slow; used to check compute_window_metrics() and MetricsEngine.
+    """
+    step_sec = step_sec or window_sec
+    step = timedelta(seconds=step_sec)
+    window = timedelta(seconds=window_sec)
+    epoch = datetime(1970, 1, 1, tzinfo=records[0].ts.tzinfo) if records else None
+
+    by_symbol: Dict[str, List[TradeRecord]] = {}
+    for record in records:
+        by_symbol.setdefault(record.symbol, []).append(record)
+
+    out = []
+    for symbol in sorted(by_symbol):
+        trades = sorted(by_symbol[symbol], key=lambda r: r.ts)
+        ends = set()
+        for trade in trades:
+            pane_end = epoch + ((trade.ts - epoch) // step + 1) * step
+            ends.update(pane_end + k * step for k in range(window_sec // step_sec))
+        for end in sorted(ends):
+            inside = [t for t in trades if end - window <= t.ts < end]
+            if not inside:
+                continue
+            prices = [t.price for t in inside]
+            volume = sum(t.size for t in inside)
+            notional = sum(t.price * t.size for t in inside)
+            vwap = notional / volume if volume > 0 else None
+            returns = [math.log(b / a) for a, b in zip(prices, prices[1:])]
+            high, low = max(prices), min(prices)
+            out.append(WindowMetrics(
+                symbol=symbol,
+                window_start=end - window,
+                window_end=end,
+                vwap=vwap,
+                volatility=statistics.stdev(returns) if len(returns) >= 2 else None,
+                momentum=prices[-1] / prices[0] - 1.0,
+                liquidity_ratio=notional / ((high - low) / vwap) if vwap and high > low else None,
+                volume=volume,
+                trade_count=len(inside),
+                first_price=prices[0],
+                last_price=prices[-1],
+            ))
+    return out
+
+
+# ---- backfill -------------------------------------------------------------
+
+def shard_by_symbol(batch: TradeBatch, shards: int) -> List[TradeBatch]:
+    """
+    Split a batch into up to `shards` batches with disjoint symbols.
+    """
+    shard_of = batch.symbol_codes % shards
+    return [batch.take(shard_of == i) for i in range(shards) if (shard_of == i).any()]
+
+
+def _compute_shard(args) -> Dict[str, np.ndarray]:
+    # Process-pool entry point: arrays in and out pickle far cheaper than rows
+    symbol_codes, ts, price, size, window_sec, step_sec, end_range = args
+    batch = TradeBatch.from_columns(
+        symbol_codes, [], ts, price, size, np.zeros(len(ts), dtype=np.int32), [None]
+    )
+    return window_columns(batch, window_sec, step_sec, end_range)
+
+
+async def compute_sharded(
+    batch: TradeBatch,
+    window_sec: int,
+    step_sec: Optional[int] = None,
+    end_range: Optional[Tuple[int, int]] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+    shards: int = 1,
+) -> List[WindowMetrics]:
+    """
+    compute_window_metrics() with symbols sharded across a process pool.
+    """
+    if executor is None or shards <= 1:
+        return compute_window_metrics(batch, window_sec, step_sec, end_range)
+    loop = asyncio.get_running_loop()
+    jobs = [
+        loop.run_in_executor(executor, _compute_shard, (
+            part.symbol_codes, part.ts, part.price, part.size, window_sec, step_sec, end_range,
+        ))
+        for part in shard_by_symbol(batch, shards)
+    ]
+    results = await asyncio.gather(*jobs)
+    merged = {
+        name: np.concatenate([r[name] for r in results]) if results else np.empty(0)
+        for name in _WINDOW_ARRAYS
+    }
+    return columns_to_metrics(merged, batch.symbols)
+
+
+async def load_trades(start: datetime, end: datetime, symbols: Optional[List[str]] = None) -> TradeBatch:
+    """
+    raw_trades in [start, end) as a TradeBatch, streamed in column batches.
+    """
+    sql = (
+        "SELECT symbol, ts, price::float8 AS price, COALESCE(size, 0)::float8 AS size "
+        "FROM raw_trades WHERE ts >= $1 AND ts < $2 AND ($3::text[] IS NULL OR symbol = ANY($3))"
+    )
+    parts = []
+    async for cols in stream_columns(sql, (start, end, symbols)):
+        codes, names = factorize(cols["symbol"])
+        parts.append(TradeBatch.from_columns(
+            codes, names, ts_column(cols["ts"]),
+            np.array(cols["price"], dtype=np.float64), np.array(cols["size"], dtype=np.float64),
+            np.zeros(len(codes), dtype=np.int32), [None],
+        ))
+    return concat_batches(parts)
+
+
+def concat_batches(parts: List[TradeBatch]) -> TradeBatch:
+    """
+    One batch from several, re-coding symbols into a shared table.
+    """
+    if not parts:
+        return TradeBatch(capacity=1)
+    index: Dict[str, int] = {}
+    codes = []
+    for part in parts:
+        remap = np.array([index.setdefault(s, len(index)) for s in part.symbols], dtype=np.int32)
+        codes.append(remap[part.symbol_codes])
+    return TradeBatch.from_columns(
+        np.concatenate(codes), list(index),
+        np.concatenate([p.ts for p in parts]),
+        np.concatenate([p.price for p in parts]),
+        np.concatenate([p.size for p in parts]),
+        np.zeros(sum(len(p) for p in parts), dtype=np.int32), [None],
+    )
+
+
+async def backfill(
+    start: datetime,
+    end: datetime,
+    symbols: Optional[List[str]] = None,
+    windows: Optional[Sequence[Tuple[int, int]]] = None,
+    processes: Optional[int] = None,
+    chunk_sec: Optional[int] = None,
+    writer: Optional[MetricsWriter] = None,
+) -> int:
+    """
+    Recompute derived_metrics for windows ending in (start, end] from raw_trades.
+
+    Works chunk by chunk (BACKFILL_CHUNK_SEC, a day by default): each chunk
+    loads its trades plus one longest window of lookback, then
+    replaces the chunk's existing windows with the new ones in one
+    transaction per window size (writer is called with conn=). With
+    processes > 1 symbols are sharded across a process pool. Returns
+    windows written.
+    """
+    windows = windows if windows is not None else parse_windows(Config.METRICS_WINDOWS)
+    processes = processes or Config.BACKFILL_PROCESSES
+    chunk = timedelta(seconds=chunk_sec or Config.BACKFILL_CHUNK_SEC)
+    writer = writer or write_metrics
+    # A full window of lookback: chunk bounds need not sit on the step grid
+    lookback = timedelta(seconds=max(w for w, _ in windows)) if windows else timedelta(0)
+
+    executor = ProcessPoolExecutor(max_workers=processes) if processes > 1 else None
+    written = 0
+    try:
+        lo = start
+        while lo < end:
+            hi = min(lo + chunk, end)
+            batch = await load_trades(lo - lookback, hi, symbols)
+            end_range = (_to_ns(lo), _to_ns(hi))
+            for window_sec, step_sec in windows:
+                metrics = await compute_sharded(batch, window_sec, step_sec, end_range, executor, processes)
+                # Readers never see the chunk's windows deleted but not yet rewritten
+                async with transaction() as conn:
+                    await execute(
+                        "DELETE FROM derived_metrics WHERE window_end > $1 AND window_end <= $2 "
+                        "AND window_end - window_start = $3 AND ($4::text[] IS NULL OR symbol = ANY($4))",
+                        (lo, hi, timedelta(seconds=window_sec), symbols),
+                        conn=conn,
+                    )
+                    written += await writer(metrics, conn=conn)
+            info("Backfilled derived_metrics for {} .. {}: {} trades.".format(lo, hi, len(batch)))
+            lo = hi
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return written
+
+
+def _to_ns(value: datetime) -> int:
+    return int(ts_column([value])[0])
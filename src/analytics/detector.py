@@ -0,0 +1,291 @@
+"""
+Streaming anomaly detection over closed metric windows
+
+EventDetector consumes WindowMetrics as the aggregator closes them and keeps
+O(1) state per symbol, so it never re-queries history:
+- volume_spike:            log volume far above its EWMA (z-score) and above
+                           a running P² estimate of its upper quantile
+- volatility_regime_shift: fast/slow EWMA ratio of window volatility crosses
+                           DETECTOR_VOL_RATIO (up) or its inverse (down);
+                           reported once per regime change
+- price_gap:               log jump from the previous window's last price to
+                           this window's first price, as a z-score against
+                           an EWMA of past gaps
+
+Only windows of DETECTOR_WINDOW_SEC are used. Windows that are not newer
+than the last one seen for the symbol are ignored, and events are written
+with ON CONFLICT DO NOTHING against the (symbol, type, window) unique index,
+so each window yields at most one event per type.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import math
+
+from analytics.metrics import WindowMetrics
+from core.config import Config
+from core.db import execute_many
+from core.logging import debug
+from ingest.writer_errors import WriterError
+
+INSERT_EVENT_SQL = (
+    "INSERT INTO events (symbol, window_start, window_end, type, severity, details) "
+    "VALUES ($1, $2, $3, $4, $5, $6) ON CONFLICT DO NOTHING"
+)
+
+
+class Ewma:
+    """
+    Exponentially weighted mean and variance, O(1) per update.
+    """
+    __slots__ = ("alpha", "mean", "var", "n")
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.mean = 0.0
+        self.var = 0.0
+        self.n = 0
+
+    def zscore(self, x: float) -> float:
+        """
+        z-score of x against the current state (0 until there is spread).
+        """
+        if self.n < 2 or self.var <= 0:
+            return 0.0
+        return (x - self.mean) / math.sqrt(self.var)
+
+    def update(self, x: float) -> None:
+        self.n += 1
+        if self.n == 1:
+            self.mean = x
+            return
+        delta = x - self.mean
+        self.mean += self.alpha * delta
+        self.var = (1 - self.alpha) * (self.var + self.alpha * delta * delta)
+
+
+class P2Quantile:
+    """
+    Running estimate of the p-quantile with the P² algorithm (Jain &
+    Chlamtac): five markers, O(1) memory and time per update.
+    """
+    __slots__ = ("p", "n", "q", "pos", "desired", "inc")
+
+    def __init__(self, p: float):
+        self.p = p
+        self.n = 0
+        self.q: List[float] = []
+        self.pos = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.desired = [1.0, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5.0]
+        self.inc = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    @property
+    def value(self) -> Optional[float]:
+        if not self.n:
+            return None
+        if self.n < 5:
+            ordered = sorted(self.q)
+            return ordered[min(int(self.p * len(ordered)), len(ordered) - 1)]
+        return self.q[2]
+
+    def update(self, x: float) -> None:
+        self.n += 1
+        q, pos = self.q, self.pos
+        if self.n <= 5:
+            q.append(x)
+            if self.n == 5:
+                q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(1, 5) if x < q[i]) - 1
+        for i in range(k + 1, 5):
+            pos[i] += 1
+        for i in range(5):
+            self.desired[i] += self.inc[i]
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - pos[i]
+            if (d >= 1 and pos[i + 1] - pos[i] > 1) or (d <= -1 and pos[i - 1] - pos[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = q[i] + step / (pos[i + 1] - pos[i - 1]) * (
+                    (pos[i] - pos[i - 1] + step) * (q[i + 1] - q[i]) / (pos[i + 1] - pos[i])
+                    + (pos[i + 1] - pos[i] - step) * (q[i] - q[i - 1]) / (pos[i] - pos[i - 1])
+                )
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + step * (q[i + step] - q[i]) / (pos[i + step] - pos[i])
+                q[i] = candidate
+                pos[i] += step
+
+
+@dataclass(slots=True)
+class Event:
+    symbol: str
+    window_start: datetime
+    window_end: datetime
+    type: str
+    severity: str
+    details: Dict[str, Any]
+
+    def to_row(self) -> Tuple[Any, ...]:
+        return (
+            self.symbol, self.window_start, self.window_end, self.type,
+            self.severity, json.dumps(self.details),
+        )
+
+
+@dataclass(slots=True)
+class SymbolState:
+    """
+    Per-symbol rolling statistics; a fixed handful of floats.
+    """
+    windows: int
+    volume: Ewma
+    volume_quantile: P2Quantile
+    vol_fast: Ewma
+    vol_slow: Ewma
+    gap: Ewma
+    regime: str = "normal"
+    last_end: Optional[datetime] = None
+    last_price: Optional[float] = None
+
+
+def severity(score: float, threshold: float) -> str:
+    if score >= 2 * threshold:
+        return "high"
+    if score >= 1.5 * threshold:
+        return "medium"
+    return "low"
+
+
+class EventDetector:
+    """
+    Online detector fed with closed WindowMetrics (e.g. as a
+    MetricsAggregator listener); writes events in one batch per call.
+    """
+
+    def __init__(self, writer=None, window_sec: Optional[int] = None):
+        self.window_sec = window_sec or Config.DETECTOR_WINDOW_SEC
+        self.fast_alpha = Config.DETECTOR_FAST_ALPHA
+        self.slow_alpha = Config.DETECTOR_SLOW_ALPHA
+        self.warmup = Config.DETECTOR_WARMUP_WINDOWS
+        self.volume_z = Config.DETECTOR_VOLUME_Z
+        self.volume_quantile = Config.DETECTOR_VOLUME_QUANTILE
+        self.vol_ratio = Config.DETECTOR_VOL_RATIO
+        self.gap_z = Config.DETECTOR_GAP_Z
+        self.gap_min = Config.DETECTOR_GAP_MIN_PCT
+        self._writer = writer or write_events
+        self._symbols: Dict[str, SymbolState] = {}
+        self.events_written = 0
+        self.stale_windows = 0
+
+    def _state(self, symbol: str) -> SymbolState:
+        state = self._symbols.get(symbol)
+        if state is None:
+            state = self._symbols[symbol] = SymbolState(
+                windows=0,
+                volume=Ewma(self.slow_alpha),
+                volume_quantile=P2Quantile(self.volume_quantile),
+                vol_fast=Ewma(self.fast_alpha),
+                vol_slow=Ewma(self.slow_alpha),
+                gap=Ewma(self.slow_alpha),
+            )
+        return state
+
+    def detect(self, m: WindowMetrics) -> List[Event]:
+        """
+        Update the symbol's state with one window and return its events.
+        """
+        if (m.window_end - m.window_start).total_seconds() != self.window_sec:
+            return []
+        state = self._state(m.symbol)
+        if state.last_end is not None and m.window_end <= state.last_end:
+            self.stale_windows += 1
+            return []
+
+        events: List[Event] = []
+        armed = state.windows >= self.warmup
+
+        def emit(kind: str, score: float, threshold: float, **details: Any) -> None:
+            events.append(Event(m.symbol, m.window_start, m.window_end, kind, severity(score, threshold), details))
+
+        # Volume spike
+        x = math.log1p(m.volume)
+        z = state.volume.zscore(x)
+        upper = state.volume_quantile.value
+        if armed and z >= self.volume_z and upper is not None and x > upper:
+            emit("volume_spike", z, self.volume_z, volume=m.volume, zscore=round(z, 3),
+                 typical_volume=round(math.expm1(state.volume.mean), 6))
+        state.volume.update(x)
+        state.volume_quantile.update(x)
+
+        # Volatility regime shift (with hysteresis so each shift is reported once)
+        if m.volatility is not None:
+            state.vol_fast.update(m.volatility)
+            state.vol_slow.update(m.volatility)
+            if armed and state.vol_slow.mean > 0:
+                ratio = state.vol_fast.mean / state.vol_slow.mean
+                band = math.sqrt(self.vol_ratio)
+                if ratio >= self.vol_ratio and state.regime != "high":
+                    state.regime = "high"
+                    emit("volatility_regime_shift", ratio, self.vol_ratio, direction="up", ratio=round(ratio, 3))
+                elif ratio <= 1 / self.vol_ratio and state.regime != "low":
+                    state.regime = "low"
+                    emit("volatility_regime_shift", 1 / ratio, self.vol_ratio, direction="down", ratio=round(ratio, 3))
+                elif 1 / band < ratio < band:
+                    state.regime = "normal"
+
+        # Price gap between consecutive windows
+        if state.last_price is not None and state.last_price > 0 and m.first_price > 0:
+            gap = math.log(m.first_price / state.last_price)
+            z = abs(state.gap.zscore(gap))
+            if armed and z >= self.gap_z and abs(gap) >= self.gap_min:
+                emit("price_gap", z, self.gap_z, gap_pct=round(math.expm1(gap), 6), zscore=round(z, 3),
+                     previous_close=state.last_price, open=m.first_price)
+            state.gap.update(gap)
+
+        state.windows += 1
+        state.last_end = m.window_end
+        state.last_price = m.last_price
+        return events
+
+    async def on_metrics(self, metrics: List[WindowMetrics]) -> int:
+        """
+        Aggregator listener: detect over closed windows (in time order per
+        symbol) and write all resulting events in one batch.
+        """
+        events = [
+            event
+            for m in sorted(metrics, key=lambda m: m.window_end)
+            for event in self.detect(m)
+        ]
+        if not events:
+            return 0
+        written = await self._writer(events)
+        self.events_written += written
+        debug("Detected {} events.".format(written))
+        return written
+
+    def tracked_symbols(self) -> int:
+        return len(self._symbols)
+
+
+async def write_events(events: List[Event]) -> int:
+    """
+    Insert events in one executemany; duplicates of an existing
+    (symbol, type, window) are skipped.
+    """
+    if not events:
+        return 0
+    try:
+        await execute_many(INSERT_EVENT_SQL, [event.to_row() for event in events])
+    except Exception as e:
+        raise WriterError("Database error during events write: {}".format(e)) from e
+    return len(events)
@@ -0,0 +1,343 @@
+"""
+Incremental windowed metrics
+
+Per-window metrics for derived_metrics are maintained from running state as
+trades arrive instead of re-scanning raw_trades:
+- vwap:            sum(price * size) / sum(size)
+- volatility:      sample standard deviation of log returns between trades
+- momentum:        last_price / first_price - 1
+- liquidity_ratio: notional traded per unit of relative price range,
+                   sum(price * size) / ((high - low) / vwap)
+
+Trades are folded into fixed panes of `step` seconds per symbol. A pane is a
+WindowState: counts and sums, first/last/high/low price and a Welford
+accumulator over log returns. WindowStates merge exactly, so a window is the
+merge of its panes:
+- tumbling windows: step == window, one pane per window
+- sliding windows:  step < window (window must be a multiple of step), each
+                    window of `window` seconds is emitted every `step` seconds
+
+Windows are epoch-aligned and emitted once the watermark (latest trade seen
+minus the allowed lateness) passes their end. Trades older than the
+watermark are dropped and counted in MetricsEngine.late_trades.
+See docs/metrics_reference.md.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional
+import math
+
+import numpy as np
+
+from core.config import Config
+from ingest.batch import NAT, TradeBatch
+from ingest.providers.base import TradeRecord
+
+NS_PER_SEC = 1_000_000_000
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+DERIVED_METRICS_COLUMNS = (
+    "symbol", "window_start", "window_end", "vwap", "volatility", "momentum",
+    "liquidity_ratio", "volume", "trade_count", "first_price", "last_price",
+)
+
+
+class WindowMetrics(NamedTuple):
+    """
+    One closed window, in derived_metrics column order.
+    """
+    symbol: str
+    window_start: datetime
+    window_end: datetime
+    vwap: Optional[float]
+    volatility: Optional[float]
+    momentum: Optional[float]
+    liquidity_ratio: Optional[float]
+    volume: float
+    trade_count: int
+    first_price: float
+    last_price: float
+
+
+@dataclass(slots=True)
+class WindowState:
+    """
+    Mergeable running state for the trades of one symbol over a time span.
+    """
+    count: int = 0
+    volume: float = 0.0
+    notional: float = 0.0
+    first_ts: int = 0
+    first_price: float = math.nan
+    last_ts: int = 0
+    last_price: float = math.nan
+    high: float = -math.inf
+    low: float = math.inf
+    # Welford accumulator over log returns between consecutive trades
+    n_returns: int = 0
+    mean_return: float = 0.0
+    m2_return: float = 0.0
+
+    def update(self, ts: int, price: float, size: float) -> None:
+        """
+        Fold in one trade (ts in epoch ns). Trades are expected in ts order.
+        """
+        if self.count:
+            self._add_return(math.log(price / self.last_price))
+        else:
+            self.first_ts, self.first_price = ts, price
+        self.count += 1
+        self.volume += size
+        self.notional += price * size
+        self.last_ts, self.last_price = ts, price
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+
+    def _add_return(self, r: float) -> None:
+        self.n_returns += 1
+        delta = r - self.mean_return
+        self.mean_return += delta / self.n_returns
+        self.m2_return += delta * (r - self.mean_return)
+
+    @classmethod
+    def from_arrays(cls, ts: np.ndarray, price: np.ndarray, size: np.ndarray) -> WindowState:
+        """
+        State for a non-empty run of trades already sorted by ts.
+        """
+        state = cls(
+            count=len(ts),
+            volume=float(size.sum()),
+            notional=float(price @ size),
+            first_ts=int(ts[0]),
+            first_price=float(price[0]),
+            last_ts=int(ts[-1]),
+            last_price=float(price[-1]),
+            high=float(price.max()),
+            low=float(price.min()),
+        )
+        if len(price) > 1:
+            returns = np.diff(np.log(price))
+            state.n_returns = len(returns)
+            state.mean_return = float(returns.mean())
+            state.m2_return = float(((returns - state.mean_return) ** 2).sum())
+        return state
+
+    def merge(self, later: WindowState) -> WindowState:
+        """
+        New state covering self followed by `later`. The return from
+        self.last_price to later.first_price bridges the two.
+        """
+        if not self.count:
+            return later.copy()
+        if not later.count:
+            return self.copy()
+
+        out = self.copy()
+        n = self.n_returns + later.n_returns
+        if n:
+            delta = later.mean_return - self.mean_return
+            out.mean_return = self.mean_return + delta * later.n_returns / n
+            out.m2_return = self.m2_return + later.m2_return + delta * delta * self.n_returns * later.n_returns / n
+            out.n_returns = n
+        out._add_return(math.log(later.first_price / self.last_price))
+        out.count += later.count
+        out.volume += later.volume
+        out.notional += later.notional
+        out.last_ts, out.last_price = later.last_ts, later.last_price
+        out.high = max(self.high, later.high)
+        out.low = min(self.low, later.low)
+        return out
+
+    def copy(self) -> WindowState:
+        return WindowState(
+            self.count, self.volume, self.notional, self.first_ts, self.first_price,
+            self.last_ts, self.last_price, self.high, self.low,
+            self.n_returns, self.mean_return, self.m2_return,
+        )
+
+    # ---- metrics ---------------------------------------------------------
+
+    @property
+    def vwap(self) -> Optional[float]:
+        return self.notional / self.volume if self.volume > 0 else None
+
+    @property
+    def volatility(self) -> Optional[float]:
+        if self.n_returns < 2:
+            return None
+        return math.sqrt(self.m2_return / (self.n_returns - 1))
+
+    @property
+    def momentum(self) -> Optional[float]:
+        return self.last_price / self.first_price - 1.0 if self.count else None
+
+    @property
+    def liquidity_ratio(self) -> Optional[float]:
+        vwap = self.vwap
+        if vwap is None or self.high <= self.low:
+            return None
+        return self.notional / ((self.high - self.low) / vwap)
+
+    def to_metrics(self, symbol: str, start_ns: int, end_ns: int) -> WindowMetrics:
+        return WindowMetrics(
+            symbol=symbol,
+            window_start=ns_to_datetime(start_ns),
+            window_end=ns_to_datetime(end_ns),
+            vwap=self.vwap,
+            volatility=self.volatility,
+            momentum=self.momentum,
+            liquidity_ratio=self.liquidity_ratio,
+            volume=self.volume,
+            trade_count=self.count,
+            first_price=self.first_price,
+            last_price=self.last_price,
+        )
+
+
+def ns_to_datetime(ns: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=ns // 1000)
+
+
+class MetricsEngine:
+    """
+    Tumbling (step == window) or sliding (step < window) metrics over
+    per-symbol panes of `step` seconds.
+    """
+
+    def __init__(
+        self,
+        window_sec: int,
+        step_sec: Optional[int] = None,
+        allowed_lateness_sec: Optional[float] = None,
+    ):
+        step_sec = step_sec or window_sec
+        if window_sec <= 0 or step_sec <= 0 or window_sec % step_sec:
+            raise ValueError("Window ({}s) must be a positive multiple of step ({}s).".format(window_sec, step_sec))
+        if allowed_lateness_sec is None:
+            allowed_lateness_sec = Config.METRICS_ALLOWED_LATENESS_SEC
+
+        self.window_sec = window_sec
+        self.step_sec = step_sec
+        self.window_ns = window_sec * NS_PER_SEC
+        self.step_ns = step_sec * NS_PER_SEC
+        self.lateness_ns = int(allowed_lateness_sec * NS_PER_SEC)
+        # symbol -> pane start (epoch ns) -> state
+        self._panes: Dict[str, Dict[int, WindowState]] = {}
+        self.max_ts: int = NAT
+        # Every window ending at or before this has been emitted
+        self.closed_until: int = NAT
+        self.late_trades = 0
+
+    def _pane(self, symbol: str, ts: int) -> Optional[WindowState]:
+        start = ts - ts % self.step_ns
+        if start + self.step_ns <= self.closed_until:
+            self.late_trades += 1
+            return None
+        panes = self._panes.setdefault(symbol, {})
+        state = panes.get(start)
+        if state is None:
+            state = panes[start] = WindowState()
+        return state
+
+    def add(self, symbol: str, ts: int, price: float, size: float) -> None:
+        """
+        Fold in one trade (ts in epoch ns).
+        """
+        state = self._pane(symbol, ts)
+        if state is None:
+            return
+        state.update(ts, price, size)
+        if ts > self.max_ts:
+            self.max_ts = ts
+
+    def add_records(self, records: Iterable[TradeRecord]) -> None:
+        self.add_batch(TradeBatch.from_records(list(records)))
+
+    def add_batch(self, batch: TradeBatch) -> None:
+        """
+        Fold in a batch of validated trades. Trades are grouped by symbol
+        and pane with NumPy and each group is merged into its pane at once.
+        """
+        n = len(batch)
+        if not n:
+            return
+        ts = batch.ts
+        price = batch.price
+        size = np.nan_to_num(batch.size, nan=0.0)
+        codes = batch.symbol_codes
+        panes = ts - ts % self.step_ns
+
+        order = np.lexsort((ts, panes, codes))
+        ts, price, size, codes, panes = ts[order], price[order], size[order], codes[order], panes[order]
+        breaks = np.flatnonzero((np.diff(codes) != 0) | (np.diff(panes) != 0)) + 1
+        bounds = np.concatenate(([0], breaks, [n])).tolist()
+
+        symbols = batch.symbols
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            state = self._pane(symbols[codes[lo]], int(ts[lo]))
+            if state is None:
+                self.late_trades += hi - lo - 1
+                continue
+            incoming = WindowState.from_arrays(ts[lo:hi], price[lo:hi], size[lo:hi])
+            merged = state.merge(incoming) if state.first_ts <= incoming.first_ts else incoming.merge(state)
+            self._panes[symbols[codes[lo]]][int(panes[lo])] = merged
+        self.max_ts = max(self.max_ts, int(ts.max()))
+
+    @property
+    def watermark(self) -> int:
+        return self.max_ts - self.lateness_ns if self.max_ts != NAT else NAT
+
+    def close(self, watermark: Optional[int] = None) -> List[WindowMetrics]:
+        """
+        Emit every window ending after the previous close and at or before
+        the watermark (epoch ns; default: latest trade minus lateness), and
+        drop panes no later window needs.
+        """
+        watermark = self.watermark if watermark is None else watermark
+        if watermark == NAT or watermark <= self.closed_until:
+            return []
+
+        out: List[WindowMetrics] = []
+        per_window = self.window_ns // self.step_ns
+        for symbol in list(self._panes):
+            panes = self._panes[symbol]
+            ends = sorted({
+                start + k * self.step_ns
+                for start in panes
+                for k in range(1, per_window + 1)
+            })
+            for end in ends:
+                if end <= self.closed_until or end > watermark:
+                    continue
+                state: Optional[WindowState] = None
+                for start in range(end - self.window_ns, end, self.step_ns):
+                    pane = panes.get(start)
+                    if pane is not None:
+                        state = pane.copy() if state is None else state.merge(pane)
+                if state is not None:
+                    out.append(state.to_metrics(symbol, end - self.window_ns, end))
+
+            for start in [s for s in panes if s + self.window_ns <= watermark]:
+                del panes[start]
+            if not panes:
+                del self._panes[symbol]
+
+        self.closed_until = watermark
+        return out
+
+    def close_all(self) -> List[WindowMetrics]:
+        """
+        Emit every remaining window, e.g. at shutdown or the end of a backfill.
+        """
+        if not self._panes:
+            return []
+        last = max(start for panes in self._panes.values() for start in panes)
+        return self.close(last + self.window_ns)
+
+    def open_panes(self) -> int:
+        return sum(len(panes) for panes in self._panes.values())
+
@@ -0,0 +1,339 @@
+"""
+Multi-resolution OHLCV + VWAP bars
+
+Bars for each resolution in ROLLUP_RESOLUTIONS (finest first, default
+1m,5m,1h,1d) live in the bars table. The finest resolution is folded from
+raw_trades and every other one from the resolution before it, so an hourly
+bar is built from twelve 5m bars, not from raw trades.
+
+refresh_rollups() is incremental:
+- Each resolution has a watermark in rollup_watermarks; every bucket before
+  it is folded. A run folds [watermark, new watermark) and advances it. The
+  finest watermark trails the database clock by ROLLUP_LATENESS_SEC; coarser
+  ones follow the closed buckets of their source.
+- Late trades (inserted after the last run, timestamped before the finest
+  watermark) are found through raw_trades.inserted_at, rescanning the last
+  ROLLUP_LATE_SCAN_OVERLAP_SEC for writes that committed late. Only their
+  buckets are recomputed, and the change is propagated to the matching
+  coarser buckets.
+
+get_bars() answers a (symbol, range, interval) request from the coarsest
+resolution that divides the interval and is aligned to the range start, up
+to that resolution's watermark; the rest comes from finer resolutions and
+finally raw_trades, so buckets not folded yet are never read as empty.
+
+    python -m analytics.rollups      # one refresh, e.g. every minute from cron
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+import asyncio
+
+from core.config import Config
+from core.db import execute, fetch, fetch_one, init_pool, close_pool
+from core.logging import info
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_UNIT_SEC = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+_UPSERT_SQL = """
+    INSERT INTO bars (resolution, symbol, bucket, open, high, low, close, volume, notional, trade_count, vwap)
+    SELECT resolution, symbol, bucket, open, high, low, close, volume, notional, trade_count,
+           notional / NULLIF(volume, 0)
+    FROM ({select}) AS agg(resolution, symbol, bucket, open, high, low, close, volume, notional, trade_count)
+    ON CONFLICT (resolution, symbol, bucket) DO UPDATE SET
+        open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low, close = EXCLUDED.close,
+        volume = EXCLUDED.volume, notional = EXCLUDED.notional, trade_count = EXCLUDED.trade_count,
+        vwap = EXCLUDED.vwap, updated_at = NOW()
+"""
+
+# $1 resolution label, $2 bucket interval; the range or key parameters follow.
+# GROUP BY uses the ordinal because bars has its own "bucket" column.
+_FROM_RAW_SQL = """
+    SELECT $1::text, t.symbol, date_bin($2::interval, t.ts, TIMESTAMPTZ 'epoch'),
+           (array_agg(t.price ORDER BY t.ts))[1], max(t.price), min(t.price),
+           (array_agg(t.price ORDER BY t.ts DESC))[1],
+           sum(COALESCE(t.size, 0)), sum(t.price * COALESCE(t.size, 0)), count(*)::int
+    FROM raw_trades t {join}
+    WHERE {where}
+    GROUP BY t.symbol, 3
+"""
+
+_FROM_BARS_SQL = """
+    SELECT $1::text, t.symbol, date_bin($2::interval, t.bucket, TIMESTAMPTZ 'epoch'),
+           (array_agg(t.open ORDER BY t.bucket))[1], max(t.high), min(t.low),
+           (array_agg(t.close ORDER BY t.bucket DESC))[1],
+           sum(t.volume), sum(t.notional), sum(t.trade_count)::int
+    FROM bars t {join}
+    WHERE {where}
+    GROUP BY t.symbol, 3
+"""
+
+_RAW_RANGE = "t.ts >= $3 AND t.ts < $4"
+_BARS_RANGE = "t.resolution = $5 AND t.bucket >= $3 AND t.bucket < $4"
+_RAW_KEYS = (
+    "JOIN unnest($3::text[], $4::timestamptz[]) AS k(symbol, bucket) "
+    "ON t.symbol = k.symbol AND t.ts >= k.bucket AND t.ts < k.bucket + $2::interval"
+)
+_BARS_KEYS = (
+    "JOIN unnest($3::text[], $4::timestamptz[]) AS k(symbol, bucket) "
+    "ON t.symbol = k.symbol AND t.bucket >= k.bucket AND t.bucket < k.bucket + $2::interval"
+)
+
+_LATE_SQL = (
+    "SELECT DISTINCT symbol, date_bin($4::interval, ts, TIMESTAMPTZ 'epoch') AS bucket "
+    "FROM raw_trades WHERE inserted_at > $1 AND inserted_at <= $2 AND ts < $3"
+)
+
+Level = Tuple[str, int]
+Keys = Set[Tuple[str, datetime]]
+
+
+def parse_resolution(name: str) -> int:
+    """
+    "5m" -> 300 seconds.
+    """
+    name = name.strip()
+    if len(name) < 2 or name[-1] not in _UNIT_SEC or not name[:-1].isdigit():
+        raise ValueError("Invalid resolution '{}'. Use e.g. 30s, 1m, 5m, 1h, 1d.".format(name))
+    return int(name[:-1]) * _UNIT_SEC[name[-1]]
+
+
+def resolutions(spec: Optional[str] = None) -> List[Level]:
+    """
+    [(name, seconds)] finest first; each must be a multiple of the previous.
+    """
+    levels = sorted(
+        ((name.strip(), parse_resolution(name)) for name in (spec or Config.ROLLUP_RESOLUTIONS).split(",") if name.strip()),
+        key=lambda level: level[1],
+    )
+    for (fine, fine_sec), (coarse, coarse_sec) in zip(levels, levels[1:]):
+        if coarse_sec % fine_sec:
+            raise ValueError("Resolution {} is not a multiple of {}.".format(coarse, fine))
+    return levels
+
+
+def floor_time(ts: datetime, seconds: int) -> datetime:
+    """
+    Start of the epoch-aligned bucket of `seconds` containing ts.
+    """
+    offset = (ts - _EPOCH) // timedelta(seconds=seconds)
+    return _EPOCH + offset * timedelta(seconds=seconds)
+
+
+def is_aligned(ts: datetime, seconds: int) -> bool:
+    return floor_time(ts, seconds) == ts
+
+
+# ---- refresh --------------------------------------------------------------
+
+async def _fold_range(level: Level, source: Optional[str], start: datetime, end: datetime) -> None:
+    """
+    Recompute every bucket of `level` in [start, end) from its source, in
+    chunks of at most ROLLUP_MAX_RANGE_SEC.
+    """
+    name, seconds = level
+    interval = timedelta(seconds=seconds)
+    chunk = interval * max(1, Config.ROLLUP_MAX_RANGE_SEC // seconds)
+    if source is None:
+        sql = _UPSERT_SQL.format(select=_FROM_RAW_SQL.format(join="", where=_RAW_RANGE))
+    else:
+        sql = _UPSERT_SQL.format(select=_FROM_BARS_SQL.format(join="", where=_BARS_RANGE))
+
+    lo = start
+    while lo < end:
+        hi = min(lo + chunk, end)
+        params = (name, interval, lo, hi) if source is None else (name, interval, lo, hi, source)
+        await execute(sql, params)
+        lo = hi
+
+
+async def _recompute(level: Level, source: Optional[str], keys: Keys) -> None:
+    """
+    Recompute only the given (symbol, bucket) pairs of `level`.
+    """
+    name, seconds = level
+    symbols = [symbol for symbol, _ in keys]
+    buckets = [bucket for _, bucket in keys]
+    if source is None:
+        sql = _UPSERT_SQL.format(select=_FROM_RAW_SQL.format(join=_RAW_KEYS, where="TRUE"))
+        params: Tuple[Any, ...] = (name, timedelta(seconds=seconds), symbols, buckets)
+    else:
+        sql = _UPSERT_SQL.format(select=_FROM_BARS_SQL.format(join=_BARS_KEYS, where="t.resolution = $5"))
+        params = (name, timedelta(seconds=seconds), symbols, buckets, source)
+    await execute(sql, params)
+
+
+async def _initial_watermark(level: Level, source: Optional[str]) -> Optional[datetime]:
+    if source is None:
+        row = await fetch_one("SELECT min(ts) AS start FROM raw_trades")
+    else:
+        row = await fetch_one("SELECT min(bucket) AS start FROM bars WHERE resolution = $1", (source,))
+    if not row or row["start"] is None:
+        return None
+    return floor_time(row["start"], level[1])
+
+
+async def _save_watermark(name: str, watermark: datetime, scanned_until: Optional[datetime]) -> None:
+    await execute(
+        "INSERT INTO rollup_watermarks (resolution, watermark, scanned_until, updated_at) "
+        "VALUES ($1, $2, $3, NOW()) "
+        "ON CONFLICT (resolution) DO UPDATE SET watermark = EXCLUDED.watermark, "
+        "scanned_until = COALESCE(EXCLUDED.scanned_until, rollup_watermarks.scanned_until), updated_at = NOW()",
+        (name, watermark, scanned_until),
+    )
+
+
+async def refresh_rollups(levels: Optional[Sequence[Level]] = None) -> Dict[str, datetime]:
+    """
+    Fold new data into every resolution and recompute buckets touched by
+    late trades. Safe to run repeatedly; returns the new watermarks.
+    """
+    levels = list(levels) if levels is not None else resolutions()
+    marks = {row["resolution"]: row for row in await fetch(
+        "SELECT resolution, watermark, scanned_until FROM rollup_watermarks"
+    )}
+    db_now = (await fetch_one("SELECT NOW() AS now"))["now"]
+
+    out: Dict[str, datetime] = {}
+    source: Optional[str] = None
+    source_mark: Optional[datetime] = None
+    late: Keys = set()
+    for level in levels:
+        name, seconds = level
+        state = marks.get(name)
+        old = state["watermark"] if state else await _initial_watermark(level, source)
+        if old is None:
+            break
+
+        scanned_until = None
+        if source is None:
+            # Late trades: inserted since the last scan but before the watermark
+            if state and state["scanned_until"] is not None:
+                # inserted_at is set when a writer's transaction starts, so rows committed
+                # after the last scan can carry an older time: look back by an overlap
+                since = state["scanned_until"] - timedelta(seconds=Config.ROLLUP_LATE_SCAN_OVERLAP_SEC)
+                rows = await fetch(_LATE_SQL, (since, db_now, old, timedelta(seconds=seconds)))
+                late = {(row["symbol"], row["bucket"]) for row in rows}
+            scanned_until = db_now
+            limit = db_now - timedelta(seconds=Config.ROLLUP_LATENESS_SEC)
+        else:
+            late = {(symbol, floor_time(bucket, seconds)) for symbol, bucket in late}
+            late = {key for key in late if key[1] < old}
+            limit = source_mark
+
+        if late:
+            await _recompute(level, source, late)
+            info("Rollup {}: recomputed {} buckets with late trades.".format(name, len(late)))
+
+        new = max(old, floor_time(limit, seconds))
+        if new > old:
+            await _fold_range(level, source, old, new)
+        await _save_watermark(name, new, scanned_until)
+
+        out[name] = new
+        source, source_mark = name, new
+    return out
+
+
+# ---- queries --------------------------------------------------------------
+
+def plan_bars(
+    interval_sec: int,
+    start: datetime,
+    end: datetime,
+    watermarks: Mapping[str, datetime],
+    levels: Optional[Sequence[Level]] = None,
+) -> List[Tuple[Optional[Level], datetime, datetime]]:
+    """
+    Split [start, end) into (level, lo, hi) segments, each served by one
+    source: the coarsest resolution that divides interval_sec, is aligned to
+    lo and has folded its buckets (below its watermark), then finer ones for
+    the rest. What no resolution covers yet is served from raw_trades
+    (level None).
+    """
+    levels = levels if levels is not None else resolutions()
+    segments: List[Tuple[Optional[Level], datetime, datetime]] = []
+    lo = start
+    while lo < end:
+        for name, seconds in reversed(levels):
+            mark = watermarks.get(name)
+            if mark is None or interval_sec % seconds or not is_aligned(lo, seconds):
+                continue
+            hi = min(floor_time(end, seconds), floor_time(mark, seconds))
+            if hi > lo:
+                segments.append(((name, seconds), lo, hi))
+                lo = hi
+                break
+        else:
+            segments.append((None, lo, end))
+            lo = end
+    return segments
+
+
+def _merge_bars(rows: Sequence[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    # Segments are in time order; a bucket split across two of them is folded into one bar
+    out: List[Dict[str, Any]] = []
+    for row in rows:
+        row = dict(row)
+        prev = out[-1] if out else None
+        if prev is None or prev["bucket"] != row["bucket"]:
+            out.append(row)
+            continue
+        prev["high"] = max(prev["high"], row["high"])
+        prev["low"] = min(prev["low"], row["low"])
+        prev["close"] = row["close"]
+        prev["volume"] += row["volume"]
+        prev["notional"] += row["notional"]
+        prev["trade_count"] += row["trade_count"]
+        prev["vwap"] = prev["notional"] / prev["volume"] if prev["volume"] else None
+        prev["source"] = "{}+{}".format(prev["source"], row["source"])
+    for bar in out:
+        del bar["notional"]
+    return out
+
+
+async def get_bars(
+    symbol: str,
+    start: datetime,
+    end: datetime,
+    interval_sec: int,
+    levels: Optional[Sequence[Level]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    OHLCV + VWAP bars of interval_sec for symbol in [start, end), ordered by
+    bucket. Bars are only read below each resolution's watermark (see
+    plan_bars), so recent buckets come from finer resolutions or raw_trades.
+    """
+    watermarks = {row["resolution"]: row["watermark"] for row in await fetch(
+        "SELECT resolution, watermark FROM rollup_watermarks"
+    )}
+    interval = timedelta(seconds=interval_sec)
+    columns = "resolution, symbol, bucket, open, high, low, close, volume, notional, trade_count"
+    rows: List[Mapping[str, Any]] = []
+    for level, lo, hi in plan_bars(interval_sec, start, end, watermarks, levels):
+        if level is None:
+            select = _FROM_RAW_SQL.format(join="", where=_RAW_RANGE + " AND t.symbol = $5")
+            params: Tuple[Any, ...] = ("raw", interval, lo, hi, symbol)
+        else:
+            select = _FROM_BARS_SQL.format(join="", where=_BARS_RANGE + " AND t.symbol = $6")
+            params = (level[0], interval, lo, hi, level[0], symbol)
+        sql = (
+            "SELECT bucket, open, high, low, close, volume, notional, trade_count, "
+            "notional / NULLIF(volume, 0) AS vwap, resolution AS source "
+            "FROM ({select}) AS agg({columns}) ORDER BY bucket"
+        ).format(select=select, columns=columns)
+        rows.extend(await fetch(sql, params))
+    return _merge_bars(rows)
+
+
+async def main():
+    await init_pool()
+    try:
+        marks = await refresh_rollups()
+        info("Rollups refreshed: {}".format({name: mark.isoformat() for name, mark in marks.items()}))
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+"""
+In-memory dedup of content hashes
+
+HashDeduper answers "has this hash been stored already?" before anything is
+sent to the database, in two tiers:
+- LRUSet: exact set of the most recent NEWS_LRU_SIZE hashes
+- BloomFilter: compact set of the last NEWS_BLOOM_CAPACITY to twice that
+  many hashes (and, after warm(), recent hashes already in the database).
+  It is kept in two generations: once the current one holds its capacity
+  it becomes the previous one and a fresh filter takes over, so the false
+  positive rate stays near NEWS_BLOOM_ERROR_RATE instead of growing with
+  every hash added.
+
+A hash found in either tier is dropped. The bloom filter never misses a
+hash it still holds, but may report an unseen one as seen with probability
+about 2 * NEWS_BLOOM_ERROR_RATE; such an item is skipped. Everything that
+passes is still inserted with ON CONFLICT DO NOTHING, so the database
+stays the source of truth.
+"""
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional, TypeVar
+import hashlib
+import math
+
+from core.config import Config
+
+T = TypeVar("T")
+
+
+class BloomFilter:
+    """
+    Bloom filter sized for `capacity` items at `error_rate` false positives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # Double hashing over one 128-bit digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class LRUSet:
+    """
+    Set of at most `maxsize` keys; the least recently seen is evicted first.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._keys: "OrderedDict[str, None]" = OrderedDict()
+
+    def add(self, key: str) -> None:
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+        if len(self._keys) > self.maxsize:
+            self._keys.popitem(last=False)
+
+    def __contains__(self, key: str) -> bool:
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class HashDeduper:
+    """
+    LRU + two-generation bloom filter of content hashes, with hit counters.
+    """
+
+    def __init__(
+        self,
+        lru_size: Optional[int] = None,
+        bloom_capacity: Optional[int] = None,
+        bloom_error_rate: Optional[float] = None,
+    ):
+        self.recent = LRUSet(lru_size or Config.NEWS_LRU_SIZE)
+        self.bloom = BloomFilter(
+            bloom_capacity or Config.NEWS_BLOOM_CAPACITY,
+            bloom_error_rate or Config.NEWS_BLOOM_ERROR_RATE,
+        )
+        self.previous_bloom: Optional[BloomFilter] = None
+        self.lru_hits = 0
+        self.bloom_hits = 0
+        self.rotations = 0
+
+    def seen(self, key: str) -> bool:
+        if key in self.recent:
+            self.lru_hits += 1
+            return True
+        if key in self.bloom or (self.previous_bloom is not None and key in self.previous_bloom):
+            self.bloom_hits += 1
+            return True
+        return False
+
+    def add(self, key: str) -> None:
+        self.recent.add(key)
+        if self.bloom.count >= self.bloom.capacity:
+            # A full filter's error rate climbs with every add: start a new generation
+            self.previous_bloom = self.bloom
+            self.bloom = BloomFilter(self.bloom.capacity, self.bloom.error_rate)
+            self.rotations += 1
+        self.bloom.add(key)
+
+    def warm(self, keys: Iterable[str]) -> int:
+        """
+        Preload hashes that are already stored, e.g. after a restart.
+        """
+        n = 0
+        for key in keys:
+            self.add(key)
+            n += 1
+        return n
+
+    def filter_new(self, items: Iterable[T], key: Callable[[T], str], mark: bool = True) -> List[T]:
+        """
+        Items whose key has not been seen, keeping the first of repeated keys.
+        With mark=False the caller add()s the keys once they are stored.
+        """
+        out = []
+        batch = set()
+        for item in items:
+            k = key(item)
+            if k in batch or self.seen(k):
+                continue
+            batch.add(k)
+            out.append(item)
+            if mark:
+                self.add(k)
+        return out
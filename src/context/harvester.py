@@ -0,0 +1,295 @@
+"""
+Concurrent news harvester
+
+NewsHarvester.harvest(symbols) fetches news for every (source, symbol)
+concurrently over one keep-alive aiohttp session and writes new items to
+context_news in one batch:
+- Rate limits: one TokenBucket per source (its `rate` and `burst`); at most
+  NEWS_CONCURRENCY requests are in flight overall.
+- Conditional requests: the ETag / Last-Modified of every URL are kept and
+  sent back as If-None-Match / If-Modified-Since; a 304 costs no parsing.
+  They are only kept once the run's items are written, so a failed write
+  refetches the same content next time.
+- Dedup: items are normalized (context.normalizer) and filtered through a
+  HashDeduper (context.cache) before the database, which still inserts with
+  ON CONFLICT (hash) DO NOTHING.
+
+A failing request is logged and counted; it does not stop the others.
+Sources take a base URL, so tests run against a local stub server.
+
+    python -m context.harvester
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import json
+
+import aiohttp
+
+from context.cache import HashDeduper
+from context.normalizer import NewsItem, normalize_news
+from core.config import Config
+from core.db import close_pool, execute_many, fetch, init_pool
+from core.logging import debug, info, warning
+from core.utils import TokenBucket
+from ingest.writer_errors import WriterError
+
+INSERT_NEWS_SQL = (
+    "INSERT INTO context_news (symbol, published_at, title, summary, hash, source) "
+    "VALUES ($1, $2, $3, $4, $5, $6) ON CONFLICT (hash) DO NOTHING"
+)
+
+
+class HarvestError(Exception):
+    """
+    A news request failed (transport error, bad status or bad payload).
+    """
+    pass
+
+
+class NewsSource:
+    """
+    A news API: how to request one symbol's news and parse the response.
+    """
+    name = "news"
+
+    def __init__(self, base_url: str, rate: float, burst: int):
+        self.base_url = base_url
+        self.limiter = TokenBucket(rate, burst)
+
+    def request(self, symbol: str, now: datetime) -> Tuple[str, Dict[str, str]]:
+        """
+        (url, query params) for one symbol.
+        """
+        raise NotImplementedError
+
+    def parse(self, payload: Any) -> List[Dict[str, Any]]:
+        """
+        Raw items from the decoded JSON body.
+        """
+        raise NotImplementedError
+
+
+class FinnhubNewsSource(NewsSource):
+    """
+    Finnhub /company-news: a JSON list of {headline, summary, datetime, source, ...}.
+    """
+    name = "finnhub"
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 rate: Optional[float] = None, burst: Optional[int] = None):
+        super().__init__(
+            base_url or Config.NEWS_FINNHUB_URL,
+            Config.NEWS_RATE_LIMIT if rate is None else rate,
+            burst or Config.NEWS_BURST,
+        )
+        self.api_key = api_key or Config.FINNHUB_API_KEY
+
+    def request(self, symbol: str, now: datetime) -> Tuple[str, Dict[str, str]]:
+        since = now - timedelta(days=Config.NEWS_LOOKBACK_DAYS)
+        return self.base_url, {
+            "symbol": symbol,
+            "from": since.date().isoformat(),
+            "to": now.date().isoformat(),
+            "token": self.api_key or "",
+        }
+
+    def parse(self, payload: Any) -> List[Dict[str, Any]]:
+        if not isinstance(payload, list):
+            raise HarvestError("Expected a list of news items, got {}".format(type(payload).__name__))
+        return [item for item in payload if isinstance(item, dict)]
+
+
+NEWS_SOURCES = {
+    "finnhub": FinnhubNewsSource,
+}
+
+
+def get_sources(names: Optional[str] = None) -> List[NewsSource]:
+    sources = []
+    for name in (names or Config.NEWS_SOURCES).split(","):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in NEWS_SOURCES:
+            raise ValueError("Unknown news source '{}'. Supported sources: {}.".format(
+                name, ", ".join(NEWS_SOURCES)
+            ))
+        sources.append(NEWS_SOURCES[name]())
+    return sources
+
+
+@dataclass
+class HarvestResult:
+    requests: int = 0
+    not_modified: int = 0
+    fetched: int = 0
+    duplicates: int = 0
+    inserted: int = 0
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+class NewsHarvester:
+    """
+    Keeps the HTTP session, conditional-request validators and dedup cache
+    across runs; reuse one instance and call aclose() at shutdown.
+    """
+
+    def __init__(
+        self,
+        sources: Optional[Sequence[NewsSource]] = None,
+        deduper: Optional[HashDeduper] = None,
+        concurrency: Optional[int] = None,
+        writer=None,
+    ):
+        self.sources = list(sources) if sources is not None else get_sources()
+        self.deduper = deduper or HashDeduper()
+        self.concurrency = concurrency or Config.NEWS_CONCURRENCY
+        self._writer = writer or write_news
+        self._session: Optional[aiohttp.ClientSession] = None
+        # (url, sorted params) -> {"etag": ..., "last_modified": ...}
+        self._validators: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Dict[str, str]] = {}
+        # Validators of the current run, kept only once its items are written
+        self._pending: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Dict[str, str]] = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.concurrency,
+                    keepalive_timeout=Config.HTTP_KEEPALIVE_SEC,
+                ),
+                timeout=aiohttp.ClientTimeout(total=Config.HTTP_TIMEOUT_SEC),
+            )
+        return self._session
+
+    async def aclose(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def warm(self, days: Optional[int] = None) -> int:
+        """
+        Load hashes of recently stored news into the dedup cache.
+        """
+        days = Config.NEWS_WARM_DAYS if days is None else days
+        rows = await fetch(
+            "SELECT hash FROM context_news WHERE inserted_at >= NOW() - make_interval(days => $1) AND hash IS NOT NULL",
+            (days,),
+        )
+        return self.deduper.warm(row["hash"] for row in rows)
+
+    async def fetch_source(self, source: NewsSource, symbol: str, now: datetime) -> Optional[List[Dict[str, Any]]]:
+        """
+        Raw items for one symbol, or None when the server answers 304.
+        """
+        url, params = source.request(symbol, now)
+        key = (url, tuple(sorted(params.items())))
+        headers = {}
+        cached = self._validators.get(key, {})
+        if "etag" in cached:
+            headers["If-None-Match"] = cached["etag"]
+        if "last_modified" in cached:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        await source.limiter.acquire()
+        try:
+            async with self._get_session().get(url, params=params, headers=headers) as response:
+                if response.status == 304:
+                    return None
+                text = await response.text()
+                if response.status != 200:
+                    raise HarvestError("{} returned {} for {}: {}".format(
+                        source.name, response.status, symbol, text[:200]
+                    ))
+                validators = {}
+                if response.headers.get("ETag"):
+                    validators["etag"] = response.headers["ETag"]
+                if response.headers.get("Last-Modified"):
+                    validators["last_modified"] = response.headers["Last-Modified"]
+        except asyncio.TimeoutError as e:
+            raise HarvestError("Timeout when fetching {} news for {}: {}".format(source.name, symbol, e)) from e
+        except aiohttp.ClientError as e:
+            raise HarvestError("HTTP error when fetching {} news for {}: {}".format(source.name, symbol, e)) from e
+
+        try:
+            items = source.parse(json.loads(text))
+        except ValueError as e:
+            raise HarvestError("Invalid JSON from {} for {}: {}".format(source.name, symbol, text[:200])) from e
+        if validators:
+            self._pending[key] = validators
+        return items
+
+    async def harvest(self, symbols: Optional[Sequence[str]] = None, now: Optional[datetime] = None) -> HarvestResult:
+        """
+        Fetch, normalize, dedup and store news for all symbols and sources.
+        """
+        symbols = list(symbols or Config.SYMBOLS)
+        now = now or datetime.now(timezone.utc)
+        result = HarvestResult()
+        self._pending.clear()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(source: NewsSource, symbol: str) -> List[NewsItem]:
+            async with semaphore:
+                try:
+                    raw = await self.fetch_source(source, symbol, now)
+                except HarvestError as e:
+                    result.errors["{}:{}".format(source.name, symbol)] = str(e)
+                    warning(str(e))
+                    return []
+            if raw is None:
+                result.not_modified += 1
+                return []
+            items = [normalize_news(item, symbol, source.name) for item in raw]
+            return [item for item in items if item is not None]
+
+        jobs = [(source, symbol) for source in self.sources for symbol in symbols]
+        result.requests = len(jobs)
+        batches = await asyncio.gather(*(one(source, symbol) for source, symbol in jobs))
+        items = [item for batch in batches for item in batch]
+        result.fetched = len(items)
+
+        # Hashes are marked seen only once written, so a failed write is retried next run
+        new_items = self.deduper.filter_new(items, key=lambda item: item.hash, mark=False)
+        result.duplicates = len(items) - len(new_items)
+        if new_items:
+            result.inserted = await self._writer(new_items)
+            for item in new_items:
+                self.deduper.add(item.hash)
+        self._validators.update(self._pending)
+
+        info("News harvest: {} requests ({} not modified, {} failed), {} items, {} duplicates, {} written.".format(
+            result.requests, result.not_modified, len(result.errors), result.fetched,
+            result.duplicates, result.inserted,
+        ))
+        debug("News dedup: {} LRU hits, {} bloom hits.".format(self.deduper.lru_hits, self.deduper.bloom_hits))
+        return result
+
+
+async def write_news(items: List[NewsItem]) -> int:
+    """
+    Insert items in one executemany; hashes already stored are skipped.
+    """
+    if not items:
+        return 0
+    try:
+        await execute_many(INSERT_NEWS_SQL, [item.to_row() for item in items])
+    except Exception as e:
+        raise WriterError("Database error during news write: {}".format(e)) from e
+    return len(items)
+
+
+async def main():
+    await init_pool()
+    harvester = NewsHarvester()
+    try:
+        await harvester.warm()
+        await harvester.harvest()
+    finally:
+        await harvester.aclose()
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
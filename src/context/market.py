@@ -0,0 +1,239 @@
+"""
+Cross-sectional sector and market context
+
+refresh_context() reads every derived_metrics window ending in the last
+CONTEXT_LOOKBACK_SEC (all symbols, one streamed query) and computes, per
+window:
+- context_sector: average return (momentum), notional-weighted return and
+  average volatility of the symbols in each sector
+- context_market: the same across the whole universe, plus breadth
+  (advancers / decliners), the CONTEXT_MARKET_SYMBOL return as spx_return,
+  the CONTEXT_VOLATILITY_SYMBOL price as vix_level and a risk_flag
+
+The symbol -> sector mapping (symbol_sectors) is loaded once into a
+SectorIndex. Each window and (window, sector) pair becomes an integer group
+and all aggregates come from np.bincount, so cost is one pass over the rows
+regardless of the number of sectors. Results are upserted in bulk; rerunning
+over the same windows replaces them.
+
+    python -m context.market      # e.g. every minute from cron
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import asyncio
+
+import numpy as np
+
+from core.config import Config
+from core.db import close_pool, fetch, init_pool, stream_columns, upsert_records
+from core.logging import info
+from ingest.batch import factorize, float_column, ts_column
+
+CONTEXT_SECTOR_COLUMNS = (
+    "sector_id", "window_start", "window_end", "avg_return", "weighted_return",
+    "avg_volatility", "symbol_count",
+)
+CONTEXT_MARKET_COLUMNS = (
+    "window_start", "window_end", "avg_return", "weighted_return", "avg_volatility",
+    "advancers", "decliners", "symbol_count", "spx_return", "vix_level", "risk_flag",
+)
+
+_METRICS_SQL = (
+    "SELECT symbol, window_start, window_end, momentum::float8 AS momentum, "
+    "volatility::float8 AS volatility, (vwap * volume)::float8 AS notional, last_price::float8 AS last_price "
+    "FROM derived_metrics WHERE window_end > $1 AND window_end <= $2"
+)
+
+
+class SectorIndex:
+    """
+    symbol -> sector code lookup; symbols without a sector get -1.
+    """
+
+    def __init__(self, mapping: Mapping[str, str]):
+        self.sectors: List[str] = sorted(set(mapping.values()))
+        code = {sector: i for i, sector in enumerate(self.sectors)}
+        self._codes = {symbol: code[sector] for symbol, sector in mapping.items()}
+
+    @classmethod
+    async def load(cls) -> "SectorIndex":
+        rows = await fetch("SELECT symbol, sector_id FROM symbol_sectors")
+        return cls({row["symbol"]: row["sector_id"] for row in rows})
+
+    def __len__(self) -> int:
+        return len(self.sectors)
+
+    def codes(self, symbols: Sequence[str]) -> np.ndarray:
+        """
+        Sector code per row; each distinct symbol is looked up once.
+        """
+        symbol_codes, uniques = factorize(symbols)
+        table = np.array([self._codes.get(s, -1) for s in uniques], dtype=np.int64)
+        return table[symbol_codes] if len(symbols) else np.empty(0, dtype=np.int64)
+
+
+class _Groups:
+    """
+    Sums over integer group ids with np.bincount.
+    """
+
+    def __init__(self, groups: np.ndarray, size: int):
+        self.groups = groups
+        self.size = size
+
+    def sum(self, weights: np.ndarray) -> np.ndarray:
+        return np.bincount(self.groups, weights=weights, minlength=self.size)
+
+    def mean(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (mean of non-NaN values, their count) per group; NaN where empty.
+        """
+        valid = ~np.isnan(values)
+        count = self.sum(valid.astype(np.float64))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.sum(np.where(valid, values, 0.0)) / count, count
+
+    def weighted_mean(self, values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        ok = ~np.isnan(values) & ~np.isnan(weights) & (weights > 0)
+        w = np.where(ok, weights, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.sum(np.where(ok, values, 0.0) * w) / self.sum(w)
+
+
+def compute_context(
+    columns: Mapping[str, Sequence[Any]],
+    index: SectorIndex,
+    market_symbol: Optional[str] = None,
+    volatility_symbol: Optional[str] = None,
+) -> Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]]]:
+    """
+    (context_sector rows, context_market rows) for derived_metrics columns
+    symbol, window_start, window_end, momentum, volatility, notional, last_price.
+    """
+    symbols = list(columns["symbol"])
+    if not symbols:
+        return [], []
+    market_symbol = Config.CONTEXT_MARKET_SYMBOL if market_symbol is None else market_symbol
+    volatility_symbol = Config.CONTEXT_VOLATILITY_SYMBOL if volatility_symbol is None else volatility_symbol
+
+    bounds = np.stack((ts_column(columns["window_start"]), ts_column(columns["window_end"])), axis=1)
+    _, first, window = np.unique(bounds, axis=0, return_index=True, return_inverse=True)
+    window = window.ravel()
+    n_windows = len(first)
+    starts = [columns["window_start"][i] for i in first.tolist()]
+    ends = [columns["window_end"][i] for i in first.tolist()]
+
+    ret = float_column(columns["momentum"])
+    vol = float_column(columns["volatility"])
+    notional = float_column(columns["notional"])
+
+    # Market: one group per window
+    market = _Groups(window, n_windows)
+    avg_ret, count = market.mean(ret)
+    weighted = market.weighted_mean(ret, notional)
+    avg_vol, _ = market.mean(vol)
+    advancers = market.sum((ret > 0).astype(np.float64))
+    decliners = market.sum((ret < 0).astype(np.float64))
+    spx = _pick(market, symbols, market_symbol, ret)
+    vix = _pick(market, symbols, volatility_symbol, float_column(columns["last_price"]))
+
+    market_rows = []
+    for w in range(n_windows):
+        n = int(count[w])
+        market_rows.append((
+            starts[w], ends[w], _value(avg_ret[w]), _value(weighted[w]), _value(avg_vol[w]),
+            int(advancers[w]), int(decliners[w]), n, _value(spx[w]), _value(vix[w]),
+            risk_flag(avg_ret[w], decliners[w] / n if n else 0.0),
+        ))
+
+    # Sectors: one group per (window, sector)
+    sector = index.codes(symbols)
+    known = sector >= 0
+    sector_rows = []
+    if known.any() and len(index):
+        n_sectors = len(index)
+        groups = _Groups(window[known] * n_sectors + sector[known], n_windows * n_sectors)
+        s_ret, s_count = groups.mean(ret[known])
+        s_weighted = groups.weighted_mean(ret[known], notional[known])
+        s_vol, _ = groups.mean(vol[known])
+        present = groups.sum(np.ones(int(known.sum())))
+        for g in np.flatnonzero(present).tolist():
+            w, s = divmod(g, n_sectors)
+            sector_rows.append((
+                index.sectors[s], starts[w], ends[w], _value(s_ret[g]), _value(s_weighted[g]),
+                _value(s_vol[g]), int(s_count[g]),
+            ))
+    return sector_rows, market_rows
+
+
+def _pick(groups: _Groups, symbols: List[str], symbol: str, values: np.ndarray) -> np.ndarray:
+    # Value of one symbol per window (NaN where it has no row)
+    if not symbol:
+        return np.full(groups.size, np.nan)
+    mask = np.fromiter((s == symbol for s in symbols), dtype=bool, count=len(symbols))
+    out = np.full(groups.size, np.nan)
+    out[groups.groups[mask]] = values[mask]
+    return out
+
+
+def _value(x: float) -> Optional[float]:
+    return None if np.isnan(x) else float(x)
+
+
+def risk_flag(avg_return: float, decline_share: float) -> str:
+    if not np.isnan(avg_return) and avg_return <= -Config.CONTEXT_RISK_RETURN_PCT:
+        return "high"
+    if decline_share >= Config.CONTEXT_RISK_BREADTH:
+        return "elevated"
+    return "low"
+
+
+async def load_metrics(start: datetime, end: datetime) -> Dict[str, List[Any]]:
+    """
+    derived_metrics columns for windows ending in (start, end], all symbols.
+    """
+    out: Dict[str, List[Any]] = {}
+    async for cols in stream_columns(_METRICS_SQL, (start, end)):
+        for name, values in cols.items():
+            out.setdefault(name, []).extend(values)
+    return out
+
+
+async def refresh_context(
+    index: SectorIndex,
+    lookback_sec: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> Tuple[int, int]:
+    """
+    Recompute and upsert sector and market context for recent windows.
+    Returns (sector rows, market rows) written.
+    """
+    end = now or datetime.now(timezone.utc)
+    start = end - timedelta(seconds=lookback_sec or Config.CONTEXT_LOOKBACK_SEC)
+    columns = await load_metrics(start, end)
+    if not columns:
+        return 0, 0
+
+    sector_rows, market_rows = compute_context(columns, index)
+    written = (
+        await upsert_records("context_sector", CONTEXT_SECTOR_COLUMNS, sector_rows,
+                             ("sector_id", "window_start", "window_end")) if sector_rows else 0,
+        await upsert_records("context_market", CONTEXT_MARKET_COLUMNS, market_rows,
+                             ("window_start", "window_end")) if market_rows else 0,
+    )
+    info("Context refreshed: {} metric rows -> {} sector rows, {} market rows.".format(
+        len(columns["symbol"]), *written
+    ))
+    return written
+
+
+async def main():
+    await init_pool()
+    try:
+        await refresh_context(await SectorIndex.load())
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
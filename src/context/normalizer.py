@@ -0,0 +1,95 @@
+"""
+News item normalization
+
+normalize_news() turns one raw item from a news source into a NewsItem ready
+for context_news: whitespace collapsed, HTML entities and tags removed,
+published_at as an aware UTC datetime, summary truncated to
+NEWS_SUMMARY_MAX_CHARS.
+
+The content hash is computed from the symbol and the canonical title
+(lowercase, punctuation and whitespace removed), so the same story carried
+by several sources or re-fetched later maps to the same hash.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import html
+import re
+
+from core.config import Config
+
+_TAG = re.compile(r"<[^>]+>")
+_SPACE = re.compile(r"\s+")
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+@dataclass(slots=True)
+class NewsItem:
+    symbol: str
+    published_at: Optional[datetime]
+    title: str
+    summary: str
+    hash: str
+    source: str
+
+    def to_row(self) -> Tuple[Any, ...]:
+        return (self.symbol, self.published_at, self.title, self.summary, self.hash, self.source)
+
+
+def clean_text(value: Any) -> str:
+    if not isinstance(value, str):
+        return ""
+    return _SPACE.sub(" ", _TAG.sub(" ", html.unescape(value))).strip()
+
+
+def canonical_title(title: str) -> str:
+    return _NON_WORD.sub(" ", title.lower()).strip()
+
+
+def content_hash(symbol: str, title: str) -> str:
+    return hashlib.sha256("{}|{}".format(symbol.upper(), canonical_title(title)).encode()).hexdigest()
+
+
+def parse_published(value: Any) -> Optional[datetime]:
+    """
+    Unix seconds (or milliseconds) or an ISO 8601 string to UTC; None if unusable.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        if value <= 0:
+            return None
+        seconds = value / 1000 if value > 1e11 else value
+        return datetime.fromtimestamp(seconds, tz=timezone.utc)
+    if isinstance(value, str) and value:
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.astimezone(timezone.utc)
+    return None
+
+
+def normalize_news(raw: Dict[str, Any], symbol: str, source: str) -> Optional[NewsItem]:
+    """
+    NewsItem from a raw item with title/headline, summary and
+    published_at/datetime fields; None when it has no title.
+    """
+    title = clean_text(raw.get("title") or raw.get("headline"))
+    if not canonical_title(title):
+        return None
+    summary = clean_text(raw.get("summary") or raw.get("description"))
+    limit = Config.NEWS_SUMMARY_MAX_CHARS
+    if len(summary) > limit:
+        summary = summary[:limit - 1].rstrip() + "…"
+    return NewsItem(
+        symbol=symbol,
+        published_at=parse_published(raw.get("published_at", raw.get("datetime"))),
+        title=title,
+        summary=summary,
+        hash=content_hash(symbol, title),
+        source=clean_text(raw.get("source")) or source,
+    )
@@ -5,12 +5,122 @@ load_dotenv()
 
 class Config:
     DB_URL = os.getenv("DATABASE_URL")
+    DB_READ_URL = os.getenv("DATABASE_READ_URL")
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_READ_POOL_MIN_SIZE = int(os.getenv("DB_READ_POOL_MIN_SIZE", "1"))
+    DB_READ_POOL_MAX_SIZE = int(os.getenv("DB_READ_POOL_MAX_SIZE", "10"))
+    DB_ACQUIRE_TIMEOUT_SEC = float(os.getenv("DB_ACQUIRE_TIMEOUT_SEC", "10"))
+    DB_COMMAND_TIMEOUT_SEC = float(os.getenv("DB_COMMAND_TIMEOUT_SEC", "60"))
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+    DB_MAX_INACTIVE_CONNECTION_LIFETIME_SEC = float(os.getenv("DB_MAX_INACTIVE_CONNECTION_LIFETIME_SEC", "300"))
+    DB_STREAM_BATCH_SIZE = int(os.getenv("DB_STREAM_BATCH_SIZE", "5000"))
+    RAW_TRADES_RETENTION_DAYS = int(os.getenv("RAW_TRADES_RETENTION_DAYS", "0"))  # 0 keeps everything
+    RAW_TRADES_PARTITIONS_AHEAD = int(os.getenv("RAW_TRADES_PARTITIONS_AHEAD", "3"))
+    # run_scheduler() runs ops.partitions on startup and at this interval (0 = leave it to cron)
+    PARTITION_MAINTENANCE_INTERVAL_SEC = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL_SEC", "21600"))
     FETCH_INTERVAL = int(os.getenv("FETCH_INTERVAL", "60"))
     SYMBOLS = [s.strip() for s in os.getenv("SYMBOLS", "AAPL").split(",")]
     API_PROVIDER = os.getenv("API_PROVIDER", "yfinance")
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
     REQUEST_DELAY = float(os.getenv("REQUEST_DELAY", "0.2"))
+    FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "10"))
+    FETCH_RATE_LIMIT = float(os.getenv("FETCH_RATE_LIMIT", "5"))
+    FETCH_BURST = int(os.getenv("FETCH_BURST", "1"))
+    STREAM_PROVIDER = os.getenv("STREAM_PROVIDER", "finnhub")
+    FINNHUB_WS_URL = os.getenv("FINNHUB_WS_URL", "wss://ws.finnhub.io")
+    STREAM_RECONNECT_DELAY_SEC = float(os.getenv("STREAM_RECONNECT_DELAY_SEC", "1"))
+    STREAM_MAX_RECONNECT_DELAY_SEC = float(os.getenv("STREAM_MAX_RECONNECT_DELAY_SEC", "60"))
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+    HTTP_TIMEOUT_SEC = float(os.getenv("HTTP_TIMEOUT_SEC", "5"))
+    HTTP_KEEPALIVE_SEC = float(os.getenv("HTTP_KEEPALIVE_SEC", "30"))
+    INGEST_MODE = os.getenv("INGEST_MODE", "batch")  # batch, pipeline or stream (websocket feed)
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "1000"))
+    PIPELINE_BATCH_SIZE = int(os.getenv("PIPELINE_BATCH_SIZE", "500"))
+    PIPELINE_FLUSH_INTERVAL_SEC = float(os.getenv("PIPELINE_FLUSH_INTERVAL_SEC", "1.0"))
+    QUARANTINE_REPLAY_MAX_ATTEMPTS = int(os.getenv("QUARANTINE_REPLAY_MAX_ATTEMPTS", "5"))
     SCHEDULER_INTERVAL_SEC = int(os.getenv("SCHEDULER_INTERVAL_SEC", "20"))
+    SCHEDULER_OVERRUN_POLICY = os.getenv("SCHEDULER_OVERRUN_POLICY", "skip")
+    SCHEDULER_MAX_IN_FLIGHT = int(os.getenv("SCHEDULER_MAX_IN_FLIGHT", "2"))
+    SCHEDULER_SHUTDOWN_GRACE_SEC = float(os.getenv("SCHEDULER_SHUTDOWN_GRACE_SEC", "10"))
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_WINDOWS = os.getenv("METRICS_WINDOWS", "60,300:60")  # window_sec[:step_sec], comma separated
+    METRICS_ALLOWED_LATENESS_SEC = float(os.getenv("METRICS_ALLOWED_LATENESS_SEC", "5"))
+    METRICS_MAX_PENDING_WINDOWS = int(os.getenv("METRICS_MAX_PENDING_WINDOWS", "100000"))
+    DETECTOR_ENABLED = os.getenv("DETECTOR_ENABLED", "true").lower() == "true"
+    DETECTOR_WINDOW_SEC = int(os.getenv("DETECTOR_WINDOW_SEC", "60"))
+    DETECTOR_FAST_ALPHA = float(os.getenv("DETECTOR_FAST_ALPHA", "0.2"))
+    DETECTOR_SLOW_ALPHA = float(os.getenv("DETECTOR_SLOW_ALPHA", "0.02"))
+    DETECTOR_WARMUP_WINDOWS = int(os.getenv("DETECTOR_WARMUP_WINDOWS", "30"))
+    DETECTOR_VOLUME_Z = float(os.getenv("DETECTOR_VOLUME_Z", "4"))
+    DETECTOR_VOLUME_QUANTILE = float(os.getenv("DETECTOR_VOLUME_QUANTILE", "0.99"))
+    DETECTOR_VOL_RATIO = float(os.getenv("DETECTOR_VOL_RATIO", "2"))
+    DETECTOR_GAP_Z = float(os.getenv("DETECTOR_GAP_Z", "4"))
+    DETECTOR_GAP_MIN_PCT = float(os.getenv("DETECTOR_GAP_MIN_PCT", "0.005"))
+    HOT_CACHE_ENABLED = os.getenv("HOT_CACHE_ENABLED", "true").lower() == "true"
+    HOT_CACHE_CAPACITY = int(os.getenv("HOT_CACHE_CAPACITY", "16384"))  # trades per symbol
+    ROLLUP_RESOLUTIONS = os.getenv("ROLLUP_RESOLUTIONS", "1m,5m,1h,1d")
+    ROLLUP_LATENESS_SEC = int(os.getenv("ROLLUP_LATENESS_SEC", "60"))
+    ROLLUP_MAX_RANGE_SEC = int(os.getenv("ROLLUP_MAX_RANGE_SEC", "86400"))
+    ROLLUP_LATE_SCAN_OVERLAP_SEC = int(os.getenv("ROLLUP_LATE_SCAN_OVERLAP_SEC", "300"))
+    ANALYTICS_INTERVAL_SEC = float(os.getenv("ANALYTICS_INTERVAL_SEC", "60"))
+    ANALYTICS_LATENESS_SEC = int(os.getenv("ANALYTICS_LATENESS_SEC", "60"))
+    ANALYTICS_CHUNK_SEC = int(os.getenv("ANALYTICS_CHUNK_SEC", "3600"))
+    CONTEXT_LOOKBACK_SEC = int(os.getenv("CONTEXT_LOOKBACK_SEC", "900"))
+    CONTEXT_MARKET_SYMBOL = os.getenv("CONTEXT_MARKET_SYMBOL", "SPY")
+    CONTEXT_VOLATILITY_SYMBOL = os.getenv("CONTEXT_VOLATILITY_SYMBOL", "")
+    CONTEXT_RISK_RETURN_PCT = float(os.getenv("CONTEXT_RISK_RETURN_PCT", "0.01"))
+    CONTEXT_RISK_BREADTH = float(os.getenv("CONTEXT_RISK_BREADTH", "0.7"))
+    NEWS_SOURCES = os.getenv("NEWS_SOURCES", "finnhub")
+    NEWS_FINNHUB_URL = os.getenv("NEWS_FINNHUB_URL", "https://finnhub.io/api/v1/company-news")
+    NEWS_LOOKBACK_DAYS = int(os.getenv("NEWS_LOOKBACK_DAYS", "1"))
+    NEWS_RATE_LIMIT = float(os.getenv("NEWS_RATE_LIMIT", "1"))  # requests per second, per source
+    NEWS_BURST = int(os.getenv("NEWS_BURST", "5"))
+    NEWS_CONCURRENCY = int(os.getenv("NEWS_CONCURRENCY", "8"))
+    NEWS_SUMMARY_MAX_CHARS = int(os.getenv("NEWS_SUMMARY_MAX_CHARS", "2000"))
+    NEWS_LRU_SIZE = int(os.getenv("NEWS_LRU_SIZE", "50000"))
+    NEWS_BLOOM_CAPACITY = int(os.getenv("NEWS_BLOOM_CAPACITY", "1000000"))
+    NEWS_BLOOM_ERROR_RATE = float(os.getenv("NEWS_BLOOM_ERROR_RATE", "0.0001"))
+    NEWS_WARM_DAYS = int(os.getenv("NEWS_WARM_DAYS", "7"))
+    LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.openai.com/v1")  # any OpenAI-compatible endpoint
+    LLM_API_KEY = os.getenv("LLM_API_KEY")
+    LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    LLM_WORKERS = int(os.getenv("LLM_WORKERS", "8"))
+    LLM_RPM = float(os.getenv("LLM_RPM", "500"))  # 0 disables the limit
+    LLM_TPM = float(os.getenv("LLM_TPM", "200000"))  # 0 disables the limit
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+    LLM_BACKOFF_BASE_SEC = float(os.getenv("LLM_BACKOFF_BASE_SEC", "0.5"))
+    LLM_BACKOFF_MAX_SEC = float(os.getenv("LLM_BACKOFF_MAX_SEC", "20"))
+    LLM_TIMEOUT_SEC = float(os.getenv("LLM_TIMEOUT_SEC", "60"))
+    LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "300"))
+    LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.2"))
+    LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "1000"))
+    LLM_WRITE_BATCH = int(os.getenv("LLM_WRITE_BATCH", "100"))
+    RULES_SPEC = os.getenv(
+        "RULES_SPEC",
+        "skip:trade_count<1,model:events_high>=1,model:events_medium>=1,model:abs_return>=0.01,"
+        "template:trade_count>=1",
+    )
+    RULES_DEFAULT = os.getenv("RULES_DEFAULT", "skip")
+    RULES_WINDOW_SEC = int(os.getenv("RULES_WINDOW_SEC", "300"))
+    RULES_LOOKBACK_SEC = int(os.getenv("RULES_LOOKBACK_SEC", "900"))
+    RULES_TEMPLATE_VERSION = os.getenv("RULES_TEMPLATE_VERSION", "template-v1")
+    PROMPT_TEMPLATE_NAME = os.getenv("PROMPT_TEMPLATE_NAME", "market_summary")
+    PROMPT_TEMPLATE_VERSION = os.getenv("PROMPT_TEMPLATE_VERSION", "")  # empty = latest
+    PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+    PROMPT_TRUNCATION_ORDER = os.getenv("PROMPT_TRUNCATION_ORDER", "news,context,events,metrics")
+    PROMPT_MAX_NEWS = int(os.getenv("PROMPT_MAX_NEWS", "10"))
+    SUMMARIZER_BATCH_ENABLED = os.getenv("SUMMARIZER_BATCH_ENABLED", "true").lower() == "true"
+    SUMMARIZER_BATCH_SIZE = int(os.getenv("SUMMARIZER_BATCH_SIZE", "10"))
+    SUMMARIZER_BATCH_SYMBOL_BUDGET = int(os.getenv("SUMMARIZER_BATCH_SYMBOL_BUDGET", "300"))
+    SUMMARIZER_BATCH_MAX_TOKENS = int(os.getenv("SUMMARIZER_BATCH_MAX_TOKENS", "1500"))
+    SUMMARIZER_NEWS_LOOKBACK_SEC = int(os.getenv("SUMMARIZER_NEWS_LOOKBACK_SEC", "86400"))
+    PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "10000"))
+    PROMPT_CACHE_TTL_SEC = float(os.getenv("PROMPT_CACHE_TTL_SEC", "900"))
+    PROMPT_CACHE_SIGNIFICANT_DIGITS = int(os.getenv("PROMPT_CACHE_SIGNIFICANT_DIGITS", "3"))  # 0 = exact
+    PROMPT_CACHE_QUANTA = os.getenv("PROMPT_CACHE_QUANTA", "")  # field:step, comma separated
+    BACKFILL_PROCESSES = int(os.getenv("BACKFILL_PROCESSES", "1"))
+    BACKFILL_CHUNK_SEC = int(os.getenv("BACKFILL_CHUNK_SEC", "86400"))
     ENABLE_LOG_COLORS = bool(os.getenv("ENABLE_LOG_COLORS", "False"))
     DEBUG = bool(os.getenv("DEBUG", "False"))
\ No newline at end of file
@@ -4,41 +4,165 @@ Database Access Layer
 Provides a centralized, minimal, and reliable interface for interacting with the PostgreSQL database.
 This module abstracts connection creation, pooled access, and query execution so that ingest, analytics,
 and reasoning modules never directly manage psycopg2 or asyncpg.
+
+Two pools are kept so writers and readers cannot starve each other:
+- pool (writes): execute(), execute_many(), copy_records(), upsert_records(),
+  execute_prepared()
+- read_pool (reads): fetch(), fetch_one(), fetch_prepared(), stream(), stream_columns()
+The read pool connects to Config.DB_READ_URL when set (e.g. a read replica,
+which may lag the primary) and to Config.DB_URL otherwise. Setting
+DB_READ_POOL_MAX_SIZE=0 makes reads share the write pool.
+
+Hot statements can be registered by name with register_statement(); they
+are prepared once per connection on first use and reused afterwards.
+pool_stats() reports acquire wait times so the pools can be sized from data.
+
+Writes that must commit together run inside transaction(); pass the
+connection it yields as conn= to execute(), execute_many(), copy_records()
+and upsert_records().
+
+fetch() materializes the whole result. Large or historical reads should use
+stream() / stream_columns() instead, which pull rows through a server-side
+cursor in batches of Config.DB_STREAM_BATCH_SIZE so memory stays flat.
 """
-from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, AsyncIterator, Optional, Iterable, Sequence, Tuple
+import asyncio
+import time
 import asyncpg
 
 from core.config import Config
 
 pool: Optional[asyncpg.pool.Pool] = None
+read_pool: Optional[asyncpg.pool.Pool] = None
+
+# Upper bounds (seconds) of the acquire wait-time histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, float("inf"))
+
+
+@dataclass
+class PoolStats:
+    """
+    Acquire wait-time metrics for one pool.
+    """
+    acquisitions: int = 0
+    timeouts: int = 0
+    total_wait_sec: float = 0.0
+    max_wait_sec: float = 0.0
+    wait_histogram: List[int] = field(default_factory=lambda: [0] * len(WAIT_BUCKETS))
+
+    def record(self, wait: float) -> None:
+        self.acquisitions += 1
+        self.total_wait_sec += wait
+        self.max_wait_sec = max(self.max_wait_sec, wait)
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if wait <= bound:
+                self.wait_histogram[i] += 1
+                break
+
+
+_stats: Dict[str, PoolStats] = {"write": PoolStats(), "read": PoolStats()}
+
+# name -> SQL for hot statements, and per-connection prepared statements
+# keyed by (pool kind, backend pid). Entries are reset whenever the pool
+# opens a new connection, so a reused pid never sees stale statements.
+_statements: Dict[str, str] = {}
+_prepared: Dict[Tuple[str, int], Dict[str, Any]] = {}
+
+
+def register_statement(name: str, sql: str) -> None:
+    """
+    Register a hot statement to be prepared once per connection.
+    """
+    _statements[name] = sql
+
+
+def _connection_init(kind: str):
+    async def init(conn) -> None:
+        _prepared[(kind, conn.get_server_pid())] = {}
+    return init
+
+
+async def _create_pool(kind: str, dsn: str, min_size: int, max_size: int) -> asyncpg.pool.Pool:
+    return await asyncpg.create_pool(
+        dsn=dsn,
+        min_size=min(min_size, max_size),
+        max_size=max_size,
+        command_timeout=Config.DB_COMMAND_TIMEOUT_SEC,
+        statement_cache_size=Config.DB_STATEMENT_CACHE_SIZE,
+        max_inactive_connection_lifetime=Config.DB_MAX_INACTIVE_CONNECTION_LIFETIME_SEC,
+        init=_connection_init(kind),
+    )
+
 
 async def init_pool():
     """
-    Create a global asyncpg connection pool.
+    Create the global asyncpg write and read pools.
     Should be called once during application startup.
     """
-    global pool
+    global pool, read_pool
     if pool is not None:
         return
     
     if not Config.DB_URL:
         raise RuntimeError("DB_URL is not set.")
     
-    pool = await asyncpg.create_pool(
-        dsn=Config.DB_URL,
-        min_size=1,
-        max_size=5,
-    )
+    pool = await _create_pool("write", Config.DB_URL, Config.DB_POOL_MIN_SIZE, Config.DB_POOL_MAX_SIZE)
+    if Config.DB_READ_POOL_MAX_SIZE > 0:
+        read_pool = await _create_pool(
+            "read",
+            Config.DB_READ_URL or Config.DB_URL,
+            Config.DB_READ_POOL_MIN_SIZE,
+            Config.DB_READ_POOL_MAX_SIZE,
+        )
+    else:
+        read_pool = pool
 
-async def fetch(sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+
+@asynccontextmanager
+async def _acquire(kind: str) -> AsyncIterator[Any]:
     """
-    Executes a SELECT query and returns rows as a list of dictionaries.
-    Caller is responsible for passing safe SQL and Parameters.
+    Acquire a connection from the write or read pool, recording the wait.
     """
-    if pool is None:
+    target = pool if kind == "write" else read_pool
+    if target is None:
         raise RuntimeError("Database pool not initialized. Call init_pool() first.")
 
-    async with pool.acquire() as conn:
+    stats = _stats[kind]
+    started = time.monotonic()
+    try:
+        conn = await target.acquire(timeout=Config.DB_ACQUIRE_TIMEOUT_SEC)
+    except asyncio.TimeoutError:
+        stats.timeouts += 1
+        raise
+    stats.record(time.monotonic() - started)
+    try:
+        yield conn
+    finally:
+        await target.release(conn)
+
+
+async def _prepared_statement(kind: str, conn, name: str):
+    sql = _statements.get(name)
+    if sql is None:
+        raise KeyError("Unknown prepared statement '{}'".format(name))
+    cache = _prepared.setdefault((kind, conn.get_server_pid()), {})
+    stmt = cache.get(name)
+    if stmt is None:
+        stmt = cache[name] = await conn.prepare(sql)
+    return stmt
+
+
+async def fetch(sql: str, params: tuple = (), conn=None) -> List[Dict[str, Any]]:
+    """
+    Executes a SELECT query and returns rows as a list of dictionaries.
+    Caller is responsible for passing safe SQL and Parameters.
+    With conn (from transaction()) the query runs on that connection.
+    """
+    if conn is not None:
+        return [dict(r) for r in await conn.fetch(sql, *params)]
+    async with _acquire("read") as conn:
         rows = await conn.fetch(sql, *params)
         return [dict(r) for r in rows]
 
@@ -46,29 +170,174 @@ async def fetch_one(sql: str, params: tuple = ()) -> Optional[Dict[str, Any]]:
     """
     Same as fetch(), but returns either one row or None
     """
-    if pool is None:
-        raise RuntimeError("Database pool not initialized. Call init_pool() first.")
-    
-    async with pool.acquire() as conn:
+    async with _acquire("read") as conn:
         row = await conn.fetchrow(sql, *params)
         return dict(row) if row else None
 
-async def execute(sql: str, params: tuple = ()) -> None:
+async def fetch_prepared(name: str, params: tuple = ()) -> List[Dict[str, Any]]:
+    """
+    Same as fetch(), for a statement registered with register_statement().
+    """
+    async with _acquire("read") as conn:
+        stmt = await _prepared_statement("read", conn, name)
+        rows = await stmt.fetch(*params)
+        return [dict(r) for r in rows]
+
+async def _stream_records(sql: str, params: tuple, batch_size: Optional[int]) -> AsyncIterator[List[Any]]:
+    """
+    Yield lists of at most batch_size records from a server-side cursor.
+    The read connection is held (inside a read-only transaction) until the
+    generator is exhausted or closed.
+    """
+    batch_size = batch_size or Config.DB_STREAM_BATCH_SIZE
+    async with _acquire("read") as conn:
+        async with conn.transaction(readonly=True):
+            cursor = await conn.cursor(sql, *params)
+            while True:
+                records = await cursor.fetch(batch_size)
+                if not records:
+                    break
+                yield records
+
+async def stream(sql: str, params: tuple = (), batch_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Same as fetch(), but yields rows one at a time without building the
+    full result. Rows are pulled from the server batch_size at a time.
+    Break out early only via contextlib.aclosing() so the connection is
+    released promptly.
+    """
+    async for records in _stream_records(sql, params, batch_size):
+        for r in records:
+            yield dict(r)
+
+async def stream_columns(sql: str, params: tuple = (), batch_size: Optional[int] = None) -> AsyncIterator[Dict[str, List[Any]]]:
+    """
+    Like stream(), but yields each batch as {column: [values]}.
+    """
+    async for records in _stream_records(sql, params, batch_size):
+        columns = list(records[0].keys())
+        yield dict(zip(columns, map(list, zip(*records))))
+
+@asynccontextmanager
+async def transaction() -> AsyncIterator[Any]:
+    """
+    Write connection inside one transaction: commits when the block exits,
+    rolls back if it raises.
+    """
+    async with _acquire("write") as conn:
+        async with conn.transaction():
+            yield conn
+
+@asynccontextmanager
+async def _write_conn(conn=None) -> AsyncIterator[Any]:
+    # The caller's transaction() connection, or a new single-use transaction
+    if conn is not None:
+        yield conn
+        return
+    async with transaction() as own:
+        yield own
+
+async def execute(sql: str, params: tuple = (), conn=None) -> None:
     """
     Execute INSERT/UPDATE/Delete.
     Does not return rows
     """
-    if pool is None:
-        raise RuntimeError("Database pool not initialized. Call init_pool() first.")
-    
-    async with pool.acquire() as conn:
+    if conn is not None:
+        await conn.execute(sql, *params)
+        return
+    async with _acquire("write") as conn:
         await conn.execute(sql, *params)
 
+async def execute_prepared(name: str, params: tuple = ()) -> None:
+    """
+    Same as execute(), for a statement registered with register_statement().
+    """
+    async with _acquire("write") as conn:
+        stmt = await _prepared_statement("write", conn, name)
+        await stmt.fetch(*params)
+
+async def execute_many(sql: str, records: Iterable[Sequence[Any]], conn=None) -> None:
+    """
+    Execute one statement for every parameter tuple in records.
+    Runs inside a single transaction on a single connection.
+    """
+    async with _write_conn(conn) as conn:
+        await conn.executemany(sql, records)
+
+async def copy_records(table: str, columns: Sequence[str], records: Iterable[Sequence[Any]], conn=None) -> int:
+    """
+    Bulk load records into table using the COPY protocol.
+    Runs inside a single transaction on a single connection and returns
+    the number of rows copied.
+    """
+    async with _write_conn(conn) as conn:
+        status = await conn.copy_records_to_table(
+            table, records=records, columns=list(columns)
+        )
+    # asyncpg returns the command tag, e.g. "COPY 42"
+    return int(status.split()[-1])
+
+async def upsert_records(
+    table: str,
+    columns: Sequence[str],
+    records: Iterable[Sequence[Any]],
+    key_columns: Sequence[str],
+    conn=None,
+) -> int:
+    """
+    Bulk insert-or-update: COPY records into a temporary staging table, then
+    INSERT ... ON CONFLICT (key_columns) DO UPDATE the other columns.
+    Needs a unique index on key_columns; keys must be unique within records.
+    Returns the number of rows inserted or updated.
+    """
+    columns = list(columns)
+    staging = "_upsert_{}".format(table)
+    column_list = ", ".join(columns)
+    updates = ", ".join("{0} = EXCLUDED.{0}".format(c) for c in columns if c not in key_columns)
+    async with _write_conn(conn) as conn:
+        await conn.execute(
+            "CREATE TEMP TABLE {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP".format(staging, table)
+        )
+        await conn.copy_records_to_table(staging, records=records, columns=columns)
+        status = await conn.execute(
+            "INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+            "ON CONFLICT ({keys}) DO {action}".format(
+                table=table, columns=column_list, staging=staging, keys=", ".join(key_columns),
+                action="UPDATE SET {}".format(updates) if updates else "NOTHING",
+            )
+        )
+        await conn.execute("DROP TABLE {}".format(staging))
+    # "INSERT 0 42"
+    return int(status.split()[-1])
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Current size and acquire wait-time metrics for the write and read pools.
+    """
+    out: Dict[str, Dict[str, Any]] = {}
+    for kind, target in (("write", pool), ("read", read_pool)):
+        stats = _stats[kind]
+        out[kind] = {
+            "size": target.get_size() if target is not None else 0,
+            "idle": target.get_idle_size() if target is not None else 0,
+            "max_size": target.get_max_size() if target is not None else 0,
+            "acquisitions": stats.acquisitions,
+            "timeouts": stats.timeouts,
+            "avg_wait_sec": stats.total_wait_sec / stats.acquisitions if stats.acquisitions else 0.0,
+            "max_wait_sec": stats.max_wait_sec,
+            "wait_histogram": dict(zip(WAIT_BUCKETS, stats.wait_histogram)),
+        }
+    return out
+
 async def close_pool():
     """
-    Gracefully closes the database pool.
+    Gracefully closes the database pools.
     """
-    global pool
+    global pool, read_pool
+    if read_pool is not None and read_pool is not pool:
+        await read_pool.close()
+    read_pool = None
     if pool is not None:
         await pool.close()
-        pool = None
\ No newline at end of file
+        pool = None
+    _prepared.clear()
@@ -1,66 +1,212 @@
-from core.config import Config
-from ingest.fetcher import fetch_all
-from ingest.validator import validate
-from ingest.writer import write
-from core.logging import info, error, debug
-from datetime import datetime, timezone
-import time
-
-
+from typing import Optional, Set, Tuple
 import asyncio
+import time
 
-async def run_once():
+from analytics.aggregator import MetricsAggregator
+from analytics.detector import EventDetector
+from core.config import Config
+from core.utils import TokenBucket
+from ingest.hot_cache import get_hot_cache
+from ingest.fetcher import fetch_all_async, make_limiter
+from ingest.pipeline import run_pipeline_once, run_stream
+from ingest.providers import get_provider, get_stream_provider
+from ingest.providers.base import BaseProvider
+from ingest.quarantine import quarantine
+from ingest.validator import partition
+from ingest.writer import add_listener, remove_listener, write_bulk
+from ingest.writer_errors import WriterError
+from ops.partitions import maintain_partitions
+from core.logging import info, error, debug, warning
+
+# What to do when a cycle is still running at the next tick:
+# - skip:       never overlap; ticks missed while a cycle runs are dropped
+#               and the next cycle starts on the next grid tick.
+# - queue:      never overlap; an overrunning cycle is followed immediately
+#               by the next one, then the schedule re-aligns to the grid.
+# - concurrent: start a new cycle on every tick while fewer than
+#               SCHEDULER_MAX_IN_FLIGHT cycles are running, else skip it.
+OVERRUN_POLICIES = ("skip", "queue", "concurrent")
+
+
+async def run_once(
+    provider: Optional[BaseProvider] = None,
+    limiter: Optional[TokenBucket] = None,
+) -> int:
     debug("Starting single ingest cycle.")
 
-    records = fetch_all()
-    debug("Fetched {} raw records.".format(len(records)))
+    if Config.INGEST_MODE.lower() == "pipeline":
+        return await run_pipeline_once(provider=provider, limiter=limiter)
 
-    validated = validate(records)
-    debug("Validated {} records.".format(len(validated)))
+    result = await fetch_all_async(provider=provider, limiter=limiter)
+    records = result.records
+    debug("Fetched {} raw records ({} symbols failed).".format(len(records), len(result.errors)))
 
-    written = await write(validated)
+    validated, rejected = partition(records)
+    debug("Validated {} records ({} rejected).".format(len(validated), len(rejected)))
+
+    # Valid rows first, so a failing quarantine cannot cost them
+    written = await write_bulk(validated)
+    if rejected:
+        try:
+            await quarantine(rejected)
+        except WriterError as e:
+            error("Quarantine of {} records failed: {}".format(len(rejected), e))
     info("Single ingestion cycle complete: {} records written".format(written))
 
     return written
 
 
-async def run_scheduler():
-    info("Schedule started with interval {} seconds.".format(
-        Config.SCHEDULER_INTERVAL_SEC
-    ))
-
+async def _run_cycle(provider: BaseProvider, limiter: TokenBucket) -> None:
+    try:
+        await run_once(provider, limiter)
+    except Exception as e:
+        error("Ingest cycle failed: {}".format(e))
+
+
+def next_deadline(start: float, interval: float, now: float, tick: int, policy: str) -> Tuple[int, float]:
+    """
+    Return (tick, deadline) for the next cycle.
+
+    Deadlines sit on the fixed monotonic grid start + tick * interval, so
+    time spent in a cycle or oversleeping never accumulates as drift.
+    When `now` is already past the next grid point the cycle overran;
+    "queue" runs again immediately, every other policy jumps to the next
+    grid point still in the future.
+    """
+    tick += 1
+    deadline = start + tick * interval
+    if now <= deadline:
+        return tick, deadline
+
+    behind = int((now - start) // interval)
+    if policy == "queue":
+        return behind, now
+    return behind + 1, start + (behind + 1) * interval
+
+
+async def _partition_maintenance(interval: float) -> None:
+    """
+    Keep raw_trades partitions ahead of time: once at startup, then every
+    `interval` seconds. Failures are logged and retried on the next run.
+    """
+    while True:
+        try:
+            await maintain_partitions()
+        except Exception as e:
+            error("raw_trades partition maintenance failed: {}".format(e))
+        await asyncio.sleep(interval)
+
+
+async def _drain(tasks: Set[asyncio.Task], timeout: float) -> None:
+    """
+    Give in-flight cycles up to `timeout` seconds to finish, then cancel them.
+    """
+    if not tasks:
+        return
+    _, pending = await asyncio.wait(set(tasks), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        warning("Cancelled {} ingest cycles still running at shutdown.".format(len(pending)))
+
+
+async def run_scheduler(
+    interval: Optional[float] = None,
+    policy: Optional[str] = None,
+    max_in_flight: Optional[int] = None,
+):
+    interval = interval or Config.SCHEDULER_INTERVAL_SEC
+    policy = (policy or Config.SCHEDULER_OVERRUN_POLICY).lower()
+    max_in_flight = max_in_flight or Config.SCHEDULER_MAX_IN_FLIGHT
+    if policy not in OVERRUN_POLICIES:
+        raise ValueError("Unknown overrun policy '{}'. Supported policies: {}.".format(
+            policy, ", ".join(OVERRUN_POLICIES)
+        ))
+
+    # INGEST_MODE=stream: trades come from the websocket feed instead of polling
+    stream = Config.INGEST_MODE.lower() == "stream"
+    if not stream:
+        info("Schedule started with interval {} seconds (overrun policy: {}).".format(interval, policy))
+
+    # One provider and rate limiter for the lifetime of the scheduler, so
+    # overlapping cycles share the provider's rate budget.
+    provider = None if stream else get_provider()
+    limiter = make_limiter()
+    in_flight: Set[asyncio.Task] = set()
+
+    # New days need their partition before the first trade of the day
+    maintenance = None
+    if Config.PARTITION_MAINTENANCE_INTERVAL_SEC > 0:
+        maintenance = asyncio.create_task(_partition_maintenance(Config.PARTITION_MAINTENANCE_INTERVAL_SEC))
+
+    # Recent trades are served from memory; see ingest.hot_cache
+    hot_cache = get_hot_cache() if Config.HOT_CACHE_ENABLED else None
+    if hot_cache is not None:
+        add_listener(hot_cache.on_trades)
+
+    # Derived metrics are updated from each committed batch, not re-scanned
+    aggregator = MetricsAggregator() if Config.METRICS_ENABLED else None
+    if aggregator is not None:
+        add_listener(aggregator.on_trades)
+        if Config.DETECTOR_ENABLED:
+            aggregator.add_listener(EventDetector().on_metrics)
+
+    start = time.monotonic()
+    tick = 0
     try:
+        if stream:
+            # Same write listeners as polling; run_stream flushes on cancellation
+            await run_stream(get_stream_provider())
+            return
         while True:
-            cycle_start = datetime.now(timezone.utc)
-
-            try:
+            if policy == "concurrent" and len(in_flight) >= max_in_flight:
+                warning("{} ingest cycles still running; skipping this tick.".format(len(in_flight)))
+            else:
                 debug("Starting new ingest cycle.")
-
-                records = fetch_all()
-                debug("Fetched {} raw records".format(len(records)))
-
-                validated = validate(records)
-                debug("Validated {} records.".format(len(validated)))
-
-                written = await write(validated)
-                info("Ingest cycle completed: {} records written.".format(written))
-            
-            except Exception as e:
-                error("Ingest cycle failed: {}".format(e))
-            
-            # Maintain fixed interval
-            elapsed = (datetime.now(timezone.utc) - cycle_start).total_seconds()
-            delay = Config.SCHEDULER_INTERVAL_SEC - elapsed
-
+                task = asyncio.create_task(_run_cycle(provider, limiter))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+                if policy != "concurrent":
+                    # Shield so cancelling the scheduler lets the cycle finish
+                    # within the shutdown grace period instead of mid-write.
+                    await asyncio.shield(task)
+
+            now = time.monotonic()
+            next_tick, deadline = next_deadline(start, interval, now, tick, policy)
+            if next_tick > tick + 1:
+                debug("Cycle exceeded interval; skipped {} ticks.".format(next_tick - tick - 1))
+            tick = next_tick
+
+            delay = deadline - now
             if delay > 0:
-                debug("Sleeping {} seconds".format(delay))
-                time.sleep(delay)
+                debug("Sleeping {:.3f} seconds".format(delay))
+                await asyncio.sleep(delay)
             else:
-                debug("Cycle exceeded interval; restarting immedietly.")
-    except KeyboardInterrupt:
-        info("Scheduler stopped manually.")
-    except SystemExit:
-        info("Scheduler shutting down.")
+                debug("Cycle exceeded interval; restarting immediately.")
+    except asyncio.CancelledError:
+        info("Scheduler shutting down; waiting for {} in-flight cycles.".format(len(in_flight)))
+        await _drain(in_flight, Config.SCHEDULER_SHUTDOWN_GRACE_SEC)
+        info("Scheduler stopped.")
+        raise
+    finally:
+        if maintenance is not None:
+            maintenance.cancel()
+            await asyncio.gather(maintenance, return_exceptions=True)
+        if hot_cache is not None:
+            remove_listener(hot_cache.on_trades)
+        if aggregator is not None:
+            remove_listener(aggregator.on_trades)
+            try:
+                await aggregator.flush()
+            except Exception as e:
+                error("Failed to flush open metric windows: {}".format(e))
+            aggregator.log_summary()
+        if provider is not None:
+            await provider.aclose()
 
 if __name__ == "__main__":
-    asyncio.run(run_scheduler())
\ No newline at end of file
+    try:
+        asyncio.run(run_scheduler())
+    except KeyboardInterrupt:
+        info("Scheduler stopped manually.")
@@ -0,0 +1,67 @@
+"""
+Shared helpers used across the ingest, context and reasoning layers.
+"""
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to `capacity`, so
+    short bursts are allowed while the long-run rate stays bounded.
+    A rate of 0 or less disables limiting entirely.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = float(capacity) if capacity is not None else max(float(rate), 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Wait until `tokens` are available and consume them.
+        Waiters are served in arrival order.
+        """
+        if self.rate <= 0:
+            return
+        if tokens > self.capacity:
+            raise ValueError(
+                "Cannot acquire {} tokens from a bucket of capacity {}".format(tokens, self.capacity)
+            )
+
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def refund(self, tokens: float) -> None:
+        """
+        Return unused tokens, e.g. when a reservation turned out too large.
+        """
+        if self.rate <= 0 or tokens <= 0:
+            return
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def debit(self, tokens: float) -> None:
+        """
+        Take tokens spent beyond a reservation. The balance may go negative;
+        later acquire() calls wait until it has refilled.
+        """
+        if self.rate <= 0 or tokens <= 0:
+            return
+        self._refill()
+        self._tokens -= tokens
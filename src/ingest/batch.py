@@ -0,0 +1,273 @@
+"""
+Columnar trade container
+
+TradeBatch stores trades as parallel NumPy columns instead of one
+TradeRecord object per trade:
+- ts:     int64 epoch nanoseconds (NAT when missing or unusable)
+- price:  float64 (NaN when missing or not a number)
+- size:   float64 (NaN when missing or not a number)
+- symbol: int32 codes into an interned symbol table
+- source: int32 codes into an interned source table
+
+Columns are preallocated and grow by doubling, so append() is amortized
+O(1) and a buffered trade costs ~30 bytes instead of a Python object
+graph. Convert with TradeBatch.from_records() / to_records().
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from operator import attrgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ingest.providers.base import TradeRecord
+
+# Missing / unusable timestamps are stored as this sentinel (numpy's NaT)
+NAT = np.iinfo(np.int64).min
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NUMERIC_TYPES = {float, int, bool}
+
+
+def factorize(values: Sequence[Any]) -> Tuple[np.ndarray, List[Any]]:
+    """
+    Map values to dense integer codes; returns (codes, distinct values).
+    """
+    uniques = list(dict.fromkeys(values))
+    table: Dict[Any, int] = {v: i for i, v in enumerate(uniques)}
+    codes = np.fromiter(map(table.__getitem__, values), dtype=np.int32, count=len(values))
+    return codes, uniques
+
+
+def float_column(values: Sequence[Any]) -> np.ndarray:
+    """
+    float64 column; anything that is not an int or float becomes NaN.
+    """
+    if set(map(type, values)) <= _NUMERIC_TYPES:
+        return np.array(values, dtype=np.float64)
+    return np.array(
+        [v if isinstance(v, (float, int)) else np.nan for v in values], dtype=np.float64
+    )
+
+
+def ts_column(values: Sequence[Any]) -> np.ndarray:
+    """
+    Epoch-nanosecond column; None, non-datetimes and naive datetimes become NAT.
+    """
+    n = len(values)
+    if set(map(type, values)) == {datetime} and all(
+        isinstance(tz, timezone) for tz in set(map(attrgetter("tzinfo"), values))
+    ):
+        seconds = np.fromiter(map(datetime.timestamp, values), dtype=np.float64, count=n)
+        return np.round(seconds * 1e6).astype(np.int64) * 1000
+
+    ts = np.full(n, NAT, dtype=np.int64)
+    for i, value in enumerate(values):
+        if isinstance(value, datetime) and value.utcoffset() is not None:
+            ts[i] = round(value.timestamp() * 1_000_000) * 1000
+    return ts
+
+
+def ns_to_datetimes(ts: np.ndarray) -> List[Optional[datetime]]:
+    """
+    Convert an epoch-ns column back to timezone-aware datetimes (µs precision).
+    """
+    return [
+        None if ns == NAT else _EPOCH + timedelta(microseconds=ns // 1000)
+        for ns in ts.tolist()
+    ]
+
+
+class TradeBatch:
+    """
+    Growable columnar batch of trades with interned symbols and sources.
+    """
+
+    __slots__ = (
+        "_ts", "_price", "_size", "_symbol_codes", "_source_codes", "_len",
+        "symbols", "sources", "_symbol_index", "_source_index",
+    )
+
+    def __init__(self, capacity: int = 1024):
+        capacity = max(int(capacity), 1)
+        self._ts = np.empty(capacity, dtype=np.int64)
+        self._price = np.empty(capacity, dtype=np.float64)
+        self._size = np.empty(capacity, dtype=np.float64)
+        self._symbol_codes = np.empty(capacity, dtype=np.int32)
+        self._source_codes = np.empty(capacity, dtype=np.int32)
+        self._len = 0
+        self.symbols: List[Any] = []
+        self.sources: List[Any] = []
+        self._symbol_index: Dict[Any, int] = {}
+        self._source_index: Dict[Any, int] = {}
+
+    # ---- construction ----------------------------------------------------
+
+    @classmethod
+    def from_columns(
+        cls,
+        symbol_codes: np.ndarray,
+        symbols: List[Any],
+        ts: np.ndarray,
+        price: np.ndarray,
+        size: np.ndarray,
+        source_codes: np.ndarray,
+        sources: List[Any],
+    ) -> TradeBatch:
+        """
+        Wrap existing columns. The arrays are used as-is, not copied.
+        """
+        batch = cls.__new__(cls)
+        batch._ts = np.asarray(ts, dtype=np.int64)
+        batch._price = np.asarray(price, dtype=np.float64)
+        batch._size = np.asarray(size, dtype=np.float64)
+        batch._symbol_codes = np.asarray(symbol_codes, dtype=np.int32)
+        batch._source_codes = np.asarray(source_codes, dtype=np.int32)
+        batch._len = len(batch._ts)
+        batch.symbols = list(symbols)
+        batch.sources = list(sources)
+        batch._symbol_index = {v: i for i, v in enumerate(batch.symbols)}
+        batch._source_index = {v: i for i, v in enumerate(batch.sources)}
+        return batch
+
+    @classmethod
+    def from_records(cls, records: Sequence[TradeRecord]) -> TradeBatch:
+        """
+        Build a batch from TradeRecords column by column. Values that do not
+        fit a column (non-numbers, naive timestamps, ...) become NaN / NAT.
+        """
+        symbol_codes, symbols = factorize(list(map(attrgetter("symbol"), records)))
+        source_codes, sources = factorize(list(map(attrgetter("source"), records)))
+        return cls.from_columns(
+            symbol_codes=symbol_codes,
+            symbols=symbols,
+            ts=ts_column(list(map(attrgetter("ts"), records))),
+            price=float_column(list(map(attrgetter("price"), records))),
+            size=float_column(list(map(attrgetter("size"), records))),
+            source_codes=source_codes,
+            sources=sources,
+        )
+
+    # ---- column views ----------------------------------------------------
+
+    @property
+    def ts(self) -> np.ndarray:
+        return self._ts[:self._len]
+
+    @property
+    def price(self) -> np.ndarray:
+        return self._price[:self._len]
+
+    @property
+    def size(self) -> np.ndarray:
+        return self._size[:self._len]
+
+    @property
+    def symbol_codes(self) -> np.ndarray:
+        return self._symbol_codes[:self._len]
+
+    @property
+    def source_codes(self) -> np.ndarray:
+        return self._source_codes[:self._len]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes held by the column buffers (including spare capacity).
+        """
+        return sum(a.nbytes for a in (self._ts, self._price, self._size, self._symbol_codes, self._source_codes))
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[TradeRecord]:
+        return iter(self.to_records())
+
+    # ---- mutation --------------------------------------------------------
+
+    def _intern(self, table: List[Any], index: Dict[Any, int], value: Any) -> int:
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(table)
+            table.append(value)
+        return code
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._ts)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("_ts", "_price", "_size", "_symbol_codes", "_source_codes"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._len] = old[:self._len]
+            setattr(self, name, new)
+
+    def append(self, record: TradeRecord) -> None:
+        """
+        Append one trade (amortized O(1)).
+        """
+        self._grow(self._len + 1)
+        i = self._len
+        ts = record.ts
+        self._ts[i] = (
+            round(ts.timestamp() * 1_000_000) * 1000
+            if isinstance(ts, datetime) and ts.utcoffset() is not None else NAT
+        )
+        self._price[i] = record.price if isinstance(record.price, (float, int)) else np.nan
+        self._size[i] = record.size if isinstance(record.size, (float, int)) else np.nan
+        self._symbol_codes[i] = self._intern(self.symbols, self._symbol_index, record.symbol)
+        self._source_codes[i] = self._intern(self.sources, self._source_index, record.source)
+        self._len += 1
+
+    def extend(self, records: Iterable[TradeRecord]) -> None:
+        for record in records:
+            self.append(record)
+
+    def clear(self) -> None:
+        """
+        Drop all rows but keep the allocated capacity and symbol tables.
+        """
+        self._len = 0
+
+    # ---- selection and conversion ---------------------------------------
+
+    def take(self, selector: np.ndarray) -> TradeBatch:
+        """
+        New batch with the rows picked by a boolean mask or index array.
+        Symbol and source tables are shared as-is.
+        """
+        return TradeBatch.from_columns(
+            symbol_codes=self.symbol_codes[selector],
+            symbols=self.symbols,
+            ts=self.ts[selector],
+            price=self.price[selector],
+            size=self.size[selector],
+            source_codes=self.source_codes[selector],
+            sources=self.sources,
+        )
+
+    def symbol_column(self) -> List[Any]:
+        symbols = self.symbols
+        return [symbols[c] for c in self.symbol_codes.tolist()]
+
+    def source_column(self) -> List[Any]:
+        sources = self.sources
+        return [sources[c] for c in self.source_codes.tolist()]
+
+    def rows(self) -> List[Tuple[Any, Optional[datetime], float, float, Any]]:
+        """
+        (symbol, ts, price, size, source) tuples, e.g. for a bulk insert.
+        """
+        return list(zip(
+            self.symbol_column(),
+            ns_to_datetimes(self.ts),
+            self.price.tolist(),
+            self.size.tolist(),
+            self.source_column(),
+        ))
+
+    def to_records(self) -> List[TradeRecord]:
+        return [TradeRecord(*row) for row in self.rows()]
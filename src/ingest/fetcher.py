@@ -1,19 +1,97 @@
-from typing import List
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import asyncio
 import time
 
 from core.config import Config
+from core.logging import warning
+from core.utils import TokenBucket
 from ingest.providers import get_provider
-from ingest.providers.base import TradeRecord
+from ingest.providers.base import BaseProvider, TradeRecord
 from ingest.providers.errors import ProviderError
 
 
+@dataclass
+class FetchResult:
+    """
+    Outcome of one concurrent fetch cycle.
+
+    records keeps the order of the requested symbols; errors maps each
+    symbol that failed to the ProviderError it raised.
+    """
+    records: List[TradeRecord] = field(default_factory=list)
+    errors: Dict[str, ProviderError] = field(default_factory=dict)
+
+
 def fetch_all() -> List[TradeRecord]:
     provider = get_provider()
     trade_records: List[TradeRecord] = []
-    for i, symbol in enumerate(Config.SYMBOLS):
-        # Implicitly re-raises any thrown errors
-        record: TradeRecord = provider.fetch(symbol)
-        trade_records.append(record)
-        if i < len(Config.SYMBOLS) - 1:
-            time.sleep(Config.REQUEST_DELAY)
-    return trade_records
\ No newline at end of file
+    try:
+        for i, symbol in enumerate(Config.SYMBOLS):
+            # Implicitly re-raises any thrown errors
+            record: TradeRecord = provider.fetch(symbol)
+            trade_records.append(record)
+            if i < len(Config.SYMBOLS) - 1:
+                time.sleep(Config.REQUEST_DELAY)
+    finally:
+        provider.close()
+    return trade_records
+
+
+def make_limiter() -> TokenBucket:
+    """
+    Build a token bucket from the configured provider rate limit.
+    """
+    return TokenBucket(Config.FETCH_RATE_LIMIT, Config.FETCH_BURST)
+
+
+async def fetch_all_async(
+    provider: Optional[BaseProvider] = None,
+    symbols: Optional[List[str]] = None,
+    limiter: Optional[TokenBucket] = None,
+) -> FetchResult:
+    """
+    Fetch every symbol concurrently.
+
+    At most Config.FETCH_CONCURRENCY requests are in flight at once and
+    request starts are paced by a token bucket, so cycle time follows the
+    provider's rate limit instead of the symbol count. A ProviderError for
+    one symbol is recorded in the result rather than aborting the cycle.
+
+    A provider created here is closed before returning; a provider passed
+    in stays open so its connection pool can be reused across cycles.
+    """
+    owns_provider = provider is None
+    provider = provider or get_provider()
+    symbols = Config.SYMBOLS if symbols is None else symbols
+    limiter = limiter or make_limiter()
+    semaphore = asyncio.Semaphore(max(1, Config.FETCH_CONCURRENCY))
+
+    async def fetch_symbol(symbol: str) -> TradeRecord:
+        async with semaphore:
+            await limiter.acquire()
+            return await provider.fetch_async(symbol)
+
+    try:
+        outcomes = await asyncio.gather(
+            *(fetch_symbol(symbol) for symbol in symbols),
+            return_exceptions=True,
+        )
+    finally:
+        if owns_provider:
+            await provider.aclose()
+
+    result = FetchResult()
+    for symbol, outcome in zip(symbols, outcomes):
+        if isinstance(outcome, ProviderError):
+            result.errors[symbol] = outcome
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            result.records.append(outcome)
+
+    if result.errors:
+        warning("Failed to fetch {} of {} symbols: {}".format(
+            len(result.errors), len(symbols), ", ".join(result.errors)
+        ))
+    return result
@@ -0,0 +1,248 @@
+"""
+In-process hot cache of recent trades per symbol
+
+HotTradeCache keeps the last HOT_CACHE_CAPACITY trades of every symbol in
+preallocated NumPy ring buffers, fed by the writer with every committed
+batch (add_listener(cache.on_trades)), so "the last N minutes of X" needs
+no raw_trades query.
+
+Each ring is mirrored: slot i is also written at i + capacity, so the
+buffered trades are always one contiguous slice and reads return views
+without copying. Appends are O(1) per trade (two stores per column).
+
+A ring answers a range only if it is known to hold every trade in it:
+- from the time the cache was created (earlier trades never passed through it)
+- after the newest trade it has overwritten
+- after any trade that arrived out of order (it is written to the database
+  but not to the ring)
+Anything else is a miss, and get_trades() falls back to raw_trades.
+
+Views alias the ring and are overwritten by later appends; copy them
+(np.array(view)) to keep them across an await.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, NamedTuple, Optional
+import time
+
+import numpy as np
+
+from core.config import Config
+from core.db import stream_columns
+from ingest.batch import NAT, TradeBatch, ts_column
+
+
+class TradeWindow(NamedTuple):
+    ts: np.ndarray          # int64 epoch ns, ascending
+    price: np.ndarray
+    size: np.ndarray
+    source: str             # "cache" or "db"
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+
+class SymbolRing:
+    """
+    Fixed-capacity mirrored ring buffer of (ts, price, size) for one symbol.
+    """
+    __slots__ = ("capacity", "ts", "price", "size", "head", "count", "complete_from")
+
+    def __init__(self, capacity: int, complete_from: int):
+        self.capacity = capacity
+        self.ts = np.empty(2 * capacity, dtype=np.int64)
+        self.price = np.empty(2 * capacity, dtype=np.float64)
+        self.size = np.empty(2 * capacity, dtype=np.float64)
+        self.head = 0               # next slot to write
+        self.count = 0
+        self.complete_from = complete_from
+
+    @property
+    def last_ts(self) -> Optional[int]:
+        # head - 1 is -1 right after a wrap, i.e. the mirror of slot capacity - 1
+        return int(self.ts[self.head - 1]) if self.count else None
+
+    def append(self, ts: int, price: float, size: float) -> None:
+        """
+        Add one trade. A trade older than the newest buffered one is skipped
+        and marks everything up to it as incomplete.
+        """
+        last = self.last_ts
+        if last is not None and ts < last:
+            self.complete_from = max(self.complete_from, ts + 1)
+            return
+        cap = self.capacity
+        if self.count == cap:
+            # Overwriting the oldest trade: the ring is complete only after it
+            self.complete_from = max(self.complete_from, int(self.ts[self.head]) + 1)
+        else:
+            self.count += 1
+        i = self.head
+        self.ts[i] = self.ts[i + cap] = ts
+        self.price[i] = self.price[i + cap] = price
+        self.size[i] = self.size[i + cap] = size
+        self.head = (i + 1) % cap
+
+    def extend(self, ts: np.ndarray, price: np.ndarray, size: np.ndarray) -> None:
+        """
+        Add trades sorted by ts. Trades older than the newest buffered one are
+        skipped and mark everything up to them as incomplete.
+        """
+        last = self.last_ts
+        if last is not None and len(ts) and ts[0] < last:
+            late = ts < last
+            self.complete_from = max(self.complete_from, int(ts[late].max()) + 1)
+            ts, price, size = ts[~late], price[~late], size[~late]
+        n = len(ts)
+        if not n:
+            return
+
+        cap = self.capacity
+        evicted = max(0, self.count + n - cap)
+        if evicted:
+            if evicted > self.count:
+                # The batch alone overflows the ring: drop its own oldest trades too
+                self.complete_from = max(self.complete_from, int(ts[n - cap - 1]) + 1)
+            else:
+                oldest = (self.head - self.count) % cap
+                self.complete_from = max(self.complete_from, int(self.ts[oldest + evicted - 1]) + 1)
+        if n > cap:
+            ts, price, size = ts[-cap:], price[-cap:], size[-cap:]
+            n = cap
+
+        slots = (self.head + np.arange(n)) % cap
+        for column, values in ((self.ts, ts), (self.price, price), (self.size, size)):
+            column[slots] = values
+            column[slots + cap] = values
+        self.head = (self.head + n) % cap
+        self.count = min(cap, self.count + n)
+
+    def covers(self, start_ns: int) -> bool:
+        return start_ns >= self.complete_from
+
+    def view(self, start_ns: int, end_ns: int) -> TradeWindow:
+        """
+        Trades with start_ns <= ts < end_ns as read-only views.
+        """
+        first = (self.head - self.count) % self.capacity
+        ts = self.ts[first:first + self.count]
+        lo, hi = np.searchsorted(ts, (start_ns, end_ns), side="left")
+        out = []
+        for column in (self.ts, self.price, self.size):
+            v = column[first + lo:first + hi]
+            v.flags.writeable = False
+            out.append(v)
+        return TradeWindow(out[0], out[1], out[2], "cache")
+
+
+class HotTradeCache:
+    """
+    Ring buffers for every symbol seen, with hit/miss counters.
+    """
+
+    def __init__(self, capacity: Optional[int] = None, created_ns: Optional[int] = None):
+        self.capacity = capacity or Config.HOT_CACHE_CAPACITY
+        self.created_ns = created_ns if created_ns is not None else time.time_ns()
+        self._rings: Dict[str, SymbolRing] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _ring(self, symbol: str) -> SymbolRing:
+        ring = self._rings.get(symbol)
+        if ring is None:
+            ring = self._rings[symbol] = SymbolRing(self.capacity, self.created_ns)
+        return ring
+
+    def add_batch(self, batch: TradeBatch) -> None:
+        """
+        Add every trade of a batch, grouped per symbol in ts order.
+        """
+        valid = batch.ts != NAT
+        if not valid.all():
+            batch = batch.take(valid)
+        if not len(batch):
+            return
+        order = np.lexsort((batch.ts, batch.symbol_codes))
+        codes = batch.symbol_codes[order]
+        ts, price, size = batch.ts[order], batch.price[order], batch.size[order]
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(codes)]))
+        for a, b in zip(starts.tolist(), ends.tolist()):
+            self._ring(batch.symbols[codes[a]]).extend(ts[a:b], price[a:b], size[a:b])
+
+    async def on_trades(self, batch: TradeBatch) -> None:
+        """
+        Writer listener.
+        """
+        self.add_batch(batch)
+
+    def window(self, symbol: str, start: datetime, end: datetime) -> Optional[TradeWindow]:
+        """
+        Buffered trades in [start, end), or None (a miss) if the ring cannot
+        guarantee it holds all of them.
+        """
+        start_ns, end_ns = ts_column([start, end]).tolist()
+        ring = self._rings.get(symbol)
+        if ring is None or not ring.covers(start_ns):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ring.view(start_ns, end_ns)
+
+    async def get_trades(self, symbol: str, start: datetime, end: datetime) -> TradeWindow:
+        """
+        Trades in [start, end) from the cache, or from raw_trades on a miss.
+        """
+        cached = self.window(symbol, start, end)
+        if cached is not None:
+            return cached
+        return await load_window(symbol, start, end)
+
+    async def recent(self, symbol: str, seconds: float, now: Optional[datetime] = None) -> TradeWindow:
+        """
+        Trades of the last `seconds` before now.
+        """
+        end = now or datetime.now(timezone.utc)
+        return await self.get_trades(symbol, end - timedelta(seconds=seconds), end)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "symbols": len(self._rings),
+            "trades": sum(ring.count for ring in self._rings.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "bytes": sum(ring.ts.nbytes + ring.price.nbytes + ring.size.nbytes for ring in self._rings.values()),
+        }
+
+
+async def load_window(symbol: str, start: datetime, end: datetime) -> TradeWindow:
+    """
+    raw_trades of one symbol in [start, end), ordered by ts.
+    """
+    sql = (
+        "SELECT ts, price::float8 AS price, size::float8 AS size FROM raw_trades "
+        "WHERE symbol = $1 AND ts >= $2 AND ts < $3 ORDER BY ts"
+    )
+    ts, price, size = [], [], []
+    async for cols in stream_columns(sql, (symbol, start, end)):
+        ts.append(ts_column(cols["ts"]))
+        price.append(np.array(cols["price"], dtype=np.float64))
+        size.append(np.array([np.nan if v is None else v for v in cols["size"]], dtype=np.float64))
+    if not ts:
+        return TradeWindow(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), "db")
+    return TradeWindow(np.concatenate(ts), np.concatenate(price), np.concatenate(size), "db")
+
+
+_hot_cache: Optional[HotTradeCache] = None
+
+
+def get_hot_cache() -> HotTradeCache:
+    """
+    The process-wide cache shared by ingest, analytics, the API and reasoning.
+    """
+    global _hot_cache
+    if _hot_cache is None:
+        _hot_cache = HotTradeCache()
+    return _hot_cache
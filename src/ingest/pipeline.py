@@ -0,0 +1,290 @@
+"""
+Streaming ingest pipeline
+
+Runs fetch -> validate -> write as concurrent stages connected by bounded
+asyncio.Queues, so HTTP latency and database latency overlap instead of
+adding up. A full queue blocks the stage feeding it (back-pressure), and
+the writer stage micro-batches rows, flushing when a batch reaches
+PIPELINE_BATCH_SIZE or its oldest row is PIPELINE_FLUSH_INTERVAL_SEC old.
+Rows failing validation are quarantined instead of written. A failing write
+or quarantine is logged and counted per batch; the stages keep running.
+
+Each stage keeps StageStats; metrics() reports per-stage input queue
+depth, throughput and utilization so the bottleneck stage is visible.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import time
+
+from core.config import Config
+from core.logging import debug, error, info, warning
+from core.utils import TokenBucket
+from ingest.batch import TradeBatch
+from ingest.fetcher import make_limiter
+from ingest.providers import get_provider
+from ingest.providers.base import BaseProvider, BaseStreamProvider, TradeRecord
+from ingest.providers.errors import ProviderError
+from ingest.quarantine import quarantine
+from ingest.validator import partition
+from ingest.writer import write_bulk
+
+# Sentinel pushed through the queues to shut the stages down in order
+_STOP = object()
+
+
+@dataclass
+class StageStats:
+    """
+    Counters for one pipeline stage.
+    """
+    processed: int = 0
+    errors: int = 0
+    busy_sec: float = 0.0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def snapshot(self, queue_depth: Optional[int] = None) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            "queue_depth": queue_depth,
+            "processed": self.processed,
+            "errors": self.errors,
+            "throughput_per_sec": self.processed / elapsed,
+            "utilization": min(self.busy_sec / elapsed, 1.0),
+        }
+
+
+class IngestPipeline:
+    """
+    Bounded-queue ingest pipeline.
+
+    Usage:
+        pipeline = IngestPipeline(provider)
+        await pipeline.start()
+        await pipeline.fetch(symbols)   # and/or: await pipeline.put(record)
+        written = await pipeline.stop()
+    """
+
+    def __init__(
+        self,
+        provider: Optional[BaseProvider] = None,
+        limiter: Optional[TokenBucket] = None,
+        queue_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        writer: Optional[Callable[[TradeBatch], Awaitable[int]]] = None,
+        quarantine_writer: Optional[Callable[[List[Tuple[Any, str]]], Awaitable[int]]] = None,
+        dedup: bool = True,
+    ):
+        queue_size = queue_size or Config.PIPELINE_QUEUE_SIZE
+        self.provider = provider
+        self.limiter = limiter or make_limiter()
+        self.batch_size = batch_size or Config.PIPELINE_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else Config.PIPELINE_FLUSH_INTERVAL_SEC
+        self.writer = writer or write_bulk
+        self.quarantine = quarantine_writer or quarantine
+        # (symbol, ts) dedup is for polled quotes; see validator.validate_batch
+        self.dedup = dedup
+
+        self.raw_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.valid_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.stats: Dict[str, StageStats] = {
+            "fetch": StageStats(),
+            "validate": StageStats(),
+            "write": StageStats(),
+        }
+        self.fetch_errors: Dict[str, ProviderError] = {}
+        self.written = 0
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """
+        Start the validate and write stages.
+        """
+        self._tasks = [
+            asyncio.create_task(self._validate_stage()),
+            asyncio.create_task(self._write_stage()),
+        ]
+
+    async def put(self, record: TradeRecord) -> None:
+        """
+        Feed one record into the pipeline. Blocks while the validator is behind.
+        """
+        await self.raw_queue.put(record)
+
+    async def fetch(self, symbols: Optional[List[str]] = None) -> None:
+        """
+        Fetch symbols concurrently and feed the results into the pipeline.
+
+        Workers stop pulling new symbols while the raw queue is full, so a
+        slow database throttles the fetcher instead of buffering unboundedly.
+        """
+        provider = self.provider = self.provider or get_provider()
+        symbols = Config.SYMBOLS if symbols is None else symbols
+        pending = iter(symbols)
+        stats = self.stats["fetch"]
+
+        async def worker():
+            for symbol in pending:
+                await self.limiter.acquire()
+                started = time.monotonic()
+                try:
+                    record = await provider.fetch_async(symbol)
+                except ProviderError as e:
+                    self.fetch_errors[symbol] = e
+                    stats.errors += 1
+                    continue
+                finally:
+                    stats.busy_sec += time.monotonic() - started
+                stats.processed += 1
+                await self.put(record)
+
+        workers = max(1, min(Config.FETCH_CONCURRENCY, len(symbols)))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        if self.fetch_errors:
+            warning("Failed to fetch {} symbols: {}".format(
+                len(self.fetch_errors), ", ".join(self.fetch_errors)
+            ))
+
+    async def stop(self) -> int:
+        """
+        Drain every stage, flush the final batch and return the rows written.
+        """
+        await self.raw_queue.put(_STOP)
+        await asyncio.gather(*self._tasks)
+        self._tasks = []
+        return self.written
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-stage counters. queue_depth is the stage's input queue.
+        """
+        return {
+            "fetch": self.stats["fetch"].snapshot(),
+            "validate": self.stats["validate"].snapshot(self.raw_queue.qsize()),
+            "write": self.stats["write"].snapshot(self.valid_queue.qsize()),
+        }
+
+    async def _validate_stage(self) -> None:
+        stats = self.stats["validate"]
+        while True:
+            # Validate whatever has queued up, up to one write batch at a time
+            items = [await self.raw_queue.get()]
+            while len(items) < self.batch_size and not self.raw_queue.empty():
+                items.append(self.raw_queue.get_nowait())
+
+            records = [item for item in items if item is not _STOP]
+            if records:
+                started = time.monotonic()
+                valid = await self._validate(records)
+                stats.busy_sec += time.monotonic() - started
+                stats.processed += len(valid)
+                for record in valid:
+                    await self.valid_queue.put(record)
+
+            if len(records) != len(items):
+                await self.valid_queue.put(_STOP)
+                return
+
+    async def _validate(self, records: List[TradeRecord]) -> List[TradeRecord]:
+        # Per-row validation: bad rows go to the quarantine, good rows go on
+        valid, rejected = partition(records, self.dedup)
+        if rejected:
+            self.stats["validate"].errors += len(rejected)
+            try:
+                await self.quarantine(rejected)
+            except Exception as e:
+                error("Pipeline quarantine of {} records failed: {}".format(len(rejected), e))
+        return valid
+
+    async def _write_stage(self) -> None:
+        loop = asyncio.get_running_loop()
+        # Buffered rows are held column-wise until the next flush
+        batch = TradeBatch(self.batch_size)
+        flush_at = 0.0
+        while True:
+            timeout = max(flush_at - loop.time(), 0) if batch else None
+            try:
+                item = await asyncio.wait_for(self.valid_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                batch = await self._flush(batch)
+                continue
+
+            if item is _STOP:
+                await self._flush(batch)
+                return
+
+            if not batch:
+                flush_at = loop.time() + self.flush_interval
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                batch = await self._flush(batch)
+
+    async def _flush(self, batch: TradeBatch) -> TradeBatch:
+        if not batch:
+            return batch
+        stats = self.stats["write"]
+        started = time.monotonic()
+        try:
+            written = await self.writer(batch)
+            self.written += written
+            stats.processed += written
+            debug("Pipeline flushed {} records.".format(written))
+        except Exception as e:
+            # writer= may be any callable; a dead stage would block put() and stop() forever
+            stats.errors += len(batch)
+            error("Pipeline write of {} records failed: {}".format(len(batch), e))
+        finally:
+            stats.busy_sec += time.monotonic() - started
+        return TradeBatch(self.batch_size)
+
+
+async def run_pipeline_once(
+    provider: Optional[BaseProvider] = None,
+    limiter: Optional[TokenBucket] = None,
+    symbols: Optional[List[str]] = None,
+) -> int:
+    """
+    Run one fetch cycle through the streaming pipeline and return the rows written.
+    A provider created here is closed before returning.
+    """
+    owns_provider = provider is None
+    provider = provider or get_provider()
+    pipeline = IngestPipeline(provider=provider, limiter=limiter)
+    await pipeline.start()
+    try:
+        await pipeline.fetch(symbols)
+    finally:
+        written = await pipeline.stop()
+        if owns_provider:
+            await provider.aclose()
+
+    for stage, stats in pipeline.metrics().items():
+        debug("Pipeline stage {}: {}".format(stage, stats))
+    info("Pipeline ingest cycle complete: {} records written".format(written))
+    return written
+
+
+async def run_stream(
+    provider: BaseStreamProvider,
+    symbols: Optional[List[str]] = None,
+    pipeline: Optional[IngestPipeline] = None,
+) -> int:
+    """
+    Feed a streaming provider into the pipeline until the stream ends or
+    the task is cancelled, then flush and return the rows written.
+    """
+    symbols = Config.SYMBOLS if symbols is None else symbols
+    pipeline = pipeline or IngestPipeline()
+    # Distinct trades often share a millisecond; never drop them as duplicates
+    pipeline.dedup = False
+    await pipeline.start()
+    info("Streaming {} symbols into the ingest pipeline.".format(len(symbols)))
+    try:
+        async for record in provider.stream(symbols):
+            await pipeline.put(record)
+    finally:
+        await provider.aclose()
+        written = await pipeline.stop()
+        info("Stream ingest stopped: {} records written".format(written))
+    return written
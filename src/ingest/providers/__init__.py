@@ -1,15 +1,17 @@
 """
 Provider factory for market data ingestion
 
-This module exposes one function: get_provider()
+This module exposes two functions:
+- get_provider(): reads Config.API_PROVIDER and returns a polling provider
+- get_stream_provider(): reads Config.STREAM_PROVIDER and returns a streaming provider
 
-It reads Config.API_PROVIDER and returns the correct provider instance.
-If an unknown provider is requested, it returns a ProviderError
+If an unknown provider is requested, they raise a ProviderError
 """
 
 from core.config import Config
 from ingest.providers.errors import ProviderError
 from ingest.providers.finnhub_provider import FinnhubProvider
+from ingest.providers.finnhub_stream_provider import FinnhubStreamProvider
 
 def get_provider():
     """
@@ -31,4 +33,23 @@ def get_provider():
         "Unknown API Provider '{}'. Supported providers: finnhub.".format(
             provider_name
         )
-    )
\ No newline at end of file
+    )
+
+def get_stream_provider():
+    """
+    Return an instance of the streaming provider specified in Config.STREAM_PROVIDER
+
+    Supported values:
+    - "finnhub"
+    """
+
+    provider_name = (Config.STREAM_PROVIDER or "").lower()
+
+    if provider_name == "finnhub":
+        return FinnhubStreamProvider()
+
+    raise ProviderError(
+        "Unknown stream provider '{}'. Supported providers: finnhub.".format(
+            provider_name
+        )
+    )
@@ -3,22 +3,25 @@ Provider interface for market data sources
 
 This module defines:
 - TradeRecord: the normalized shape of each trade/bar record
-- BaseProvider: an abstract interface that all providers must implement
+- BaseProvider: an abstract interface that all polling providers must implement
+- BaseStreamProvider: an abstract interface for push-based (streaming) providers
 """
 
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List
+from typing import AsyncIterator, List
 
-@dataclass
+@dataclass(slots=True)
 class TradeRecord:
     """
     Normalized market data record
     
-    All providers must return data in this shape
+    All providers must return data in this shape. Slotted (no per-instance
+    __dict__); use ingest.batch.TradeBatch when buffering many trades.
     """
     symbol: str
     ts: datetime
@@ -41,4 +44,48 @@ class BaseProvider(ABC):
         - Normalize all records into TradeRecord
         - Handle provider-specific errors and raise or log
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    async def fetch_async(self, symbol: str) -> TradeRecord:
+        """
+        Async variant of fetch().
+
+        The default runs the blocking fetch() in a worker thread so every
+        provider can be used by the concurrent fetch path. Providers with a
+        native async client should override this.
+        """
+        return await asyncio.to_thread(self.fetch, symbol)
+
+    def close(self) -> None:
+        """
+        Release any network resources held by the provider.
+        The default provider holds none.
+        """
+
+    async def aclose(self) -> None:
+        """
+        Async variant of close(), for providers holding async clients.
+        """
+        self.close()
+
+
+class BaseStreamProvider(ABC):
+    """
+    Abstract base class for providers that push trades as they happen.
+    """
+
+    @abstractmethod
+    def stream(self, symbols: List[str]) -> AsyncIterator[TradeRecord]:
+        """
+        Subscribe to symbols and yield TradeRecords as they arrive.
+
+        Implementations:
+        - Reconnect and resubscribe on their own when the connection drops
+        - Stop iterating once aclose() has been called
+        """
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        """
+        Stop streaming and release the connection.
+        """
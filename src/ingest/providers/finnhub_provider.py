@@ -1,5 +1,9 @@
-from typing import Optional
+from typing import Callable, Optional
+import asyncio
+import json
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timezone
 
 from core.config import Config
@@ -13,13 +17,40 @@ class FinnhubError(ProviderError):
     pass
 
 class FinnhubProvider(BaseProvider):
+    """
+    Polls Finnhub's /quote endpoint.
+
+    Each instance owns a keep-alive connection pool: a requests.Session for
+    fetch() and an aiohttp.ClientSession (created lazily on first use inside
+    the event loop) for fetch_async(). Reuse one instance across cycles and
+    call close()/aclose() at shutdown.
+    """
     QUOTE_URL = "https://finnhub.io/api/v1/quote"
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, pool_size: Optional[int] = None):
         self.api_key = api_key or Config.FINNHUB_API_KEY
         if not self.api_key or self.api_key is None:
             raise FinnhubError("Finnhub API Key is missing.")
-        
+
+        self.pool_size = pool_size or Config.HTTP_POOL_SIZE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._async_session: Optional[aiohttp.ClientSession] = None
+
+    def _get_async_session(self) -> aiohttp.ClientSession:
+        if self._async_session is None or self._async_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                keepalive_timeout=Config.HTTP_KEEPALIVE_SEC,
+            )
+            self._async_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=Config.HTTP_TIMEOUT_SEC),
+            )
+        return self._async_session
+
     def fetch(self, symbol: str) -> TradeRecord:
         # Build the request
         params = {
@@ -28,7 +59,7 @@ class FinnhubProvider(BaseProvider):
         }
 
         try:
-            response = requests.get(self.QUOTE_URL, params=params, timeout=5)
+            response = self.session.get(self.QUOTE_URL, params=params, timeout=Config.HTTP_TIMEOUT_SEC)
 
         except requests.exceptions.Timeout as e:
             raise FinnhubError("Timeout when fetching {}: {}".format(symbol, e))
@@ -38,30 +69,55 @@ class FinnhubProvider(BaseProvider):
         
         except requests.exceptions.RequestException as e:
             raise FinnhubError("HTTP Error when fetching {}: {}".format(symbol, e))
-        
+
+        return self._to_record(symbol, response.status_code, response.text, response.json)
+
+    async def fetch_async(self, symbol: str) -> TradeRecord:
+        params = {
+            "token": self.api_key,
+            "symbol": symbol,
+        }
+
+        try:
+            async with self._get_async_session().get(self.QUOTE_URL, params=params) as response:
+                status = response.status
+                text = await response.text()
+
+        except asyncio.TimeoutError as e:
+            raise FinnhubError("Timeout when fetching {}: {}".format(symbol, e))
+
+        except aiohttp.ClientConnectionError as e:
+            raise FinnhubError("Connection error when fetching {}: {}".format(symbol, e))
+
+        except aiohttp.ClientError as e:
+            raise FinnhubError("HTTP Error when fetching {}: {}".format(symbol, e))
+
+        return self._to_record(symbol, status, text, lambda: json.loads(text))
+
+    def _to_record(self, symbol: str, status_code: int, text: str, parse_json: Callable[[], dict]) -> TradeRecord:
         # Handle non-200 status
-        if response.status_code != 200:
+        if status_code != 200:
             raise FinnhubError(
                 "Finnhub returned {} for symbol {}: {}".format(
-                    response.status_code,
+                    status_code,
                     symbol,
-                    response.text[:200],
+                    text[:200],
                 )
             )
         
         # Parse JSON
         try:
-            data: dict = response.json()
+            data: dict = parse_json()
         except ValueError:
             raise FinnhubError(
                 "Invalid JSON from Finnhub for {}: {}".format(
                     symbol,
-                    response.text[:200],
+                    text[:200],
                 )
             )
 
         # Validate content
-        if data.get("c", "") in (None, 0, "", "0"):
+        if not isinstance(data, dict) or data.get("c", "") in (None, 0, "", "0"):
             raise FinnhubError(
                 "Finnhub returned missing or invalid price for {}. Response: {}".format(
                     symbol,
@@ -79,4 +135,13 @@ class FinnhubProvider(BaseProvider):
             price=price,
             size=size,
             source="finnhub",
-        )
\ No newline at end of file
+        )
+
+    def close(self) -> None:
+        self.session.close()
+
+    async def aclose(self) -> None:
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+        self._async_session = None
+        self.close()
@@ -0,0 +1,118 @@
+from typing import AsyncIterator, List, Optional
+import asyncio
+import json
+import aiohttp
+from datetime import datetime, timezone
+
+from core.config import Config
+from core.logging import debug, info, warning
+from ingest.providers.base import BaseStreamProvider, TradeRecord
+from ingest.providers.finnhub_provider import FinnhubError
+
+
+class FinnhubStreamProvider(BaseStreamProvider):
+    """
+    Streams real trades from Finnhub's trade websocket.
+
+    Messages look like:
+        {"type": "trade", "data": [{"s": "AAPL", "p": 189.1, "t": 1700000000000, "v": 100}]}
+
+    When the socket drops, the provider reconnects with exponential backoff
+    (STREAM_RECONNECT_DELAY_SEC doubling up to STREAM_MAX_RECONNECT_DELAY_SEC)
+    and resubscribes to every symbol.
+    """
+
+    SOURCE = "finnhub_ws"
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        url: Optional[str] = None,
+        reconnect_delay: Optional[float] = None,
+        max_reconnect_delay: Optional[float] = None,
+    ):
+        self.api_key = api_key or Config.FINNHUB_API_KEY
+        if not self.api_key:
+            raise FinnhubError("Finnhub API Key is missing.")
+
+        self.url = url or Config.FINNHUB_WS_URL
+        self.reconnect_delay = reconnect_delay if reconnect_delay is not None else Config.STREAM_RECONNECT_DELAY_SEC
+        self.max_reconnect_delay = max_reconnect_delay or Config.STREAM_MAX_RECONNECT_DELAY_SEC
+        self.connections = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._closed = False
+
+    async def stream(self, symbols: List[str]) -> AsyncIterator[TradeRecord]:
+        delay = self.reconnect_delay
+        while not self._closed:
+            try:
+                if self._session is None or self._session.closed:
+                    self._session = aiohttp.ClientSession()
+                async with self._session.ws_connect(
+                    self.url, params={"token": self.api_key}, heartbeat=30
+                ) as ws:
+                    self._ws = ws
+                    self.connections += 1
+                    for symbol in symbols:
+                        await ws.send_json({"type": "subscribe", "symbol": symbol})
+                    info("Finnhub stream connected; subscribed to {} symbols.".format(len(symbols)))
+                    delay = self.reconnect_delay
+
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            for record in self.parse_message(msg.data):
+                                yield record
+                        elif msg.type == aiohttp.WSMsgType.ERROR:
+                            break
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                warning("Finnhub stream connection failed: {}".format(e))
+            finally:
+                self._ws = None
+
+            if self._closed:
+                return
+            warning("Finnhub stream disconnected; reconnecting in {} seconds.".format(delay))
+            await asyncio.sleep(delay)
+            delay = min(max(delay, 0.01) * 2, self.max_reconnect_delay)
+
+    def parse_message(self, raw: str) -> List[TradeRecord]:
+        """
+        Normalize one websocket message into TradeRecords.
+        Pings, errors and malformed trades yield nothing.
+        """
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            warning("Invalid JSON from Finnhub stream: {}".format(raw[:200]))
+            return []
+
+        msg_type = message.get("type") if isinstance(message, dict) else None
+        if msg_type == "error":
+            warning("Finnhub stream error: {}".format(message.get("msg")))
+            return []
+        if msg_type != "trade":
+            return []
+
+        records: List[TradeRecord] = []
+        for trade in message.get("data") or []:
+            try:
+                records.append(TradeRecord(
+                    symbol=trade["s"],
+                    ts=datetime.fromtimestamp(trade["t"] / 1000.0, tz=timezone.utc),
+                    price=float(trade["p"]),
+                    size=float(trade.get("v") or 0),
+                    source=self.SOURCE,
+                ))
+            except (KeyError, TypeError, ValueError) as e:
+                debug("Skipping malformed Finnhub trade {}: {}".format(trade, e))
+        return records
+
+    async def aclose(self) -> None:
+        self._closed = True
+        if self._ws is not None:
+            await self._ws.close()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
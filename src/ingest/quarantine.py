@@ -0,0 +1,151 @@
+"""
+Quarantine for rejected ingest records
+
+Rows that fail validation are written in bulk to raw_trades_rejects with
+their rejection reason instead of failing the whole batch. Process-wide
+counters by reason are kept in memory, and quarantined rows can be
+replayed through validation once the cause has been fixed.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import json
+import math
+
+from core.config import Config
+from core.db import copy_records, execute, stream_columns, transaction
+from core.logging import info, warning
+from ingest.providers.base import TradeRecord
+from ingest.validator import partition
+from ingest.writer import notify_listeners, write_bulk
+from ingest.writer_errors import WriterError
+
+REJECTS_COLUMNS = ("symbol", "ts", "price", "size", "source", "reason", "raw")
+
+# Rejected rows seen by this process, by reason
+reject_counts: Counter = Counter()
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)) and math.isfinite(value):
+        return value
+    return None
+
+
+def to_reject_row(record: Any, reason: str) -> Tuple[Any, ...]:
+    """
+    Build a raw_trades_rejects row. Typed columns are only filled when the
+    value fits the column; raw always keeps the original values.
+    """
+    if not isinstance(record, TradeRecord):
+        return (None, None, None, None, None, reason, json.dumps({"value": repr(record)}))
+
+    ts = record.ts if isinstance(record.ts, datetime) and record.ts.utcoffset() is not None else None
+    raw = {
+        "symbol": repr(record.symbol),
+        "ts": record.ts.isoformat() if isinstance(record.ts, datetime) else repr(record.ts),
+        "price": repr(record.price),
+        "size": repr(record.size),
+        "source": repr(record.source),
+    }
+    return (
+        record.symbol if isinstance(record.symbol, str) else None,
+        ts,
+        _number(record.price),
+        _number(record.size),
+        record.source if isinstance(record.source, str) else None,
+        reason,
+        json.dumps(raw),
+    )
+
+
+async def quarantine(rejects: Sequence[Tuple[Any, str]]) -> int:
+    """
+    Write (record, reason) pairs to raw_trades_rejects in one COPY and
+    update the per-reason counters. Raises WriterError on failure.
+    """
+    if not rejects:
+        return 0
+
+    reject_counts.update(reason for _, reason in rejects)
+    rows = [to_reject_row(record, reason) for record, reason in rejects]
+    try:
+        written = await copy_records("raw_trades_rejects", REJECTS_COLUMNS, rows)
+    except Exception as e:
+        raise WriterError("Database error during quarantine write: {}".format(e)) from e
+
+    warning("Quarantined {} rejected records: {}".format(
+        written, dict(Counter(reason for _, reason in rejects))
+    ))
+    return written
+
+
+async def replay(
+    reasons: Optional[List[str]] = None,
+    limit: int = 10000,
+    max_attempts: Optional[int] = None,
+) -> Tuple[int, int]:
+    """
+    Re-validate quarantined rows that have not been replayed yet.
+
+    Without reasons, "duplicate" rows are left alone: validation only
+    re-checks them within the replayed batch, not against raw_trades.
+    Rows that now pass are written to raw_trades and marked replayed in
+    one transaction. Rows that still fail get an attempt recorded, sort
+    behind fresher rejects and are given up after max_attempts.
+    Returns (replayed, still_rejected).
+    """
+    max_attempts = max_attempts or Config.QUARANTINE_REPLAY_MAX_ATTEMPTS
+    sql = (
+        "SELECT id, symbol, ts, price, size, source FROM raw_trades_rejects "
+        "WHERE replayed_at IS NULL AND replay_attempts < $3 "
+        "AND (($1::text[] IS NULL AND reason <> 'duplicate') OR reason = ANY($1)) "
+        "ORDER BY replay_attempts, rejected_at LIMIT $2"
+    )
+    replayed = still_rejected = 0
+    async for cols in stream_columns(sql, (reasons, limit, max_attempts)):
+        records = [
+            TradeRecord(
+                symbol=symbol,
+                ts=ts,
+                price=float(price) if price is not None else None,
+                size=float(size) if size is not None else None,
+                source=source,
+            )
+            for symbol, ts, price, size, source in zip(
+                cols["symbol"], cols["ts"], cols["price"], cols["size"], cols["source"]
+            )
+        ]
+        valid, rejected = partition(records)
+        rejected_ids = {id(record) for record, _ in rejected}
+        replay_ids = [row_id for row_id, record in zip(cols["id"], records) if id(record) not in rejected_ids]
+        failed_ids = [row_id for row_id, record in zip(cols["id"], records) if id(record) in rejected_ids]
+
+        async with transaction() as conn:
+            if valid:
+                await write_bulk(valid, conn=conn)
+                await execute(
+                    "UPDATE raw_trades_rejects SET replayed_at = NOW() WHERE id = ANY($1)",
+                    (replay_ids,), conn=conn,
+                )
+            if failed_ids:
+                await execute(
+                    "UPDATE raw_trades_rejects SET replay_attempts = replay_attempts + 1, last_replay_at = NOW() "
+                    "WHERE id = ANY($1)",
+                    (failed_ids,), conn=conn,
+                )
+        if valid:
+            await notify_listeners(valid)
+        replayed += len(valid)
+        still_rejected += len(rejected)
+
+    if replayed or still_rejected:
+        info("Replayed {} quarantined records; {} still rejected.".format(replayed, still_rejected))
+    return replayed, still_rejected
+
+
+def reject_summary() -> Dict[str, int]:
+    """
+    Counts of rejected rows by reason since process start.
+    """
+    return dict(reject_counts)
@@ -1,10 +1,17 @@
-from typing import List, Set, Tuple
+from dataclasses import dataclass, replace
+from typing import Any, List, Set, Tuple, Union
 from datetime import datetime, timezone, timedelta
 import math
 
+import numpy as np
+
+from ingest.batch import NAT, TradeBatch, factorize
 from ingest.providers.base import TradeRecord
 
-def validate(records: List[TradeRecord]) -> List[TradeRecord]:
+def validate(records: Union[List[TradeRecord], TradeBatch]) -> List[TradeRecord]:
+    if isinstance(records, TradeBatch):
+        records = records.to_records()
+
     val_records: List[TradeRecord] = []
     seen_records: Set[Tuple[str, datetime]] = set()
     tolerance = timedelta(seconds=10)
@@ -69,4 +76,190 @@ def validate(records: List[TradeRecord]) -> List[TradeRecord]:
             continue
         seen_records.add(to_add)
         val_records.append(record)
-    return val_records
\ No newline at end of file
+    return val_records
+
+# ---------------------------------------------------------------------
+# Columnar batch validation
+# ---------------------------------------------------------------------
+
+# Rejection reasons, indexed by the codes in BatchValidation.reasons.
+# Code 0 means the row is kept.
+REJECT_REASONS = (
+    "ok",
+    "not_trade_record",
+    "source_missing",
+    "symbol_empty",
+    "symbol_has_space",
+    "ts_invalid",
+    "ts_future",
+    "price_invalid",
+    "price_nonpositive",
+    "duplicate",
+)
+_CODES = {name: code for code, name in enumerate(REJECT_REASONS)}
+
+_FUTURE_TOLERANCE_NS = 10 * 1_000_000_000
+
+
+@dataclass
+class BatchValidation:
+    """
+    Result of validate_batch().
+
+    keep is a boolean mask over the input rows; reasons holds a code into
+    REJECT_REASONS for every row (0 for kept rows). Only the first failing
+    check is reported per row, in the same order validate() checks them.
+    batch holds every input row with symbol, source and size normalized.
+    """
+    keep: np.ndarray
+    reasons: np.ndarray
+    batch: TradeBatch
+
+    def reason_names(self) -> List[str]:
+        return [REJECT_REASONS[code] for code in self.reasons]
+
+    def valid(self) -> TradeBatch:
+        """
+        The kept rows as a TradeBatch.
+        """
+        return self.batch.take(self.keep)
+
+    def select(self, records: List[TradeRecord]) -> List[TradeRecord]:
+        """
+        Return normalized copies of the kept records, in input order.
+        The input records are not modified.
+        """
+        batch = self.batch
+        return [
+            replace(
+                records[i],
+                symbol=batch.symbols[batch.symbol_codes[i]],
+                source=batch.sources[batch.source_codes[i]],
+                size=float(batch.size[i]),
+            )
+            for i in np.flatnonzero(self.keep)
+        ]
+
+
+# Stand-in for rows that are not TradeRecords so every column can be
+# built in one pass; such rows are always rejected as not_trade_record.
+_PLACEHOLDER = TradeRecord(symbol=None, ts=None, price=None, size=None, source=None)
+
+
+def validate_batch(records: Union[List[TradeRecord], TradeBatch], dedup: bool = True) -> BatchValidation:
+    """
+    Validate a batch of records column-wise.
+
+    Mirrors validate()'s rules, but evaluates every check as an array
+    operation over TradeBatch columns. Invalid rows are reported per row
+    instead of raising, so one bad record never costs the rest of the
+    batch. A TradeBatch is validated directly without building records.
+
+    dedup drops repeated (symbol, ts) rows, which only makes sense for
+    polled quotes; a trade feed has distinct trades in the same
+    millisecond, so stream callers pass dedup=False.
+    """
+    if isinstance(records, TradeBatch):
+        batch = records
+        is_record = np.ones(len(batch), dtype=bool)
+    elif set(map(type, records)) <= {TradeRecord}:
+        batch = TradeBatch.from_records(records)
+        is_record = np.ones(len(records), dtype=bool)
+    else:
+        is_record = np.fromiter(
+            (isinstance(r, TradeRecord) for r in records), dtype=bool, count=len(records)
+        )
+        batch = TradeBatch.from_records(
+            [r if ok else _PLACEHOLDER for r, ok in zip(records, is_record)]
+        )
+
+    n = len(batch)
+    ts = batch.ts
+    price = batch.price
+    sym = batch.symbol_codes
+    src = batch.source_codes
+
+    # Normalize each distinct symbol / source once rather than once per row
+    symbol_values = [v.strip() if isinstance(v, str) else "" for v in batch.symbols]
+    source_values = [v.lower() if isinstance(v, str) else None for v in batch.sources]
+    norm_symbol_codes, norm_symbols = factorize(symbol_values)
+    norm_source_codes, norm_sources = factorize(source_values)
+    symbol_empty = np.array([not v for v in symbol_values], dtype=bool)
+    symbol_space = np.array([" " in v for v in symbol_values], dtype=bool)
+    source_none = np.array([v is None for v in source_values], dtype=bool)
+    source_empty = np.array([v == "" for v in source_values], dtype=bool)
+
+    now_ns = round(datetime.now(timezone.utc).timestamp() * 1_000_000) * 1000
+
+    # Fix what we can: unusable sizes become 0
+    size = np.where(np.isfinite(batch.size) & (batch.size >= 0), batch.size, 0.0)
+
+    # Apply checks from lowest to highest priority so the first failing
+    # check (in validate() order) wins for each row.
+    reasons = np.zeros(n, dtype=np.int8)
+    finite_price = np.isfinite(price)
+    checks = [
+        ("source_missing", source_empty[src]),
+        ("price_nonpositive", finite_price & (price <= 0)),
+        ("price_invalid", ~finite_price),
+        ("ts_future", (ts != NAT) & (ts - now_ns > _FUTURE_TOLERANCE_NS)),
+        ("ts_invalid", ts == NAT),
+        ("symbol_has_space", symbol_space[sym]),
+        ("symbol_empty", symbol_empty[sym]),
+        ("source_missing", source_none[src]),
+        ("not_trade_record", ~is_record),
+    ]
+    for name, mask in checks:
+        reasons[mask] = _CODES[name]
+
+    symbol_codes = norm_symbol_codes[sym]
+
+    # Deduplicate surviving rows on (symbol, ts), keeping the first occurrence
+    candidates = np.flatnonzero(reasons == 0)
+    if dedup and candidates.size > 1:
+        cand_sym = symbol_codes[candidates]
+        cand_ts = ts[candidates]
+        order = np.lexsort((candidates, cand_ts, cand_sym))
+        same = (cand_sym[order][1:] == cand_sym[order][:-1]) & (cand_ts[order][1:] == cand_ts[order][:-1])
+        reasons[candidates[order][1:][same]] = _CODES["duplicate"]
+
+    normalized = TradeBatch.from_columns(
+        symbol_codes=symbol_codes,
+        symbols=norm_symbols,
+        ts=ts,
+        price=price,
+        size=size,
+        source_codes=norm_source_codes[src],
+        sources=norm_sources,
+    )
+    return BatchValidation(keep=reasons == 0, reasons=reasons, batch=normalized)
+
+
+def partition(
+    records: Union[List[TradeRecord], TradeBatch],
+    dedup: bool = True,
+) -> Tuple[Union[List[TradeRecord], TradeBatch], List[Tuple[Any, str]]]:
+    """
+    Split records into (valid, rejected) using validate_batch().
+
+    valid holds normalized copies of the good records (a TradeBatch when a
+    TradeBatch was passed in); rejected holds (original record, reason)
+    pairs for the quarantine.
+    """
+    if isinstance(records, TradeBatch):
+        result = validate_batch(records, dedup)
+        bad = np.flatnonzero(~result.keep)
+        rejected = list(zip(
+            records.take(bad).to_records(),
+            [REJECT_REASONS[code] for code in result.reasons[bad]],
+        ))
+        return result.valid(), rejected
+
+    if not records:
+        return [], []
+    result = validate_batch(records, dedup)
+    rejected = [
+        (records[i], REJECT_REASONS[result.reasons[i]])
+        for i in np.flatnonzero(~result.keep)
+    ]
+    return result.select(records), rejected
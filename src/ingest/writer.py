@@ -1,8 +1,43 @@
-from typing import List
+from typing import Awaitable, Callable, List, Union
 
+from ingest.batch import TradeBatch
 from ingest.providers.base import TradeRecord
 from ingest.writer_errors import WriterError
-from core.db import execute
+from core.db import execute_prepared, execute_many, copy_records, register_statement
+from core.logging import error
+
+RAW_TRADES_COLUMNS = ("symbol", "ts", "price", "size", "source")
+INSERT_RAW_TRADE_SQL = "INSERT INTO raw_trades (symbol, ts, price, size, source) VALUES ($1, $2, $3, $4, $5)"
+INSERT_RAW_TRADE_STATEMENT = "insert_raw_trade"
+
+register_statement(INSERT_RAW_TRADE_STATEMENT, INSERT_RAW_TRADE_SQL)
+
+# Called with every TradeBatch committed by write_bulk(), e.g. to update
+# incremental analytics without re-reading raw_trades.
+WriteListener = Callable[[TradeBatch], Awaitable[None]]
+_listeners: List[WriteListener] = []
+
+
+def add_listener(listener: WriteListener) -> None:
+    _listeners.append(listener)
+
+
+def remove_listener(listener: WriteListener) -> None:
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+async def notify_listeners(records: Union[List[TradeRecord], TradeBatch]) -> None:
+    """
+    Call the write listeners with committed records.
+    """
+    batch = records if isinstance(records, TradeBatch) else TradeBatch.from_records(records)
+    for listener in list(_listeners):
+        try:
+            await listener(batch)
+        except Exception as e:
+            # The rows are already committed; a failing listener must not fail the write
+            error("Write listener {} failed: {}".format(getattr(listener, "__qualname__", listener), e))
 
 async def write(records: List[TradeRecord]) -> int:
     if not records:
@@ -12,8 +47,8 @@ async def write(records: List[TradeRecord]) -> int:
     try:
         for record in records:
             try:
-                await execute(
-                    "INSERT INTO raw_trades (symbol, ts, price, size, source) VALUES ($1, $2, $3, $4, $5)",
+                await execute_prepared(
+                    INSERT_RAW_TRADE_STATEMENT,
                     (record.symbol, record.ts, record.price, record.size, record.source)
                 )
                 cnt_written += 1
@@ -22,3 +57,41 @@ async def write(records: List[TradeRecord]) -> int:
         return cnt_written
     except Exception as e:
         raise WriterError("Unexpected error during write: {}".format(e)) from e
+
+
+async def write_bulk(records: Union[List[TradeRecord], TradeBatch], use_copy: bool = True, conn=None) -> int:
+    """
+    Write all records in one round trip inside a single transaction.
+
+    Accepts a list of TradeRecords or a TradeBatch. Uses COPY by default;
+    use_copy=False falls back to a multi-row executemany of the per-row
+    INSERT. Either the whole batch is written or none of it is, and any
+    failure is raised as WriterError. Registered listeners are called
+    with the committed batch.
+
+    With conn (from transaction()) the rows are written in the caller's
+    transaction and listeners are not called; the caller calls
+    notify_listeners() once it has committed.
+    """
+    if not len(records):
+        return 0
+
+    if isinstance(records, TradeBatch):
+        rows = records.rows()
+    else:
+        rows = [
+            (record.symbol, record.ts, record.price, record.size, record.source)
+            for record in records
+        ]
+    try:
+        if use_copy:
+            written = await copy_records("raw_trades", RAW_TRADES_COLUMNS, rows, conn=conn)
+        else:
+            await execute_many(INSERT_RAW_TRADE_SQL, rows, conn=conn)
+            written = len(rows)
+    except Exception as e:
+        raise WriterError("Database error during bulk write: {}".format(e)) from e
+
+    if _listeners and conn is None:
+        await notify_listeners(records)
+    return written
@@ -0,0 +1,47 @@
+"""
+raw_trades partition maintenance
+
+raw_trades is range-partitioned by UTC day (see
+sql/migrations/002_partition_raw_trades.sql). maintain_partitions()
+creates partitions for the next RAW_TRADES_PARTITIONS_AHEAD days and drops
+partitions older than RAW_TRADES_RETENTION_DAYS (0 keeps everything).
+It is idempotent. core.scheduler.run_scheduler() runs it on startup and
+every PARTITION_MAINTENANCE_INTERVAL_SEC; deployments that ingest without
+the scheduler (or set the interval to 0) must run it at least daily, e.g.
+from cron:
+
+    python -m ops.partitions
+"""
+from typing import Optional
+import asyncio
+
+from core.config import Config
+from core.db import execute, init_pool, close_pool
+from core.logging import info
+
+
+async def maintain_partitions(
+    retention_days: Optional[int] = None,
+    days_ahead: Optional[int] = None,
+) -> None:
+    retention_days = Config.RAW_TRADES_RETENTION_DAYS if retention_days is None else retention_days
+    days_ahead = Config.RAW_TRADES_PARTITIONS_AHEAD if days_ahead is None else days_ahead
+
+    await execute("SELECT raw_trades_create_partitions($1)", (days_ahead,))
+    if retention_days > 0:
+        await execute("SELECT raw_trades_drop_partitions($1)", (retention_days,))
+    info("raw_trades partitions maintained ({} days ahead, retention {}).".format(
+        days_ahead, "{} days".format(retention_days) if retention_days > 0 else "unlimited"
+    ))
+
+
+async def main():
+    await init_pool()
+    try:
+        await maintain_partitions()
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
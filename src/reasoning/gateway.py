@@ -0,0 +1,427 @@
+"""
+Async LLM gateway
+
+LLMGateway multiplexes summary requests for many symbols over a bounded
+pool of LLM_WORKERS workers talking to an OpenAI-compatible
+/chat/completions endpoint (LLM_BASE_URL) over one keep-alive session:
+- Budgets: a request-per-minute and a token-per-minute TokenBucket. A call
+  reserves its estimated tokens (prompt estimate + max_tokens) before it is
+  sent; it is settled against the reported usage, refunding the unused part
+  or debiting an overrun (the estimate is a heuristic capped at the bucket
+  size, so real usage can exceed it).
+- Coalescing: requests with the same key (model + prompt by default) that
+  are queued or in flight share one call and one result.
+- Retries: 429, 5xx, timeouts and connection errors are retried up to
+  LLM_MAX_RETRIES times with full-jitter exponential backoff, honouring
+  Retry-After. Other errors fail the request immediately.
+- Accounting: every successful call becomes a summaries row (model,
+  tokens_used, latency_ms, ...) buffered and written in bulk, unless the
+  request sets record=False and the caller records rows itself.
+- Caching: with a PromptCache, requests carrying a cache_key (see
+  reasoning.prompt_cache.fingerprint) are answered from it when possible;
+  the row is still written, with 0 tokens, so every window has its summary.
+
+    async with LLMGateway() as gateway:
+        results = await gateway.summarize_many(requests)
+
+Point LLM_BASE_URL at scripts/fake_model_server.py to test or benchmark
+without network (scripts/bench_gateway.py).
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+import aiohttp
+
+from core.config import Config
+from core.db import copy_records
+from core.logging import debug, error, info, warning
+from core.utils import TokenBucket
+from ingest.writer_errors import WriterError
+from reasoning.prompt_cache import PromptCache
+
+SUMMARIES_COLUMNS = (
+    "symbol", "window_start", "window_end", "model", "prompt_version", "text", "tokens_used", "latency_ms",
+    "cache_key",
+)
+
+SummaryWriter = Callable[[List[Tuple[Any, ...]]], Awaitable[int]]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English prose).
+    """
+    return (len(text) + 3) // 4
+
+
+class GatewayError(Exception):
+    """
+    A model call failed; `retryable` tells whether another attempt may succeed.
+    """
+
+    def __init__(self, message: str, retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+@dataclass
+class SummaryRequest:
+    symbol: str
+    window_start: datetime
+    window_end: datetime
+    prompt: str
+    system: str = ""
+    prompt_version: Optional[str] = None
+    max_tokens: Optional[int] = None
+    model: Optional[str] = None
+    cache_key: Optional[str] = None
+    record: bool = True     # False: the caller writes the summaries rows (e.g. one per symbol of a batch)
+
+    def coalesce_key(self, model: str) -> str:
+        raw = json.dumps([model, self.system, self.prompt, self.max_tokens], separators=(",", ":"))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+
+@dataclass
+class SummaryResult:
+    request: SummaryRequest
+    text: Optional[str] = None
+    model: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_ms: int = 0
+    attempts: int = 0
+    coalesced: bool = False
+    cached: bool = False
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.text is not None
+
+    @property
+    def tokens_used(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def to_row(self) -> Tuple[Any, ...]:
+        r = self.request
+        return (r.symbol, r.window_start, r.window_end, self.model, r.prompt_version,
+                self.text, self.tokens_used, self.latency_ms, r.cache_key)
+
+
+@dataclass
+class GatewayStats:
+    requests: int = 0
+    calls: int = 0
+    coalesced: int = 0
+    cached: int = 0
+    retries: int = 0
+    failures: int = 0
+    tokens_used: int = 0
+    latency_ms_total: int = 0
+    rows_written: int = 0
+    latencies_ms: List[int] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies_ms)
+        return {
+            "requests": self.requests,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "cached": self.cached,
+            "retries": self.retries,
+            "failures": self.failures,
+            "tokens_used": self.tokens_used,
+            "avg_latency_ms": self.latency_ms_total / self.calls if self.calls else 0.0,
+            "p95_latency_ms": ordered[int(0.95 * (len(ordered) - 1))] if ordered else 0,
+            "rows_written": self.rows_written,
+        }
+
+
+async def write_summaries(rows: List[Tuple[Any, ...]]) -> int:
+    """
+    COPY summaries rows in one transaction.
+    """
+    if not rows:
+        return 0
+    try:
+        return await copy_records("summaries", SUMMARIES_COLUMNS, rows)
+    except Exception as e:
+        raise WriterError("Database error during summaries write: {}".format(e)) from e
+
+
+class LLMGateway:
+    """
+    Worker pool in front of one model endpoint. Use as an async context
+    manager, or call start() and aclose().
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        workers: Optional[int] = None,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        writer: Optional[SummaryWriter] = None,
+        cache: Optional[PromptCache] = None,
+    ):
+        self.base_url = (base_url or Config.LLM_BASE_URL).rstrip("/")
+        self.api_key = api_key if api_key is not None else Config.LLM_API_KEY
+        self.model = model or Config.LLM_MODEL
+        self.workers = workers or Config.LLM_WORKERS
+        rpm = Config.LLM_RPM if rpm is None else rpm
+        tpm = Config.LLM_TPM if tpm is None else tpm
+        # A minute's budget may be spent at once, then refills continuously
+        self.request_bucket = TokenBucket(rpm / 60.0, max(rpm, 1.0))
+        self.token_bucket = TokenBucket(tpm / 60.0, max(tpm, 1.0))
+        self.max_retries = Config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = Config.LLM_BACKOFF_BASE_SEC
+        self.backoff_max = Config.LLM_BACKOFF_MAX_SEC
+        self.write_batch = Config.LLM_WRITE_BATCH
+        self._writer = writer or write_summaries
+        self.cache = cache
+
+        self.stats = GatewayStats()
+        self._queue: "asyncio.Queue[Tuple[str, SummaryRequest, asyncio.Future]]" = asyncio.Queue(
+            maxsize=Config.LLM_QUEUE_SIZE
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._rows: List[Tuple[Any, ...]] = []
+        self._write_lock = asyncio.Lock()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    # ---- lifecycle -------------------------------------------------------
+
+    async def __aenter__(self) -> "LLMGateway":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def aclose(self) -> None:
+        """
+        Finish queued requests, stop the workers, write buffered rows.
+        """
+        if self._tasks:
+            await self._queue.join()
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+        try:
+            await self.flush()
+        finally:
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+        info("LLM gateway: {}".format(self.stats.as_dict()))
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.workers,
+                    keepalive_timeout=Config.HTTP_KEEPALIVE_SEC,
+                ),
+                timeout=aiohttp.ClientTimeout(total=Config.LLM_TIMEOUT_SEC),
+            )
+        return self._session
+
+    # ---- submission ------------------------------------------------------
+
+    async def submit(self, request: SummaryRequest) -> "asyncio.Future[SummaryResult]":
+        """
+        Queue a request (waiting while the queue is full) and return a future
+        for its result. Identical requests already queued or in flight share
+        that request's future.
+        """
+        self.start()
+        self.stats.requests += 1
+        key = request.coalesce_key(request.model or self.model)
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats.coalesced += 1
+            return future
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        await self._queue.put((key, request, future))
+        return future
+
+    async def summarize(self, request: SummaryRequest) -> SummaryResult:
+        if self.cache is not None and request.cache_key:
+            hit = await self.cache.get(request.cache_key)
+            if hit is not None:
+                self.stats.requests += 1
+                self.stats.cached += 1
+                result = SummaryResult(request=request, text=hit.text, model=hit.model, cached=True)
+                await self.record(result)
+                return result
+
+        shared = await (await self.submit(request))
+        if shared.request is request:
+            return shared
+        # Coalesced onto another request. The call was paid once, so the
+        # copy records no tokens; it gets its own row only for another window.
+        result = SummaryResult(
+            request=request, text=shared.text, model=shared.model,
+            latency_ms=shared.latency_ms, coalesced=True, error=shared.error,
+        )
+        same_window = (shared.request.symbol, shared.request.window_start, shared.request.window_end) == (
+            request.symbol, request.window_start, request.window_end
+        )
+        if result.ok and not same_window:
+            await self.record(result)
+        return result
+
+    async def summarize_many(self, requests: Sequence[SummaryRequest]) -> List[SummaryResult]:
+        """
+        Results in request order; failed requests have .error set.
+        """
+        return list(await asyncio.gather(*(self.summarize(r) for r in requests)))
+
+    # ---- workers ---------------------------------------------------------
+
+    async def _worker(self) -> None:
+        while True:
+            key, request, future = await self._queue.get()
+            try:
+                result = await self._call_with_retries(request)
+                if result.ok:
+                    if self.cache is not None and request.cache_key:
+                        self.cache.put(request.cache_key, result.text, result.model)
+                    await self.record(result)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._inflight.pop(key, None)
+                self._queue.task_done()
+
+    async def _call_with_retries(self, request: SummaryRequest) -> SummaryResult:
+        model = request.model or self.model
+        max_tokens = request.max_tokens or Config.LLM_MAX_TOKENS
+        estimate = min(estimate_tokens(request.system) + estimate_tokens(request.prompt) + max_tokens,
+                       self.token_bucket.capacity)
+        result = SummaryResult(request=request, model=model)
+        for attempt in range(self.max_retries + 1):
+            result.attempts = attempt + 1
+            await self.request_bucket.acquire()
+            await self.token_bucket.acquire(estimate)
+            started = time.monotonic()
+            try:
+                payload = await self._post(model, request, max_tokens)
+            except GatewayError as e:
+                self.token_bucket.refund(estimate)
+                if not e.retryable or attempt == self.max_retries:
+                    result.error = str(e)
+                    self.stats.failures += 1
+                    warning("LLM call for {} failed after {} attempts: {}".format(request.symbol, attempt + 1, e))
+                    return result
+                self.stats.retries += 1
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if e.retry_after is not None:
+                    delay = max(delay, e.retry_after)
+                debug("Retrying LLM call for {} in {:.2f}s: {}".format(request.symbol, delay, e))
+                await asyncio.sleep(delay)
+                continue
+
+            result.latency_ms = int((time.monotonic() - started) * 1000)
+            try:
+                result.text = payload["choices"][0]["message"]["content"]
+            except (KeyError, IndexError, TypeError):
+                result.error = "Malformed model response: {}".format(str(payload)[:200])
+                self.stats.failures += 1
+                return result
+            usage = payload.get("usage") or {}
+            result.model = payload.get("model") or model
+            result.prompt_tokens = int(usage.get("prompt_tokens") or 0)
+            result.completion_tokens = int(usage.get("completion_tokens") or 0)
+            if result.tokens_used:
+                # Settle the reservation: refund what was unused, debit any overrun
+                if result.tokens_used < estimate:
+                    self.token_bucket.refund(estimate - result.tokens_used)
+                else:
+                    self.token_bucket.debit(result.tokens_used - estimate)
+
+            self.stats.calls += 1
+            self.stats.tokens_used += result.tokens_used
+            self.stats.latency_ms_total += result.latency_ms
+            self.stats.latencies_ms.append(result.latency_ms)
+            return result
+        return result
+
+    async def _post(self, model: str, request: SummaryRequest, max_tokens: int) -> Dict[str, Any]:
+        messages = ([{"role": "system", "content": request.system}] if request.system else []) + [
+            {"role": "user", "content": request.prompt}
+        ]
+        headers = {"Authorization": "Bearer {}".format(self.api_key)} if self.api_key else {}
+        body = {"model": model, "messages": messages, "max_tokens": max_tokens,
+                "temperature": Config.LLM_TEMPERATURE}
+        try:
+            async with self._get_session().post(
+                self.base_url + "/chat/completions", json=body, headers=headers
+            ) as response:
+                text = await response.text()
+                if response.status == 200:
+                    return json.loads(text)
+                retry_after = response.headers.get("Retry-After")
+                raise GatewayError(
+                    "Model endpoint returned {}: {}".format(response.status, text[:200]),
+                    retryable=response.status == 429 or response.status >= 500,
+                    retry_after=float(retry_after) if retry_after and retry_after.replace(".", "", 1).isdigit() else None,
+                )
+        except asyncio.TimeoutError as e:
+            raise GatewayError("Timeout calling model endpoint: {}".format(e), retryable=True) from e
+        except aiohttp.ClientError as e:
+            raise GatewayError("HTTP error calling model endpoint: {}".format(e), retryable=True) from e
+        except ValueError as e:
+            raise GatewayError("Invalid JSON from model endpoint: {}".format(e)) from e
+
+    # ---- accounting ------------------------------------------------------
+
+    async def record(self, result: SummaryResult) -> None:
+        """
+        Buffer the result's summaries row (unless its request opted out).
+        """
+        if not result.request.record:
+            return
+        self._rows.append(result.to_row())
+        if len(self._rows) >= self.write_batch:
+            try:
+                await self.flush()
+            except Exception:
+                pass  # flush() logged it; the rows stay buffered for the next one
+
+    async def flush(self) -> int:
+        """
+        Write buffered summaries rows in one batch.
+        """
+        async with self._write_lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                written = await self._writer(rows)
+            except Exception as e:
+                error("Failed to write {} summaries: {}".format(len(rows), e))
+                self._rows = rows + self._rows
+                raise
+            self.stats.rows_written += written
+            return written
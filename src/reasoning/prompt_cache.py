@@ -0,0 +1,178 @@
+"""
+Prompt-response cache keyed on a context fingerprint
+
+fingerprint() hashes (prompt_version, model, inputs) into a stable key:
+dict keys are sorted, text whitespace is collapsed and numbers are
+quantized, so quiet windows with near-identical metrics, events and context
+share a key. Quantization trades freshness for hit rate:
+- PROMPT_CACHE_SIGNIFICANT_DIGITS rounds every float to that many
+  significant digits (0 keeps full precision)
+- PROMPT_CACHE_QUANTA ("volatility:0.0005,momentum:0.001") rounds the
+  named fields to a fixed step instead
+Include the symbol in inputs whenever the answer mentions it (prompts
+rendered from reasoning.prompt_templates do), or one symbol's summary is
+served for another. Leave out window timestamps, or nothing will ever match.
+
+PromptCache.get() looks in two tiers:
+- memory: LRU of PROMPT_CACHE_SIZE entries, each valid PROMPT_CACHE_TTL_SEC
+- Postgres: the newest summaries row with the same cache_key created within
+  the TTL that paid for a model call (tokens_used > 0). Rows recorded for
+  cache hits and coalesced copies carry the key too but do not count, so
+  hits never extend an entry's lifetime.
+A database hit is promoted to memory for the rest of its TTL. stats()
+reports hits per tier.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Mapping, Optional, Tuple
+import hashlib
+import json
+import math
+import re
+import time
+
+from core.config import Config
+from core.db import fetch_one
+
+_SPACE = re.compile(r"\s+")
+
+
+def parse_quanta(spec: Optional[str] = None) -> Dict[str, float]:
+    """
+    "volatility:0.0005,momentum:0.001" -> {"volatility": 0.0005, "momentum": 0.001}
+    """
+    quanta = {}
+    for part in (Config.PROMPT_CACHE_QUANTA if spec is None else spec).split(","):
+        name, _, step = part.partition(":")
+        if name.strip() and step.strip():
+            quanta[name.strip()] = float(step)
+    return quanta
+
+
+def quantize(value: float, step: Optional[float], digits: int) -> float:
+    if math.isnan(value) or math.isinf(value):
+        return value
+    if step:
+        return float("{:.12g}".format(round(value / step) * step))
+    if digits > 0:
+        return float("{:.{}g}".format(value, digits))
+    return value
+
+
+def normalize(value: Any, digits: int, quanta: Mapping[str, float], field: Optional[str] = None) -> Any:
+    """
+    JSON-ready canonical form of value (see the module docstring).
+    """
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (float, Decimal)):
+        x = quantize(float(value), quanta.get(field or ""), digits)
+        return None if math.isnan(x) else x
+    if isinstance(value, int):
+        step = quanta.get(field or "")
+        return quantize(float(value), step, 0) if step else value
+    if isinstance(value, str):
+        return _SPACE.sub(" ", value).strip()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Mapping):
+        return {str(k): normalize(v, digits, quanta, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v, digits, quanta, field) for v in value]
+    return str(value)
+
+
+def fingerprint(
+    prompt_version: Optional[str],
+    model: str,
+    inputs: Mapping[str, Any],
+    digits: Optional[int] = None,
+    quanta: Optional[Mapping[str, float]] = None,
+) -> str:
+    """
+    Stable sha256 key for a summarizer call.
+    """
+    digits = Config.PROMPT_CACHE_SIGNIFICANT_DIGITS if digits is None else digits
+    quanta = parse_quanta() if quanta is None else quanta
+    canonical = json.dumps(
+        [prompt_version or "", model, normalize(inputs, digits, quanta)],
+        sort_keys=True, separators=(",", ":"), allow_nan=False,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    text: str
+    model: Optional[str]
+    source: str         # "memory" or "db"
+
+
+class PromptCache:
+    """
+    LRU + TTL memory tier in front of the summaries table.
+    """
+
+    def __init__(self, maxsize: Optional[int] = None, ttl_sec: Optional[float] = None, use_db: bool = True):
+        self.maxsize = maxsize or Config.PROMPT_CACHE_SIZE
+        self.ttl_sec = Config.PROMPT_CACHE_TTL_SEC if ttl_sec is None else ttl_sec
+        self.use_db = use_db
+        self._entries: "OrderedDict[str, Tuple[float, str, Optional[str]]]" = OrderedDict()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def _get_memory(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, text, model = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            self.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return CachedResponse(text, model, "memory")
+
+    def put(self, key: str, text: str, model: Optional[str], ttl_sec: Optional[float] = None) -> None:
+        ttl_sec = self.ttl_sec if ttl_sec is None else ttl_sec
+        if ttl_sec <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl_sec, text, model)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        hit = self._get_memory(key)
+        if hit is not None:
+            self.memory_hits += 1
+            return hit
+        if self.use_db:
+            row = await fetch_one(
+                "SELECT text, model, EXTRACT(EPOCH FROM NOW() - created_at)::float8 AS age FROM summaries "
+                "WHERE cache_key = $1 AND text IS NOT NULL AND tokens_used > 0 "
+                "AND created_at >= NOW() - make_interval(secs => $2) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (key, float(self.ttl_sec)),
+            )
+            if row is not None:
+                self.db_hits += 1
+                self.put(key, row["text"], row["model"], self.ttl_sec - (row.get("age") or 0.0))
+                return CachedResponse(row["text"], row["model"], "db")
+        self.misses += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": (self.memory_hits + self.db_hits) / lookups if lookups else 0.0,
+        }
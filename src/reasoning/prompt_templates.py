@@ -0,0 +1,311 @@
+"""
+Prompt and summary templates
+
+Prompt templates live in prompt_versions (name, version, content). Content
+is plain text with placeholders:
+    {symbol} {window_start} {window_end} {metrics} {events} {news} {context}
+({{ and }} for literal braces).
+
+TemplateRegistry.load() reads every version once and compiles it:
+- the static prefix (everything up to the last blank line before the first
+  placeholder) is kept as one string with its token estimate; it becomes
+  the system message, identical for every symbol
+- the rest is pre-split into (literal, placeholder) parts, so rendering a
+  symbol only joins the variable tail
+
+CompiledTemplate.assemble() fills the tail within a hard token budget
+(PROMPT_TOKEN_BUDGET, counted with gateway.estimate_tokens). Each of the
+events, news and context sections is a list of lines, most important first.
+While the prompt is over budget, the last line of the first non-empty
+section in PROMPT_TRUNCATION_ORDER is dropped. PromptBudgetError is raised
+when even the fixed parts do not fit.
+
+template_summary() renders the fixed-form summary used instead of a model
+call for windows the rules gate (reasoning.rules) marks as "template".
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import string
+
+from core.config import Config
+from core.db import fetch
+from reasoning.gateway import estimate_tokens
+
+TEMPLATE_MODEL = "template"
+SECTIONS = ("metrics", "events", "news", "context")
+PLACEHOLDERS = ("symbol", "window_start", "window_end") + SECTIONS
+EMPTY_SECTION = "none"
+
+SEVERITY_ORDER = {"high": 0, "medium": 1, "low": 2}
+
+DEFAULT_TEMPLATE_NAME = "market_summary"
+DEFAULT_TEMPLATE_VERSION = "builtin-v1"
+DEFAULT_TEMPLATE = """You are a markets analyst writing short, factual updates for traders.
+Use only the data given. Lead with the most important change, mention
+notable events and news that explain it, and say so when nothing stands out.
+Answer in at most three sentences, without advice or predictions.
+
+Symbol: {symbol}
+Window: {window_start} to {window_end} UTC
+
+Metrics:
+{metrics}
+
+Events:
+{events}
+
+News:
+{news}
+
+Market context:
+{context}
+"""
+
+
+class PromptBudgetError(Exception):
+    """
+    A prompt does not fit its token budget even with every optional line dropped.
+    """
+    pass
+
+
+@dataclass
+class AssembledPrompt:
+    system: str
+    prompt: str
+    prompt_version: str
+    tokens: int
+    dropped: Dict[str, int] = field(default_factory=dict)
+
+
+class CompiledTemplate:
+    """
+    One prompt_versions row, split into a static prefix and a variable tail.
+    """
+
+    def __init__(self, name: str, version: str, content: str):
+        self.name = name
+        self.version = version
+        self.parts = _compile(content)
+        self.prefix, self.parts = _split_prefix(self.parts)
+        self.prefix_tokens = estimate_tokens(self.prefix)
+        self.literal_tokens = sum(estimate_tokens(literal) for literal, _ in self.parts)
+        self.fields = frozenset(name for _, name in self.parts if name)
+
+    @property
+    def prompt_version(self) -> str:
+        return "{}:{}".format(self.name, self.version)
+
+    def render(self, values: Mapping[str, str]) -> str:
+        return "".join(literal + (values[name] if name else "") for literal, name in self.parts)
+
+    def assemble(
+        self,
+        symbol: str,
+        window_start: datetime,
+        window_end: datetime,
+        metrics: Optional[Mapping[str, Any]] = None,
+        events: Optional[Sequence[Mapping[str, Any]]] = None,
+        news: Optional[Sequence[Mapping[str, Any]]] = None,
+        context: Optional[Mapping[str, Any]] = None,
+        budget: Optional[int] = None,
+    ) -> AssembledPrompt:
+        """
+        System prefix and rendered tail within `budget` tokens (see the
+        module docstring for the truncation rules).
+        """
+        budget = budget or Config.PROMPT_TOKEN_BUDGET
+        values = {
+            "symbol": symbol,
+            "window_start": window_start.strftime("%Y-%m-%d %H:%M"),
+            "window_end": window_end.strftime("%Y-%m-%d %H:%M"),
+        }
+        sections = {
+            "metrics": metric_lines(metrics or {}),
+            "events": event_lines(events or ()),
+            "news": news_lines(news or ()),
+            "context": context_lines(context or {}),
+        }
+        sections = {name: lines for name, lines in sections.items() if name in self.fields}
+        costs = {name: [estimate_tokens(line + "\n") for line in lines] for name, lines in sections.items()}
+
+        fixed = self.prefix_tokens + self.literal_tokens + sum(
+            estimate_tokens(values[name]) for name in ("symbol", "window_start", "window_end") if name in self.fields
+        )
+        empty = estimate_tokens(EMPTY_SECTION)
+        total = fixed + sum(sum(c) if c else empty for c in costs.values())
+
+        dropped: Dict[str, int] = {}
+        for name in _truncation_order():
+            lines, cost = sections.get(name), costs.get(name)
+            while total > budget and lines:
+                lines.pop()
+                total -= cost.pop() - (0 if lines else empty)
+                dropped[name] = dropped.get(name, 0) + 1
+        if total > budget:
+            raise PromptBudgetError("Prompt {} for {} needs {} tokens, over the budget of {}.".format(
+                self.prompt_version, symbol, total, budget
+            ))
+
+        for name, lines in sections.items():
+            values[name] = "\n".join(lines) or EMPTY_SECTION
+        prompt = self.render(values)
+        return AssembledPrompt(
+            system=self.prefix,
+            prompt=prompt,
+            prompt_version=self.prompt_version,
+            tokens=self.prefix_tokens + estimate_tokens(prompt),
+            dropped=dropped,
+        )
+
+
+def _compile(content: str) -> List[Tuple[str, Optional[str]]]:
+    parts = []
+    for literal, name, spec, conversion in string.Formatter().parse(content):
+        if name is not None and (name not in PLACEHOLDERS or spec or conversion):
+            raise ValueError("Unsupported placeholder '{{{}}}' in prompt template. Supported: {}.".format(
+                name, ", ".join(PLACEHOLDERS)
+            ))
+        parts.append((literal, name))
+    return parts
+
+
+def _split_prefix(parts: List[Tuple[str, Optional[str]]]) -> Tuple[str, List[Tuple[str, Optional[str]]]]:
+    # Static text before the first placeholder, cut at a paragraph (or line) break
+    literal, name = parts[0] if parts else ("", None)
+    if name is None:
+        return literal.strip(), []
+    cut = literal.rfind("\n\n")
+    cut = literal.rfind("\n") if cut < 0 else cut
+    if cut < 0:
+        return "", parts
+    return literal[:cut].strip(), [(literal[cut:].lstrip("\n"), name)] + parts[1:]
+
+
+def _truncation_order() -> List[str]:
+    order = [name.strip() for name in Config.PROMPT_TRUNCATION_ORDER.split(",") if name.strip()]
+    for name in order:
+        if name not in SECTIONS:
+            raise ValueError("Unknown prompt section '{}' in PROMPT_TRUNCATION_ORDER.".format(name))
+    return order
+
+
+def _number(value: Optional[float], spec: str, missing: str = "n/a") -> str:
+    if value is None or value != value:
+        return missing
+    return format(value, spec)
+
+
+def metric_lines(metrics: Mapping[str, Any]) -> List[str]:
+    """
+    "name: value" per metric, in the given order; missing values are left out.
+    """
+    lines = []
+    for name, value in metrics.items():
+        if value is None or value != value:
+            continue
+        if isinstance(value, float):
+            value = "{:.6g}".format(value)
+        lines.append("{}: {}".format(name, value))
+    return lines
+
+
+def event_lines(events: Sequence[Mapping[str, Any]]) -> List[str]:
+    """
+    One line per event, most severe (then latest) first.
+    """
+    ordered = sorted(
+        events,
+        key=lambda e: (SEVERITY_ORDER.get(e.get("severity") or "", 3),
+                       -(e["window_end"].timestamp() if e.get("window_end") else 0)),
+    )
+    lines = []
+    for event in ordered:
+        details = event.get("details") or {}
+        when = event["window_end"].strftime("%H:%M") if event.get("window_end") else "?"
+        lines.append("- {} {} ({}){}".format(
+            when, event.get("type"), event.get("severity") or "n/a",
+            ": " + ", ".join("{}={}".format(k, v) for k, v in details.items()) if details else "",
+        ))
+    return lines
+
+
+def news_lines(news: Sequence[Mapping[str, Any]]) -> List[str]:
+    """
+    One line per news item, latest first.
+    """
+    ordered = sorted(news, key=lambda n: -(n["published_at"].timestamp() if n.get("published_at") else 0))
+    lines = []
+    for item in ordered[:Config.PROMPT_MAX_NEWS]:
+        when = item["published_at"].strftime("%Y-%m-%d %H:%M") if item.get("published_at") else "?"
+        summary = item.get("summary") or ""
+        lines.append("- {} {}{}".format(when, item.get("title") or "", ": " + summary if summary else ""))
+    return lines
+
+
+def context_lines(context: Mapping[str, Any]) -> List[str]:
+    return metric_lines(context)
+
+
+class TemplateRegistry:
+    """
+    Compiled prompt templates by (name, version); the built-in default is
+    always available.
+    """
+
+    def __init__(self, rows: Sequence[Mapping[str, Any]] = ()):
+        self._templates: Dict[Tuple[str, str], CompiledTemplate] = {}
+        self._latest: Dict[str, CompiledTemplate] = {}
+        self.add(DEFAULT_TEMPLATE_NAME, DEFAULT_TEMPLATE_VERSION, DEFAULT_TEMPLATE)
+        for row in rows:
+            if row.get("content"):
+                self.add(row["name"], row.get("version") or "", row["content"])
+
+    @classmethod
+    async def load(cls) -> "TemplateRegistry":
+        rows = await fetch("SELECT name, version, content FROM prompt_versions ORDER BY created_at, version")
+        return cls(rows)
+
+    def add(self, name: str, version: str, content: str) -> CompiledTemplate:
+        """
+        Compile and register a template; the last one added is the latest.
+        """
+        template = CompiledTemplate(name, version, content)
+        self._templates[(name, version)] = template
+        self._latest[name] = template
+        return template
+
+    def get(self, name: Optional[str] = None, version: Optional[str] = None) -> CompiledTemplate:
+        name = name or Config.PROMPT_TEMPLATE_NAME
+        version = Config.PROMPT_TEMPLATE_VERSION if version is None else version
+        template = self._templates.get((name, version)) if version else self._latest.get(name)
+        if template is None:
+            raise KeyError("Unknown prompt template {}:{}".format(name, version or "latest"))
+        return template
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+
+def template_summary(
+    symbol: str,
+    window_start: datetime,
+    window_end: datetime,
+    values: Mapping[str, Optional[float]],
+) -> str:
+    """
+    One-line summary of a quiet window from its metrics (last_price, return,
+    volume, trade_count, volatility; missing values print as n/a).
+    """
+    trades = values.get("trade_count")
+    return "{} {}-{} UTC: no notable activity. Last {} ({}), volume {} over {} trades, volatility {}.".format(
+        symbol,
+        window_start.strftime("%H:%M"),
+        window_end.strftime("%H:%M"),
+        _number(values.get("last_price"), ".2f"),
+        _number(values.get("return"), "+.2%"),
+        _number(values.get("volume"), ",.0f"),
+        _number(trades, ".0f", "0"),
+        _number(values.get("volatility"), ".4f"),
+    )
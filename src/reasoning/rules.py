@@ -0,0 +1,343 @@
+"""
+Rule-based gate in front of the summarizer
+
+Every symbol-window in derived_metrics gets one of three actions:
+- model:    worth a full LLM summary
+- template: a fixed-form summary (reasoning.prompt_templates) is enough
+- skip:     nothing is written
+
+Rules are declarative, "action:condition[&condition...]" separated by
+commas (RULES_SPEC), e.g.
+
+    skip:trade_count<1,model:events_high>=1,model:abs_return>=0.01,template:trade_count>=1
+
+A condition is "<feature> <op> <number>" with op one of >=, >, <=, <, ==,
+!=. Features are the derived_metrics columns (vwap, volatility, momentum,
+liquidity_ratio, volume, trade_count, first_price, last_price), the derived
+return, abs_return and abs_momentum, and event counts joined from the events
+table: events, events_high, events_medium, events_low and events.<type>
+(e.g. events.volume_spike). The first matching rule wins; windows matching
+none get RULES_DEFAULT. A missing (NULL) value never satisfies a condition.
+
+Only windows of RULES_WINDOW_SEC on that grid (window_start a multiple of
+it, so sliding metric windows are gated once, not once per step) and
+without a summaries row yet are gated. Template and model windows get
+their row, so reruns over the last RULES_LOOKBACK_SEC only pick up new or
+still unsummarized windows (e.g. after a failed model call).
+
+RuleSet.compile() parses the spec once. evaluate() then computes only the
+features the rules reference, as numpy columns over all symbols of the
+window, and assigns actions with one vectorized comparison per condition.
+
+    python -m reasoning.rules     # gate the latest windows, write templates
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+import asyncio
+import operator
+import re
+
+import numpy as np
+
+from core.config import Config
+from core.db import close_pool, fetch, init_pool, stream_columns
+from core.logging import info
+from ingest.batch import float_column, ts_column
+from reasoning.gateway import write_summaries
+from reasoning.prompt_templates import TEMPLATE_MODEL, template_summary
+
+ACTIONS = ("model", "template", "skip")
+
+METRIC_FEATURES = (
+    "vwap", "volatility", "momentum", "liquidity_ratio", "volume", "trade_count", "first_price", "last_price",
+)
+DERIVED_FEATURES = ("return", "abs_return", "abs_momentum")
+EVENT_FEATURES = ("events", "events_high", "events_medium", "events_low")
+EVENT_TYPE_PREFIX = "events."
+
+_OPERATORS: Dict[str, Callable[[np.ndarray, float], np.ndarray]] = {
+    ">=": operator.ge, ">": operator.gt, "<=": operator.le, "<": operator.lt, "==": operator.eq, "!=": operator.ne,
+}
+_CONDITION = re.compile(r"^\s*([A-Za-z_][\w.]*)\s*(>=|<=|==|!=|>|<)\s*([-+0-9.eE]+)\s*$")
+
+_METRICS_SQL = (
+    "SELECT m.symbol, m.window_start, m.window_end, m.vwap::float8 AS vwap, m.volatility::float8 AS volatility, "
+    "m.momentum::float8 AS momentum, m.liquidity_ratio::float8 AS liquidity_ratio, m.volume::float8 AS volume, "
+    "m.trade_count::float8 AS trade_count, m.first_price::float8 AS first_price, "
+    "m.last_price::float8 AS last_price "
+    "FROM derived_metrics m WHERE m.window_end > $1 AND m.window_end <= $2 "
+    "AND m.window_end - m.window_start = make_interval(secs => $3) "
+    "AND MOD(EXTRACT(EPOCH FROM m.window_start)::bigint, $4) = 0 "
+    "AND NOT EXISTS (SELECT 1 FROM summaries s WHERE s.symbol = m.symbol "
+    "AND s.window_start = m.window_start AND s.window_end = m.window_end)"
+)
+_EVENTS_SQL = (
+    "SELECT symbol, window_start, window_end, type, severity FROM events "
+    "WHERE window_end > $1 - make_interval(secs => $3) AND window_end <= $2"
+)
+
+
+class Condition(NamedTuple):
+    feature: str
+    op: str
+    value: float
+
+
+class Rule(NamedTuple):
+    action: str
+    conditions: Tuple[Condition, ...]
+
+    def __str__(self) -> str:
+        return "{}:{}".format(self.action, "&".join("{}{}{:g}".format(*c) for c in self.conditions))
+
+
+class Decision(NamedTuple):
+    symbol: str
+    window_start: datetime
+    window_end: datetime
+    action: str
+    rule: Optional[str]     # None when the default applied
+
+
+def parse_condition(text: str) -> Condition:
+    match = _CONDITION.match(text)
+    if not match:
+        raise ValueError("Invalid rule condition '{}'. Expected <feature><op><number>.".format(text.strip()))
+    feature, op, value = match.groups()
+    if not (feature in METRIC_FEATURES or feature in DERIVED_FEATURES or feature in EVENT_FEATURES
+            or (feature.startswith(EVENT_TYPE_PREFIX) and len(feature) > len(EVENT_TYPE_PREFIX))):
+        raise ValueError("Unknown rule feature '{}'.".format(feature))
+    try:
+        return Condition(feature, op, float(value))
+    except ValueError:
+        raise ValueError("Invalid number in rule condition '{}'.".format(text.strip())) from None
+
+
+def parse_rules(spec: str) -> List[Rule]:
+    """
+    "model:events_high>=1,template:trade_count>=1" -> [Rule, Rule]
+    """
+    rules = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        action, sep, body = part.partition(":")
+        action = action.strip().lower()
+        if not sep or action not in ACTIONS:
+            raise ValueError("Invalid rule '{}'. Expected <{}>:<conditions>.".format(part.strip(), "|".join(ACTIONS)))
+        rules.append(Rule(action, tuple(parse_condition(c) for c in body.split("&"))))
+    return rules
+
+
+class GateResult:
+    """
+    Actions for one batch of symbol-windows, as parallel arrays.
+    """
+
+    def __init__(self, columns: Mapping[str, Sequence[Any]], actions: np.ndarray, matched: np.ndarray,
+                 rules: Sequence[Rule], features: Dict[str, np.ndarray]):
+        self.columns = columns
+        self.actions = actions      # index into ACTIONS
+        self.matched = matched      # index into rules, -1 for the default
+        self.rules = rules
+        self.features = features
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def indices(self, action: str) -> List[int]:
+        return np.flatnonzero(self.actions == ACTIONS.index(action)).tolist()
+
+    def counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.actions, minlength=len(ACTIONS))
+        return {action: int(counts[i]) for i, action in enumerate(ACTIONS)}
+
+    def decision(self, i: int) -> Decision:
+        rule = int(self.matched[i])
+        return Decision(
+            self.columns["symbol"][i], self.columns["window_start"][i], self.columns["window_end"][i],
+            ACTIONS[self.actions[i]], str(self.rules[rule]) if rule >= 0 else None,
+        )
+
+    def decisions(self, action: Optional[str] = None) -> List[Decision]:
+        rows = self.indices(action) if action else range(len(self))
+        return [self.decision(i) for i in rows]
+
+    def values(self, i: int) -> Dict[str, Optional[float]]:
+        """
+        Metric and derived feature values of row i (None where missing).
+        """
+        out = {}
+        for name in METRIC_FEATURES + DERIVED_FEATURES:
+            column = self.features.get(name)
+            if column is None:
+                column = self.features[name] = _feature(name, self.columns, {}, len(self))
+            x = float(column[i])
+            out[name] = None if np.isnan(x) else x
+        return out
+
+
+class RuleSet:
+    """
+    Compiled gate rules: first match wins, unmatched rows get `default`.
+    """
+
+    def __init__(self, rules: Sequence[Rule], default: str = "skip"):
+        if default not in ACTIONS:
+            raise ValueError("Unknown default action '{}'. Supported actions: {}.".format(default, ", ".join(ACTIONS)))
+        self.rules = list(rules)
+        self.default = default
+        self.features = sorted({c.feature for rule in self.rules for c in rule.conditions})
+        self.needs_events = any(f.startswith("events") for f in self.features)
+
+    @classmethod
+    def compile(cls, spec: Optional[str] = None, default: Optional[str] = None) -> "RuleSet":
+        return cls(
+            parse_rules(Config.RULES_SPEC if spec is None else spec),
+            (Config.RULES_DEFAULT if default is None else default).strip().lower(),
+        )
+
+    def evaluate(
+        self,
+        columns: Mapping[str, Sequence[Any]],
+        events: Optional[Mapping[str, Sequence[Any]]] = None,
+    ) -> GateResult:
+        """
+        Actions for derived_metrics columns (symbol, window_start, window_end
+        and the metric features) given events columns (symbol, window_start,
+        window_end, type, severity).
+        """
+        n = len(columns.get("symbol", ()))
+        counts = event_counts(columns, events) if self.needs_events and events else {}
+        features = {name: _feature(name, columns, counts, n) for name in self.features}
+
+        actions = np.full(n, ACTIONS.index(self.default), dtype=np.int64)
+        matched = np.full(n, -1, dtype=np.int64)
+        undecided = np.ones(n, dtype=bool)
+        for i, rule in enumerate(self.rules):
+            hit = undecided.copy()
+            for c in rule.conditions:
+                column = features[c.feature]
+                hit &= _OPERATORS[c.op](column, c.value) & ~np.isnan(column)
+            actions[hit] = ACTIONS.index(rule.action)
+            matched[hit] = i
+            undecided &= ~hit
+        return GateResult(columns, actions, matched, self.rules, features)
+
+
+def _feature(name: str, columns: Mapping[str, Sequence[Any]], counts: Mapping[str, np.ndarray], n: int) -> np.ndarray:
+    # NaN marks a missing value; comparisons with NaN are always False
+    if name.startswith("events"):
+        return counts.get(name, np.zeros(n))
+    if name in METRIC_FEATURES:
+        return float_column(columns[name]) if name in columns else np.full(n, np.nan)
+    if name == "abs_momentum":
+        return np.abs(_feature("momentum", columns, counts, n))
+    first = _feature("first_price", columns, counts, n)
+    last = _feature("last_price", columns, counts, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = np.where(first > 0, last / first - 1.0, np.nan)
+    return np.abs(ret) if name == "abs_return" else ret
+
+
+def event_counts(
+    columns: Mapping[str, Sequence[Any]],
+    events: Mapping[str, Sequence[Any]],
+) -> Dict[str, np.ndarray]:
+    """
+    Per metrics row, the number of events of the same symbol whose window
+    lies inside the row's window: in total, per severity and per type.
+    """
+    n = len(columns["symbol"])
+    starts = ts_column(columns["window_start"])
+    ends = ts_column(columns["window_end"])
+    rows_by_symbol: Dict[str, List[int]] = {}
+    for i, symbol in enumerate(columns["symbol"]):
+        rows_by_symbol.setdefault(symbol, []).append(i)
+    by_symbol = {symbol: np.array(rows, dtype=np.int64) for symbol, rows in rows_by_symbol.items()}
+
+    ev_starts = ts_column(events["window_start"])
+    ev_ends = ts_column(events["window_end"])
+    hits: Dict[str, List[int]] = {}
+    for j, symbol in enumerate(events["symbol"]):
+        rows = by_symbol.get(symbol)
+        if rows is None:
+            continue
+        rows = rows[(starts[rows] <= ev_starts[j]) & (ends[rows] >= ev_ends[j])]
+        if not len(rows):
+            continue
+        keys = ["events", EVENT_TYPE_PREFIX + str(events["type"][j])]
+        if events["severity"][j]:
+            keys.append("events_{}".format(events["severity"][j]))
+        for key in keys:
+            hits.setdefault(key, []).extend(rows.tolist())
+    return {key: np.bincount(rows, minlength=n).astype(np.float64) for key, rows in hits.items()}
+
+
+async def load_window(start: datetime, end: datetime, window_sec: int, with_events: bool = True) -> Tuple[
+        Dict[str, List[Any]], Dict[str, List[Any]]]:
+    """
+    (derived_metrics columns, events columns) for windows of window_sec
+    ending in (start, end] that start on the window_sec grid and have no
+    summaries row yet.
+    """
+    columns: Dict[str, List[Any]] = {}
+    async for cols in stream_columns(_METRICS_SQL, (start, end, float(window_sec), int(window_sec))):
+        for name, values in cols.items():
+            columns.setdefault(name, []).extend(values)
+    events: Dict[str, List[Any]] = {}
+    if with_events and columns:
+        rows = await fetch(_EVENTS_SQL, (start, end, float(window_sec)))
+        events = {name: [row[name] for row in rows] for name in ("symbol", "window_start", "window_end",
+                                                                 "type", "severity")}
+    return columns, events
+
+
+def template_rows(result: GateResult, prompt_version: Optional[str] = None) -> List[Tuple[Any, ...]]:
+    """
+    summaries rows (gateway.SUMMARIES_COLUMNS) for the "template" windows.
+    """
+    version = prompt_version or Config.RULES_TEMPLATE_VERSION
+    rows = []
+    for i in result.indices("template"):
+        d = result.decision(i)
+        text = template_summary(d.symbol, d.window_start, d.window_end, result.values(i))
+        rows.append((d.symbol, d.window_start, d.window_end, TEMPLATE_MODEL, version, text, 0, 0, None))
+    return rows
+
+
+async def gate(
+    rules: RuleSet,
+    start: datetime,
+    end: datetime,
+    window_sec: Optional[int] = None,
+    writer=None,
+) -> GateResult:
+    """
+    Evaluate the rules over the unsummarized grid windows ending in
+    (start, end] and write template summaries. The caller sends
+    result.decisions("model") to the summarizer.
+    """
+    window_sec = window_sec or Config.RULES_WINDOW_SEC
+    columns, events = await load_window(start, end, window_sec, rules.needs_events)
+    result = rules.evaluate(columns, events)
+    rows = template_rows(result)
+    if rows:
+        await (writer or write_summaries)(rows)
+    info("Rules gate: {} windows -> {}.".format(
+        len(result), ", ".join("{} {}".format(count, action) for action, count in result.counts().items())
+    ))
+    return result
+
+
+async def main():
+    await init_pool()
+    try:
+        end = datetime.now(timezone.utc)
+        await gate(RuleSet.compile(), end - timedelta(seconds=Config.RULES_LOOKBACK_SEC), end)
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
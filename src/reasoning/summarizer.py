@@ -0,0 +1,308 @@
+"""
+Window summarizer
+
+Summarizer turns SummaryInputs (one symbol-window with its metrics, events,
+news and market context) into summaries through the LLMGateway, with
+prompts from a compiled template (reasoning.prompt_templates):
+- single mode: one request per symbol; with a PromptCache on the gateway
+  the request carries a fingerprint of the symbol and its inputs as
+  cache_key (the answer names the symbol, so it is never reused for another)
+- batch mode: low-activity inputs (no events, no news) are packed
+  SUMMARIZER_BATCH_SIZE at a time into one request that asks for a JSON
+  object {symbol: summary}. The answer is split into one summaries row per
+  symbol, sharing the call's tokens. If the answer cannot be parsed, the
+  whole batch falls back to single calls; symbols missing from a parsed
+  answer fall back individually.
+
+    python -m reasoning.summarizer   # gate the latest windows and summarize
+"""
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+import asyncio
+import json
+import re
+
+from core.config import Config
+from core.db import close_pool, fetch, fetch_one, init_pool
+from core.logging import info, warning
+from reasoning.gateway import LLMGateway, SummaryRequest, SummaryResult
+from reasoning.prompt_cache import PromptCache, fingerprint
+from reasoning.prompt_templates import CompiledTemplate, PromptBudgetError, TemplateRegistry
+from reasoning.rules import GateResult, RuleSet, gate
+
+BATCH_SEPARATOR = "\n\n---\n\n"
+BATCH_INSTRUCTIONS = (
+    "Several symbols follow, separated by \"---\". Write one summary per symbol following the "
+    "instructions above. Reply with only a JSON object mapping each symbol to its summary text, "
+    "for example {\"AAPL\": \"...\", \"MSFT\": \"...\"}."
+)
+BATCH_VERSION_SUFFIX = "+batch"
+
+PROMPT_METRICS = ("last_price", "return", "vwap", "volume", "trade_count", "volatility", "momentum", "liquidity_ratio")
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+
+
+@dataclass
+class SummaryInput:
+    symbol: str
+    window_start: datetime
+    window_end: datetime
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    news: List[Dict[str, Any]] = field(default_factory=list)
+    context: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def low_activity(self) -> bool:
+        return not self.events and not self.news
+
+
+@dataclass
+class SummarizerStats:
+    singles: int = 0
+    batches: int = 0
+    batched_symbols: int = 0
+    fallbacks: int = 0
+
+
+def parse_batch(text: str, symbols: Sequence[str]) -> Dict[str, str]:
+    """
+    {symbol: summary} from a batch answer: a JSON object keyed by symbol, or
+    a list of {"symbol", "summary"} objects (optionally under "summaries"),
+    possibly inside a code fence. Raises ValueError when no requested
+    symbol can be read from it.
+    """
+    body = _FENCE.sub("", text or "")
+    start, end = body.find("{"), body.rfind("}")
+    list_start = body.find("[")
+    if list_start >= 0 and (start < 0 or list_start < start):
+        start, end = list_start, body.rfind("]")
+    if start < 0 or end <= start:
+        raise ValueError("No JSON in batch answer")
+    payload = json.loads(body[start:end + 1])
+
+    if isinstance(payload, dict) and isinstance(payload.get("summaries"), list):
+        payload = payload["summaries"]
+    if isinstance(payload, list):
+        payload = {
+            item.get("symbol"): item.get("summary")
+            for item in payload if isinstance(item, dict)
+        }
+    if not isinstance(payload, dict):
+        raise ValueError("Batch answer is not an object")
+
+    wanted = {symbol.upper(): symbol for symbol in symbols}
+    out = {}
+    for key, value in payload.items():
+        symbol = wanted.get(str(key).strip().upper())
+        if symbol and isinstance(value, str) and value.strip():
+            out[symbol] = value.strip()
+    if not out:
+        raise ValueError("Batch answer has no summary for {}".format(", ".join(symbols)))
+    return out
+
+
+def _shares(total: int, n: int) -> List[int]:
+    # Split total into n integer parts that add up to it
+    base, extra = divmod(total, n)
+    return [base + (1 if i < extra else 0) for i in range(n)]
+
+
+class Summarizer:
+    """
+    Builds requests from a template and sends them through a started gateway.
+    """
+
+    def __init__(
+        self,
+        gateway: LLMGateway,
+        template: CompiledTemplate,
+        batch_size: Optional[int] = None,
+        batch_enabled: Optional[bool] = None,
+    ):
+        self.gateway = gateway
+        self.template = template
+        self.batch_size = batch_size or Config.SUMMARIZER_BATCH_SIZE
+        self.batch_enabled = Config.SUMMARIZER_BATCH_ENABLED if batch_enabled is None else batch_enabled
+        self.stats = SummarizerStats()
+
+    async def summarize(self, items: Sequence[SummaryInput]) -> List[SummaryResult]:
+        """
+        Results in input order; failed ones have .error set.
+        """
+        singles = list(range(len(items)))
+        groups: List[List[int]] = []
+        if self.batch_enabled and self.batch_size > 1:
+            quiet = [i for i in singles if items[i].low_activity]
+            groups = [quiet[k:k + self.batch_size] for k in range(0, len(quiet), self.batch_size)]
+            groups = [group for group in groups if len(group) > 1]
+            batched = {i for group in groups for i in group}
+            singles = [i for i in singles if i not in batched]
+
+        outcomes = await asyncio.gather(
+            *(self.summarize_one(items[i]) for i in singles),
+            *(self.summarize_batch([items[i] for i in group]) for group in groups),
+        )
+        results: List[Optional[SummaryResult]] = [None] * len(items)
+        for i, result in zip(singles, outcomes[:len(singles)]):
+            results[i] = result
+        for group, batch in zip(groups, outcomes[len(singles):]):
+            for i, result in zip(group, batch):
+                results[i] = result
+        return results
+
+    def _request(self, item: SummaryInput, budget: Optional[int] = None) -> SummaryRequest:
+        prompt = self.template.assemble(
+            item.symbol, item.window_start, item.window_end,
+            item.metrics, item.events, item.news, item.context, budget=budget,
+        )
+        return SummaryRequest(
+            symbol=item.symbol, window_start=item.window_start, window_end=item.window_end,
+            prompt=prompt.prompt, system=prompt.system, prompt_version=prompt.prompt_version,
+        )
+
+    async def summarize_one(self, item: SummaryInput) -> SummaryResult:
+        try:
+            request = self._request(item)
+        except PromptBudgetError as e:
+            warning(str(e))
+            request = SummaryRequest(symbol=item.symbol, window_start=item.window_start,
+                                     window_end=item.window_end, prompt="")
+            return SummaryResult(request=request, error=str(e))
+        if self.gateway.cache is not None:
+            request.cache_key = fingerprint(request.prompt_version, request.model or self.gateway.model, {
+                "symbol": item.symbol, "metrics": item.metrics, "events": item.events, "news": item.news,
+                "context": item.context,
+            })
+        self.stats.singles += 1
+        return await self.gateway.summarize(request)
+
+    async def summarize_batch(self, items: Sequence[SummaryInput]) -> List[SummaryResult]:
+        try:
+            requests = [self._request(item, Config.SUMMARIZER_BATCH_SYMBOL_BUDGET) for item in items]
+        except PromptBudgetError as e:
+            warning("Batch prompt does not fit, summarizing one by one: {}".format(e))
+            return await self._fallback(items)
+        symbols = [item.symbol for item in items]
+        version = self.template.prompt_version + BATCH_VERSION_SUFFIX
+        batch = SummaryRequest(
+            symbol=",".join(symbols),
+            window_start=min(item.window_start for item in items),
+            window_end=max(item.window_end for item in items),
+            prompt=BATCH_SEPARATOR.join(r.prompt for r in requests),
+            system="{}\n\n{}".format(self.template.prefix, BATCH_INSTRUCTIONS).strip(),
+            prompt_version=version,
+            max_tokens=min(Config.LLM_MAX_TOKENS * len(items), Config.SUMMARIZER_BATCH_MAX_TOKENS),
+            record=False,
+        )
+        self.stats.batches += 1
+        self.stats.batched_symbols += len(items)
+        result = await self.gateway.summarize(batch)
+        if not result.ok:
+            return [replace(result, request=r, prompt_tokens=0, completion_tokens=0) for r in requests]
+
+        try:
+            texts = parse_batch(result.text, symbols)
+        except ValueError as e:
+            warning("Unparseable batch answer for {}, summarizing one by one: {}".format(batch.symbol, e))
+            return await self._fallback(items)
+
+        prompt_shares = _shares(0 if result.coalesced else result.prompt_tokens, len(items))
+        completion_shares = _shares(0 if result.coalesced else result.completion_tokens, len(items))
+        out: List[Optional[SummaryResult]] = [None] * len(items)
+        missing = []
+        for i, request in enumerate(requests):
+            if request.symbol not in texts:
+                missing.append(i)
+                continue
+            request.prompt_version = version
+            out[i] = replace(
+                result, request=request, text=texts[request.symbol],
+                prompt_tokens=prompt_shares[i], completion_tokens=completion_shares[i],
+            )
+            await self.gateway.record(out[i])
+        if missing:
+            warning("Batch answer for {} lacks {}, summarizing them one by one.".format(
+                batch.symbol, ", ".join(symbols[i] for i in missing)
+            ))
+            for i, single in zip(missing, await self._fallback([items[i] for i in missing])):
+                out[i] = single
+        return out
+
+    async def _fallback(self, items: Sequence[SummaryInput]) -> List[SummaryResult]:
+        self.stats.fallbacks += len(items)
+        return list(await asyncio.gather(*(self.summarize_one(item) for item in items)))
+
+
+async def load_inputs(result: GateResult) -> List[SummaryInput]:
+    """
+    SummaryInputs for the windows the gate sent to the model: metrics from
+    the gate, events and news of those symbols, and the latest market context.
+    """
+    indices = result.indices("model")
+    if not indices:
+        return []
+    items = []
+    for i in indices:
+        d = result.decision(i)
+        values = result.values(i)
+        items.append(SummaryInput(
+            d.symbol, d.window_start, d.window_end,
+            metrics={name: values[name] for name in PROMPT_METRICS if values.get(name) is not None},
+        ))
+    symbols = sorted({item.symbol for item in items})
+    start = min(item.window_start for item in items)
+    end = max(item.window_end for item in items)
+
+    events = await fetch(
+        "SELECT symbol, window_start, window_end, type, severity, details FROM events "
+        "WHERE symbol = ANY($1) AND window_end > $2 AND window_end <= $3",
+        (symbols, start, end),
+    )
+    news = await fetch(
+        "SELECT symbol, published_at, title, summary FROM context_news "
+        "WHERE symbol = ANY($1) AND published_at > $2 AND published_at <= $3 ORDER BY published_at DESC",
+        (symbols, end - timedelta(seconds=Config.SUMMARIZER_NEWS_LOOKBACK_SEC), end),
+    )
+    market = await fetch_one(
+        "SELECT spx_return::float8 AS spx_return, vix_level::float8 AS vix_level, risk_flag, "
+        "avg_return::float8 AS market_return, advancers, decliners FROM context_market "
+        "WHERE window_end <= $1 ORDER BY window_end DESC LIMIT 1",
+        (end,),
+    )
+
+    for item in items:
+        item.context = dict(market or {})
+        for event in events:
+            if event["symbol"] == item.symbol and item.window_start <= event["window_start"] \
+                    and event["window_end"] <= item.window_end:
+                details = event["details"]
+                item.events.append(dict(event, details=json.loads(details) if isinstance(details, str) else details))
+        item.news = [row for row in news if row["symbol"] == item.symbol]
+    return items
+
+
+async def main():
+    await init_pool()
+    try:
+        end = datetime.now(timezone.utc)
+        result = await gate(RuleSet.compile(), end - timedelta(seconds=Config.RULES_LOOKBACK_SEC), end)
+        items = await load_inputs(result)
+        if not items:
+            return
+        template = (await TemplateRegistry.load()).get()
+        async with LLMGateway(cache=PromptCache()) as gateway:
+            summarizer = Summarizer(gateway, template)
+            results = await summarizer.summarize(items)
+        info("Summarized {} windows ({} failed): {} single calls, {} batches of {} symbols, {} fallbacks.".format(
+            len(results), sum(not r.ok for r in results), summarizer.stats.singles,
+            summarizer.stats.batches, summarizer.stats.batched_symbols, summarizer.stats.fallbacks,
+        ))
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
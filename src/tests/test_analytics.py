@@ -0,0 +1,298 @@
+import numpy as np
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+from analytics.aggregator import (
+    MetricsAggregator, backfill, compute_sharded, compute_window_metrics, concat_batches,
+    parse_windows, reference_window_metrics, shard_by_symbol, write_metrics,
+)
+from analytics.metrics import DERIVED_METRICS_COLUMNS, MetricsEngine, WindowState, NS_PER_SEC
+from ingest.batch import TradeBatch
+from ingest.providers.base import TradeRecord
+from ingest.writer_errors import WriterError
+
+BASE = datetime(2025, 1, 2, 9, 30, tzinfo=timezone.utc)
+
+
+def make_rec(symbol="AAPL", seconds=0.0, price=100.0, size=10.0):
+    return TradeRecord(
+        symbol=symbol,
+        ts=BASE + timedelta(seconds=seconds),
+        price=price,
+        size=size,
+        source="finnhub"
+    )
+
+
+# This test checks the per-window metrics against values computed by hand
+def test_tumbling_window_metrics():
+    engine = MetricsEngine(60, allowed_lateness_sec=0)
+    prices = [100.0, 101.0, 99.0, 102.0]
+    engine.add_records([make_rec(seconds=i, price=p, size=i + 1) for i, p in enumerate(prices)])
+    engine.add_records([make_rec(seconds=61)])
+
+    [m] = engine.close()
+
+    sizes = [1, 2, 3, 4]
+    returns = np.diff(np.log(prices))
+    assert m.symbol == "AAPL"
+    assert m.window_start == BASE and m.window_end == BASE + timedelta(seconds=60)
+    assert m.vwap == pytest.approx(sum(p * s for p, s in zip(prices, sizes)) / sum(sizes))
+    assert m.volatility == pytest.approx(returns.std(ddof=1))
+    assert m.momentum == pytest.approx(102.0 / 100.0 - 1)
+    assert m.liquidity_ratio == pytest.approx(sum(p * s for p, s in zip(prices, sizes)) / (3.0 / m.vwap))
+    assert (m.trade_count, m.volume, m.first_price, m.last_price) == (4, 10, 100.0, 102.0)
+    assert len(m) == len(DERIVED_METRICS_COLUMNS)
+
+
+# This test checks that merging states split at any point matches one pass over all trades
+def test_window_state_merge_matches_single_pass():
+    rng = np.random.default_rng(7)
+    ts = np.arange(50, dtype=np.int64) * NS_PER_SEC
+    price = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 50)))
+    size = rng.uniform(1, 10, 50)
+
+    whole = WindowState()
+    for t, p, s in zip(ts.tolist(), price.tolist(), size.tolist()):
+        whole.update(t, p, s)
+
+    for cut in (1, 17, 49):
+        merged = WindowState.from_arrays(ts[:cut], price[:cut], size[:cut]).merge(
+            WindowState.from_arrays(ts[cut:], price[cut:], size[cut:])
+        )
+        assert merged.count == whole.count
+        assert merged.n_returns == whole.n_returns == 49
+        assert merged.vwap == pytest.approx(whole.vwap)
+        assert merged.volatility == pytest.approx(whole.volatility)
+        assert (merged.high, merged.low) == (whole.high, whole.low)
+
+
+# This test checks that sliding windows emit every step and cover the whole window
+def test_sliding_windows():
+    engine = MetricsEngine(180, step_sec=60, allowed_lateness_sec=0)
+    engine.add_records([make_rec(seconds=s) for s in (10, 70, 130)])
+    engine.add_records([make_rec(seconds=400)])
+
+    metrics = [m for m in engine.close() if m.symbol == "AAPL"]
+
+    counts = {(m.window_start - BASE).total_seconds(): m.trade_count for m in metrics}
+    # windows ending at 60..360 that contain at least one of the first three trades
+    assert counts == {-120.0: 1, -60.0: 2, 0.0: 3, 60.0: 2, 120.0: 1}
+    assert engine.open_panes() == 1
+
+
+# This test checks that windows only close after the lateness allowance and late trades are dropped
+def test_watermark_and_late_trades():
+    engine = MetricsEngine(60, allowed_lateness_sec=10)
+    engine.add_records([make_rec(seconds=5), make_rec(seconds=65)])
+    assert engine.close() == []
+
+    engine.add_records([make_rec(seconds=71)])
+    [m] = engine.close()
+    assert m.trade_count == 1
+
+    engine.add_records([make_rec(seconds=30)])
+    assert engine.late_trades == 1
+    assert [m.trade_count for m in engine.close_all()] == [2]
+
+
+# This test checks that batches with several symbols are grouped per symbol and pane
+def test_add_batch_groups_symbols():
+    engine = MetricsEngine(60, allowed_lateness_sec=0)
+    recs = [make_rec("MSFT" if i % 2 else "AAPL", seconds=i, price=100 + i) for i in range(6)]
+    engine.add_batch(TradeBatch.from_records(list(reversed(recs))))
+
+    metrics = {m.symbol: m for m in engine.close_all()}
+
+    assert metrics["AAPL"].trade_count == metrics["MSFT"].trade_count == 3
+    assert (metrics["AAPL"].first_price, metrics["AAPL"].last_price) == (100, 104)
+    assert (metrics["MSFT"].first_price, metrics["MSFT"].last_price) == (101, 105)
+
+
+# This test checks the window spec parser
+def test_parse_windows():
+    assert parse_windows("60, 300:60,") == [(60, 60), (300, 60)]
+    with pytest.raises(ValueError):
+        MetricsEngine(300, step_sec=70)
+
+
+# This test checks that the aggregator writes closed windows as batches arrive and the rest on flush
+@pytest.mark.asyncio
+async def test_aggregator_writes_closed_windows():
+    writer = AsyncMock(side_effect=lambda metrics: len(metrics))
+    aggregator = MetricsAggregator(windows=[(60, 60)], writer=writer, allowed_lateness_sec=0)
+
+    await aggregator.on_trades(TradeBatch.from_records([make_rec(seconds=1), make_rec(seconds=2)]))
+    writer.assert_not_called()
+
+    await aggregator.on_trades(TradeBatch.from_records([make_rec(seconds=61)]))
+    assert [m.trade_count for m in writer.call_args[0][0]] == [2]
+
+    assert await aggregator.flush() == 1
+    assert aggregator.windows_written == 2
+
+
+# This test checks that closed windows survive a failed write and are retried on the next call and on flush
+@pytest.mark.asyncio
+async def test_aggregator_retries_failed_writes():
+    writer = AsyncMock(side_effect=WriterError("db down"))
+    aggregator = MetricsAggregator(windows=[(60, 60)], writer=writer, allowed_lateness_sec=0)
+
+    await aggregator.on_trades(TradeBatch.from_records([make_rec(seconds=1)]))
+    with pytest.raises(WriterError):
+        await aggregator.on_trades(TradeBatch.from_records([make_rec(seconds=61)]))
+    assert aggregator.pending() == 1
+
+    # Next closed window: both are sent together, the write fails again
+    with pytest.raises(WriterError):
+        await aggregator.on_trades(TradeBatch.from_records([make_rec(seconds=121)]))
+    assert aggregator.pending() == 2
+
+    # flush retries the pending windows along with the open one
+    writer.side_effect = lambda metrics: len(metrics)
+    assert await aggregator.flush() == 3
+    assert [m.trade_count for m in writer.call_args[0][0]] == [1, 1, 1]
+    assert aggregator.pending() == 0
+
+
+# This test checks that metrics are bulk upserted into derived_metrics keyed on symbol and window
+@pytest.mark.asyncio
+@patch("analytics.aggregator.upsert_records", new_callable=AsyncMock)
+async def test_write_metrics_upserts(mock_upsert):
+    engine = MetricsEngine(60, allowed_lateness_sec=0)
+    engine.add_records([make_rec(seconds=1), make_rec("MSFT", seconds=2)])
+    metrics = engine.close_all()
+    mock_upsert.return_value = 2
+
+    assert await write_metrics(metrics) == 2
+    table, columns, rows, key = mock_upsert.call_args[0]
+    assert table == "derived_metrics"
+    assert key == ("symbol", "window_start", "window_end")
+    assert columns == DERIVED_METRICS_COLUMNS
+    assert sorted(r[0] for r in rows) == ["AAPL", "MSFT"]
+
+
+def random_records(n=600, symbols=4, seconds=900, seed=3):
+    rng = np.random.default_rng(seed)
+    return [
+        make_rec("S{}".format(rng.integers(symbols)), float(rng.uniform(0, seconds)),
+                 float(rng.uniform(90, 110)), float(rng.integers(1, 50)))
+        for _ in range(n)
+    ]
+
+
+def assert_same_metrics(expected, actual):
+    key = lambda m: (m.symbol, m.window_end)
+    expected, actual = sorted(expected, key=key), sorted(actual, key=key)
+    assert len(expected) == len(actual)
+    for e, a in zip(expected, actual):
+        assert e[:3] == a[:3]
+        for x, y in zip(e[3:], a[3:]):
+            assert (x is None and y is None) or x == pytest.approx(y, rel=1e-9)
+
+
+# This test checks the vectorized batch path against the pure-Python reference for tumbling and sliding windows
+@pytest.mark.parametrize("window,step", [(60, 60), (300, 60), (120, 30)])
+def test_vectorized_matches_reference(window, step):
+    recs = random_records()
+    expected = reference_window_metrics(recs, window, step)
+    assert_same_metrics(expected, compute_window_metrics(TradeBatch.from_records(recs), window, step))
+
+
+# This test checks that end_range keeps only windows ending inside the range
+def test_vectorized_end_range():
+    recs = random_records()
+    lo = int((BASE + timedelta(seconds=300)).timestamp()) * NS_PER_SEC
+    hi = lo + 300 * NS_PER_SEC
+    metrics = compute_window_metrics(TradeBatch.from_records(recs), 120, 60, end_range=(lo, hi))
+    ends = {(m.window_end - BASE).total_seconds() for m in metrics}
+    assert ends == {360.0, 420.0, 480.0, 540.0, 600.0}
+
+
+# This test checks that sharding by symbol keeps symbols disjoint and concat_batches reassembles them
+def test_shard_and_concat_batches():
+    batch = TradeBatch.from_records(random_records(symbols=5))
+    shards = shard_by_symbol(batch, 3)
+
+    assert len(shards) == 3
+    seen = [set(s.symbol_column()) for s in shards]
+    assert set.union(*seen) == set(batch.symbols)
+    assert sum(len(s) for s in seen) == 5
+
+    joined = concat_batches(shards)
+    assert len(joined) == len(batch)
+    assert sorted(joined.symbol_column()) == sorted(batch.symbol_column())
+
+
+# This test checks that the process-pool path returns the same windows as the in-process path
+@pytest.mark.asyncio
+async def test_compute_sharded_matches_single_process():
+    from concurrent.futures import ProcessPoolExecutor
+
+    batch = TradeBatch.from_records(random_records())
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        sharded = await compute_sharded(batch, 300, 60, executor=executor, shards=2)
+    assert_same_metrics(compute_window_metrics(batch, 300, 60), sharded)
+
+
+# This test checks that backfill loads each chunk with lookback, replaces its windows and writes the new ones
+@pytest.mark.asyncio
+@patch("analytics.aggregator.transaction")
+@patch("analytics.aggregator.execute", new_callable=AsyncMock)
+@patch("analytics.aggregator.load_trades", new_callable=AsyncMock)
+async def test_backfill_chunks(mock_load, mock_execute, mock_transaction):
+    conn = object()
+
+    @asynccontextmanager
+    async def fake_transaction():
+        yield conn
+
+    mock_transaction.side_effect = fake_transaction
+    recs = random_records(seconds=1200)
+    mock_load.side_effect = lambda lo, hi, symbols: TradeBatch.from_records(
+        [r for r in recs if lo <= r.ts < hi]
+    )
+    writer = AsyncMock(side_effect=lambda metrics, conn=None: len(metrics))
+
+    written = await backfill(
+        BASE, BASE + timedelta(seconds=1200), windows=[(300, 60)], processes=1,
+        chunk_sec=600, writer=writer,
+    )
+
+    assert [c[0][0] for c in mock_load.call_args_list] == [BASE - timedelta(seconds=300), BASE + timedelta(seconds=300)]
+    assert mock_execute.await_count == 2
+    # Each chunk's DELETE and rewrite share one transaction
+    assert mock_transaction.call_count == 2
+    assert all(c.kwargs["conn"] is conn for c in mock_execute.call_args_list + writer.call_args_list)
+    metrics = [m for c in writer.call_args_list for m in c[0][0]]
+    expected = [m for m in reference_window_metrics(recs, 300, 60) if BASE < m.window_end <= BASE + timedelta(seconds=1200)]
+    assert written == len(expected)
+    assert_same_metrics(expected, metrics)
+
+
+# This test checks that a backfill starting off the step grid still sees every trade of its first window
+@pytest.mark.asyncio
+@patch("analytics.aggregator.transaction")
+@patch("analytics.aggregator.execute", new_callable=AsyncMock)
+@patch("analytics.aggregator.load_trades", new_callable=AsyncMock)
+async def test_backfill_off_grid_start(mock_load, mock_execute, mock_transaction):
+    @asynccontextmanager
+    async def fake_transaction():
+        yield None
+
+    mock_transaction.side_effect = fake_transaction
+    recs = [make_rec(seconds=s) for s in (10, 20, 40, 50)]
+    mock_load.side_effect = lambda lo, hi, symbols: TradeBatch.from_records(
+        [r for r in recs if lo <= r.ts < hi]
+    )
+    writer = AsyncMock(side_effect=lambda metrics, conn=None: len(metrics))
+
+    await backfill(
+        BASE + timedelta(seconds=30), BASE + timedelta(seconds=90), windows=[(60, 60)], processes=1,
+        writer=writer,
+    )
+
+    metrics = writer.call_args[0][0]
+    assert [(m.window_start, m.trade_count) for m in metrics] == [(BASE, 4)]
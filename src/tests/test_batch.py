@@ -0,0 +1,132 @@
+import numpy as np
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+from ingest.batch import NAT, TradeBatch
+from ingest.providers.base import TradeRecord
+from ingest.validator import partition, validate, validate_batch
+from ingest.writer import write_bulk
+
+
+def make_rec(symbol="AAPL", price=100.0, size=10.0, ts=None, source="finnhub"):
+    return TradeRecord(
+        symbol=symbol,
+        ts=ts or datetime.now(timezone.utc).replace(microsecond=123456),
+        price=price,
+        size=size,
+        source=source
+    )
+
+
+# This test checks that TradeRecord is slotted (no per-instance __dict__).
+def test_trade_record_has_slots():
+    rec = make_rec()
+    assert not hasattr(rec, "__dict__")
+    with pytest.raises(AttributeError):
+        rec.extra = 1
+
+
+# This test checks that records survive a round trip through a batch.
+def test_round_trip_records():
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    recs = [make_rec(s, 100.0 + i, float(i), base + timedelta(microseconds=i)) for i, s in enumerate(["AAPL", "MSFT", "AAPL"])]
+
+    batch = TradeBatch.from_records(recs)
+
+    assert len(batch) == 3
+    assert batch.symbols == ["AAPL", "MSFT"]
+    assert batch.symbol_codes.tolist() == [0, 1, 0]
+    assert batch.to_records() == recs
+    assert list(batch) == recs
+
+
+# This test checks that append() grows the columns and interns symbols.
+def test_append_grows_capacity():
+    batch = TradeBatch(capacity=2)
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for i in range(5):
+        batch.append(make_rec("AAPL" if i % 2 else "MSFT", ts=base + timedelta(seconds=i)))
+
+    assert len(batch) == 5
+    assert batch.symbols == ["MSFT", "AAPL"]
+    assert batch.ts.tolist()[1] - batch.ts.tolist()[0] == 1_000_000_000
+    assert [r.symbol for r in batch.to_records()] == ["MSFT", "AAPL", "MSFT", "AAPL", "MSFT"]
+
+
+# This test checks that unusable values are stored as NaN / NAT.
+def test_unusable_values_become_missing():
+    batch = TradeBatch.from_records([make_rec(price="abc", size=None, ts=datetime(2024, 1, 1))])
+    assert np.isnan(batch.price[0])
+    assert np.isnan(batch.size[0])
+    assert batch.ts[0] == NAT
+
+
+# This test checks take() with a boolean mask.
+def test_take_mask():
+    batch = TradeBatch.from_records([make_rec("AAPL"), make_rec("MSFT"), make_rec("GOOG")])
+    picked = batch.take(np.array([True, False, True]))
+    assert [r.symbol for r in picked.to_records()] == ["AAPL", "GOOG"]
+
+
+# This test checks that a batch holds trades in far less memory than
+# the equivalent list of TradeRecords.
+def test_batch_is_compact():
+    batch = TradeBatch(capacity=1000)
+    assert batch.nbytes / 1000 <= 32
+
+
+# This test checks that validate_batch() accepts a TradeBatch directly
+# and returns a normalized batch of the kept rows.
+def test_validate_batch_accepts_trade_batch():
+    ts = datetime.now(timezone.utc)
+    batch = TradeBatch.from_records([
+        make_rec(" AAPL ", ts=ts, size=-1, source="FINNHUB"),
+        make_rec("MSFT", price=-1),
+        make_rec("AAPL", ts=ts),
+    ])
+
+    result = validate_batch(batch)
+
+    assert result.reason_names() == ["ok", "price_nonpositive", "duplicate"]
+    valid = result.valid()
+    assert len(valid) == 1
+    rec = valid.to_records()[0]
+    assert (rec.symbol, rec.size, rec.source) == ("AAPL", 0.0, "finnhub")
+
+
+# This test checks that partition() of a batch returns a batch of good
+# rows and (record, reason) pairs for the rejects.
+def test_partition_trade_batch():
+    batch = TradeBatch.from_records([make_rec("AAPL"), make_rec("MSFT", price=0)])
+    valid, rejected = partition(batch)
+    assert isinstance(valid, TradeBatch)
+    assert len(valid) == 1
+    assert [(r.symbol, reason) for r, reason in rejected] == [("MSFT", "price_nonpositive")]
+
+
+# This test checks that the reference validator also accepts a batch.
+def test_validate_accepts_trade_batch():
+    batch = TradeBatch.from_records([make_rec("AAPL")])
+    out = validate(batch)
+    assert [r.symbol for r in out] == ["AAPL"]
+
+
+# This test checks that write_bulk() writes a batch straight from its columns.
+@pytest.mark.asyncio
+@patch("ingest.writer.copy_records", new_callable=AsyncMock)
+async def test_write_bulk_accepts_trade_batch(mock_copy):
+    mock_copy.return_value = 2
+    recs = [make_rec("AAPL"), make_rec("MSFT")]
+    out = await write_bulk(TradeBatch.from_records(recs))
+    assert out == 2
+    rows = mock_copy.call_args[0][2]
+    assert rows == [(r.symbol, r.ts, r.price, r.size, r.source) for r in recs]
+
+
+# This test checks that an empty batch is not written.
+@pytest.mark.asyncio
+@patch("ingest.writer.copy_records", new_callable=AsyncMock)
+async def test_write_bulk_empty_trade_batch(mock_copy):
+    assert await write_bulk(TradeBatch()) == 0
+    mock_copy.assert_not_called()
@@ -0,0 +1,79 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+from context.market import CONTEXT_MARKET_COLUMNS, SectorIndex, compute_context, refresh_context
+
+T0 = datetime(2024, 1, 2, 10, 0, tzinfo=timezone.utc)
+T1 = T0 + timedelta(minutes=1)
+T2 = T0 + timedelta(minutes=2)
+
+INDEX = SectorIndex({"AAPL": "technology", "MSFT": "technology", "XOM": "energy"})
+
+
+def metrics_columns(rows):
+    names = ("symbol", "window_start", "window_end", "momentum", "volatility", "notional", "last_price")
+    return {name: [row[i] for row in rows] for i, name in enumerate(names)}
+
+
+COLUMNS = metrics_columns([
+    ("AAPL", T0, T1, 0.02, 0.001, 300.0, 190.0),
+    ("MSFT", T0, T1, -0.01, 0.003, 100.0, 330.0),
+    ("XOM", T0, T1, 0.01, None, 100.0, 110.0),
+    ("SPY", T0, T1, 0.005, 0.0005, 1000.0, 470.0),
+    ("AAPL", T1, T2, -0.02, 0.002, 100.0, 189.0),
+])
+
+
+# This test checks that sector codes are looked up per distinct symbol and unknown symbols get -1
+def test_sector_index_codes():
+    assert INDEX.sectors == ["energy", "technology"]
+    assert INDEX.codes(["XOM", "AAPL", "TSLA", "AAPL"]).tolist() == [0, 1, -1, 1]
+
+
+# This test checks per-sector averages for every window in one pass
+def test_compute_context_sectors():
+    sectors, _ = compute_context(COLUMNS, INDEX, market_symbol="SPY", volatility_symbol="")
+    by_key = {(row[0], row[1]): row for row in sectors}
+
+    assert set(by_key) == {("energy", T0), ("technology", T0), ("technology", T1)}
+    tech = by_key[("technology", T0)]
+    assert tech[3] == pytest.approx(0.005)                       # avg return
+    assert tech[4] == pytest.approx((0.02 * 300 - 0.01 * 100) / 400)  # notional weighted
+    assert tech[5] == pytest.approx(0.002)
+    assert tech[6] == 2
+    assert by_key[("energy", T0)][5] is None                     # no volatility available
+
+
+# This test checks market-level returns, breadth and the reference symbols
+def test_compute_context_market():
+    _, market = compute_context(COLUMNS, INDEX, market_symbol="SPY", volatility_symbol="MSFT")
+    rows = [dict(zip(CONTEXT_MARKET_COLUMNS, row)) for row in market]
+
+    first, second = rows
+    assert (first["window_start"], first["window_end"]) == (T0, T1)
+    assert first["avg_return"] == pytest.approx((0.02 - 0.01 + 0.01 + 0.005) / 4)
+    assert (first["advancers"], first["decliners"], first["symbol_count"]) == (3, 1, 4)
+    assert first["spx_return"] == pytest.approx(0.005)
+    assert first["vix_level"] == pytest.approx(330.0)
+    assert first["risk_flag"] == "low"
+
+    assert second["spx_return"] is None
+    assert second["risk_flag"] == "high"
+
+
+# This test checks that results are bulk upserted keyed on the window
+@pytest.mark.asyncio
+@patch("context.market.upsert_records", new_callable=AsyncMock)
+@patch("context.market.load_metrics", new_callable=AsyncMock)
+async def test_refresh_context_upserts(mock_load, mock_upsert):
+    mock_load.return_value = COLUMNS
+    mock_upsert.side_effect = lambda table, columns, rows, key: len(rows)
+
+    assert await refresh_context(INDEX, lookback_sec=600, now=T2) == (3, 2)
+    mock_load.assert_awaited_once_with(T2 - timedelta(minutes=10), T2)
+    tables = [(c[0][0], c[0][3]) for c in mock_upsert.call_args_list]
+    assert tables == [
+        ("context_sector", ("sector_id", "window_start", "window_end")),
+        ("context_market", ("window_start", "window_end")),
+    ]
@@ -92,3 +92,88 @@ async def test_fetch_empty(test_db):
         "SELECT * FROM derived_metrics LIMIT 1"
     )
     assert row is None
+
+
+@pytest.mark.asyncio
+async def test_copy_records(test_db):
+    """
+    Bulk load rows with COPY and ensure the copied count is returned.
+    """
+    await db.execute("DELETE FROM raw_trades")
+
+    from datetime import datetime, timezone
+    now = datetime.now(timezone.utc)
+    rows = [("AAPL", now, 1.0 + i, 1.0, "test") for i in range(10)]
+
+    copied = await db.copy_records(
+        "raw_trades", ("symbol", "ts", "price", "size", "source"), rows
+    )
+    assert copied == 10
+
+    row = await db.fetch_one("SELECT COUNT(*) AS n FROM raw_trades")
+    assert row["n"] == 10
+
+
+@pytest.mark.asyncio
+async def test_execute_many(test_db):
+    """
+    Insert several rows with executemany in one transaction.
+    """
+    await db.execute("DELETE FROM raw_trades")
+
+    await db.execute_many(
+        "INSERT INTO raw_trades (symbol, ts, price, size) VALUES ($1, NOW(), $2, 1.0)",
+        [("AAPL", 1.0), ("MSFT", 2.0)],
+    )
+
+    row = await db.fetch_one("SELECT COUNT(*) AS n FROM raw_trades")
+    assert row["n"] == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_and_stream_columns(test_db):
+    """
+    stream() yields every row in order across several cursor batches;
+    stream_columns() yields the same rows as column batches.
+    """
+    await db.execute("DELETE FROM raw_trades")
+    await db.execute_many(
+        "INSERT INTO raw_trades (symbol, ts, price, size, source) VALUES ($1, NOW(), $2, 1.0, 'test')",
+        [("S{}".format(i), float(i)) for i in range(5)],
+    )
+
+    sql = "SELECT symbol, price FROM raw_trades ORDER BY price"
+    rows = [row async for row in db.stream(sql, batch_size=2)]
+    assert [r["symbol"] for r in rows] == ["S0", "S1", "S2", "S3", "S4"]
+
+    batches = [cols async for cols in db.stream_columns(sql, batch_size=2)]
+    assert [len(b["symbol"]) for b in batches] == [2, 2, 1]
+    assert [float(p) for b in batches for p in b["price"]] == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+@pytest.mark.asyncio
+async def test_upsert_records_in_transaction(test_db):
+    """
+    Upserting the same keys twice updates rows instead of duplicating them,
+    and a failed transaction() rolls back every write inside it.
+    """
+    await db.execute("DELETE FROM derived_metrics")
+
+    from datetime import datetime, timedelta, timezone
+    start = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    end = start + timedelta(minutes=1)
+    columns = ("symbol", "window_start", "window_end", "vwap")
+    key = ("symbol", "window_start", "window_end")
+
+    assert await db.upsert_records("derived_metrics", columns, [("AAPL", start, end, 1.0)], key) == 1
+    assert await db.upsert_records("derived_metrics", columns, [("AAPL", start, end, 2.0)], key) == 1
+
+    try:
+        async with db.transaction() as conn:
+            await db.upsert_records("derived_metrics", columns, [("AAPL", start, end, 3.0)], key, conn=conn)
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+
+    rows = await db.fetch("SELECT vwap::float8 AS vwap FROM derived_metrics")
+    assert rows == [{"vwap": 2.0}]
@@ -0,0 +1,189 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import core.db as db
+from core.config import Config
+
+
+def make_conn(pid=100):
+    conn = MagicMock()
+    conn.get_server_pid.return_value = pid
+    conn.fetch = AsyncMock(return_value=[{"n": 1}])
+    conn.execute = AsyncMock()
+    stmt = MagicMock()
+    stmt.fetch = AsyncMock(return_value=[{"n": 2}])
+    conn.prepare = AsyncMock(return_value=stmt)
+    return conn
+
+
+def make_pool(conn):
+    pool = MagicMock()
+    pool.acquire = AsyncMock(return_value=conn)
+    pool.release = AsyncMock()
+    pool.get_size.return_value = 2
+    pool.get_idle_size.return_value = 1
+    pool.get_max_size.return_value = 5
+    return pool
+
+
+@pytest.fixture(autouse=True)
+def reset_db_state():
+    yield
+    db.pool = None
+    db.read_pool = None
+    db._prepared.clear()
+    db._stats["write"] = db.PoolStats()
+    db._stats["read"] = db.PoolStats()
+
+
+# This test checks that reads go to the read pool and writes to the write pool
+@pytest.mark.asyncio
+async def test_reads_and_writes_use_separate_pools():
+    write_conn, read_conn = make_conn(1), make_conn(2)
+    db.pool, db.read_pool = make_pool(write_conn), make_pool(read_conn)
+
+    rows = await db.fetch("SELECT 1")
+    await db.execute("DELETE FROM raw_trades")
+
+    assert rows == [{"n": 1}]
+    read_conn.fetch.assert_awaited_once()
+    write_conn.execute.assert_awaited_once()
+    db.read_pool.release.assert_awaited_once_with(read_conn)
+    db.pool.release.assert_awaited_once_with(write_conn)
+
+
+# This test checks that init_pool sizes pools from Config and shares the write pool when the read pool is disabled
+@pytest.mark.asyncio
+async def test_init_pool_uses_config():
+    created = []
+
+    async def fake_create_pool(**kwargs):
+        created.append(kwargs)
+        return MagicMock()
+
+    with patch("core.db.asyncpg.create_pool", side_effect=fake_create_pool), \
+         patch.object(Config, "DB_URL", "postgres://primary"), \
+         patch.object(Config, "DB_READ_URL", "postgres://replica"), \
+         patch.object(Config, "DB_POOL_MAX_SIZE", 7), \
+         patch.object(Config, "DB_STATEMENT_CACHE_SIZE", 0):
+        await db.init_pool()
+
+    assert [c["dsn"] for c in created] == ["postgres://primary", "postgres://replica"]
+    assert created[0]["max_size"] == 7
+    assert created[0]["statement_cache_size"] == 0
+    assert db.read_pool is not db.pool
+
+    db.pool = db.read_pool = None
+    created.clear()
+    with patch("core.db.asyncpg.create_pool", side_effect=fake_create_pool), \
+         patch.object(Config, "DB_URL", "postgres://primary"), \
+         patch.object(Config, "DB_READ_POOL_MAX_SIZE", 0):
+        await db.init_pool()
+
+    assert len(created) == 1
+    assert db.read_pool is db.pool
+
+
+# This test checks that a registered statement is prepared once per connection and reused
+@pytest.mark.asyncio
+async def test_prepared_statement_reused_per_connection():
+    db.register_statement("test_select", "SELECT $1::int AS n")
+    conn = make_conn(42)
+    db.read_pool = make_pool(conn)
+
+    first = await db.fetch_prepared("test_select", (2,))
+    second = await db.fetch_prepared("test_select", (2,))
+
+    assert first == second == [{"n": 2}]
+    conn.prepare.assert_awaited_once_with("SELECT $1::int AS n")
+
+    # A new connection (init callback) starts with an empty statement cache
+    await db._connection_init("read")(conn)
+    await db.fetch_prepared("test_select", (2,))
+    assert conn.prepare.await_count == 2
+
+
+# This test checks that unknown statement names are rejected
+@pytest.mark.asyncio
+async def test_unknown_prepared_statement_raises():
+    db.pool = make_pool(make_conn())
+    with pytest.raises(KeyError):
+        await db.execute_prepared("missing", ())
+
+
+# This test checks that acquire waits and timeouts are recorded in pool_stats
+@pytest.mark.asyncio
+async def test_pool_stats_records_waits_and_timeouts():
+    conn = make_conn()
+    db.pool = db.read_pool = make_pool(conn)
+
+    await db.execute("SELECT 1")
+    db.pool.acquire.side_effect = asyncio.TimeoutError()
+    with pytest.raises(asyncio.TimeoutError):
+        await db.execute("SELECT 1")
+
+    stats = db.pool_stats()
+    assert stats["write"]["acquisitions"] == 1
+    assert stats["write"]["timeouts"] == 1
+    assert stats["write"]["size"] == 2
+    assert stats["write"]["idle"] == 1
+    assert sum(stats["write"]["wait_histogram"].values()) == 1
+    assert stats["read"]["acquisitions"] == 0
+
+
+# This test checks that helpers fail clearly before init_pool
+@pytest.mark.asyncio
+async def test_helpers_require_initialized_pool():
+    with pytest.raises(RuntimeError):
+        await db.fetch("SELECT 1")
+
+
+class _Record(dict):
+    # asyncpg Records iterate over values rather than keys
+    def __iter__(self):
+        return iter(self.values())
+
+
+def make_cursor_conn(records, pid=100):
+    conn = make_conn(pid)
+    cursor = MagicMock()
+    chunks = [records[i:i + 2] for i in range(0, len(records), 2)] + [[]]
+    cursor.fetch = AsyncMock(side_effect=chunks)
+    conn.cursor = AsyncMock(return_value=cursor)
+    transaction = MagicMock()
+    transaction.__aenter__ = AsyncMock()
+    transaction.__aexit__ = AsyncMock(return_value=False)
+    conn.transaction.return_value = transaction
+    return conn, cursor
+
+
+# This test checks that stream() pulls rows from a cursor batch by batch and releases the connection
+@pytest.mark.asyncio
+async def test_stream_yields_rows_in_batches():
+    records = [{"symbol": "S{}".format(i), "price": i} for i in range(5)]
+    conn, cursor = make_cursor_conn(records)
+    db.read_pool = make_pool(conn)
+
+    rows = [row async for row in db.stream("SELECT symbol, price FROM raw_trades", (), batch_size=2)]
+
+    assert rows == records
+    assert cursor.fetch.await_count == 4
+    cursor.fetch.assert_awaited_with(2)
+    conn.transaction.assert_called_once_with(readonly=True)
+    db.read_pool.release.assert_awaited_once_with(conn)
+
+
+# This test checks that stream_columns() transposes each batch into column lists
+@pytest.mark.asyncio
+async def test_stream_columns_yields_column_batches():
+    records = [{"symbol": "S{}".format(i), "price": i} for i in range(3)]
+    conn, _ = make_cursor_conn([_Record(r) for r in records])
+    db.read_pool = make_pool(conn)
+
+    batches = [cols async for cols in db.stream_columns("SELECT symbol, price FROM raw_trades", (), batch_size=2)]
+
+    assert batches == [
+        {"symbol": ["S0", "S1"], "price": [0, 1]},
+        {"symbol": ["S2"], "price": [2]},
+    ]
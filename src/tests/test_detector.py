@@ -0,0 +1,157 @@
+import json
+import numpy as np
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+from analytics.aggregator import MetricsAggregator
+from analytics.detector import Event, EventDetector, Ewma, P2Quantile, write_events
+from analytics.metrics import WindowMetrics
+from core.config import Config
+from ingest.batch import TradeBatch
+from ingest.providers.base import TradeRecord
+
+BASE = datetime(2025, 1, 2, 9, 30, tzinfo=timezone.utc)
+
+
+def make_window(i, volume=1000.0, volatility=0.001, first=100.0, last=100.0, symbol="AAPL", length=60):
+    start = BASE + timedelta(seconds=60 * i)
+    return WindowMetrics(
+        symbol=symbol, window_start=start, window_end=start + timedelta(seconds=length),
+        vwap=first, volatility=volatility, momentum=last / first - 1, liquidity_ratio=None,
+        volume=volume, trade_count=10, first_price=first, last_price=last,
+    )
+
+
+def quiet_windows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    price = 100.0
+    out = []
+    for i in range(n):
+        first = price * (1 + rng.normal(0, 0.0002))
+        price = first * (1 + rng.normal(0, 0.0005))
+        out.append(make_window(i, volume=float(rng.uniform(900, 1100)),
+                               volatility=float(rng.uniform(0.0009, 0.0011)), first=first, last=price))
+    return out
+
+
+@pytest.fixture
+def detector():
+    with patch.object(Config, "DETECTOR_WARMUP_WINDOWS", 20):
+        yield EventDetector(writer=AsyncMock(side_effect=lambda events: len(events)), window_sec=60)
+
+
+# This test checks that the EWMA tracks a constant level and scores outliers
+def test_ewma_zscore():
+    ewma = Ewma(0.1)
+    for x in [1.0, 1.2, 0.8, 1.1, 0.9] * 10:
+        ewma.update(x)
+    assert ewma.mean == pytest.approx(1.0, abs=0.1)
+    assert ewma.zscore(3.0) > 5
+    assert Ewma(0.1).zscore(3.0) == 0.0
+
+
+# This test checks that the P² sketch approximates quantiles in constant memory
+@pytest.mark.parametrize("p", [0.5, 0.9, 0.99])
+def test_p2_quantile_estimate(p):
+    values = np.random.default_rng(1).lognormal(0, 1, 20000)
+    sketch = P2Quantile(p)
+    for v in values.tolist():
+        sketch.update(v)
+    assert sketch.value == pytest.approx(np.quantile(values, p), rel=0.05)
+    assert len(sketch.q) == 5
+
+
+# This test checks that quiet markets produce no events
+def test_no_events_in_quiet_market(detector):
+    events = [e for m in quiet_windows(200) for e in detector.detect(m)]
+    assert events == []
+
+
+# This test checks that a volume spike after warmup is flagged with a severity and details
+def test_volume_spike(detector):
+    windows = quiet_windows(50)
+    for m in windows:
+        detector.detect(m)
+    last = windows[-1].last_price
+    [event] = detector.detect(make_window(50, volume=50000.0, first=last, last=last))
+
+    assert event.type == "volume_spike"
+    assert event.severity == "high"
+    assert event.details["volume"] == 50000.0
+
+
+# This test checks that a volatility regime shift is reported once, not on every window
+def test_volatility_regime_shift_reported_once(detector):
+    windows = quiet_windows(60)
+    for m in windows:
+        detector.detect(m)
+    last = windows[-1].last_price
+    events = []
+    for i in range(60, 80):
+        events += detector.detect(make_window(i, volatility=0.01, first=last, last=last))
+
+    assert [(e.type, e.details["direction"]) for e in events] == [("volatility_regime_shift", "up")]
+
+
+# This test checks that an opening jump between windows is flagged as a price gap
+def test_price_gap(detector):
+    windows = quiet_windows(60)
+    for m in windows:
+        detector.detect(m)
+    gapped = windows[-1].last_price * 1.05
+    events = detector.detect(make_window(60, first=gapped, last=gapped))
+
+    assert [e.type for e in events] == ["price_gap"]
+    assert events[0].details["gap_pct"] == pytest.approx(0.05, rel=1e-3)
+
+
+# This test checks that repeated or out-of-order windows and other window lengths are ignored
+def test_stale_and_foreign_windows_ignored(detector):
+    detector.detect(make_window(5))
+    assert detector.detect(make_window(5, volume=1e9)) == []
+    assert detector.detect(make_window(3)) == []
+    assert detector.stale_windows == 2
+    assert detector.detect(make_window(6, length=300)) == []
+
+
+# This test checks that events are detected for many symbols and written in one batch
+@pytest.mark.asyncio
+async def test_on_metrics_writes_one_batch(detector):
+    for m in quiet_windows(40):
+        await detector.on_metrics([m, m._replace(symbol="MSFT")])
+    last = quiet_windows(40)[-1].last_price
+    spike = make_window(40, volume=1e6, first=last, last=last)
+
+    written = await detector.on_metrics([spike, spike._replace(symbol="MSFT")])
+
+    assert written == 2
+    assert detector._writer.await_count == 1
+    assert detector.tracked_symbols() == 2
+
+
+# This test checks that events are inserted with executemany and ON CONFLICT DO NOTHING
+@pytest.mark.asyncio
+@patch("analytics.detector.execute_many", new_callable=AsyncMock)
+async def test_write_events_dedups_in_db(mock_execute_many):
+    event = Event("AAPL", BASE, BASE + timedelta(seconds=60), "price_gap", "low", {"gap_pct": 0.01})
+
+    assert await write_events([event]) == 1
+    sql, rows = mock_execute_many.call_args[0]
+    assert "ON CONFLICT DO NOTHING" in sql
+    assert json.loads(rows[0][5]) == {"gap_pct": 0.01}
+
+
+# This test checks that aggregator listeners receive every written list of windows
+@pytest.mark.asyncio
+async def test_aggregator_notifies_listeners():
+    listener = AsyncMock()
+    aggregator = MetricsAggregator(windows=[(60, 60)], writer=AsyncMock(side_effect=lambda m: len(m)),
+                                   allowed_lateness_sec=0)
+    aggregator.add_listener(listener)
+    trades = [TradeRecord("AAPL", BASE + timedelta(seconds=s), 100.0, 1.0, "finnhub") for s in (1, 61)]
+
+    await aggregator.on_trades(TradeBatch.from_records(trades))
+
+    [metrics] = listener.call_args[0]
+    assert [m.trade_count for m in metrics] == [1]
@@ -96,3 +96,108 @@ def test_fetcher_with_no_symbols(mock_config, mock_get_provider):
 
     assert records == []
     assert mock_provider.fetch.call_count == 0
+
+
+# ---------------------------------------------------------
+# Async fetch path
+# ---------------------------------------------------------
+import asyncio
+from unittest.mock import AsyncMock
+
+from ingest.fetcher import fetch_all_async
+
+
+# This test checks that fetch_all_async() returns records in symbol order
+# even when later symbols finish first.
+@pytest.mark.asyncio
+@patch("ingest.fetcher.Config")
+async def test_fetch_all_async_preserves_order(mock_config):
+    mock_config.SYMBOLS = ["AAPL", "MSFT", "GOOG"]
+    mock_config.FETCH_CONCURRENCY = 3
+    mock_config.FETCH_RATE_LIMIT = 0
+    mock_config.FETCH_BURST = 1
+
+    delays = {"AAPL": 0.03, "MSFT": 0.02, "GOOG": 0.0}
+
+    async def fake_fetch(symbol):
+        await asyncio.sleep(delays[symbol])
+        return symbol
+
+    provider = MagicMock()
+    provider.fetch_async = AsyncMock(side_effect=fake_fetch)
+
+    result = await fetch_all_async(provider=provider)
+
+    assert result.records == ["AAPL", "MSFT", "GOOG"]
+    assert result.errors == {}
+
+
+# This test checks that a failing symbol is reported in errors while
+# the remaining symbols are still returned.
+@pytest.mark.asyncio
+@patch("ingest.fetcher.Config")
+async def test_fetch_all_async_collects_failures(mock_config):
+    mock_config.SYMBOLS = ["AAPL", "BAD", "GOOG"]
+    mock_config.FETCH_CONCURRENCY = 2
+    mock_config.FETCH_RATE_LIMIT = 0
+    mock_config.FETCH_BURST = 1
+
+    async def fake_fetch(symbol):
+        if symbol == "BAD":
+            raise ProviderError("no such symbol")
+        return symbol
+
+    provider = MagicMock()
+    provider.fetch_async = AsyncMock(side_effect=fake_fetch)
+
+    result = await fetch_all_async(provider=provider)
+
+    assert result.records == ["AAPL", "GOOG"]
+    assert list(result.errors) == ["BAD"]
+    assert isinstance(result.errors["BAD"], ProviderError)
+
+
+# This test checks that no more than FETCH_CONCURRENCY requests
+# are in flight at the same time.
+@pytest.mark.asyncio
+@patch("ingest.fetcher.Config")
+async def test_fetch_all_async_bounds_concurrency(mock_config):
+    mock_config.SYMBOLS = ["S{}".format(i) for i in range(10)]
+    mock_config.FETCH_CONCURRENCY = 3
+    mock_config.FETCH_RATE_LIMIT = 0
+    mock_config.FETCH_BURST = 1
+
+    in_flight = 0
+    peak = 0
+
+    async def fake_fetch(symbol):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return symbol
+
+    provider = MagicMock()
+    provider.fetch_async = AsyncMock(side_effect=fake_fetch)
+
+    result = await fetch_all_async(provider=provider)
+
+    assert len(result.records) == 10
+    assert peak == 3
+
+
+# This test checks that unexpected (non-provider) errors still propagate.
+@pytest.mark.asyncio
+@patch("ingest.fetcher.Config")
+async def test_fetch_all_async_raises_unexpected_error(mock_config):
+    mock_config.SYMBOLS = ["AAPL"]
+    mock_config.FETCH_CONCURRENCY = 1
+    mock_config.FETCH_RATE_LIMIT = 0
+    mock_config.FETCH_BURST = 1
+
+    provider = MagicMock()
+    provider.fetch_async = AsyncMock(side_effect=RuntimeError("bug"))
+
+    with pytest.raises(RuntimeError):
+        await fetch_all_async(provider=provider)
@@ -17,7 +17,7 @@ def provider(monkeypatch):
 
 # This test checks that a normal, successful Finnhub response
 # produces exactly one TradeRecord with the expected values.
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_successful_fetch(mock_get, provider):
     mock_response = MagicMock()
     mock_response.status_code = 200
@@ -49,7 +49,7 @@ def test_missing_api_key(monkeypatch):
 
 # This test checks that the provider raises an error when Finnhub returns
 # a non-200 status code, such as 403 or 500.
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_http_error_status(mock_get, provider):
     mock_resp = MagicMock()
     mock_resp.status_code = 403
@@ -62,14 +62,14 @@ def test_http_error_status(mock_get, provider):
 
 # These tests check how the provider handles basic networking errors.
 # If the request times out or cannot connect, it should raise FinnhubError.
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_timeout_error(mock_get, provider):
     mock_get.side_effect = requests.exceptions.Timeout("timeout")
     with pytest.raises(FinnhubError):
         provider.fetch("AAPL")
 
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_connection_error(mock_get, provider):
     mock_get.side_effect = requests.exceptions.ConnectionError("conn-error")
     with pytest.raises(FinnhubError):
@@ -78,7 +78,7 @@ def test_connection_error(mock_get, provider):
 
 # This test checks that if the response cannot be parsed as JSON,
 # the provider raises an error instead of crashing.
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_invalid_json(mock_get, provider):
     mock_resp = MagicMock()
     mock_resp.status_code = 200
@@ -92,7 +92,7 @@ def test_invalid_json(mock_get, provider):
 # These tests check that the provider handles missing or invalid prices.
 # Finnhub is expected to return the price in the field "c". If it is missing,
 # null, or zero, the provider should raise an error.
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_missing_price_field(mock_get, provider):
     mock_resp = MagicMock()
     mock_resp.status_code = 200
@@ -105,7 +105,7 @@ def test_missing_price_field(mock_get, provider):
         provider.fetch("AAPL")
 
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_zero_price_invalid(mock_get, provider):
     mock_resp = MagicMock()
     mock_resp.status_code = 200
@@ -117,3 +117,131 @@ def test_zero_price_invalid(mock_get, provider):
 
     with pytest.raises(FinnhubError):
         provider.fetch("AAPL")
+
+
+# ---------------------------------------------------------
+# Pooled sessions and the async path
+# ---------------------------------------------------------
+import asyncio
+import pytest_asyncio
+from aiohttp import web
+
+
+# This test checks that the sync path goes through one pooled session
+# sized from the provider's pool_size.
+def test_session_is_pooled():
+    provider = FinnhubProvider(api_key="TESTKEY", pool_size=7)
+    adapter = provider.session.get_adapter("https://finnhub.io")
+    assert adapter._pool_maxsize == 7
+    provider.close()
+
+
+# Starts a local stand-in for the Finnhub quote endpoint and yields
+# (base_url, state) where state counts requests and distinct connections.
+@pytest_asyncio.fixture
+async def quote_server():
+    state = {"requests": 0, "peers": set(), "status": 200, "body": {"c": 123.45, "v": 10}}
+
+    async def quote(request):
+        state["requests"] += 1
+        state["peers"].add(request.transport.get_extra_info("peername"))
+        if isinstance(state["body"], str):
+            return web.Response(status=state["status"], text=state["body"])
+        return web.json_response(state["body"], status=state["status"])
+
+    app = web.Application()
+    app.router.add_get("/quote", quote)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield "http://127.0.0.1:{}/quote".format(port), state
+    await runner.cleanup()
+
+
+# This test checks that fetch_async() parses a normal response.
+@pytest.mark.asyncio
+async def test_fetch_async_success(quote_server):
+    url, state = quote_server
+    provider = FinnhubProvider(api_key="TESTKEY")
+    provider.QUOTE_URL = url
+
+    record = await provider.fetch_async("AAPL")
+    await provider.aclose()
+
+    assert record.symbol == "AAPL"
+    assert record.price == 123.45
+    assert record.source == "finnhub"
+
+
+# This test checks that sequential async fetches reuse one keep-alive
+# connection instead of opening a new one per request.
+@pytest.mark.asyncio
+async def test_fetch_async_reuses_connection(quote_server):
+    url, state = quote_server
+    provider = FinnhubProvider(api_key="TESTKEY")
+    provider.QUOTE_URL = url
+
+    for symbol in ["AAPL", "MSFT", "GOOG", "AMZN"]:
+        await provider.fetch_async(symbol)
+    await provider.aclose()
+
+    assert state["requests"] == 4
+    assert len(state["peers"]) == 1
+
+
+# This test checks that the async path maps a non-200 status to FinnhubError.
+@pytest.mark.asyncio
+async def test_fetch_async_http_error(quote_server):
+    url, state = quote_server
+    state["status"] = 429
+    state["body"] = "Too Many Requests"
+    provider = FinnhubProvider(api_key="TESTKEY")
+    provider.QUOTE_URL = url
+
+    with pytest.raises(FinnhubError):
+        await provider.fetch_async("AAPL")
+    await provider.aclose()
+
+
+# This test checks that the async path maps invalid JSON to FinnhubError.
+@pytest.mark.asyncio
+async def test_fetch_async_invalid_json(quote_server):
+    url, state = quote_server
+    state["body"] = "not json"
+    provider = FinnhubProvider(api_key="TESTKEY")
+    provider.QUOTE_URL = url
+
+    with pytest.raises(FinnhubError):
+        await provider.fetch_async("AAPL")
+    await provider.aclose()
+
+
+# This test checks that connection failures surface as FinnhubError.
+@pytest.mark.asyncio
+async def test_fetch_async_connection_error():
+    provider = FinnhubProvider(api_key="TESTKEY")
+    provider.QUOTE_URL = "http://127.0.0.1:1/quote"
+
+    with pytest.raises(FinnhubError):
+        await provider.fetch_async("AAPL")
+    await provider.aclose()
+
+
+# This test checks that aclose() closes the async session and a later
+# call transparently opens a new one.
+@pytest.mark.asyncio
+async def test_aclose_closes_async_session(quote_server):
+    url, _ = quote_server
+    provider = FinnhubProvider(api_key="TESTKEY")
+    provider.QUOTE_URL = url
+
+    await provider.fetch_async("AAPL")
+    session = provider._async_session
+    await provider.aclose()
+    assert session.closed
+
+    await provider.fetch_async("AAPL")
+    assert provider._async_session is not session
+    await provider.aclose()
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock
+
+from ingest.pipeline import IngestPipeline, run_stream
+from ingest.providers.finnhub_stream_provider import FinnhubStreamProvider
+from ingest.providers.finnhub_provider import FinnhubError
+
+
+def trade_msg(*trades):
+    return json.dumps({
+        "type": "trade",
+        "data": [{"s": s, "p": p, "t": t, "v": v} for s, p, t, v in trades],
+    })
+
+
+# Local stand-in for Finnhub's trade websocket. Each connection pops the
+# next script of messages; a script ending in None closes the socket so
+# the client has to reconnect. state["subscriptions"] keeps, per
+# connection, the symbols the client subscribed to.
+@pytest_asyncio.fixture
+async def ws_server():
+    state = {"scripts": [], "subscriptions": [], "tokens": []}
+
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        state["tokens"].append(request.query.get("token"))
+        subs = []
+        state["subscriptions"].append(subs)
+        script = state["scripts"].pop(0) if state["scripts"] else []
+
+        # Wait for the subscriptions before sending anything
+        expected = state.get("expected_subs", 0)
+        while len(subs) < expected:
+            msg = await ws.receive()
+            if msg.type != web.WSMsgType.TEXT:
+                return ws
+            subs.append(json.loads(msg.data)["symbol"])
+
+        for message in script:
+            if message is None:
+                await ws.close()
+                return ws
+            await ws.send_str(message)
+
+        async for msg in ws:
+            pass
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield "ws://127.0.0.1:{}/".format(port), state
+    await runner.cleanup()
+
+
+def make_provider(url):
+    return FinnhubStreamProvider(api_key="TESTKEY", url=url, reconnect_delay=0.01)
+
+
+async def collect(provider, symbols, n):
+    records = []
+    async for record in provider.stream(symbols):
+        records.append(record)
+        if len(records) == n:
+            break
+    return records
+
+
+# This test checks that trade messages are normalized into TradeRecords.
+@pytest.mark.asyncio
+async def test_stream_normalizes_trades(ws_server):
+    url, state = ws_server
+    state["expected_subs"] = 2
+    state["scripts"] = [[
+        json.dumps({"type": "ping"}),
+        trade_msg(("AAPL", 189.5, 1700000000000, 100), ("MSFT", 330.25, 1700000000500, 5)),
+    ]]
+    provider = make_provider(url)
+
+    records = await asyncio.wait_for(collect(provider, ["AAPL", "MSFT"], 2), 5)
+    await provider.aclose()
+
+    assert state["tokens"] == ["TESTKEY"]
+    assert state["subscriptions"] == [["AAPL", "MSFT"]]
+    assert [r.symbol for r in records] == ["AAPL", "MSFT"]
+    assert records[0].price == 189.5
+    assert records[0].size == 100
+    assert records[0].ts == datetime.fromtimestamp(1700000000, tz=timezone.utc)
+    assert records[0].source == "finnhub_ws"
+
+
+# This test checks that the provider reconnects after the server drops
+# the connection and subscribes to every symbol again.
+@pytest.mark.asyncio
+async def test_stream_reconnects_and_resubscribes(ws_server):
+    url, state = ws_server
+    state["expected_subs"] = 2
+    state["scripts"] = [
+        [trade_msg(("AAPL", 1.0, 1700000000000, 1)), None],
+        [trade_msg(("MSFT", 2.0, 1700000001000, 1))],
+    ]
+    provider = make_provider(url)
+
+    records = await asyncio.wait_for(collect(provider, ["AAPL", "MSFT"], 2), 5)
+    await provider.aclose()
+
+    assert [r.symbol for r in records] == ["AAPL", "MSFT"]
+    assert provider.connections == 2
+    assert state["subscriptions"] == [["AAPL", "MSFT"], ["AAPL", "MSFT"]]
+
+
+# This test checks that malformed trades and non-trade messages are skipped.
+def test_parse_message_skips_bad_input():
+    provider = make_provider("ws://unused")
+    assert provider.parse_message("not json") == []
+    assert provider.parse_message(json.dumps({"type": "ping"})) == []
+    assert provider.parse_message(json.dumps({"type": "error", "msg": "bad token"})) == []
+
+    records = provider.parse_message(json.dumps({
+        "type": "trade",
+        "data": [{"s": "AAPL", "p": "oops", "t": 1}, {"s": "MSFT", "p": 1.5, "t": 1700000000000}],
+    }))
+    assert [r.symbol for r in records] == ["MSFT"]
+    assert records[0].size == 0.0
+
+
+# This test checks that the provider refuses to start without an API key.
+def test_missing_api_key(monkeypatch):
+    monkeypatch.setattr("core.config.Config.FINNHUB_API_KEY", None)
+    with pytest.raises(FinnhubError):
+        FinnhubStreamProvider(api_key=None)
+
+
+# This test checks the end-to-end path: streamed trades are written
+# through the pipeline in micro-batches.
+@pytest.mark.asyncio
+async def test_run_stream_writes_micro_batches(ws_server):
+    url, state = ws_server
+    state["expected_subs"] = 1
+    state["scripts"] = [[
+        trade_msg(*[("AAPL", 100.0 + i, 1700000000000 + i, 1) for i in range(5)]),
+    ]]
+    provider = make_provider(url)
+    writer = AsyncMock(side_effect=lambda batch: len(batch))
+    pipeline = IngestPipeline(writer=writer, batch_size=2, flush_interval=0.01)
+
+    task = asyncio.create_task(run_stream(provider, ["AAPL"], pipeline=pipeline))
+    for _ in range(100):
+        if pipeline.written == 5:
+            break
+        await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert pipeline.written == 5
+    assert writer.await_count >= 3
+
+
+# This test checks that distinct trades in the same millisecond are all
+# written instead of being quarantined as duplicates.
+@pytest.mark.asyncio
+async def test_run_stream_keeps_same_millisecond_trades(ws_server):
+    url, state = ws_server
+    state["expected_subs"] = 1
+    state["scripts"] = [[
+        trade_msg(("AAPL", 100.0, 1700000000000, 1), ("AAPL", 100.01, 1700000000000, 3),
+                  ("AAPL", 100.0, 1700000000000, 1)),
+    ]]
+    provider = make_provider(url)
+    writer = AsyncMock(side_effect=lambda batch: len(batch))
+    quarantine_writer = AsyncMock(return_value=0)
+    pipeline = IngestPipeline(writer=writer, quarantine_writer=quarantine_writer, batch_size=10, flush_interval=0.01)
+
+    task = asyncio.create_task(run_stream(provider, ["AAPL"], pipeline=pipeline))
+    for _ in range(100):
+        if pipeline.written == 3:
+            break
+        await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert pipeline.written == 3
+    quarantine_writer.assert_not_called()
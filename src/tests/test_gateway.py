@@ -0,0 +1,168 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from core.utils import TokenBucket
+from reasoning.gateway import LLMGateway, SummaryRequest, estimate_tokens
+
+END = datetime(2024, 1, 2, 15, 0, tzinfo=timezone.utc)
+
+
+def make_request(symbol="AAPL", prompt=None):
+    return SummaryRequest(
+        symbol=symbol, window_start=END - timedelta(minutes=5), window_end=END,
+        prompt=prompt or "Summarize {}".format(symbol), prompt_version="v1",
+    )
+
+
+@pytest_asyncio.fixture
+async def model_server():
+    """
+    Fake chat-completions endpoint. `plan` holds status codes to return
+    before succeeding; `delay` is the per-call latency; `usage` is the
+    reported (prompt, completion) tokens.
+    """
+    state = {"calls": 0, "concurrent": 0, "max_concurrent": 0, "plan": [], "delay": 0.02,
+             "usage": (10, 5)}
+
+    async def completions(request):
+        body = await request.json()
+        state["calls"] += 1
+        state["concurrent"] += 1
+        state["max_concurrent"] = max(state["max_concurrent"], state["concurrent"])
+        try:
+            await asyncio.sleep(state["delay"])
+            if state["plan"]:
+                status = state["plan"].pop(0)
+                return web.json_response({"error": "x"}, status=status, headers={"Retry-After": "0"})
+            prompt = body["messages"][-1]["content"]
+            return web.json_response({
+                "model": body["model"],
+                "choices": [{"message": {"role": "assistant", "content": "ok: " + prompt}}],
+                "usage": {"prompt_tokens": state["usage"][0], "completion_tokens": state["usage"][1],
+                          "total_tokens": sum(state["usage"])},
+            })
+        finally:
+            state["concurrent"] -= 1
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    server = TestServer(app)
+    await server.start_server()
+    server.state = state
+    yield server
+    await server.close()
+
+
+def make_gateway(server, rows, **kwargs):
+    async def writer(batch):
+        rows.extend(batch)
+        return len(batch)
+
+    gateway = LLMGateway(
+        base_url=str(server.make_url("/v1")), api_key="k", model="fake", rpm=0, tpm=0, writer=writer,
+        **kwargs,
+    )
+    gateway.backoff_base = gateway.backoff_max = 0.001
+    return gateway
+
+
+# This test checks that requests run concurrently on at most `workers` connections and are accounted in bulk
+@pytest.mark.asyncio
+async def test_worker_pool_and_accounting(model_server):
+    rows = []
+    async with make_gateway(model_server, rows, workers=3) as gateway:
+        results = await gateway.summarize_many([make_request("S{}".format(i)) for i in range(9)])
+
+    assert [r.text for r in results] == ["ok: Summarize S{}".format(i) for i in range(9)]
+    assert model_server.state["max_concurrent"] == 3
+    assert len(rows) == 9
+    symbol, _, _, model, version, text, tokens, latency, cache_key = rows[0]
+    assert (model, version, tokens) == ("fake", "v1", 15)
+    assert latency >= 20
+    assert gateway.stats.as_dict()["tokens_used"] == 135
+
+
+# This test checks that identical in-flight requests share one model call
+@pytest.mark.asyncio
+async def test_coalescing(model_server):
+    rows = []
+    async with make_gateway(model_server, rows, workers=2) as gateway:
+        results = await gateway.summarize_many([make_request("AAPL") for _ in range(4)])
+
+    assert model_server.state["calls"] == 1
+    assert all(r.text == "ok: Summarize AAPL" for r in results)
+    assert sum(r.coalesced for r in results) == 3
+    assert len(rows) == 1
+
+
+# This test checks that 429/5xx are retried and other errors fail without retrying
+@pytest.mark.asyncio
+async def test_retries(model_server):
+    model_server.state["plan"] = [429, 503]
+    rows = []
+    async with make_gateway(model_server, rows, workers=1, max_retries=3) as gateway:
+        result = await gateway.summarize(make_request())
+    assert result.ok and result.attempts == 3
+    assert gateway.stats.retries == 2
+
+    model_server.state["plan"] = [400]
+    async with make_gateway(model_server, rows, workers=1, max_retries=3) as gateway:
+        result = await gateway.summarize(make_request("MSFT"))
+    assert not result.ok and "400" in result.error
+    assert result.attempts == 1
+
+    model_server.state["plan"] = [500, 500]
+    async with make_gateway(model_server, rows, workers=1, max_retries=1) as gateway:
+        result = await gateway.summarize(make_request("TSLA"))
+    assert not result.ok and result.attempts == 2
+
+
+# This test checks that the request-per-minute budget spaces calls out
+@pytest.mark.asyncio
+async def test_request_budget(model_server):
+    model_server.state["delay"] = 0
+    rows = []
+    gateway = make_gateway(model_server, rows, workers=4)
+    gateway.request_bucket = TokenBucket(rate=50, capacity=1)   # 3000 rpm, no burst
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    async with gateway:
+        await gateway.summarize_many([make_request("S{}".format(i)) for i in range(6)])
+    assert loop.time() - started >= 5 / 50 * 0.9
+
+
+# This test checks the token estimate and token bucket refunds
+@pytest.mark.asyncio
+async def test_token_estimate_and_refund():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcdefgh") == 2
+
+    bucket = TokenBucket(rate=1, capacity=100)
+    await bucket.acquire(100)
+    bucket.refund(60)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await bucket.acquire(60)
+    assert loop.time() - started < 0.5
+
+
+# This test checks that usage above the reserved estimate is debited from the token budget
+@pytest.mark.asyncio
+async def test_token_overrun_is_debited(model_server):
+    model_server.state["usage"] = (900, 100)
+    rows = []
+    gateway = make_gateway(model_server, rows, workers=1)
+    gateway.token_bucket = TokenBucket(rate=10, capacity=600)
+    async with gateway:
+        request = make_request()
+        request.max_tokens = 50
+        result = await gateway.summarize(request)
+
+    assert result.ok and result.tokens_used == 1000
+    # Reserved about 50 tokens, used 1000: the balance is well below zero
+    assert gateway.token_bucket._tokens < -300
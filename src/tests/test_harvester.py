@@ -0,0 +1,159 @@
+import pytest
+import pytest_asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from context.cache import BloomFilter, HashDeduper, LRUSet
+from context.harvester import FinnhubNewsSource, NewsHarvester
+from context.normalizer import content_hash, normalize_news, parse_published
+
+NOW = datetime(2024, 1, 2, 15, 0, tzinfo=timezone.utc)
+
+NEWS = {
+    "AAPL": [
+        {"headline": "Apple  unveils <b>new</b> chip", "summary": "Details &amp; more", "datetime": 1704200000, "source": "Reuters"},
+        {"headline": "Apple unveils new chip!", "summary": "Same story, other outlet", "datetime": 1704200100, "source": "CNBC"},
+    ],
+    "MSFT": [
+        {"headline": "Microsoft earnings beat", "summary": "", "datetime": 1704201000, "source": "Reuters"},
+        {"headline": "", "summary": "no title"},
+    ],
+}
+
+
+@pytest_asyncio.fixture
+async def news_server():
+    """
+    Local stub of the company-news endpoint with ETag support.
+    """
+    calls = []
+
+    async def company_news(request):
+        symbol = request.query["symbol"]
+        calls.append((symbol, request.headers.get("If-None-Match")))
+        if symbol == "FAIL":
+            return web.Response(status=500, text="boom")
+        etag = '"{}-v1"'.format(symbol)
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304)
+        return web.json_response(NEWS.get(symbol, []), headers={"ETag": etag})
+
+    app = web.Application()
+    app.router.add_get("/company-news", company_news)
+    server = TestServer(app)
+    await server.start_server()
+    server.calls = calls
+    yield server
+    await server.close()
+
+
+def make_harvester(server, writer):
+    source = FinnhubNewsSource(base_url=str(server.make_url("/company-news")), api_key="TEST", rate=0)
+    deduper = HashDeduper(lru_size=100, bloom_capacity=1000, bloom_error_rate=0.001)
+    return NewsHarvester(sources=[source], deduper=deduper, concurrency=4, writer=writer)
+
+
+# This test checks that titles are cleaned and the same story maps to the same hash
+def test_normalize_news():
+    item = normalize_news(NEWS["AAPL"][0], "AAPL", "finnhub")
+    assert item.title == "Apple unveils new chip"
+    assert item.summary == "Details & more"
+    assert item.source == "Reuters"
+    assert item.published_at == datetime.fromtimestamp(1704200000, tz=timezone.utc)
+    assert item.hash == normalize_news(NEWS["AAPL"][1], "AAPL", "finnhub").hash
+    assert item.hash != content_hash("MSFT", item.title)
+    assert normalize_news(NEWS["MSFT"][1], "MSFT", "finnhub") is None
+
+    assert parse_published("2024-01-02T10:00:00Z") == datetime(2024, 1, 2, 10, tzinfo=timezone.utc)
+    assert parse_published("not a date") is None
+
+
+# This test checks the LRU, bloom filter and deduper building blocks
+def test_dedup_cache():
+    lru = LRUSet(2)
+    for key in ("a", "b", "c"):
+        lru.add(key)
+    assert "a" not in lru and "c" in lru
+
+    bloom = BloomFilter(1000, 0.01)
+    for i in range(1000):
+        bloom.add(str(i))
+    assert all(str(i) in bloom for i in range(1000))
+    false_positives = sum(str(i) in bloom for i in range(1000, 11000))
+    assert false_positives < 300
+
+    deduper = HashDeduper(lru_size=1, bloom_capacity=100, bloom_error_rate=0.001)
+    assert deduper.filter_new(["x", "y", "x"], key=str) == ["x", "y"]
+    # "x" fell out of the LRU but is still caught by the bloom filter
+    assert deduper.filter_new(["x", "z"], key=str) == ["z"]
+    assert deduper.bloom_hits == 1
+
+
+# This test checks that the bloom filter rotates at capacity and still catches the previous generation
+def test_dedup_bloom_rotates():
+    deduper = HashDeduper(lru_size=1, bloom_capacity=100, bloom_error_rate=0.001)
+    deduper.warm(str(i) for i in range(150))
+
+    assert deduper.rotations == 1
+    assert deduper.bloom.count == 50
+    assert deduper.filter_new(["10", "120", "new"], key=str) == ["new"]
+
+    # A second rotation forgets the oldest generation
+    deduper.warm("x{}".format(i) for i in range(100))
+    assert deduper.rotations == 2
+    assert deduper.filter_new(["10"], key=str) == ["10"]
+
+
+# This test checks a harvest against the stub server: concurrent fetch, dedup and one bulk write
+@pytest.mark.asyncio
+async def test_harvest_against_stub_server(news_server):
+    writer = AsyncMock(side_effect=lambda items: len(items))
+    harvester = make_harvester(news_server, writer)
+    try:
+        result = await harvester.harvest(["AAPL", "MSFT", "FAIL"], now=NOW)
+    finally:
+        await harvester.aclose()
+
+    assert result.requests == 3
+    assert result.fetched == 3
+    assert result.duplicates == 1
+    assert result.inserted == 2
+    assert list(result.errors) == ["finnhub:FAIL"]
+    written = writer.call_args[0][0]
+    assert sorted(item.symbol for item in written) == ["AAPL", "MSFT"]
+
+
+# This test checks that repeat harvests send If-None-Match and skip 304 responses
+@pytest.mark.asyncio
+async def test_harvest_conditional_requests(news_server):
+    writer = AsyncMock(side_effect=lambda items: len(items))
+    harvester = make_harvester(news_server, writer)
+    try:
+        await harvester.harvest(["AAPL"], now=NOW)
+        result = await harvester.harvest(["AAPL"], now=NOW)
+    finally:
+        await harvester.aclose()
+
+    assert news_server.calls == [("AAPL", None), ("AAPL", '"AAPL-v1"')]
+    assert result.not_modified == 1
+    assert result.fetched == 0
+    writer.assert_awaited_once()
+
+
+# This test checks that hashes and ETags are not kept when the database write fails
+@pytest.mark.asyncio
+async def test_failed_write_is_retried(news_server):
+    writer = AsyncMock(side_effect=[RuntimeError("db down"), 1])
+    harvester = make_harvester(news_server, writer)
+    try:
+        with pytest.raises(RuntimeError):
+            await harvester.harvest(["MSFT"], now=NOW)
+        result = await harvester.harvest(["MSFT"], now=NOW)
+    finally:
+        await harvester.aclose()
+
+    assert result.inserted == 1
+    assert news_server.calls == [("MSFT", None), ("MSFT", None)]
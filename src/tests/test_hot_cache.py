@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from ingest.batch import TradeBatch, ts_column
+from ingest.hot_cache import HotTradeCache, SymbolRing, TradeWindow
+from ingest.providers.base import TradeRecord
+
+T0 = datetime(2024, 1, 2, tzinfo=timezone.utc)
+T0_NS = int(ts_column([T0])[0])
+
+
+def make_rec(symbol="AAPL", seconds=0.0, price=100.0, size=1.0):
+    return TradeRecord(symbol=symbol, ts=T0 + timedelta(seconds=seconds), price=price, size=size, source="test")
+
+
+def at(seconds):
+    return T0 + timedelta(seconds=seconds)
+
+
+# This test checks that the mirrored ring keeps the newest trades contiguous across wrap-around
+def test_ring_wraps_and_returns_contiguous_views():
+    ring = SymbolRing(4, complete_from=0)
+    for i in range(6):
+        ring.append(T0_NS + i, float(i), 1.0)
+
+    window = ring.view(0, T0_NS + 100)
+    assert window.price.tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert np.shares_memory(window.price, ring.price)
+    assert not window.price.flags.writeable
+    # Trades 0 and 1 were overwritten, so completeness starts after trade 1
+    assert ring.complete_from == T0_NS + 2
+
+    ring.extend(np.array([T0_NS + 6, T0_NS + 7, T0_NS + 8]), np.array([6.0, 7.0, 8.0]), np.ones(3))
+    assert ring.view(0, T0_NS + 100).price.tolist() == [5.0, 6.0, 7.0, 8.0]
+    assert ring.complete_from == T0_NS + 5
+
+
+# This test checks that a batch larger than the ring keeps only its newest trades
+def test_ring_extend_larger_than_capacity():
+    ring = SymbolRing(3, complete_from=0)
+    ts = T0_NS + np.arange(5)
+    ring.extend(ts, ts.astype(np.float64), np.ones(5))
+    assert ring.view(0, T0_NS + 100).ts.tolist() == ts[2:].tolist()
+    assert ring.complete_from == T0_NS + 2
+
+
+# This test checks that cache reads hit after the cache's start and miss (counted) otherwise
+def test_cache_hits_and_misses():
+    cache = HotTradeCache(capacity=16, created_ns=T0_NS)
+    cache.add_batch(TradeBatch.from_records([
+        make_rec(seconds=2, price=102), make_rec(seconds=1, price=101), make_rec("MSFT", seconds=1.5),
+    ]))
+
+    window = cache.window("AAPL", at(0), at(2))
+    assert window.price.tolist() == [101.0]
+    assert window.source == "cache"
+    assert len(cache.window("AAPL", at(0), at(10))) == 2
+
+    assert cache.window("AAPL", at(-60), at(2)) is None      # before the cache started
+    assert cache.window("TSLA", at(0), at(2)) is None        # never seen
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["symbols"] == 2
+
+
+# This test checks that an out-of-order trade makes earlier ranges miss instead of returning incomplete data
+def test_late_trade_marks_range_incomplete():
+    cache = HotTradeCache(capacity=16, created_ns=T0_NS)
+    cache.add_batch(TradeBatch.from_records([make_rec(seconds=10)]))
+    cache.add_batch(TradeBatch.from_records([make_rec(seconds=5), make_rec(seconds=11)]))
+
+    assert cache.window("AAPL", at(0), at(20)) is None
+    assert len(cache.window("AAPL", at(6), at(20))) == 2
+
+
+# This test checks that a miss falls back to raw_trades
+@pytest.mark.asyncio
+async def test_get_trades_falls_back_to_db():
+    cache = HotTradeCache(capacity=16, created_ns=T0_NS)
+    rows = TradeWindow(np.array([T0_NS - 1]), np.array([99.0]), np.array([1.0]), "db")
+
+    with patch("ingest.hot_cache.load_window", return_value=rows) as mock_load:
+        window = await cache.get_trades("AAPL", at(-60), at(0))
+
+    assert window.source == "db"
+    mock_load.assert_awaited_once_with("AAPL", at(-60), at(0))
+
+    cache.add_batch(TradeBatch.from_records([make_rec(seconds=1)]))
+    window = await cache.recent("AAPL", 5, now=at(5))
+    assert window.source == "cache"
+    assert len(window) == 1
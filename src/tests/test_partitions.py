@@ -0,0 +1,26 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from ops.partitions import maintain_partitions
+
+
+# This test checks that partitions are created ahead and old ones dropped per the retention setting
+@pytest.mark.asyncio
+@patch("ops.partitions.execute", new_callable=AsyncMock)
+async def test_maintain_partitions_creates_and_drops(mock_execute):
+    await maintain_partitions(retention_days=30, days_ahead=2)
+
+    calls = [c[0] for c in mock_execute.call_args_list]
+    assert calls == [
+        ("SELECT raw_trades_create_partitions($1)", (2,)),
+        ("SELECT raw_trades_drop_partitions($1)", (30,)),
+    ]
+
+
+# This test checks that a retention of 0 never drops partitions
+@pytest.mark.asyncio
+@patch("ops.partitions.execute", new_callable=AsyncMock)
+async def test_maintain_partitions_unlimited_retention(mock_execute):
+    await maintain_partitions(retention_days=0, days_ahead=1)
+
+    mock_execute.assert_awaited_once_with("SELECT raw_trades_create_partitions($1)", (1,))
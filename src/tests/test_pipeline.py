@@ -0,0 +1,205 @@
+import asyncio
+import pytest
+from datetime import datetime, timezone, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from ingest.pipeline import IngestPipeline, run_pipeline_once
+from ingest.providers.base import TradeRecord
+from ingest.providers.errors import ProviderError
+from ingest.writer_errors import WriterError
+
+
+def make_rec(symbol="AAPL", price=100.0, size=1.0, ts=None):
+    return TradeRecord(
+        symbol=symbol,
+        ts=ts or datetime.now(timezone.utc),
+        price=price,
+        size=size,
+        source="finnhub"
+    )
+
+
+def make_provider(fail=()):
+    async def fake_fetch(symbol):
+        if symbol in fail:
+            raise ProviderError("failed {}".format(symbol))
+        return make_rec(symbol)
+
+    provider = MagicMock()
+    provider.fetch_async = AsyncMock(side_effect=fake_fetch)
+    return provider
+
+
+# This test checks that every fetched record reaches the writer
+# and that failed symbols are reported without stopping the pipeline.
+@pytest.mark.asyncio
+async def test_pipeline_fetches_validates_and_writes():
+    writer = AsyncMock(side_effect=lambda batch: len(batch))
+    pipeline = IngestPipeline(
+        provider=make_provider(fail={"BAD"}), writer=writer,
+        batch_size=100, flush_interval=0.01,
+    )
+
+    await pipeline.start()
+    await pipeline.fetch(["AAPL", "BAD", "MSFT", "GOOG"])
+    written = await pipeline.stop()
+
+    assert written == 3
+    written_symbols = sorted(r.symbol for call in writer.call_args_list for r in call[0][0])
+    assert written_symbols == ["AAPL", "GOOG", "MSFT"]
+    assert list(pipeline.fetch_errors) == ["BAD"]
+
+
+# This test checks that the writer flushes as soon as a batch is full.
+@pytest.mark.asyncio
+async def test_pipeline_flushes_by_size():
+    writer = AsyncMock(side_effect=lambda batch: len(batch))
+    pipeline = IngestPipeline(writer=writer, batch_size=2, flush_interval=60)
+    await pipeline.start()
+
+    base = datetime.now(timezone.utc)
+    for i in range(4):
+        await pipeline.put(make_rec(ts=base - timedelta(seconds=i)))
+    await asyncio.sleep(0.01)
+
+    # Two full batches are written without waiting for the flush interval
+    assert writer.await_count == 2
+    await pipeline.stop()
+
+
+# This test checks that a partial batch is flushed once it gets old enough.
+@pytest.mark.asyncio
+async def test_pipeline_flushes_by_age():
+    writer = AsyncMock(side_effect=lambda batch: len(batch))
+    pipeline = IngestPipeline(writer=writer, batch_size=100, flush_interval=0.02)
+    await pipeline.start()
+
+    await pipeline.put(make_rec())
+    await asyncio.sleep(0.01)
+    assert writer.await_count == 0
+    await asyncio.sleep(0.05)
+    assert writer.await_count == 1
+
+    await pipeline.stop()
+
+
+# This test checks that an invalid record is quarantined on its own
+# instead of losing the rest of its micro-batch.
+@pytest.mark.asyncio
+async def test_pipeline_quarantines_only_invalid_records():
+    writer = AsyncMock(side_effect=lambda batch: len(batch))
+    quarantine_writer = AsyncMock(side_effect=lambda rejects: len(rejects))
+    pipeline = IngestPipeline(
+        writer=writer, quarantine_writer=quarantine_writer,
+        batch_size=10, flush_interval=0.01,
+    )
+    await pipeline.start()
+
+    await pipeline.put(make_rec("AAPL"))
+    await pipeline.put(make_rec("MSFT", price=-1))
+    await pipeline.put(make_rec("GOOG"))
+    written = await pipeline.stop()
+
+    assert written == 2
+    assert pipeline.metrics()["validate"]["errors"] == 1
+    rejects = quarantine_writer.call_args[0][0]
+    assert [(r.symbol, reason) for r, reason in rejects] == [("MSFT", "price_nonpositive")]
+
+
+# This test checks that a failing quarantine write does not stop the
+# good rows from being written.
+@pytest.mark.asyncio
+async def test_pipeline_survives_quarantine_error():
+    writer = AsyncMock(side_effect=lambda batch: len(batch))
+    quarantine_writer = AsyncMock(side_effect=WriterError("db down"))
+    pipeline = IngestPipeline(
+        writer=writer, quarantine_writer=quarantine_writer,
+        batch_size=10, flush_interval=0.01,
+    )
+    await pipeline.start()
+
+    await pipeline.put(make_rec("AAPL"))
+    await pipeline.put(make_rec("MSFT", price=-1))
+    written = await pipeline.stop()
+
+    assert written == 1
+
+
+# This test checks that a failed flush is counted and the pipeline keeps going.
+@pytest.mark.asyncio
+async def test_pipeline_survives_writer_error():
+    writer = AsyncMock(side_effect=[WriterError("db down"), 1])
+    pipeline = IngestPipeline(writer=writer, batch_size=1, flush_interval=0.01)
+    await pipeline.start()
+
+    await pipeline.put(make_rec("AAPL"))
+    await pipeline.put(make_rec("MSFT"))
+    written = await pipeline.stop()
+
+    assert written == 1
+    assert pipeline.metrics()["write"]["errors"] == 1
+
+
+# This test checks that any writer or quarantine exception is counted per
+# batch instead of killing the stage (which would block put() and stop()).
+@pytest.mark.asyncio
+async def test_pipeline_survives_unexpected_writer_exception():
+    writer = AsyncMock(side_effect=[RuntimeError("boom"), 1])
+    quarantine_writer = AsyncMock(side_effect=RuntimeError("boom"))
+    pipeline = IngestPipeline(
+        writer=writer, quarantine_writer=quarantine_writer, queue_size=1, batch_size=1, flush_interval=0.01,
+    )
+    await pipeline.start()
+
+    await pipeline.put(make_rec("AAPL"))
+    await pipeline.put(make_rec("NVDA", price=-1))
+    await pipeline.put(make_rec("MSFT"))
+    written = await asyncio.wait_for(pipeline.stop(), timeout=1)
+
+    assert written == 1
+    assert pipeline.metrics()["write"]["errors"] == 1
+    quarantine_writer.assert_awaited_once()
+
+
+# This test checks that a full queue blocks the producer (back-pressure).
+@pytest.mark.asyncio
+async def test_pipeline_applies_back_pressure():
+    release = asyncio.Event()
+
+    async def slow_writer(batch):
+        await release.wait()
+        return len(batch)
+
+    pipeline = IngestPipeline(writer=slow_writer, queue_size=1, batch_size=1, flush_interval=0)
+    await pipeline.start()
+
+    base = datetime.now(timezone.utc)
+    producer = asyncio.ensure_future(
+        asyncio.gather(*(pipeline.put(make_rec(ts=base - timedelta(seconds=i))) for i in range(10)))
+    )
+    await asyncio.sleep(0.02)
+    assert not producer.done()
+    assert pipeline.metrics()["validate"]["queue_depth"] == 1
+
+    release.set()
+    await producer
+    assert await pipeline.stop() == 10
+
+
+# This test checks that metrics() reports every stage.
+@pytest.mark.asyncio
+async def test_pipeline_metrics_shape():
+    pipeline = IngestPipeline(writer=AsyncMock(return_value=0))
+    metrics = pipeline.metrics()
+    assert set(metrics) == {"fetch", "validate", "write"}
+    for stage in metrics.values():
+        assert {"queue_depth", "processed", "errors", "throughput_per_sec", "utilization"} <= set(stage)
+
+
+# This test checks the one-shot helper used by the scheduler.
+@pytest.mark.asyncio
+@patch("ingest.pipeline.write_bulk", new_callable=AsyncMock)
+async def test_run_pipeline_once(mock_write):
+    mock_write.side_effect = lambda batch: len(batch)
+    written = await run_pipeline_once(provider=make_provider(), symbols=["AAPL", "MSFT"])
+    assert written == 2
@@ -0,0 +1,85 @@
+import pytest
+import time
+from unittest.mock import AsyncMock, patch
+
+from reasoning.gateway import SummaryRequest
+from reasoning.prompt_cache import PromptCache, fingerprint, parse_quanta
+from tests.test_gateway import END, make_gateway, model_server  # noqa: F401
+
+
+# This test checks that fingerprints ignore key order and whitespace and quantize numbers
+def test_fingerprint_normalization():
+    a = fingerprint("v1", "m", {"metrics": {"vwap": 187.1234, "volatility": 0.01231}, "news": ["Apple  beats\n"]},
+                    digits=3, quanta={})
+    b = fingerprint("v1", "m", {"news": ["Apple beats"], "metrics": {"volatility": 0.01229, "vwap": 187.0999}},
+                    digits=3, quanta={})
+    assert a == b
+    assert a != fingerprint("v2", "m", {"news": ["Apple beats"]}, digits=3, quanta={})
+    assert a != fingerprint("v1", "m", {"metrics": {"vwap": 190.0, "volatility": 0.0123}, "news": ["Apple beats"]},
+                            digits=3, quanta={})
+
+    exact = {"vwap": 187.1234}
+    assert fingerprint("v1", "m", exact, digits=0, quanta={}) != fingerprint("v1", "m", {"vwap": 187.1235},
+                                                                             digits=0, quanta={})
+    quanta = parse_quanta("volatility:0.001, momentum:0.01")
+    assert quanta == {"volatility": 0.001, "momentum": 0.01}
+    assert fingerprint("v1", "m", {"volatility": 0.0121}, digits=0, quanta=quanta) == \
+        fingerprint("v1", "m", {"volatility": 0.0118}, digits=0, quanta=quanta)
+
+
+# This test checks LRU eviction and TTL expiry of the memory tier
+@pytest.mark.asyncio
+async def test_memory_tier():
+    cache = PromptCache(maxsize=2, ttl_sec=60, use_db=False)
+    cache.put("a", "A", "m")
+    cache.put("b", "B", "m")
+    assert (await cache.get("a")).text == "A"
+    cache.put("c", "C", "m")
+    assert await cache.get("b") is None
+    assert (await cache.get("c")).source == "memory"
+
+    with patch("reasoning.prompt_cache.time.monotonic", return_value=1e12):
+        assert await cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["expired"]) == (2, 2, 1)
+
+
+# This test checks that a database hit is returned and promoted to memory
+@pytest.mark.asyncio
+async def test_db_tier():
+    cache = PromptCache(maxsize=10, ttl_sec=900)
+    row = {"text": "T", "model": "m", "age": 840.0}
+    with patch("reasoning.prompt_cache.fetch_one", new=AsyncMock(return_value=row)) as fetch:
+        hit = await cache.get("k")
+        assert (hit.text, hit.source) == ("T", "db")
+        assert (await cache.get("k")).source == "memory"
+    fetch.assert_awaited_once()
+    assert fetch.await_args.args[1] == ("k", 900.0)
+    assert "tokens_used > 0" in fetch.await_args.args[0]
+    assert cache.stats()["hit_rate"] == 1.0
+
+    # Promoted for the rest of the row's TTL only, not a fresh one
+    expires = cache._entries["k"][0]
+    assert expires - 60 == pytest.approx(time.monotonic(), abs=1)
+
+
+# This test checks that the gateway answers repeated fingerprints from the cache and still writes a row
+@pytest.mark.asyncio
+async def test_gateway_uses_cache(model_server):  # noqa: F811
+    rows = []
+    cache = PromptCache(maxsize=10, ttl_sec=60, use_db=False)
+
+    def request(symbol):
+        return SummaryRequest(symbol=symbol, window_start=END, window_end=END, prompt="quiet " + symbol,
+                              prompt_version="v1", cache_key="same")
+
+    async with make_gateway(model_server, rows, workers=1, cache=cache) as gateway:
+        first = await gateway.summarize(request("AAPL"))
+        second = await gateway.summarize(request("MSFT"))
+
+    assert model_server.state["calls"] == 1
+    assert not first.cached and second.cached
+    assert second.text == first.text and second.tokens_used == 0
+    assert [row[0] for row in rows] == ["AAPL", "MSFT"]
+    assert rows[1][-1] == "same"
+    assert gateway.stats.cached == 1
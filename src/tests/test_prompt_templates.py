@@ -0,0 +1,88 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+from reasoning.gateway import estimate_tokens
+from reasoning.prompt_templates import (
+    DEFAULT_TEMPLATE_NAME, CompiledTemplate, PromptBudgetError, TemplateRegistry,
+)
+
+T0 = datetime(2024, 1, 2, 15, 0, tzinfo=timezone.utc)
+T1 = T0 + timedelta(minutes=5)
+
+CONTENT = "Be brief.\nUse the data.\n\nSymbol: {symbol}\nEvents:\n{events}\nNews:\n{news}\nMetrics:\n{metrics}\n"
+METRICS = {"vwap": 190.123456789, "momentum": 0.0123, "volatility": None}
+EVENTS = [
+    {"type": "price_gap", "severity": "low", "window_end": T1, "details": {"gap_pct": 0.006}},
+    {"type": "volume_spike", "severity": "high", "window_end": T0, "details": {}},
+]
+NEWS = [
+    {"published_at": T0 - timedelta(hours=2), "title": "Older story", "summary": "x" * 200},
+    {"published_at": T0 - timedelta(hours=1), "title": "Newer story", "summary": ""},
+]
+
+
+# This test checks that compilation splits the static prefix and rejects unknown placeholders
+def test_compile():
+    template = CompiledTemplate("t", "1", CONTENT)
+    assert template.prefix == "Be brief.\nUse the data."
+    assert template.prefix_tokens == estimate_tokens(template.prefix)
+    assert template.parts[0] == ("Symbol: ", "symbol")
+    assert template.fields == {"symbol", "events", "news", "metrics"}
+    assert template.prompt_version == "t:1"
+    with pytest.raises(ValueError):
+        CompiledTemplate("t", "1", "Hello {user}")
+    with pytest.raises(ValueError):
+        CompiledTemplate("t", "1", "Hello {symbol:>10}")
+
+
+# This test checks rendering of every section when the budget is not a constraint
+def test_assemble_full():
+    prompt = CompiledTemplate("t", "1", CONTENT).assemble("AAPL", T0, T1, METRICS, EVENTS, NEWS, budget=10000)
+    assert prompt.system == "Be brief.\nUse the data."
+    assert prompt.prompt == (
+        "Symbol: AAPL\nEvents:\n"
+        "- 15:00 volume_spike (high)\n- 15:05 price_gap (low): gap_pct=0.006\n"
+        "News:\n- 2024-01-02 14:00 Newer story\n- 2024-01-02 13:00 Older story: " + "x" * 200 + "\n"
+        "Metrics:\nvwap: 190.123\nmomentum: 0.0123\n"
+    )
+    assert prompt.dropped == {}
+    assert prompt.tokens == estimate_tokens(prompt.system) + estimate_tokens(prompt.prompt)
+
+
+# This test checks that truncation follows the priority order and respects the budget
+@pytest.mark.parametrize("budget,dropped", [
+    (90, {"news": 1}),
+    (40, {"news": 2, "events": 1}),
+    (28, {"news": 2, "events": 2, "metrics": 1}),
+])
+def test_assemble_truncates(budget, dropped):
+    template = CompiledTemplate("t", "1", CONTENT)
+    with patch("reasoning.prompt_templates.Config.PROMPT_TRUNCATION_ORDER", "news,context,events,metrics"):
+        prompt = template.assemble("AAPL", T0, T1, METRICS, EVENTS, NEWS, budget=budget)
+    assert prompt.dropped == dropped
+    assert prompt.tokens <= budget
+    if "events" in dropped and dropped["events"] == 1:
+        assert "volume_spike" in prompt.prompt and "price_gap" not in prompt.prompt
+
+    with pytest.raises(PromptBudgetError):
+        template.assemble("AAPL", T0, T1, METRICS, EVENTS, NEWS, budget=10)
+
+
+# This test checks that versions load once, the latest wins and the built-in default is kept
+@pytest.mark.asyncio
+@patch("reasoning.prompt_templates.fetch", new_callable=AsyncMock)
+async def test_registry(mock_fetch):
+    mock_fetch.return_value = [
+        {"name": "market_summary", "version": "v1", "content": "Old.\n\n{symbol}"},
+        {"name": "market_summary", "version": "v2", "content": "New.\n\n{symbol} {metrics}"},
+        {"name": "empty", "version": "v1", "content": None},
+    ]
+    registry = await TemplateRegistry.load()
+    mock_fetch.assert_awaited_once()
+
+    assert registry.get(DEFAULT_TEMPLATE_NAME, "").version == "v2"
+    assert registry.get(DEFAULT_TEMPLATE_NAME, "v1").prefix == "Old."
+    assert registry.get(DEFAULT_TEMPLATE_NAME, "builtin-v1").fields >= {"metrics", "events", "news", "context"}
+    with pytest.raises(KeyError):
+        registry.get("empty", "")
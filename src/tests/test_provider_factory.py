@@ -41,3 +41,25 @@ def test_factory_none_provider(monkeypatch):
     monkeypatch.setattr("core.config.Config.API_PROVIDER", None)
     with pytest.raises(ProviderError):
         get_provider()
+
+
+# ---------------------------------------------------------
+# Streaming providers
+# ---------------------------------------------------------
+from ingest.providers import get_stream_provider
+from ingest.providers.finnhub_stream_provider import FinnhubStreamProvider
+
+
+# This test checks that STREAM_PROVIDER=finnhub returns the websocket provider.
+def test_stream_factory_returns_finnhub(monkeypatch):
+    monkeypatch.setattr("core.config.Config.STREAM_PROVIDER", "Finnhub")
+    monkeypatch.setattr("core.config.Config.FINNHUB_API_KEY", "TESTKEY")
+    provider = get_stream_provider()
+    assert isinstance(provider, FinnhubStreamProvider)
+
+
+# This test checks that an unknown stream provider raises a ProviderError.
+def test_stream_factory_unknown_provider(monkeypatch):
+    monkeypatch.setattr("core.config.Config.STREAM_PROVIDER", "unknownprovider")
+    with pytest.raises(ProviderError):
+        get_stream_provider()
@@ -0,0 +1,128 @@
+import json
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+from ingest import quarantine as q
+from ingest.providers.base import TradeRecord
+from ingest.writer_errors import WriterError
+
+
+def make_rec(symbol="AAPL", price=100.0, size=10.0, ts=None, source="finnhub"):
+    return TradeRecord(
+        symbol=symbol,
+        ts=ts or datetime.now(timezone.utc),
+        price=price,
+        size=size,
+        source=source
+    )
+
+
+@pytest.fixture(autouse=True)
+def reset_counts():
+    q.reject_counts.clear()
+    yield
+    q.reject_counts.clear()
+
+
+# This test checks that typed columns are filled for usable values and
+# that raw keeps the original values.
+def test_to_reject_row_keeps_typed_and_raw_values():
+    rec = make_rec(price=-5)
+    row = q.to_reject_row(rec, "price_nonpositive")
+    symbol, ts, price, size, source, reason, raw = row
+    assert (symbol, price, size, source, reason) == ("AAPL", -5, 10.0, "finnhub", "price_nonpositive")
+    assert ts == rec.ts
+    assert json.loads(raw)["price"] == "-5"
+
+
+# This test checks that values that do not fit a column are left NULL.
+def test_to_reject_row_nulls_unusable_values():
+    rec = make_rec(price="abc", ts=datetime(2024, 1, 1), size=float("nan"))
+    symbol, ts, price, size, source, reason, raw = q.to_reject_row(rec, "ts_invalid")
+    assert ts is None
+    assert price is None
+    assert size is None
+    assert json.loads(raw)["ts"] == "2024-01-01T00:00:00"
+
+
+# This test checks that non-TradeRecord rows are still quarantined.
+def test_to_reject_row_for_non_record():
+    row = q.to_reject_row("garbage", "not_trade_record")
+    assert row[:5] == (None, None, None, None, None)
+    assert json.loads(row[6]) == {"value": "'garbage'"}
+
+
+# This test checks that quarantine() writes all rows in one COPY and
+# counts them by reason.
+@pytest.mark.asyncio
+@patch("ingest.quarantine.copy_records", new_callable=AsyncMock)
+async def test_quarantine_bulk_writes_and_counts(mock_copy):
+    mock_copy.return_value = 3
+    rejects = [(make_rec(), "duplicate"), (make_rec(price=-1), "price_nonpositive"), (make_rec(), "duplicate")]
+
+    out = await q.quarantine(rejects)
+
+    assert out == 3
+    mock_copy.assert_awaited_once()
+    table, columns, rows = mock_copy.call_args[0]
+    assert table == "raw_trades_rejects"
+    assert len(rows) == 3
+    assert q.reject_summary() == {"duplicate": 2, "price_nonpositive": 1}
+
+
+# This test checks that nothing is written for an empty list.
+@pytest.mark.asyncio
+@patch("ingest.quarantine.copy_records", new_callable=AsyncMock)
+async def test_quarantine_empty(mock_copy):
+    assert await q.quarantine([]) == 0
+    mock_copy.assert_not_called()
+
+
+# This test checks that database errors surface as WriterError.
+@pytest.mark.asyncio
+@patch("ingest.quarantine.copy_records", new_callable=AsyncMock)
+async def test_quarantine_db_error(mock_copy):
+    mock_copy.side_effect = Exception("db down")
+    with pytest.raises(WriterError):
+        await q.quarantine([(make_rec(), "duplicate")])
+
+
+@asynccontextmanager
+async def fake_transaction():
+    yield "conn"
+
+
+# This test checks that replay() writes rows that now validate and marks
+# them replayed in one transaction, and records an attempt on still-bad rows.
+@pytest.mark.asyncio
+@patch("ingest.quarantine.transaction", new=fake_transaction)
+@patch("ingest.quarantine.notify_listeners", new_callable=AsyncMock)
+@patch("ingest.quarantine.execute", new_callable=AsyncMock)
+@patch("ingest.quarantine.write_bulk", new_callable=AsyncMock)
+@patch("ingest.quarantine.stream_columns")
+async def test_replay_writes_recovered_rows(mock_stream, mock_write, mock_execute, mock_notify):
+    now = datetime.now(timezone.utc)
+
+    async def batches(sql, params):
+        yield {
+            "id": ["a", "b"], "symbol": ["AAPL", "MSFT"], "ts": [now, None],
+            "price": [100, 100], "size": [1, 1], "source": ["finnhub", "finnhub"],
+        }
+    mock_stream.side_effect = batches
+
+    replayed, still_rejected = await q.replay(max_attempts=3)
+
+    assert (replayed, still_rejected) == (1, 1)
+    assert [r.symbol for r in mock_write.call_args[0][0]] == ["AAPL"]
+    assert mock_write.call_args.kwargs["conn"] == "conn"
+    marked, attempted = mock_execute.call_args_list
+    assert "replayed_at" in marked.args[0] and marked.args[1] == (["a"],)
+    assert "replay_attempts" in attempted.args[0] and attempted.args[1] == (["b"],)
+    assert all(c.kwargs["conn"] == "conn" for c in mock_execute.call_args_list)
+    mock_notify.assert_awaited_once()
+
+    sql, params = mock_stream.call_args[0]
+    assert "reason <> 'duplicate'" in sql
+    assert params == (None, 10000, 3)
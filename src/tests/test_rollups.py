@@ -0,0 +1,189 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+from analytics.rollups import (
+    floor_time,
+    get_bars,
+    parse_resolution,
+    plan_bars,
+    refresh_rollups,
+    resolutions,
+)
+
+LEVELS = [("1m", 60), ("5m", 300), ("1h", 3600)]
+T0 = datetime(2024, 1, 2, 10, 0, tzinfo=timezone.utc)
+
+
+# This test checks resolution parsing and that each level must divide the next
+def test_resolutions_parse_and_validate():
+    assert parse_resolution("5m") == 300
+    assert parse_resolution("1d") == 86400
+    assert resolutions("1h,1m,5m") == [("1m", 60), ("5m", 300), ("1h", 3600)]
+
+    with pytest.raises(ValueError):
+        parse_resolution("5x")
+    with pytest.raises(ValueError):
+        resolutions("2m,5m")
+
+
+# This test checks epoch-aligned bucket flooring
+def test_floor_time():
+    assert floor_time(T0 + timedelta(minutes=7, seconds=3), 300) == T0 + timedelta(minutes=5)
+    assert floor_time(T0, 3600) == T0
+
+
+# This test checks that the coarsest folded resolution is used, capped at its watermark
+def test_plan_bars():
+    folded = {"1m": T0 + timedelta(hours=6), "5m": T0 + timedelta(hours=6), "1h": T0 + timedelta(hours=6)}
+    assert plan_bars(3600, T0, T0 + timedelta(hours=5), folded, LEVELS) == [
+        (("1h", 3600), T0, T0 + timedelta(hours=5)),
+    ]
+    assert plan_bars(900, T0, T0 + timedelta(hours=1), folded, LEVELS) == [
+        (("5m", 300), T0, T0 + timedelta(hours=1)),
+    ]
+    # Range start not aligned to 5m -> 1m
+    start = T0 + timedelta(minutes=1)
+    assert plan_bars(300, start, T0 + timedelta(hours=1), folded, LEVELS) == [
+        (("1m", 60), start, T0 + timedelta(hours=1)),
+    ]
+    # Sub-minute interval -> raw trades
+    assert plan_bars(30, T0, T0 + timedelta(hours=1), folded, LEVELS) == [
+        (None, T0, T0 + timedelta(hours=1)),
+    ]
+
+
+# This test checks that buckets past a watermark come from finer levels, then raw_trades
+def test_plan_bars_respects_watermarks():
+    marks = {
+        "1m": T0 + timedelta(hours=1, minutes=11),
+        "5m": T0 + timedelta(hours=1, minutes=10),
+        "1h": T0 + timedelta(hours=1),
+    }
+    end = T0 + timedelta(hours=2)
+    assert plan_bars(3600, T0, end, marks, LEVELS) == [
+        (("1h", 3600), T0, marks["1h"]),
+        (("5m", 300), marks["1h"], marks["5m"]),
+        (("1m", 60), marks["5m"], marks["1m"]),
+        (None, marks["1m"], end),
+    ]
+    # Nothing folded yet -> everything from raw_trades
+    assert plan_bars(3600, T0, end, {}, LEVELS) == [(None, T0, end)]
+
+
+# This test checks that get_bars reads from bars or falls back to raw_trades
+@pytest.mark.asyncio
+@patch("analytics.rollups.fetch", new_callable=AsyncMock)
+async def test_get_bars_source(mock_fetch):
+    marks = [{"resolution": name, "watermark": T0 + timedelta(days=1)} for name, _ in LEVELS]
+    mock_fetch.side_effect = [marks, []]
+
+    await get_bars("AAPL", T0, T0 + timedelta(hours=2), 3600, LEVELS)
+    sql, params = mock_fetch.call_args[0]
+    assert "FROM bars t" in sql
+    assert params == ("1h", timedelta(hours=1), T0, T0 + timedelta(hours=2), "1h", "AAPL")
+
+    mock_fetch.side_effect = [marks, []]
+    await get_bars("AAPL", T0, T0 + timedelta(minutes=1), 10, LEVELS)
+    sql, params = mock_fetch.call_args[0]
+    assert "FROM raw_trades t" in sql
+    assert params[-1] == "AAPL"
+
+
+# This test checks that a bucket split across sources comes back as one bar
+@pytest.mark.asyncio
+@patch("analytics.rollups.fetch", new_callable=AsyncMock)
+async def test_get_bars_merges_split_bucket(mock_fetch):
+    def bar(source, o, h, l, c, volume, notional, trades):
+        return {"bucket": T0, "open": o, "high": h, "low": l, "close": c, "volume": volume,
+                "notional": notional, "trade_count": trades, "vwap": notional / volume, "source": source}
+
+    mock_fetch.side_effect = [
+        [{"resolution": "5m", "watermark": T0 + timedelta(minutes=30)}],
+        [bar("5m", 10, 12, 9, 11, 100, 1050, 40)],
+        [bar("raw", 11, 13, 10, 12, 50, 600, 5)],
+    ]
+
+    bars = await get_bars("AAPL", T0, T0 + timedelta(hours=1), 3600, LEVELS)
+
+    assert [c[0][1][2:4] for c in mock_fetch.call_args_list[1:]] == [
+        (T0, T0 + timedelta(minutes=30)),
+        (T0 + timedelta(minutes=30), T0 + timedelta(hours=1)),
+    ]
+    assert bars == [{
+        "bucket": T0, "open": 10, "high": 13, "low": 9, "close": 12, "volume": 150,
+        "trade_count": 45, "vwap": 1650 / 150, "source": "5m+raw",
+    }]
+
+
+# This test checks the first refresh: watermarks start at the oldest trade and fold up to now - lateness
+@pytest.mark.asyncio
+@patch("analytics.rollups.Config.ROLLUP_LATENESS_SEC", 60)
+@patch("analytics.rollups.Config.ROLLUP_MAX_RANGE_SEC", 86400)
+@patch("analytics.rollups.execute", new_callable=AsyncMock)
+@patch("analytics.rollups.fetch_one", new_callable=AsyncMock)
+@patch("analytics.rollups.fetch", new_callable=AsyncMock)
+async def test_refresh_first_run(mock_fetch, mock_fetch_one, mock_execute):
+    now = T0 + timedelta(hours=1, minutes=12, seconds=30)
+    mock_fetch.return_value = []
+    mock_fetch_one.side_effect = [
+        {"now": now},
+        {"start": T0 + timedelta(seconds=5)},        # min(ts) in raw_trades
+        {"start": T0},                               # min 1m bucket
+        {"start": T0},                               # min 5m bucket
+    ]
+
+    marks = await refresh_rollups(LEVELS)
+
+    assert marks == {
+        "1m": T0 + timedelta(hours=1, minutes=11),
+        "5m": T0 + timedelta(hours=1, minutes=10),
+        "1h": T0 + timedelta(hours=1),
+    }
+    folds = [c[0] for c in mock_execute.call_args_list if "INSERT INTO bars" in c[0][0]]
+    assert [p[1][:4] for p in folds] == [
+        ("1m", timedelta(minutes=1), T0, marks["1m"]),
+        ("5m", timedelta(minutes=5), T0, marks["5m"]),
+        ("1h", timedelta(hours=1), T0, marks["1h"]),
+    ]
+    assert folds[1][1][4] == "1m" and folds[2][1][4] == "5m"
+    saved = [c[0][1] for c in mock_execute.call_args_list if "rollup_watermarks" in c[0][0]]
+    assert saved[0] == ("1m", marks["1m"], now)
+    assert saved[1] == ("5m", marks["5m"], None)
+
+
+# This test checks that late trades recompute only their buckets and propagate to coarser levels
+@pytest.mark.asyncio
+@patch("analytics.rollups.Config.ROLLUP_LATE_SCAN_OVERLAP_SEC", 300)
+@patch("analytics.rollups.Config.ROLLUP_LATENESS_SEC", 60)
+@patch("analytics.rollups.execute", new_callable=AsyncMock)
+@patch("analytics.rollups.fetch_one", new_callable=AsyncMock)
+@patch("analytics.rollups.fetch", new_callable=AsyncMock)
+async def test_refresh_recomputes_late_buckets(mock_fetch, mock_fetch_one, mock_execute):
+    mark_1m = T0 + timedelta(minutes=20)
+    scanned = T0 + timedelta(minutes=21)
+    now = T0 + timedelta(minutes=21, seconds=30)   # watermarks do not move
+    late_bucket = T0 + timedelta(minutes=7)
+    mock_fetch.side_effect = [
+        [
+            {"resolution": "1m", "watermark": mark_1m, "scanned_until": scanned},
+            {"resolution": "5m", "watermark": mark_1m, "scanned_until": None},
+            {"resolution": "1h", "watermark": T0, "scanned_until": None},
+        ],
+        [{"symbol": "AAPL", "bucket": late_bucket}],
+    ]
+    mock_fetch_one.return_value = {"now": now}
+
+    await refresh_rollups(LEVELS)
+
+    late_sql, late_params = mock_fetch.call_args_list[1][0]
+    assert "inserted_at > $1" in late_sql
+    # Rescans the overlap for transactions that committed after the last scan
+    assert late_params == (scanned - timedelta(minutes=5), now, mark_1m, timedelta(minutes=1))
+
+    upserts = [c[0] for c in mock_execute.call_args_list if "INSERT INTO bars" in c[0][0]]
+    # 1m and 5m recomputed for the late key only; 1h bucket is not closed yet
+    assert len(upserts) == 2
+    assert "unnest" in upserts[0][0]
+    assert upserts[0][1] == ("1m", timedelta(minutes=1), ["AAPL"], [late_bucket])
+    assert upserts[1][1] == ("5m", timedelta(minutes=5), ["AAPL"], [T0 + timedelta(minutes=5)], "1m")
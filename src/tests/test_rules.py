@@ -0,0 +1,110 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+from reasoning.gateway import SUMMARIES_COLUMNS
+from reasoning.rules import RuleSet, event_counts, gate, load_window, parse_rules
+
+T0 = datetime(2024, 1, 2, 15, 0, tzinfo=timezone.utc)
+T1 = T0 + timedelta(minutes=5)
+
+SPEC = "skip:trade_count<1,model:events_high>=1,model:abs_return>=0.01,template:trade_count>=1"
+
+
+def metrics_columns(rows):
+    names = ("symbol", "window_start", "window_end", "volume", "trade_count", "first_price", "last_price",
+             "volatility")
+    return {name: [row[i] for row in rows] for i, name in enumerate(names)}
+
+
+COLUMNS = metrics_columns([
+    ("AAPL", T0, T1, 5000.0, 40, 190.0, 190.2, 0.001),   # quiet
+    ("MSFT", T0, T1, 800.0, 10, 330.0, 336.0, 0.004),    # +1.8%
+    ("TSLA", T0, T1, 9000.0, 90, 250.0, 250.5, 0.002),   # high severity event
+    ("XOM", T0, T1, 0.0, 0, None, None, None),           # no trades
+    ("NVDA", T0, T1, None, None, None, None, None),      # nothing known
+])
+EVENTS = {
+    "symbol": ["TSLA", "TSLA", "AAPL", "MSFT"],
+    "window_start": [T0 + timedelta(minutes=2), T0, T0, T0 - timedelta(minutes=5)],
+    "window_end": [T0 + timedelta(minutes=3), T1, T1, T0],
+    "type": ["volume_spike", "price_gap", "price_gap", "volume_spike"],
+    "severity": ["high", "low", "low", "high"],
+}
+
+
+# This test checks rule parsing and that bad specs are rejected when compiled
+def test_parse_rules():
+    rules = parse_rules("model: abs_return >= 0.01 & events.price_gap>=1, skip:volume<1e3")
+    assert [str(rule) for rule in rules] == ["model:abs_return>=0.01&events.price_gap>=1", "skip:volume<1000"]
+    with pytest.raises(ValueError):
+        parse_rules("maybe:volume>1")
+    with pytest.raises(ValueError):
+        parse_rules("model:spread>1")
+    with pytest.raises(ValueError):
+        parse_rules("model:volume~1")
+    with pytest.raises(ValueError):
+        RuleSet.compile("model:volume>1", default="later")
+
+
+# This test checks that events are counted into the windows that contain them
+def test_event_counts():
+    counts = event_counts(COLUMNS, EVENTS)
+    assert counts["events"].tolist() == [1, 0, 2, 0, 0]
+    assert counts["events_high"].tolist() == [0, 0, 1, 0, 0]
+    assert counts["events.price_gap"].tolist() == [1, 0, 1, 0, 0]
+
+
+# This test checks first-match-wins evaluation, the default action and missing values
+def test_evaluate():
+    result = RuleSet.compile(SPEC, default="skip").evaluate(COLUMNS, EVENTS)
+    assert [d.action for d in result.decisions()] == ["template", "model", "model", "skip", "skip"]
+    assert [d.rule for d in result.decisions()] == [
+        "template:trade_count>=1", "model:abs_return>=0.01", "model:events_high>=1", "skip:trade_count<1", None,
+    ]
+    assert result.counts() == {"model": 2, "template": 1, "skip": 2}
+    assert [d.symbol for d in result.decisions("model")] == ["MSFT", "TSLA"]
+
+    # NULL never matches, not even "!="
+    result = RuleSet.compile("model:volatility!=0", default="template").evaluate(COLUMNS)
+    assert [d.action for d in result.decisions()] == ["model", "model", "model", "template", "template"]
+
+
+# This test checks that the gate writes template summaries and hands back the model windows
+@pytest.mark.asyncio
+@patch("reasoning.rules.load_window", new_callable=AsyncMock)
+async def test_gate_writes_templates(mock_load):
+    mock_load.return_value = (COLUMNS, EVENTS)
+    writer = AsyncMock(return_value=1)
+
+    result = await gate(RuleSet.compile(SPEC), T0, T1, window_sec=300, writer=writer)
+
+    mock_load.assert_awaited_once_with(T0, T1, 300, True)
+    assert len(result.decisions("model")) == 2
+    (rows,), _ = writer.await_args
+    assert len(rows) == 1
+    row = dict(zip(SUMMARIES_COLUMNS, rows[0]))
+    assert (row["symbol"], row["model"], row["tokens_used"]) == ("AAPL", "template", 0)
+    assert row["text"] == (
+        "AAPL 15:00-15:05 UTC: no notable activity. Last 190.20 (+0.11%), volume 5,000 over 40 trades, "
+        "volatility 0.0010."
+    )
+
+
+# This test checks that only grid-aligned windows without a summary are loaded
+@pytest.mark.asyncio
+@patch("reasoning.rules.fetch", new_callable=AsyncMock)
+@patch("reasoning.rules.stream_columns")
+async def test_load_window_filters_gated_windows(mock_stream, mock_fetch):
+    async def batches(sql, params):
+        yield {"symbol": ["AAPL"], "window_start": [T0], "window_end": [T1]}
+    mock_stream.side_effect = batches
+    mock_fetch.return_value = []
+
+    columns, events = await load_window(T0, T1, 300)
+
+    sql, params = mock_stream.call_args[0]
+    assert params == (T0, T1, 300.0, 300)
+    assert "MOD(EXTRACT(EPOCH FROM m.window_start)::bigint, $4) = 0" in sql
+    assert "NOT EXISTS (SELECT 1 FROM summaries" in sql
+    assert columns["symbol"] == ["AAPL"] and events["symbol"] == []
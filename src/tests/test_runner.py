@@ -0,0 +1,82 @@
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+from analytics.runner import UPSERT_CHECKPOINT_SQL, process_chunk, run_once
+from ingest.batch import TradeBatch
+from ingest.providers.base import TradeRecord
+
+T0 = datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+
+def make_rec(symbol="AAPL", seconds=0.0, price=100.0, size=1.0):
+    return TradeRecord(symbol=symbol, ts=T0 + timedelta(seconds=seconds), price=price, size=size, source="test")
+
+
+@asynccontextmanager
+async def fake_transaction():
+    yield "conn"
+
+
+# This test checks that symbols resume from their checkpoints (or first trade) and advance in grid-aligned chunks
+@pytest.mark.asyncio
+@patch("analytics.runner.process_chunk", new_callable=AsyncMock)
+@patch("analytics.runner.fetch", new_callable=AsyncMock)
+@patch("analytics.runner.fetch_one", new_callable=AsyncMock)
+async def test_run_once_resumes_from_checkpoints(mock_fetch_one, mock_fetch, mock_chunk):
+    mock_fetch_one.return_value = {"now": T0 + timedelta(hours=2, minutes=31)}
+    mock_fetch.side_effect = [
+        [{"symbol": "AAPL", "processed_until": T0 + timedelta(minutes=30)}],
+        [{"symbol": "MSFT", "first_ts": T0 + timedelta(hours=1, minutes=10)}, {"symbol": "NEW", "first_ts": None}],
+    ]
+    mock_chunk.return_value = 3
+
+    written = await run_once(["AAPL", "MSFT", "NEW"], windows=[(60, 60)], lateness_sec=60, chunk_sec=3600)
+
+    calls = [(c[0][0], c[0][1], c[0][2]) for c in mock_chunk.call_args_list]
+    assert calls == [
+        (["AAPL"], T0 + timedelta(minutes=30), T0 + timedelta(hours=1)),
+        (["AAPL"], T0 + timedelta(hours=1), T0 + timedelta(hours=2)),
+        (["MSFT"], T0 + timedelta(hours=1, minutes=10), T0 + timedelta(hours=2)),
+        (["AAPL", "MSFT"], T0 + timedelta(hours=2), T0 + timedelta(hours=2, minutes=30)),
+    ]
+    assert written == 12
+
+
+# This test checks that nothing runs when every checkpoint is already current
+@pytest.mark.asyncio
+@patch("analytics.runner.process_chunk", new_callable=AsyncMock)
+@patch("analytics.runner.fetch", new_callable=AsyncMock)
+@patch("analytics.runner.fetch_one", new_callable=AsyncMock)
+async def test_run_once_up_to_date(mock_fetch_one, mock_fetch, mock_chunk):
+    mock_fetch_one.return_value = {"now": T0 + timedelta(minutes=1)}
+    mock_fetch.return_value = [{"symbol": "AAPL", "processed_until": T0}]
+
+    assert await run_once(["AAPL"], windows=[(60, 60)], lateness_sec=60) == 0
+    mock_chunk.assert_not_called()
+
+
+# This test checks that a chunk writes only windows ending in (start, end] and moves checkpoints in the same transaction
+@pytest.mark.asyncio
+@patch("analytics.runner.transaction", fake_transaction)
+@patch("analytics.runner.execute_many", new_callable=AsyncMock)
+@patch("analytics.runner.write_metrics", new_callable=AsyncMock)
+@patch("analytics.runner.load_trades", new_callable=AsyncMock)
+async def test_process_chunk_is_atomic(mock_load, mock_write, mock_execute_many):
+    mock_load.return_value = TradeBatch.from_records([
+        make_rec(seconds=30), make_rec(seconds=70), make_rec(seconds=130), make_rec("MSFT", seconds=75),
+    ])
+    mock_write.side_effect = lambda metrics, conn=None: len(metrics)
+
+    start, end = T0 + timedelta(minutes=1), T0 + timedelta(minutes=2)
+    written = await process_chunk(["AAPL", "MSFT"], start, end, [(60, 60)])
+
+    assert mock_load.call_args[0] == (start - timedelta(seconds=60), end, ["AAPL", "MSFT"])
+    metrics = mock_write.call_args[0][0]
+    assert sorted((m.symbol, m.window_end) for m in metrics) == [("AAPL", end), ("MSFT", end)]
+    assert mock_write.call_args[1] == {"conn": "conn"}
+    mock_execute_many.assert_awaited_once_with(
+        UPSERT_CHECKPOINT_SQL, [("metrics", "AAPL", end), ("metrics", "MSFT", end)], conn="conn"
+    )
+    assert written == 2
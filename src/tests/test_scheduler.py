@@ -2,8 +2,16 @@ import pytest
 from unittest.mock import patch, MagicMock
 from datetime import datetime, timezone, timedelta
 
-from core.scheduler import run_once, run_scheduler
+from core.scheduler import run_once, run_scheduler, next_deadline
+from ingest.fetcher import FetchResult
 from ingest.providers.base import TradeRecord
+from ingest.writer_errors import WriterError
+
+
+@pytest.fixture(autouse=True)
+def no_partition_maintenance():
+    with patch("core.scheduler.maintain_partitions", new_callable=AsyncMock) as mock_maintain:
+        yield mock_maintain
 
 
 # Helper function to build fake records
@@ -24,18 +32,18 @@ import asyncio
 from unittest.mock import AsyncMock
 
 @pytest.mark.asyncio
-@patch("core.scheduler.write", new_callable=AsyncMock)
-@patch("core.scheduler.validate")
-@patch("core.scheduler.fetch_all")
+@patch("core.scheduler.write_bulk", new_callable=AsyncMock)
+@patch("core.scheduler.partition")
+@patch("core.scheduler.fetch_all_async", new_callable=AsyncMock)
 async def test_run_once_happy_path(mock_fetch, mock_validate, mock_write):
-    mock_fetch.return_value = [make_rec()]
-    mock_validate.return_value = [make_rec()]
+    mock_fetch.return_value = FetchResult(records=[make_rec()])
+    mock_validate.return_value = ([make_rec()], [])
     mock_write.return_value = 1
 
     result = await run_once()
 
     assert result == 1
-    mock_fetch.assert_called_once()
+    mock_fetch.assert_awaited_once()
     mock_validate.assert_called_once()
     mock_write.assert_awaited_once()
 
@@ -44,7 +52,7 @@ async def test_run_once_happy_path(mock_fetch, mock_validate, mock_write):
 # TEST 2 — run_once handles fetch errors
 # ---------------------------------------------------------
 @pytest.mark.asyncio
-@patch("core.scheduler.fetch_all")
+@patch("core.scheduler.fetch_all_async", new_callable=AsyncMock)
 async def test_run_once_fetch_error(mock_fetch):
     mock_fetch.side_effect = Exception("fetch failed")
 
@@ -56,10 +64,10 @@ async def test_run_once_fetch_error(mock_fetch):
 # TEST 3 — run_once handles validation errors
 # ---------------------------------------------------------
 @pytest.mark.asyncio
-@patch("core.scheduler.fetch_all")
-@patch("core.scheduler.validate")
+@patch("core.scheduler.fetch_all_async", new_callable=AsyncMock)
+@patch("core.scheduler.partition")
 async def test_run_once_validation_error(mock_validate, mock_fetch):
-    mock_fetch.return_value = [make_rec()]
+    mock_fetch.return_value = FetchResult(records=[make_rec()])
     mock_validate.side_effect = Exception("validation error")
 
     with pytest.raises(Exception):
@@ -70,12 +78,12 @@ async def test_run_once_validation_error(mock_validate, mock_fetch):
 # TEST 4 — run_once handles writer errors
 # ---------------------------------------------------------
 @pytest.mark.asyncio
-@patch("core.scheduler.fetch_all")
-@patch("core.scheduler.validate")
-@patch("core.scheduler.write", new_callable=AsyncMock)
+@patch("core.scheduler.fetch_all_async", new_callable=AsyncMock)
+@patch("core.scheduler.partition")
+@patch("core.scheduler.write_bulk", new_callable=AsyncMock)
 async def test_run_once_writer_error(mock_write, mock_validate, mock_fetch):
-    mock_fetch.return_value = [make_rec()]
-    mock_validate.return_value = [make_rec()]
+    mock_fetch.return_value = FetchResult(records=[make_rec()])
+    mock_validate.return_value = ([make_rec()], [])
     mock_write.side_effect = Exception("writer error")
 
     with pytest.raises(Exception):
@@ -83,32 +91,59 @@ async def test_run_once_writer_error(mock_write, mock_validate, mock_fetch):
 
 
 # ---------------------------------------------------------
-# TEST 5 — run_scheduler runs exactly 2 cycles then stops
+# TEST 4b — rejected rows are quarantined, good rows still written
 # ---------------------------------------------------------
 @pytest.mark.asyncio
-@patch("core.scheduler.Config")
-@patch("core.scheduler.time.sleep")
-@patch("core.scheduler.write", new_callable=AsyncMock)
-@patch("core.scheduler.validate")
-@patch("core.scheduler.fetch_all")
-async def test_run_scheduler_two_cycles(
-    mock_fetch, mock_validate, mock_write, mock_sleep, mock_config
-):
-    mock_fetch.side_effect = [[make_rec()], [make_rec()], KeyboardInterrupt()]
-    mock_validate.return_value = [make_rec()]
-    mock_write.return_value = 1
+@patch("core.scheduler.quarantine", new_callable=AsyncMock)
+@patch("core.scheduler.write_bulk", new_callable=AsyncMock)
+@patch("core.scheduler.fetch_all_async", new_callable=AsyncMock)
+async def test_run_once_quarantines_rejects(mock_fetch, mock_write, mock_quarantine):
+    good = make_rec("AAPL")
+    bad = make_rec("MSFT", price=-1)
+    mock_fetch.return_value = FetchResult(records=[good, bad])
+    mock_write.side_effect = lambda rows: len(rows)
 
-    mock_config.SCHEDULER_INTERVAL_SEC = 10
+    result = await run_once()
+
+    assert result == 1
+    assert [r.symbol for r in mock_write.call_args[0][0]] == ["AAPL"]
+    rejects = mock_quarantine.call_args[0][0]
+    assert [(r.symbol, reason) for r, reason in rejects] == [("MSFT", "price_nonpositive")]
 
-    try:
-        await run_scheduler()
-    except KeyboardInterrupt:
-        pass
 
-    assert mock_fetch.call_count == 3  # 2 cycles + 1 for KeyboardInterrupt
-    assert mock_validate.call_count == 2
-    assert mock_write.await_count == 2
-    assert mock_sleep.called
+# ---------------------------------------------------------
+# TEST 4c — a failing quarantine does not lose the valid rows
+# ---------------------------------------------------------
+@pytest.mark.asyncio
+@patch("core.scheduler.quarantine", new_callable=AsyncMock)
+@patch("core.scheduler.write_bulk", new_callable=AsyncMock)
+@patch("core.scheduler.fetch_all_async", new_callable=AsyncMock)
+async def test_run_once_quarantine_failure_keeps_valid_rows(mock_fetch, mock_write, mock_quarantine):
+    mock_fetch.return_value = FetchResult(records=[make_rec("AAPL"), make_rec("MSFT", price=-1)])
+    mock_write.side_effect = lambda rows: len(rows)
+    mock_quarantine.side_effect = WriterError("rejects table unavailable")
+
+    assert await run_once() == 1
+    mock_write.assert_awaited_once()
+    mock_quarantine.assert_awaited_once()
+
+
+# ---------------------------------------------------------
+# TEST 5 — run_scheduler runs repeated cycles until cancelled
+# ---------------------------------------------------------
+@pytest.mark.asyncio
+@patch("core.scheduler.get_provider", return_value=AsyncMock())
+@patch("core.scheduler.run_once", new_callable=AsyncMock)
+async def test_run_scheduler_runs_cycles_until_cancelled(mock_run_once, mock_get_provider):
+    mock_run_once.return_value = 1
+
+    task = asyncio.create_task(run_scheduler(interval=0.02, policy="skip"))
+    await asyncio.sleep(0.11)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert mock_run_once.await_count >= 3
 
 
 # ---------------------------------------------------------
@@ -116,57 +151,180 @@ async def test_run_scheduler_two_cycles(
 # ---------------------------------------------------------
 @pytest.mark.asyncio
 @patch("core.scheduler.error")
-@patch("core.scheduler.time.sleep")
-@patch("core.scheduler.Config")
-@patch("core.scheduler.fetch_all")
-async def test_scheduler_continues_after_error(mock_fetch, mock_config, mock_sleep, mock_error):
-    mock_fetch.side_effect = [
-        Exception("fetch failed"),   # first cycle
-        KeyboardInterrupt()          # second cycle stops loop
-    ]
-
-    mock_config.SCHEDULER_INTERVAL_SEC = 5
+@patch("core.scheduler.get_provider", return_value=AsyncMock())
+@patch("core.scheduler.run_once", new_callable=AsyncMock)
+async def test_scheduler_continues_after_error(mock_run_once, mock_get_provider, mock_error):
+    mock_run_once.side_effect = [Exception("fetch failed"), 1, 1, 1, 1, 1, 1, 1]
 
-    try:
-        await run_scheduler()
-    except KeyboardInterrupt:
-        pass
+    task = asyncio.create_task(run_scheduler(interval=0.02, policy="skip"))
+    await asyncio.sleep(0.07)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
 
     assert mock_error.called
+    assert mock_run_once.await_count >= 2
 
 
 # ---------------------------------------------------------
-# TEST 7 — verify scheduler sleep time is computed properly
+# TEST 7 — the scheduler does not block the event loop
+# ---------------------------------------------------------
+@pytest.mark.asyncio
+@patch("core.scheduler.get_provider", return_value=AsyncMock())
+@patch("core.scheduler.run_once", new_callable=AsyncMock)
+async def test_scheduler_does_not_block_event_loop(mock_run_once, mock_get_provider):
+    mock_run_once.return_value = 1
+    ticks = 0
+
+    async def other_work():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    scheduler = asyncio.create_task(run_scheduler(interval=10, policy="skip"))
+    worker = asyncio.create_task(other_work())
+    await asyncio.sleep(0.05)
+    scheduler.cancel()
+    worker.cancel()
+    await asyncio.gather(scheduler, worker, return_exceptions=True)
+
+    assert mock_run_once.await_count == 1
+    assert ticks >= 5
+
+
+# ---------------------------------------------------------
+# TEST 8 — cancellation lets the running cycle finish
+# ---------------------------------------------------------
+@pytest.mark.asyncio
+@patch("core.scheduler.get_provider", return_value=AsyncMock())
+@patch("core.scheduler.run_once", new_callable=AsyncMock)
+async def test_scheduler_cancellation_waits_for_cycle(mock_run_once, mock_get_provider):
+    finished = asyncio.Event()
+
+    async def slow_cycle(provider, limiter):
+        await asyncio.sleep(0.05)
+        finished.set()
+        return 1
+
+    mock_run_once.side_effect = slow_cycle
+
+    task = asyncio.create_task(run_scheduler(interval=10, policy="skip"))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert finished.is_set()
+
+
+# ---------------------------------------------------------
+# TEST 9 — concurrent policy caps cycles in flight
 # ---------------------------------------------------------
 @pytest.mark.asyncio
-@patch("core.scheduler.time.sleep")
 @patch("core.scheduler.Config")
-@patch("core.scheduler.write", new_callable=AsyncMock)
-@patch("core.scheduler.validate")
-@patch("core.scheduler.fetch_all")
-async def test_scheduler_sleep_timing(
-    mock_fetch, mock_validate, mock_write, mock_config, mock_sleep
-):
-    mock_fetch.side_effect = [
-        [make_rec()],
-        KeyboardInterrupt()
-    ]
-
-    mock_validate.return_value = [make_rec()]
-    mock_write.return_value = 1
+@patch("core.scheduler.get_provider", return_value=AsyncMock())
+@patch("core.scheduler.run_once", new_callable=AsyncMock)
+async def test_scheduler_concurrent_policy_caps_in_flight(mock_run_once, mock_get_provider, mock_config):
+    mock_config.SCHEDULER_SHUTDOWN_GRACE_SEC = 0
+    mock_config.PARTITION_MAINTENANCE_INTERVAL_SEC = 0
+    in_flight = 0
+    peak = 0
+
+    async def slow_cycle(provider, limiter):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.2)
+        in_flight -= 1
+        return 1
+
+    mock_run_once.side_effect = slow_cycle
+
+    task = asyncio.create_task(
+        run_scheduler(interval=0.01, policy="concurrent", max_in_flight=2)
+    )
+    await asyncio.sleep(0.1)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert mock_run_once.await_count == 2
+    assert peak == 2
+
+
+# ---------------------------------------------------------
+# TEST 10 — unknown overrun policy is rejected
+# ---------------------------------------------------------
+@pytest.mark.asyncio
+async def test_scheduler_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        await run_scheduler(interval=1, policy="sometimes")
+
 
-    mock_config.SCHEDULER_INTERVAL_SEC = 10
+# ---------------------------------------------------------
+# TEST 11 — deadlines stay on the grid (no drift)
+# ---------------------------------------------------------
+def test_next_deadline_on_time_stays_on_grid():
+    # Cycle took 3s of a 10s interval, and we woke up 0.5s late last time:
+    # the next deadline is still exactly start + 2 * interval.
+    tick, deadline = next_deadline(start=100.0, interval=10.0, now=113.5, tick=1, policy="skip")
+    assert tick == 2
+    assert deadline == 120.0
+
+
+def test_next_deadline_skip_jumps_to_next_grid_point():
+    # Cycle overran into the third interval: ticks 1 and 2 are skipped.
+    tick, deadline = next_deadline(start=100.0, interval=10.0, now=125.0, tick=0, policy="skip")
+    assert tick == 3
+    assert deadline == 130.0
 
-    with patch("core.scheduler.datetime") as mock_dt:
-        mock_dt.now.side_effect = [
-            datetime(2025, 1, 1, 0, 0, 0, tzinfo=timezone.utc),  # cycle start
-            datetime(2025, 1, 1, 0, 0, 3, tzinfo=timezone.utc),  # after work: elapsed 3 sec
-            datetime(2025, 1, 1, 0, 0, 3, tzinfo=timezone.utc)   # for next cycle (not used)
-        ]
 
-        try:
-            await run_scheduler()
-        except KeyboardInterrupt:
-            pass
+def test_next_deadline_queue_runs_immediately():
+    tick, deadline = next_deadline(start=100.0, interval=10.0, now=125.0, tick=0, policy="queue")
+    assert deadline == 125.0
+    # The following cycle realigns to the grid
+    tick, deadline = next_deadline(start=100.0, interval=10.0, now=126.0, tick=tick, policy="queue")
+    assert deadline == 130.0
 
-    mock_sleep.assert_called_with(7)
+
+# ---------------------------------------------------------
+# TEST — partitions are maintained on startup and periodically
+# ---------------------------------------------------------
+@pytest.mark.asyncio
+@patch("core.scheduler.Config.PARTITION_MAINTENANCE_INTERVAL_SEC", 0.02)
+@patch("core.scheduler.get_provider", return_value=AsyncMock())
+@patch("core.scheduler.run_once", new_callable=AsyncMock)
+async def test_scheduler_maintains_partitions(mock_run_once, mock_get_provider, no_partition_maintenance):
+    no_partition_maintenance.side_effect = [Exception("db down"), None, None, None, None, None, None, None]
+
+    task = asyncio.create_task(run_scheduler(interval=10, policy="skip"))
+    await asyncio.sleep(0.07)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert no_partition_maintenance.await_count >= 2
+
+
+# ---------------------------------------------------------
+# TEST — stream mode feeds the websocket provider with the same listeners
+# ---------------------------------------------------------
+@pytest.mark.asyncio
+@patch("core.scheduler.Config.INGEST_MODE", "stream")
+@patch("core.scheduler.Config.METRICS_ENABLED", True)
+@patch("core.scheduler.remove_listener")
+@patch("core.scheduler.add_listener")
+@patch("core.scheduler.get_provider")
+@patch("core.scheduler.get_stream_provider")
+@patch("core.scheduler.run_stream", new_callable=AsyncMock)
+async def test_scheduler_stream_mode(mock_run_stream, mock_get_stream, mock_get_provider, mock_add, mock_remove):
+    mock_run_stream.return_value = 3
+
+    await run_scheduler(interval=10, policy="skip")
+
+    mock_run_stream.assert_awaited_once_with(mock_get_stream.return_value)
+    mock_get_provider.assert_not_called()
+    listeners = [c[0][0].__qualname__ for c in mock_add.call_args_list]
+    assert "MetricsAggregator.on_trades" in listeners
+    assert mock_remove.call_count == mock_add.call_count
@@ -0,0 +1,140 @@
+import json
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from reasoning.gateway import SUMMARIES_COLUMNS, LLMGateway
+from reasoning.prompt_cache import PromptCache
+from reasoning.prompt_templates import CompiledTemplate
+from reasoning.summarizer import SummaryInput, Summarizer, parse_batch
+
+T0 = datetime(2024, 1, 2, 15, 0, tzinfo=timezone.utc)
+T1 = T0 + timedelta(minutes=5)
+
+TEMPLATE = CompiledTemplate("t", "1", "Be brief.\n\nSymbol: {symbol}\nMetrics:\n{metrics}\nEvents:\n{events}\n")
+
+
+def make_input(symbol, events=()):
+    return SummaryInput(symbol, T0, T1, metrics={"last_price": 100.0, "volume": 10.0}, events=list(events))
+
+
+@pytest_asyncio.fixture
+async def model_server():
+    """
+    Answers batch prompts (system asks for JSON) with {symbol: summary} for
+    the symbols in the prompt, unless `mode` says otherwise.
+    """
+    state = {"calls": [], "mode": "json"}
+
+    async def completions(request):
+        body = await request.json()
+        system, prompt = body["messages"][0]["content"], body["messages"][-1]["content"]
+        symbols = [line.split(": ", 1)[1] for line in prompt.splitlines() if line.startswith("Symbol: ")]
+        batch = "JSON object" in system
+        state["calls"].append(symbols if batch else symbols[0])
+        if not batch:
+            text = "single " + symbols[0]
+        elif state["mode"] == "garbage":
+            text = "Sorry, here are the summaries: AAPL is flat."
+        else:
+            answer = {s: "batched " + s for s in symbols}
+            if state["mode"] == "partial":
+                answer.pop(symbols[-1])
+            text = "```json\n" + json.dumps(answer) + "\n```"
+        return web.json_response({
+            "model": "fake",
+            "choices": [{"message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 10},
+        })
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    server = TestServer(app)
+    await server.start_server()
+    server.state = state
+    yield server
+    await server.close()
+
+
+def make_gateway(server, rows):
+    async def writer(batch):
+        rows.extend(dict(zip(SUMMARIES_COLUMNS, row)) for row in batch)
+        return len(batch)
+
+    return LLMGateway(base_url=str(server.make_url("/v1")), api_key="k", model="fake", rpm=0, tpm=0,
+                      workers=4, writer=writer)
+
+
+# This test checks parsing of batch answers in the accepted shapes
+def test_parse_batch():
+    assert parse_batch('```json\n{"aapl": "up", "MSFT": "flat", "X": "?"}\n```', ["AAPL", "MSFT"]) == {
+        "AAPL": "up", "MSFT": "flat",
+    }
+    assert parse_batch('Here: [{"symbol": "AAPL", "summary": "up"}]', ["AAPL", "MSFT"]) == {"AAPL": "up"}
+    assert parse_batch('{"summaries": [{"symbol": "MSFT", "summary": "flat"}]}', ["MSFT"]) == {"MSFT": "flat"}
+    for bad in ("no json here", '{"TSLA": "up"}', '{"AAPL": ""}', '{"AAPL": '):
+        with pytest.raises(ValueError):
+            parse_batch(bad, ["AAPL"])
+
+
+# This test checks that quiet symbols are packed into batches and split back into per-symbol rows
+@pytest.mark.asyncio
+async def test_batches_quiet_symbols(model_server):
+    rows = []
+    items = [make_input("S{}".format(i)) for i in range(5)]
+    items.insert(2, make_input("HOT", events=[{"type": "price_gap", "severity": "high", "window_end": T1}]))
+    async with make_gateway(model_server, rows) as gateway:
+        summarizer = Summarizer(gateway, TEMPLATE, batch_size=3, batch_enabled=True)
+        results = await summarizer.summarize(items)
+
+    calls = model_server.state["calls"]
+    assert len(calls) == 3
+    assert "HOT" in calls and ["S0", "S1", "S2"] in calls and ["S3", "S4"] in calls
+    assert [r.text for r in results] == [
+        "batched S0", "batched S1", "single HOT", "batched S2", "batched S3", "batched S4",
+    ]
+    assert summarizer.stats.batches == 2 and summarizer.stats.batched_symbols == 5
+
+    assert len(rows) == 6
+    batch_rows = [row for row in rows if row["text"].startswith("batched")]
+    assert {row["prompt_version"] for row in batch_rows} == {"t:1+batch"}
+    assert sum(row["tokens_used"] for row in batch_rows) == 2 * 110
+    assert sorted(row["tokens_used"] for row in batch_rows if row["symbol"] in ("S0", "S1", "S2")) == [36, 36, 38]
+
+
+# This test checks the fallback to single calls when the batch answer cannot be used
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode,singles", [("garbage", ["A", "B", "C"]), ("partial", ["C"])])
+async def test_batch_fallback(model_server, mode, singles):
+    model_server.state["mode"] = mode
+    rows = []
+    async with make_gateway(model_server, rows) as gateway:
+        summarizer = Summarizer(gateway, TEMPLATE, batch_size=5, batch_enabled=True)
+        results = await summarizer.summarize([make_input(s) for s in "ABC"])
+
+    assert model_server.state["calls"][0] == ["A", "B", "C"]
+    assert sorted(model_server.state["calls"][1:]) == singles
+    assert all(r.ok for r in results)
+    assert [r.text.startswith("single") for r in results] == [s in singles for s in "ABC"]
+    assert sorted(row["symbol"] for row in rows) == ["A", "B", "C"]
+    assert summarizer.stats.fallbacks == len(singles)
+
+
+# This test checks that cached answers are reused across windows of a symbol but never across symbols
+@pytest.mark.asyncio
+async def test_cache_key_includes_symbol(model_server):
+    rows = []
+    gateway = make_gateway(model_server, rows)
+    gateway.cache = PromptCache(maxsize=10, ttl_sec=60, use_db=False)
+    later = SummaryInput("AAPL", T1, T1 + timedelta(minutes=5), metrics={"last_price": 100.0, "volume": 10.0})
+    async with gateway:
+        summarizer = Summarizer(gateway, TEMPLATE, batch_enabled=False)
+        first = await summarizer.summarize([make_input("AAPL"), make_input("MSFT")])
+        second = await summarizer.summarize([later])
+
+    assert sorted(model_server.state["calls"]) == ["AAPL", "MSFT"]
+    assert [r.text for r in first] == ["single AAPL", "single MSFT"]
+    assert second[0].cached and second[0].text == "single AAPL"
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+from core.utils import TokenBucket
+
+
+# This test checks that a full bucket serves a burst without waiting.
+@pytest.mark.asyncio
+async def test_token_bucket_allows_burst():
+    bucket = TokenBucket(rate=10, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        await bucket.acquire()
+    assert time.monotonic() - start < 0.05
+
+
+# This test checks that once the bucket is empty, acquire() waits
+# roughly 1 / rate seconds per token.
+@pytest.mark.asyncio
+async def test_token_bucket_paces_after_burst():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        await bucket.acquire()
+    # 1 token up front, 5 more at 50/s -> ~0.1s
+    assert time.monotonic() - start >= 0.09
+
+
+# This test checks that a non-positive rate disables limiting.
+@pytest.mark.asyncio
+async def test_token_bucket_unlimited():
+    bucket = TokenBucket(rate=0)
+    start = time.monotonic()
+    for _ in range(1000):
+        await bucket.acquire()
+    assert time.monotonic() - start < 0.1
+
+
+# This test checks that asking for more tokens than the capacity fails fast.
+@pytest.mark.asyncio
+async def test_token_bucket_rejects_oversized_request():
+    bucket = TokenBucket(rate=1, capacity=2)
+    with pytest.raises(ValueError):
+        await bucket.acquire(3)
+
+
+# This test checks that a debit below zero makes the next acquire wait for the refill.
+@pytest.mark.asyncio
+async def test_token_bucket_debit_goes_negative():
+    bucket = TokenBucket(rate=100, capacity=10)
+    await bucket.acquire(10)
+    bucket.debit(5)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await bucket.acquire(5)
+    assert loop.time() - started >= 0.09
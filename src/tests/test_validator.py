@@ -112,3 +112,109 @@ def test_validator_preserves_order():
     rec2 = make_record(symbol="MSFT", ts=ts2)
     out = validate([rec1, rec2])
     assert out == [rec1, rec2]
+
+
+# ---------------------------------------------------------
+# Columnar batch validator
+# ---------------------------------------------------------
+import numpy as np
+from ingest.validator import validate_batch
+
+
+# This test checks that a clean batch keeps every row.
+def test_validate_batch_happy_path():
+    recs = [make_record(symbol="AAPL"), make_record(symbol="MSFT")]
+    result = validate_batch(recs)
+    assert result.keep.tolist() == [True, True]
+    assert result.reason_names() == ["ok", "ok"]
+    assert result.select(recs) == recs
+
+
+# This test checks that bad rows are reported per row instead of
+# raising, and that good rows in the same batch survive.
+def test_validate_batch_reports_reasons_per_row():
+    future_ts = datetime.now(timezone.utc) + timedelta(days=2)
+    recs = [
+        make_record(symbol="AAPL"),
+        make_record(symbol=""),
+        make_record(symbol="BRK A"),
+        make_record(ts=datetime(2024, 1, 1, 12, 0, 0)),
+        make_record(ts=future_ts),
+        make_record(price=float("nan")),
+        make_record(price=-5),
+        make_record(price="100"),
+        TradeRecord("AAPL", datetime.now(timezone.utc), 100.0, 10.0, None),
+        make_record(source=""),
+        "not a trade record",
+        make_record(symbol="MSFT"),
+    ]
+    result = validate_batch(recs)
+    assert result.reason_names() == [
+        "ok",
+        "symbol_empty",
+        "symbol_has_space",
+        "ts_invalid",
+        "ts_future",
+        "price_invalid",
+        "price_nonpositive",
+        "price_invalid",
+        "source_missing",
+        "source_missing",
+        "not_trade_record",
+        "ok",
+    ]
+    assert [r.symbol for r in result.select(recs)] == ["AAPL", "MSFT"]
+
+
+# This test checks that only the first of several duplicate
+# (symbol, ts) rows is kept, and that symbols are compared after strip().
+def test_validate_batch_marks_duplicates():
+    ts = datetime.now(timezone.utc)
+    recs = [make_record(symbol="AAPL", ts=ts), make_record(symbol="MSFT", ts=ts), make_record(symbol=" AAPL ", ts=ts)]
+    result = validate_batch(recs)
+    assert result.reason_names() == ["ok", "ok", "duplicate"]
+
+
+# This test checks that dedup=False (stream trades) keeps rows sharing a timestamp.
+def test_validate_batch_without_dedup():
+    ts = datetime.now(timezone.utc)
+    recs = [make_record(ts=ts, price=100.0), make_record(ts=ts, price=100.01), make_record(ts=ts, price=100.0)]
+    assert validate_batch(recs, dedup=False).reason_names() == ["ok", "ok", "ok"]
+
+
+# This test checks that a duplicate of a rejected row is not itself
+# flagged as a duplicate (matching validate()).
+def test_validate_batch_duplicate_of_invalid_row_is_kept():
+    ts = datetime.now(timezone.utc)
+    recs = [make_record(ts=ts, price=-1), make_record(ts=ts)]
+    result = validate_batch(recs)
+    assert result.reason_names() == ["price_nonpositive", "ok"]
+
+
+# This test checks normalization: sizes are fixed, symbol/source cleaned,
+# and the input records are left untouched.
+def test_validate_batch_normalizes_without_mutating():
+    rec = make_record(symbol=" AAPL ", size=-5, source="FinnHub")
+    out = validate_batch([rec]).select([rec])
+    assert out[0].symbol == "AAPL"
+    assert out[0].size == 0.0
+    assert out[0].source == "finnhub"
+    assert rec.symbol == " AAPL "
+    assert rec.size == -5
+
+
+# This test checks the empty batch.
+def test_validate_batch_empty():
+    result = validate_batch([])
+    assert result.keep.size == 0
+    assert result.select([]) == []
+
+
+# This test checks that the batch and reference validators agree on
+# the rows they keep for a clean batch.
+def test_validate_batch_matches_reference():
+    base = datetime.now(timezone.utc)
+    recs = [make_record(symbol="S{}".format(i % 7), ts=base - timedelta(seconds=i % 13)) for i in range(200)]
+    expected = validate([make_record(r.symbol, r.price, r.size, r.ts, r.source) for r in recs])
+    result = validate_batch(recs)
+    assert result.select(recs) == expected
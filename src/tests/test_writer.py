@@ -2,7 +2,7 @@
 import pytest
 from unittest.mock import AsyncMock, patch
 
-from ingest.writer import write
+from ingest.writer import write, INSERT_RAW_TRADE_STATEMENT
 from ingest.writer_errors import WriterError
 from ingest.providers.base import TradeRecord
 from datetime import datetime, timezone
@@ -18,7 +18,7 @@ def make_rec(symbol="AAPL", price=100.0, size=10.0):
 
 # Test writing an empty list returns 0 and does not call db.execute
 @pytest.mark.asyncio
-@patch("ingest.writer.execute", new_callable=AsyncMock)
+@patch("ingest.writer.execute_prepared", new_callable=AsyncMock)
 async def test_writer_empty_list(mock_execute):
     out = await write([])
     assert out == 0
@@ -26,18 +26,18 @@ async def test_writer_empty_list(mock_execute):
 
 # Test single row insert
 @pytest.mark.asyncio
-@patch("ingest.writer.execute", new_callable=AsyncMock)
+@patch("ingest.writer.execute_prepared", new_callable=AsyncMock)
 async def test_writer_inserts_single_row(mock_execute):
     rec = make_rec("AAPL")
     out = await write([rec])
     assert out == 1
     mock_execute.assert_awaited_once()
-    sql = mock_execute.call_args[0][0]
-    assert "INSERT INTO raw_trades" in sql
+    name = mock_execute.call_args[0][0]
+    assert name == INSERT_RAW_TRADE_STATEMENT
 
 # Test multiple row inserts
 @pytest.mark.asyncio
-@patch("ingest.writer.execute", new_callable=AsyncMock)
+@patch("ingest.writer.execute_prepared", new_callable=AsyncMock)
 async def test_writer_inserts_multiple_rows(mock_execute):
     rec1 = make_rec("AAPL")
     rec2 = make_rec("MSFT")
@@ -45,12 +45,11 @@ async def test_writer_inserts_multiple_rows(mock_execute):
     assert out == 2
     assert mock_execute.await_count == 2
     for call in mock_execute.call_args_list:
-        sql = call[0][0]
-        assert "INSERT INTO raw_trades" in sql
+        assert call[0][0] == INSERT_RAW_TRADE_STATEMENT
 
 # Test duplicate symbol inserts
 @pytest.mark.asyncio
-@patch("ingest.writer.execute", new_callable=AsyncMock)
+@patch("ingest.writer.execute_prepared", new_callable=AsyncMock)
 async def test_writer_inserts_duplicate_symbols(mock_execute):
     rec1 = make_rec("AAPL")
     rec2 = make_rec("AAPL")
@@ -58,12 +57,11 @@ async def test_writer_inserts_duplicate_symbols(mock_execute):
     assert out == 2
     assert mock_execute.await_count == 2
     for call in mock_execute.call_args_list:
-        sql = call[0][0]
-        assert "INSERT INTO raw_trades" in sql
+        assert call[0][0] == INSERT_RAW_TRADE_STATEMENT
 
 # Test db error raises WriterError
 @pytest.mark.asyncio
-@patch("ingest.writer.execute", new_callable=AsyncMock)
+@patch("ingest.writer.execute_prepared", new_callable=AsyncMock)
 async def test_writer_db_error_raises_writererror(mock_execute):
     mock_execute.side_effect = Exception("connection failed")
     with pytest.raises(WriterError):
@@ -71,8 +69,98 @@ async def test_writer_db_error_raises_writererror(mock_execute):
 
 # Test insert failure raises WriterError
 @pytest.mark.asyncio
-@patch("ingest.writer.execute", new_callable=AsyncMock)
+@patch("ingest.writer.execute_prepared", new_callable=AsyncMock)
 async def test_writer_insert_failure(mock_execute):
     mock_execute.side_effect = Exception("db insert error")
     with pytest.raises(WriterError):
         await write([make_rec("AAPL")])
+
+
+# ---------------------------------------------------------
+# Bulk write path
+# ---------------------------------------------------------
+from ingest.writer import write_bulk
+
+
+# Test writing an empty list through the bulk path touches nothing
+@pytest.mark.asyncio
+@patch("ingest.writer.copy_records", new_callable=AsyncMock)
+async def test_write_bulk_empty_list(mock_copy):
+    out = await write_bulk([])
+    assert out == 0
+    mock_copy.assert_not_called()
+
+# Test the bulk path issues a single COPY for the whole batch
+@pytest.mark.asyncio
+@patch("ingest.writer.execute_prepared", new_callable=AsyncMock)
+@patch("ingest.writer.copy_records", new_callable=AsyncMock)
+async def test_write_bulk_uses_single_copy(mock_copy, mock_execute):
+    mock_copy.return_value = 3
+    recs = [make_rec("AAPL"), make_rec("MSFT"), make_rec("GOOG")]
+    out = await write_bulk(recs)
+    assert out == 3
+    mock_copy.assert_awaited_once()
+    mock_execute.assert_not_called()
+    table, columns, rows = mock_copy.call_args[0]
+    assert table == "raw_trades"
+    assert columns == ("symbol", "ts", "price", "size", "source")
+    assert [r[0] for r in rows] == ["AAPL", "MSFT", "GOOG"]
+
+# Test the executemany fallback sends every row in one call
+@pytest.mark.asyncio
+@patch("ingest.writer.execute_many", new_callable=AsyncMock)
+async def test_write_bulk_executemany_fallback(mock_execute_many):
+    recs = [make_rec("AAPL"), make_rec("MSFT")]
+    out = await write_bulk(recs, use_copy=False)
+    assert out == 2
+    mock_execute_many.assert_awaited_once()
+    sql, rows = mock_execute_many.call_args[0]
+    assert "INSERT INTO raw_trades" in sql
+    assert len(rows) == 2
+
+# Test db errors on the bulk path raise WriterError
+@pytest.mark.asyncio
+@patch("ingest.writer.copy_records", new_callable=AsyncMock)
+async def test_write_bulk_db_error_raises_writererror(mock_copy):
+    mock_copy.side_effect = Exception("copy failed")
+    with pytest.raises(WriterError):
+        await write_bulk([make_rec()])
+
+# Test listeners get the committed batch, and a failing listener does not fail the write
+@pytest.mark.asyncio
+@patch("ingest.writer.copy_records", new_callable=AsyncMock)
+async def test_write_bulk_notifies_listeners(mock_copy):
+    from ingest.batch import TradeBatch
+    from ingest.writer import add_listener, remove_listener
+
+    mock_copy.return_value = 2
+    seen = AsyncMock()
+    broken = AsyncMock(side_effect=Exception("listener failed"))
+    add_listener(broken)
+    add_listener(seen)
+    try:
+        out = await write_bulk([make_rec("AAPL"), make_rec("MSFT")])
+    finally:
+        remove_listener(broken)
+        remove_listener(seen)
+
+    assert out == 2
+    batch = seen.call_args[0][0]
+    assert isinstance(batch, TradeBatch)
+    assert batch.symbol_column() == ["AAPL", "MSFT"]
+
+# Test listeners are not called when the write fails
+@pytest.mark.asyncio
+@patch("ingest.writer.copy_records", new_callable=AsyncMock)
+async def test_write_bulk_failure_skips_listeners(mock_copy):
+    from ingest.writer import add_listener, remove_listener
+
+    mock_copy.side_effect = Exception("copy failed")
+    seen = AsyncMock()
+    add_listener(seen)
+    try:
+        with pytest.raises(WriterError):
+            await write_bulk([make_rec()])
+    finally:
+        remove_listener(seen)
+    seen.assert_not_called()